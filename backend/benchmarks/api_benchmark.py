@@ -0,0 +1,387 @@
+"""
+Benchmarks every v1 endpoint end to end through the ASGI app, with the stub model and in-memory storage.
+
+Requests go through the whole app in process (middleware, validation, routing, text extraction, the
+model layer and storage) without a server or network. The model is the deterministic stub
+(LLM_BACKEND=stub, or a recording with --llm-backend replay) and storage is the memory backend, so the
+results measure the app itself plus the configured model latency. Notes are generated from synthetic
+PDFs, Word documents, slide decks and images of each size in benchmarks/synthetic_files.py.
+
+ID token verification is replaced by a dependency that takes the bearer token as the user ID; its cost
+is measured by auth_benchmark. Sign-up, login and token revocation call Firebase Auth and are not run.
+
+For each endpoint the report gives p50/p95/p99 latency, throughput, the peak RSS during the run and, from
+a separate sequential pass under tracemalloc, the peak and retained Python allocations per request.
+--sweep runs each endpoint at increasing concurrency and reports the saturation point: the concurrency
+after which the next step raises throughput by less than --min-throughput-gain. Reports are JSON, and
+--compare adds the change in p95 latency and throughput against an earlier report, e.g. from the
+previous commit.
+
+Usage:
+    python -m backend.benchmarks.api_benchmark --output api.json
+    python -m backend.benchmarks.api_benchmark --endpoints quiz query-bot notes:pdf --sweep 1 2 4 8 16 32
+    python -m backend.benchmarks.api_benchmark --llm-latency lognormal:-1:0.5 --compare api.json --max-regression 0.2
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import math
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from datetime import datetime, timezone
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional
+
+from backend.benchmarks.synthetic_files import FILE_MAKERS, SIZES, make_file
+
+API_PREFIX = "/v1/api"
+NOTES_CUSTOMISATION = json.dumps({"length": "concise", "language": "English"})
+QUIZ_CUSTOMISATION = {"number_of_questions": 10, "question_types": ["multiple_choice"], "difficulty_level": "mix"}
+
+
+class Scenario:
+    """
+    A request to one endpoint; `request` returns the httpx arguments for a user's request.
+    """
+
+    def __init__(self, name: str, method: str, path: str, request: Optional[Callable[[str], Dict[str, Any]]] = None):
+        self.name = name
+        self.method = method
+        self.path = path
+        self.request = request or (lambda user_id: {})
+
+
+@lru_cache(maxsize=None)
+def synthetic_upload(file_kind: str, size: str) -> Dict[str, Any]:
+    file_name, content, mime_type = make_file(file_kind, size)
+    return {"files": {"file": (file_name, content, mime_type)}, "data": {"notes_customisation": NOTES_CUSTOMISATION}}
+
+
+@lru_cache(maxsize=None)
+def synthetic_batch_upload(size: str) -> Dict[str, Any]:
+    files = [("files", make_file(file_kind, size, seed)) for seed, file_kind in enumerate(FILE_MAKERS)]
+    return {"files": files, "data": {"notes_customisation": NOTES_CUSTOMISATION, "combined_summary": "true"}}
+
+
+def build_scenarios(state: Dict[str, Any], sizes: List[str]) -> List[Scenario]:
+    """
+    Returns a scenario for every v1 route that does not call Firebase Auth, in the order they are run.
+
+    Scenarios that answer quiz questions use the question each user got during setup, and
+    delete-collections runs last because it deletes the quizzes other scenarios read.
+    """
+    def notes_request(file_kind: str, size: str) -> Callable[[str], Dict[str, Any]]:
+        return lambda user_id: synthetic_upload(file_kind, size)
+
+    scenarios = [
+        Scenario("healthcheck", "GET", "/v1/"),
+        Scenario("protected", "GET", f"{API_PREFIX}/protected"),
+        Scenario("llm-queue", "GET", f"{API_PREFIX}/llm-queue"),
+    ]
+    scenarios += [Scenario(f"notes:{file_kind}:{size}", "POST", f"{API_PREFIX}/get-notes-from-uploaded-file", notes_request(file_kind, size))
+                  for file_kind in FILE_MAKERS for size in sizes]
+    scenarios += [Scenario(f"notes-batch:{size}", "POST", f"{API_PREFIX}/get-notes-from-uploaded-files", lambda user_id, size=size: synthetic_batch_upload(size))
+                  for size in sizes]
+    scenarios += [
+        Scenario("quiz", "POST", f"{API_PREFIX}/get-quiz-from-uploaded-notes", lambda user_id: {"json": QUIZ_CUSTOMISATION}),
+        Scenario("evaluate-answer", "POST", f"{API_PREFIX}/evaluate-student-answer",
+                 lambda user_id: {"json": {"student_answer": 0, "question_and_answer": state["questions"][user_id]}}),
+        Scenario("evaluate-free-response", "POST", f"{API_PREFIX}/evaluate-student-answer",
+                 lambda user_id: {"json": {"student_answer": "Entropy measures disorder.",
+                                           "question_and_answer": {"question": "Explain entropy.", "answer": "A measure of the disorder of a system."}}}),
+        Scenario("strength-weakness", "POST", f"{API_PREFIX}/get-student-strength-weakness", lambda user_id: {"json": {"num_of_qns": 10}}),
+        Scenario("regenerate-quiz", "POST", f"{API_PREFIX}/regenerate-quiz",
+                 lambda user_id: {"json": {"quiz_customisation": QUIZ_CUSTOMISATION,
+                                           "strength_and_weakness": {"score": 5, "strength": "Definitions", "weakness": "Applications"}}}),
+        Scenario("query-bot", "POST", f"{API_PREFIX}/query-bot", lambda user_id: {"json": {"query": "What is entropy?"}}),
+        Scenario("delete-media", "POST", f"{API_PREFIX}/delete-media", lambda user_id: {"json": {"file_name": f"files/{user_id}"}}),
+        Scenario("metrics", "GET", "/metrics"),
+        Scenario("delete-collections", "POST", f"{API_PREFIX}/delete-collections",
+                 lambda user_id: {"json": {"coll_name": "quiz_qn_and_ans", "batch_size": 100}}),
+    ]
+    return scenarios
+
+
+def select_scenarios(scenarios: List[Scenario], names: Optional[List[str]]) -> List[Scenario]:
+    # A name selects the scenario with that name and, e.g. 'notes' or 'notes:pdf', all scenarios under it.
+    if not names:
+        return scenarios
+    return [scenario for scenario in scenarios if any(scenario.name == name or scenario.name.startswith(name + ":") for name in names)]
+
+
+def install_benchmark_auth(v1_app: Any) -> None:
+    """
+    Replaces ID token verification with a dependency that takes the bearer token as the user ID.
+    """
+    from fastapi import Depends
+    from fastapi.security import HTTPAuthorizationCredentials
+
+    from backend.src.api.v1.app import security, verify_token
+    from backend.src.utils.metrics import set_request_label
+
+    async def verify_bearer_as_user_id(auth_creds: HTTPAuthorizationCredentials = Depends(security)):
+        user_id = auth_creds.credentials
+        set_request_label("user_id", user_id)
+        return {"uid": user_id, "email": f"{user_id}@benchmark.invalid"}
+
+    v1_app.dependency_overrides[verify_token] = verify_bearer_as_user_id
+
+
+def rss_mib() -> float:
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    # ru_maxrss is the peak so far, in KiB on Linux.
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class RssSampler:
+    """
+    Samples the process RSS in a background thread and keeps the peak.
+    """
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.start_mib = self.peak_mib = rss_mib()
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self) -> None:
+        while not self.stopped.wait(self.interval):
+            self.peak_mib = max(self.peak_mib, rss_mib())
+
+    def __enter__(self) -> "RssSampler":
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.stopped.set()
+        self.thread.join()
+        self.peak_mib = max(self.peak_mib, rss_mib())
+
+
+def percentile(sorted_values: List[float], percent: float) -> float:
+    # Nearest rank.
+    return sorted_values[max(0, min(len(sorted_values) - 1, math.ceil(percent / 100 * len(sorted_values)) - 1))]
+
+
+async def send(client: Any, scenario: Scenario, user_id: str) -> int:
+    response = await client.request(scenario.method, scenario.path, headers={"Authorization": f"Bearer {user_id}"}, **scenario.request(user_id))
+    return response.status_code
+
+
+async def run_scenario(client: Any, scenario: Scenario, users: List[str], concurrency: int, requests: int) -> Dict[str, Any]:
+    """
+    Sends `requests` requests from `concurrency` concurrent clients, taking turns between users.
+    """
+    latencies: List[float] = []
+    statuses: Counter = Counter()
+    request_ids = itertools.count()
+
+    async def client_loop() -> None:
+        while True:
+            i = next(request_ids)
+            if i >= requests:
+                return
+            start = time.perf_counter()
+            status = await send(client, scenario, users[i % len(users)])
+            latencies.append(time.perf_counter() - start)
+            statuses[status] += 1
+
+    with RssSampler() as rss:
+        start = time.perf_counter()
+        await asyncio.gather(*(client_loop() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "endpoint": scenario.name,
+        "concurrency": concurrency,
+        "requests": requests,
+        "errors": sum(count for status, count in statuses.items() if status >= 400),
+        "status_codes": {str(status): count for status, count in sorted(statuses.items())},
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "mean_ms": round(statistics.mean(latencies) * 1000, 2),
+        "throughput_rps": round(requests / elapsed, 2),
+        "peak_rss_mib": round(rss.peak_mib, 1),
+        "rss_growth_mib": round(rss.peak_mib - rss.start_mib, 1),
+    }
+
+
+async def measure_allocations(client: Any, scenario: Scenario, users: List[str], requests: int) -> Dict[str, Any]:
+    """
+    Sends requests one at a time under tracemalloc and returns the median peak and retained allocations per request.
+    """
+    peaks, retained = [], []
+    tracemalloc.start()
+    try:
+        for i in range(requests):
+            before = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            await send(client, scenario, users[i % len(users)])
+            current, peak = tracemalloc.get_traced_memory()
+            peaks.append(peak - before)
+            retained.append(current - before)
+    finally:
+        tracemalloc.stop()
+    return {"alloc_peak_kib": round(statistics.median(peaks) / 1024, 1), "alloc_retained_kib": round(statistics.median(retained) / 1024, 1)}
+
+
+def find_saturation(points: List[Dict[str, Any]], min_gain: float) -> Dict[str, Any]:
+    """
+    Returns the concurrency after which the next step raises throughput by less than min_gain, and the best throughput.
+    """
+    saturation = None
+    for previous, current in zip(points, points[1:]):
+        if current["throughput_rps"] < previous["throughput_rps"] * (1 + min_gain):
+            saturation = previous["concurrency"]
+            break
+    best = max(points, key=lambda point: point["throughput_rps"])
+    return {"saturation_concurrency": saturation, "max_throughput_rps": best["throughput_rps"], "max_throughput_concurrency": best["concurrency"]}
+
+
+def compare_reports(report: Dict[str, Any], baseline: Dict[str, Any]) -> List[Dict[str, Any]]:
+    baseline_results = {(result["endpoint"], result["concurrency"]): result for result in baseline["results"]}
+    comparison = []
+    for result in report["results"]:
+        previous = baseline_results.get((result["endpoint"], result["concurrency"]))
+        if previous is None:
+            continue
+        comparison.append({
+            "endpoint": result["endpoint"],
+            "concurrency": result["concurrency"],
+            "p95_change": round(result["p95_ms"] / previous["p95_ms"] - 1, 3) if previous["p95_ms"] else None,
+            "throughput_change": round(result["throughput_rps"] / previous["throughput_rps"] - 1, 3) if previous["throughput_rps"] else None,
+        })
+    return comparison
+
+
+def git_commit() -> Optional[str]:
+    result = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True)
+    return result.stdout.strip() if result.returncode == 0 else None
+
+
+async def seed_users(client: Any, users: List[str], state: Dict[str, Any]) -> None:
+    """
+    Gives every user notes and a stored quiz, and keeps one of their questions for the answer scenarios.
+    """
+    for user_id in users:
+        await client.post(f"{API_PREFIX}/get-notes-from-uploaded-file", headers={"Authorization": f"Bearer {user_id}"}, **synthetic_upload("pdf", "small"))
+        response = await client.post(f"{API_PREFIX}/get-quiz-from-uploaded-notes", headers={"Authorization": f"Bearer {user_id}"}, json=QUIZ_CUSTOMISATION)
+        response.raise_for_status()
+        state["questions"][user_id] = response.json()["questions_and_answers"][0]
+
+
+async def run_benchmark(args: argparse.Namespace) -> Dict[str, Any]:
+    import httpx
+
+    from backend.src.api.main import app
+    from backend.src.api.v1.app import app as v1_app, shutdown as shutdown_v1
+
+    logging.getLogger().setLevel(logging.WARNING)
+    install_benchmark_auth(v1_app)
+
+    users = [f"benchmark-user-{i}" for i in range(args.users)]
+    state: Dict[str, Any] = {"questions": {}}
+    scenarios = select_scenarios(build_scenarios(state, args.sizes), args.endpoints)
+    concurrency_levels = args.sweep or [args.concurrency]
+
+    results, saturation = [], {}
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://benchmark", timeout=None) as client:
+        await seed_users(client, users, state)
+        for scenario in scenarios:
+            for i in range(args.warmup):
+                await send(client, scenario, users[i % len(users)])
+
+            points = []
+            for concurrency in concurrency_levels:
+                point = await run_scenario(client, scenario, users, concurrency, args.requests)
+                points.append(point)
+                print(json.dumps(point), file=sys.stderr)
+            if args.allocation_requests:
+                allocations = await measure_allocations(client, scenario, users, args.allocation_requests)
+                for point in points:
+                    point.update(allocations)
+            results.extend(points)
+            if args.sweep:
+                saturation[scenario.name] = find_saturation(points, args.min_throughput_gain)
+
+    shutdown_v1()
+    return {"results": results, "saturation": saturation}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--endpoints", nargs="*", help="Scenarios to run, e.g. 'quiz' or 'notes:pdf'; all by default")
+    parser.add_argument("--list", action="store_true", help="List the scenarios and exit")
+    parser.add_argument("--sizes", nargs="*", default=list(SIZES), choices=list(SIZES), help="Sizes of the synthetic uploads")
+    parser.add_argument("--requests", type=int, default=50, help="Requests per endpoint and concurrency level")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--sweep", type=int, nargs="*", help="Concurrency levels to run each endpoint at, e.g. 1 2 4 8 16 32")
+    parser.add_argument("--min-throughput-gain", type=float, default=0.1, help="Throughput gain per sweep step below which an endpoint is saturated")
+    parser.add_argument("--users", type=int, default=8)
+    parser.add_argument("--warmup", type=int, default=2, help="Unmeasured requests per endpoint")
+    parser.add_argument("--allocation-requests", type=int, default=10, help="Sequential requests per endpoint measured under tracemalloc; 0 to skip")
+    parser.add_argument("--llm-backend", default="stub", choices=["stub", "replay"])
+    parser.add_argument("--llm-latency", default="fixed:0", help="Stub generation latency distribution, e.g. 'lognormal:0:0.5'")
+    parser.add_argument("--embed-latency", default="fixed:0", help="Stub embedding latency distribution")
+    parser.add_argument("--answer-write-behind", choices=["true", "false"], default="true")
+    parser.add_argument("--compare", help="An earlier report to compare against")
+    parser.add_argument("--max-regression", type=float, help="Exit with an error if p95 latency grows, or throughput falls, by more than this fraction")
+    parser.add_argument("--output", help="Write the report as JSON to this path")
+    args = parser.parse_args()
+
+    if args.list:
+        for scenario in build_scenarios({"questions": {}}, list(SIZES)):
+            print(f"{scenario.name:28} {scenario.method:5} {scenario.path}")
+        return
+
+    # The app reads its backends from the environment when they are first used.
+    os.environ["STORAGE_BACKEND"] = "memory"
+    os.environ["LLM_BACKEND"] = args.llm_backend
+    os.environ["STUB_LLM_GENERATE_LATENCY"] = args.llm_latency
+    os.environ["STUB_LLM_EMBED_LATENCY"] = args.embed_latency
+    os.environ["ANSWER_WRITE_BEHIND"] = args.answer_write_behind
+
+    report = {
+        "commit": git_commit(),
+        "python": sys.version.split()[0],
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "config": {name: value for name, value in vars(args).items() if name not in ("compare", "output", "list")},
+        **asyncio.run(run_benchmark(args)),
+    }
+
+    regressions = []
+    if args.compare:
+        with open(args.compare) as f:
+            report["comparison"] = compare_reports(report, json.load(f))
+        if args.max_regression is not None:
+            regressions = [change for change in report["comparison"]
+                           if (change["p95_change"] or 0) > args.max_regression or (change["throughput_change"] or 0) < -args.max_regression]
+
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if regressions:
+        raise SystemExit(f"{len(regressions)} endpoints regressed by more than {args.max_regression:.0%}: {', '.join(change['endpoint'] for change in regressions)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Benchmarks the async Firestore operations against their sync versions on the Firestore emulator.
+
+Times adding quiz questions, updating document timestamps, reading a collection and deleting it,
+once with the sync helpers and once with the async helpers in backend.src.utils.firestore.async_operations.
+
+Usage:
+    FIRESTORE_EMULATOR_HOST=localhost:8080 python -m backend.benchmarks.async_firestore_benchmark --num-docs 1000
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+from typing import Any, Callable, Dict, List
+
+from google.cloud.firestore_v1.async_client import AsyncClient
+from google.cloud.firestore_v1.client import Client
+
+from backend.src.api.v1.models.responses import MultipleChoiceQuestion
+from backend.src.utils.constants import QUIZ_COLLECTION
+from backend.src.utils.firestore import async_operations, document_operations, quizzes_operations
+
+
+def make_questions(num_docs: int) -> List[MultipleChoiceQuestion]:
+    return [
+        MultipleChoiceQuestion(question=f"Benchmark question {i}?", choices=["a", "b", "c", "d"], answer=i % 4, explanation="Benchmark")
+        for i in range(num_docs)
+    ]
+
+
+def timed(fn: Callable[[], Any]) -> float:
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def run_sync(db: Client, user_id: str, num_docs: int, batch_size: int) -> Dict[str, float]:
+    return {
+        "add_to_quizzes": timed(lambda: quizzes_operations.add_to_quizzes(db, user_id, make_questions(num_docs))),
+        "update_doc_with_timestamp": timed(lambda: document_operations.update_doc_with_timestamp(db, user_id, QUIZ_COLLECTION)),
+        "get_all_docs": timed(lambda: sum(1 for _ in document_operations.get_all_docs(db, user_id, QUIZ_COLLECTION))),
+        "delete_all_docs_in_collection": timed(lambda: document_operations.delete_all_docs_in_collection(db, QUIZ_COLLECTION, batch_size, user_id)),
+    }
+
+
+async def run_async(db: AsyncClient, user_id: str, num_docs: int, batch_size: int) -> Dict[str, float]:
+    async def timed_async(coroutine) -> float:
+        start = time.perf_counter()
+        await coroutine
+        return time.perf_counter() - start
+
+    async def count_docs() -> int:
+        return len([doc async for doc in async_operations.get_all_docs(db, user_id, QUIZ_COLLECTION)])
+
+    return {
+        "add_to_quizzes": await timed_async(async_operations.add_to_quizzes(db, user_id, make_questions(num_docs))),
+        "update_doc_with_timestamp": await timed_async(async_operations.update_doc_with_timestamp(db, user_id, QUIZ_COLLECTION)),
+        "get_all_docs": await timed_async(count_docs()),
+        "delete_all_docs_in_collection": await timed_async(async_operations.delete_all_docs_in_collection(db, QUIZ_COLLECTION, batch_size, user_id)),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--num-docs", type=int, default=1000)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--output", help="Write the results as JSON to this path")
+    args = parser.parse_args()
+
+    if not os.getenv("FIRESTORE_EMULATOR_HOST"):
+        raise SystemExit("Set FIRESTORE_EMULATOR_HOST to run this benchmark against the Firestore emulator.")
+
+    project = os.getenv("GCLOUD_PROJECT", "benchmark")
+    user_id = "async-firestore-benchmark"
+    sync_seconds = run_sync(Client(project=project), user_id, args.num_docs, args.batch_size)
+    async_seconds = asyncio.run(run_async(AsyncClient(project=project), user_id, args.num_docs, args.batch_size))
+
+    report = {
+        "num_docs": args.num_docs,
+        "results": [
+            {"operation": operation, "sync_seconds": round(sync_seconds[operation], 3), "async_seconds": round(async_seconds[operation], 3),
+             "speedup": round(sync_seconds[operation] / async_seconds[operation], 2) if async_seconds[operation] else None}
+            for operation in sync_seconds
+        ],
+    }
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
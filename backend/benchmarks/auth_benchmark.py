@@ -0,0 +1,104 @@
+"""
+Benchmarks the per-request cost of ID token verification with and without the verified-token cache.
+
+Signs RS256 tokens with a throwaway key, shaped like Firebase ID tokens, and verifies them with
+google-auth the way firebase_admin does (signature, expiry, audience and issuer), once on every
+request and once through backend.src.utils.token_cache. Each simulated user sends --requests-per-user
+requests with one token, as a student answering a quiz does.
+
+Usage:
+    python -m backend.benchmarks.auth_benchmark --users 50 --requests-per-user 20
+"""
+import argparse
+import json
+import statistics
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List
+
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.x509.oid import NameOID
+from google.auth import crypt, jwt
+
+from backend.src.utils.token_cache import clear_token_cache, verify_token_cached
+
+PROJECT_ID = "benchmark"
+ISSUER = f"https://securetoken.google.com/{PROJECT_ID}"
+
+
+def make_signing_key() -> Dict[str, Any]:
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "benchmark")])
+    now = datetime.now(timezone.utc)
+    certificate = (x509.CertificateBuilder().subject_name(name).issuer_name(name).public_key(key.public_key())
+                   .serial_number(x509.random_serial_number()).not_valid_before(now).not_valid_after(now + timedelta(days=1))
+                   .sign(key, hashes.SHA256()))
+    private_pem = key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption())
+    return {
+        "signer": crypt.RSASigner.from_string(private_pem, key_id="benchmark"),
+        "certs": {"benchmark": certificate.public_bytes(serialization.Encoding.PEM).decode()},
+    }
+
+
+def make_token(signer: crypt.RSASigner, uid: str) -> str:
+    now = int(time.time())
+    payload = {"iss": ISSUER, "aud": PROJECT_ID, "sub": uid, "uid": uid, "iat": now, "exp": now + 3600, "auth_time": now}
+    return jwt.encode(signer, payload).decode()
+
+
+def time_requests(tokens: List[str], requests_per_user: int, verify: Callable[[str], Dict[str, Any]]) -> List[float]:
+    latencies = []
+    for _ in range(requests_per_user):
+        for token in tokens:
+            start = time.perf_counter()
+            verify(token)
+            latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def summarise(latencies: List[float]) -> Dict[str, float]:
+    latencies = sorted(latencies)
+    return {
+        "mean_us": round(statistics.mean(latencies) * 1e6, 1),
+        "p50_us": round(latencies[len(latencies) // 2] * 1e6, 1),
+        "p99_us": round(latencies[int(len(latencies) * 0.99)] * 1e6, 1),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--requests-per-user", type=int, default=20)
+    parser.add_argument("--output", help="Write the results as JSON to this path")
+    args = parser.parse_args()
+
+    signing_key = make_signing_key()
+    tokens = [make_token(signing_key["signer"], f"user-{i}") for i in range(args.users)]
+
+    def verify(token: str) -> Dict[str, Any]:
+        claims = jwt.decode(token, certs=signing_key["certs"], audience=PROJECT_ID)
+        if claims["iss"] != ISSUER:
+            raise ValueError("Unexpected issuer")
+        return claims
+
+    uncached = time_requests(tokens, args.requests_per_user, verify)
+    clear_token_cache()
+    cached = time_requests(tokens, args.requests_per_user, lambda token: verify_token_cached(token, verify))
+
+    report = {
+        "users": args.users,
+        "requests_per_user": args.requests_per_user,
+        "uncached": summarise(uncached),
+        "cached": summarise(cached),
+        "speedup": round(statistics.mean(uncached) / statistics.mean(cached), 1),
+    }
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Benchmarks collection deletion against the Firestore emulator.
+
+Seeds a collection of documents and times the previous approach (read each document, then delete it
+sequentially) against `delete_all_docs_in_collection`.
+
+Usage:
+    FIRESTORE_EMULATOR_HOST=localhost:8080 python -m backend.benchmarks.bulk_delete_benchmark --num-docs 10000
+"""
+import argparse
+import json
+import os
+import time
+from typing import Any, Dict
+
+from google.cloud.firestore_v1.client import Client
+
+from backend.src.utils.constants import NOTE_COLLECTION, USER_COLLECTION
+from backend.src.utils.firestore.document_operations import delete_all_docs_in_collection
+
+
+def seed_collection(db: Client, user_id: str, num_docs: int) -> None:
+    """
+    Writes num_docs small note documents into the user's notes collection.
+    """
+    coll_ref = db.collection(USER_COLLECTION).document(user_id).collection(NOTE_COLLECTION)
+    bulk_writer = db.bulk_writer()
+    for i in range(num_docs):
+        bulk_writer.set(coll_ref.document(f"doc-{i:06d}"), {"notes": f"note {i}", "index": i})
+    bulk_writer.close()
+
+
+def sequential_delete(db: Client, user_id: str, batch_size: int) -> int:
+    """
+    The previous implementation: stream a batch, read each document, then delete it, until the collection is empty.
+    """
+    coll_ref = db.collection(USER_COLLECTION).document(user_id).collection(NOTE_COLLECTION)
+    deleted = 0
+    while True:
+        docs = coll_ref.list_documents(page_size=batch_size)
+        page_deleted = 0
+        for doc in docs:
+            doc.get()
+            doc.delete()
+            page_deleted += 1
+        deleted += page_deleted
+        if page_deleted == 0:
+            return deleted
+
+
+def time_deletion(name: str, delete_fn, db: Client, user_id: str, num_docs: int, batch_size: int) -> Dict[str, Any]:
+    seed_collection(db, user_id, num_docs)
+    start = time.perf_counter()
+    deleted = delete_fn(db, user_id, batch_size)
+    elapsed = time.perf_counter() - start
+    return {"name": name, "deleted": deleted, "seconds": round(elapsed, 3), "docs_per_second": round(deleted / elapsed, 1) if elapsed else None}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--num-docs", type=int, default=10000)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--skip-sequential", action="store_true", help="Only time the bulk deletion")
+    parser.add_argument("--output", help="Write the results as JSON to this path")
+    args = parser.parse_args()
+
+    if not os.getenv("FIRESTORE_EMULATOR_HOST"):
+        raise SystemExit("Set FIRESTORE_EMULATOR_HOST to run this benchmark against the Firestore emulator.")
+
+    db = Client(project=os.getenv("GCLOUD_PROJECT", "benchmark"))
+    user_id = "bulk-delete-benchmark"
+    results = []
+    if not args.skip_sequential:
+        results.append(time_deletion("sequential_get_and_delete", sequential_delete, db, user_id, args.num_docs, args.batch_size))
+    results.append(time_deletion("bulk_writer_delete",
+                                 lambda db, user_id, batch_size: delete_all_docs_in_collection(db, NOTE_COLLECTION, batch_size, user_id),
+                                 db, user_id, args.num_docs, args.batch_size))
+
+    report = {"num_docs": args.num_docs, "batch_size": args.batch_size, "results": results}
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
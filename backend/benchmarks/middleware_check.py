@@ -0,0 +1,78 @@
+"""
+Checks that the request middleware finishes normal and streamed responses, with the stub model and in-memory storage.
+
+The latency and Firestore usage middleware record a request once its body has been sent. Starlette
+sends a streamed body from another task, so this drives the healthcheck and the NDJSON batch notes
+route through TestClient, and checks that both respond in full and are counted in
+'http_request_duration_seconds' and 'firestore_requests_total'. Exits with an error if either is not.
+
+Usage:
+    python -m backend.benchmarks.middleware_check
+"""
+import json
+import logging
+import os
+import re
+import sys
+from typing import List
+
+from backend.benchmarks.api_benchmark import API_PREFIX, install_benchmark_auth, synthetic_batch_upload
+
+BATCH_PATH = f"{API_PREFIX}/get-notes-from-uploaded-files"
+# Routes are labelled with the v1 app's paths, without its mount prefix.
+CHECKED_ROUTES = ("/", "/api/get-notes-from-uploaded-files")
+
+
+def request_count(metrics: str, name: str, route: str) -> int:
+    pattern = re.compile(rf'^{name}\{{[^}}]*route="{re.escape(route)}"[^}}]*\}} (\S+)$', re.MULTILINE)
+    return sum(int(float(value)) for value in pattern.findall(metrics))
+
+
+def run_checks() -> List[str]:
+    from fastapi.testclient import TestClient
+
+    from backend.src.api.main import app
+    from backend.src.api.v1.app import app as v1_app, shutdown as shutdown_v1
+
+    logging.getLogger().setLevel(logging.WARNING)
+    install_benchmark_auth(v1_app)
+
+    failures = []
+    with TestClient(app) as client:
+        response = client.get("/v1/")
+        if response.status_code != 200:
+            failures.append(f"GET /v1/ returned {response.status_code}: {response.text}")
+
+        upload = synthetic_batch_upload("small")
+        with client.stream("POST", BATCH_PATH, headers={"Authorization": "Bearer middleware-check"}, **upload) as response:
+            lines = [json.loads(line) for line in response.iter_lines() if line]
+        if response.status_code != 200:
+            failures.append(f"POST {BATCH_PATH} returned {response.status_code}")
+        elif len(lines) != len(upload["files"]) + 1 or any(line.get("error") for line in lines):
+            failures.append(f"POST {BATCH_PATH} streamed {len(lines)} lines for {len(upload['files'])} files: {lines}")
+
+        metrics = client.get("/metrics").text
+
+    shutdown_v1()
+    for name in ("http_request_duration_seconds_count", "firestore_requests_total"):
+        for route in CHECKED_ROUTES:
+            if request_count(metrics, name, route) != 1:
+                failures.append(f"{name} counted {request_count(metrics, name, route)} requests to {route}, expected 1")
+    return failures
+
+
+def main() -> None:
+    # The app reads its backends from the environment when they are first used.
+    os.environ["STORAGE_BACKEND"] = "memory"
+    os.environ["LLM_BACKEND"] = "stub"
+
+    failures = run_checks()
+    for failure in failures:
+        print(failure, file=sys.stderr)
+    if failures:
+        sys.exit(1)
+    print("Normal and streamed responses were sent and recorded")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""
+Benchmarks response serialization time and wire bytes for the v1 endpoints' response models.
+
+Each payload is serialized three ways:
+- fastapi_default: validated against the response model, converted to Python objects and encoded with
+  json, as FastAPI does for a route with a response_model and the default JSONResponse.
+- orjson: the same conversion, encoded with orjson, as with ORJSONResponse, the v1 app's default.
+- pydantic_core: the model encoded directly by pydantic-core, as ModelJSONResponse does for notes and quizzes.
+
+Wire bytes are reported uncompressed and compressed with gzip and, if it is installed, Brotli, at the
+levels CompressionMiddleware uses, with the time compression takes. Payloads below
+COMPRESSION_MINIMUM_SIZE are sent uncompressed by the middleware.
+
+Usage:
+    python -m backend.benchmarks.serialization_benchmark
+    python -m backend.benchmarks.serialization_benchmark --repeat 200 --output serialization.json
+"""
+import argparse
+import gzip
+import json
+import statistics
+import time
+from typing import Any, Callable, Dict, List, Tuple
+
+import orjson
+from pydantic import BaseModel, TypeAdapter
+from pydantic_core import to_json
+
+from backend.benchmarks.synthetic_files import make_paragraphs
+from backend.src.api.v1.models.responses import (EvaluateQuizResponse, MultipleChoiceQuestion, NotesGenerateResponse, QueryBotResponse,
+                                                 QuizGenerateResponse, StudentQuizEvaluationResponse)
+from backend.src.utils.constants import BROTLI_QUALITY, COMPRESSION_MINIMUM_SIZE, GZIP_COMPRESSION_LEVEL
+
+
+def make_notes(kib: int) -> NotesGenerateResponse:
+    sections, size, i = [], 0, 0
+    while size < kib * 1024:
+        section = f"## Section {i + 1}\n\n" + "\n".join(f"- {paragraph}" for paragraph in make_paragraphs(4, seed=i))
+        sections.append(section)
+        size += len(section)
+        i += 1
+    return NotesGenerateResponse(summarised_notes="# Notes\n\n" + "\n\n".join(sections))
+
+
+def make_quiz(questions: int) -> QuizGenerateResponse:
+    paragraphs = make_paragraphs(questions * 2, seed=questions, sentences=2)
+    return QuizGenerateResponse(questions_and_answers=[
+        MultipleChoiceQuestion(question=paragraphs[2 * i].split(".")[0] + "?",
+                               choices=[f"Choice {choice}: {paragraphs[2 * i + 1][:40]}" for choice in "ABCD"],
+                               answer=i % 4,
+                               explanation=paragraphs[2 * i + 1],
+                               topic="Key Concepts",
+                               id=f"{i:020d}")
+        for i in range(questions)
+    ])
+
+
+def make_payloads() -> List[Tuple[str, str, BaseModel]]:
+    return [
+        ("notes:5KiB", "/api/get-notes-from-uploaded-file", make_notes(5)),
+        ("notes:20KiB", "/api/get-notes-from-uploaded-file", make_notes(20)),
+        ("notes:80KiB", "/api/get-notes-from-uploaded-file", make_notes(80)),
+        ("quiz:10", "/api/get-quiz-from-uploaded-notes", make_quiz(10)),
+        ("quiz:50", "/api/get-quiz-from-uploaded-notes", make_quiz(50)),
+        ("evaluate-answer", "/api/evaluate-student-answer", EvaluateQuizResponse(correctness=1)),
+        ("strength-weakness", "/api/get-student-strength-weakness",
+         StudentQuizEvaluationResponse(score=7, strength="Strong understanding of definitions", weakness="Applications of the theory")),
+        ("query-bot", "/api/query-bot", QueryBotResponse(answer=" ".join(make_paragraphs(3, seed=1)))),
+    ]
+
+
+def serializers(model: BaseModel) -> Dict[str, Callable[[], bytes]]:
+    adapter = TypeAdapter(type(model))
+
+    def fastapi_default() -> bytes:
+        content = adapter.dump_python(adapter.validate_python(model), mode="json")
+        return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+    def orjson_response() -> bytes:
+        return orjson.dumps(adapter.dump_python(adapter.validate_python(model), mode="json"), option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+
+    return {"fastapi_default": fastapi_default, "orjson": orjson_response, "pydantic_core": lambda: to_json(model)}
+
+
+def time_call(fn: Callable[[], Any], repeat: int) -> float:
+    """
+    Returns the median time of fn in microseconds.
+    """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return round(statistics.median(times) * 1e6, 1)
+
+
+def compressors() -> Dict[str, Callable[[bytes], bytes]]:
+    compressors = {"gzip": lambda body: gzip.compress(body, compresslevel=GZIP_COMPRESSION_LEVEL)}
+    try:
+        import brotli
+        compressors["br"] = lambda body: brotli.compress(body, quality=BROTLI_QUALITY, mode=brotli.MODE_TEXT)
+    except ImportError:
+        pass
+    return compressors
+
+
+def benchmark_payload(name: str, endpoint: str, model: BaseModel, repeat: int) -> Dict[str, Any]:
+    outputs = {variant: fn() for variant, fn in serializers(model).items()}
+    reference = json.loads(outputs["fastapi_default"])
+    mismatched = [variant for variant, body in outputs.items() if json.loads(body) != reference]
+    if mismatched:
+        raise AssertionError(f"{name}: {', '.join(mismatched)} output differs from the default serialization")
+
+    body = outputs["pydantic_core"]
+    wire = {"uncompressed": {"bytes": len(body)}}
+    for encoding, compress in compressors().items():
+        wire[encoding] = {"bytes": len(compress(body)), "compress_us": time_call(lambda: compress(body), repeat)}
+
+    return {
+        "payload": name,
+        "endpoint": endpoint,
+        "serialize_us": {variant: time_call(fn, repeat) for variant, fn in serializers(model).items()},
+        "wire": wire,
+        "compressed_by_middleware": len(body) >= COMPRESSION_MINIMUM_SIZE,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=100, help="Timed calls per measurement; the median is reported")
+    parser.add_argument("--output", help="Write the results as JSON to this path")
+    args = parser.parse_args()
+
+    results = [benchmark_payload(name, endpoint, model, args.repeat) for name, endpoint, model in make_payloads()]
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
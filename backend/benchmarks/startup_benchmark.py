@@ -0,0 +1,94 @@
+"""
+Benchmarks cold-start cost: the import time and resident memory of the API and of its heavy dependencies.
+
+Each module is imported in a fresh interpreter, so times and memory are those of a cold start. For
+the API module the report also lists which heavy dependencies the import loaded; they should only be
+loaded by the routes that use them.
+
+Usage:
+    python -m backend.benchmarks.startup_benchmark
+    python -m backend.benchmarks.startup_benchmark --repeat 5 --max-import-seconds 2.5 --output startup.json
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+from typing import Any, Dict, List
+
+API_MODULE = "backend.src.api.main"
+
+HEAVY_MODULES = [
+    "fitz",
+    "docx",
+    "pptx",
+    "moviepy.editor",
+    "langchain_experimental.text_splitter",
+    "langchain_google_genai",
+    "pyrebase",
+    "firebase_admin",
+    "google.cloud.firestore",
+    "google.generativeai",
+]
+
+CHILD_SCRIPT = """
+import json, sys, time
+
+def rss_kib():
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1])
+    return 0
+
+module, heavy_modules = sys.argv[1], sys.argv[2:]
+rss_before = rss_kib()
+start = time.perf_counter()
+__import__(module)
+seconds = time.perf_counter() - start
+print(json.dumps({
+    "seconds": seconds,
+    "rss_mib": (rss_kib() - rss_before) / 1024,
+    "heavy_modules_loaded": [name for name in heavy_modules if name in sys.modules and name != module],
+}))
+"""
+
+
+def measure(module: str, repeat: int) -> Dict[str, Any]:
+    runs = []
+    for _ in range(repeat):
+        result = subprocess.run([sys.executable, "-c", CHILD_SCRIPT, module, *HEAVY_MODULES], capture_output=True, text=True)
+        if result.returncode != 0:
+            return {"module": module, "error": result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "import failed"}
+        runs.append(json.loads(result.stdout.strip().splitlines()[-1]))
+
+    return {
+        "module": module,
+        "import_seconds": round(statistics.median(run["seconds"] for run in runs), 3),
+        "rss_mib": round(statistics.median(run["rss_mib"] for run in runs), 1),
+        "heavy_modules_loaded": runs[0]["heavy_modules_loaded"],
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=3, help="Fresh interpreters per module; the median is reported")
+    parser.add_argument("--modules", nargs="*", default=[API_MODULE] + HEAVY_MODULES)
+    parser.add_argument("--max-import-seconds", type=float, help="Exit with an error if the API module imports slower than this")
+    parser.add_argument("--output", help="Write the results as JSON to this path")
+    args = parser.parse_args()
+
+    results: List[Dict[str, Any]] = [measure(module, args.repeat) for module in args.modules]
+    report = {"python": sys.version.split()[0], "repeat": args.repeat, "results": results}
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    api_result = next((result for result in results if result["module"] == API_MODULE), None)
+    if args.max_import_seconds is not None and api_result is not None and api_result.get("import_seconds", float("inf")) > args.max_import_seconds:
+        raise SystemExit(f"{API_MODULE} imported in {api_result.get('import_seconds')}s, above the {args.max_import_seconds}s budget")
+
+
+if __name__ == "__main__":
+    main()
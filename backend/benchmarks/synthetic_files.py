@@ -0,0 +1,104 @@
+"""
+Synthetic study materials for benchmarks: PDFs, Word documents, slide decks and images of a given size.
+
+The content is generated from a fixed seed, so the same size always produces the same bytes.
+"""
+import io
+import random
+from typing import Callable, Dict, List, Tuple
+
+VOCABULARY = [
+    "algorithm", "entropy", "gradient", "matrix", "protein", "enzyme", "market", "inflation", "theorem", "proof",
+    "velocity", "momentum", "circuit", "voltage", "photosynthesis", "mitochondria", "equilibrium", "catalyst",
+    "derivative", "integral", "vector", "tensor", "network", "latency", "hypothesis", "variance", "regression",
+    "empire", "revolution", "treaty", "sonnet", "metaphor", "syntax", "semantics", "compiler", "recursion",
+]
+
+# Pages, paragraphs, slides or pixels per side, by size.
+SIZES: Dict[str, Dict[str, int]] = {
+    "small": {"pdf": 1, "docx": 5, "pptx": 3, "image": 256},
+    "medium": {"pdf": 10, "docx": 50, "pptx": 15, "image": 1024},
+    "large": {"pdf": 50, "docx": 250, "pptx": 60, "image": 2048},
+}
+
+
+def make_paragraphs(count: int, seed: int, sentences: int = 5) -> List[str]:
+    rng = random.Random(seed)
+    paragraphs = []
+    for _ in range(count):
+        paragraph = []
+        for _ in range(sentences):
+            words = rng.choices(VOCABULARY, k=rng.randint(8, 16))
+            paragraph.append(" ".join(words).capitalize() + ".")
+        paragraphs.append(" ".join(paragraph))
+    return paragraphs
+
+
+def make_pdf(pages: int, seed: int = 0) -> bytes:
+    import fitz
+
+    doc = fitz.open()
+    paragraphs = make_paragraphs(pages * 4, seed)
+    for i in range(pages):
+        page = doc.new_page()
+        text_box = fitz.Rect(72, 72, page.rect.width - 72, page.rect.height - 72)
+        page.insert_textbox(text_box, "\n\n".join(paragraphs[i * 4:(i + 1) * 4]), fontsize=11)
+    return doc.tobytes()
+
+
+def make_docx(paragraphs: int, seed: int = 0) -> bytes:
+    import docx
+
+    document = docx.Document()
+    for i, paragraph in enumerate(make_paragraphs(paragraphs, seed)):
+        if i % 10 == 0:
+            document.add_heading(f"Section {i // 10 + 1}", level=1)
+        document.add_paragraph(paragraph)
+    buffer = io.BytesIO()
+    document.save(buffer)
+    return buffer.getvalue()
+
+
+def make_pptx(slides: int, seed: int = 0) -> bytes:
+    from pptx import Presentation
+
+    presentation = Presentation()
+    for i, paragraph in enumerate(make_paragraphs(slides, seed, sentences=3)):
+        slide = presentation.slides.add_slide(presentation.slide_layouts[1])
+        slide.shapes.title.text = f"Slide {i + 1}"
+        slide.placeholders[1].text = paragraph
+    buffer = io.BytesIO()
+    presentation.save(buffer)
+    return buffer.getvalue()
+
+
+def make_image(side: int, seed: int = 0) -> bytes:
+    import numpy as np
+    from PIL import Image
+
+    # Noise does not compress, so the file size grows with the number of pixels.
+    pixels = np.random.default_rng(seed).integers(0, 256, (side, side, 3), dtype=np.uint8)
+    buffer = io.BytesIO()
+    Image.fromarray(pixels).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+FILE_MAKERS: Dict[str, Tuple[str, str, Callable[[int, int], bytes]]] = {
+    "pdf": ("notes.pdf", "application/pdf", make_pdf),
+    "docx": ("notes.docx", "application/vnd.openxmlformats-officedocument.wordprocessingml.document", make_docx),
+    "pptx": ("notes.pptx", "application/vnd.openxmlformats-officedocument.presentationml.presentation", make_pptx),
+    "image": ("notes.png", "image/png", make_image),
+}
+
+
+def make_file(file_kind: str, size: str, seed: int = 0) -> Tuple[str, bytes, str]:
+    """
+    Returns the file name, content and MIME type of a synthetic file.
+
+    Args:
+        file_kind (str): 'pdf', 'docx', 'pptx' or 'image'.
+        size (str): 'small', 'medium' or 'large'.
+        seed (int): The seed of the generated content.
+    """
+    file_name, mime_type, make = FILE_MAKERS[file_kind]
+    return file_name, make(SIZES[size][file_kind], seed), mime_type
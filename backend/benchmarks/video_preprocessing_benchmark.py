@@ -0,0 +1,99 @@
+"""
+Benchmarks video preprocessing on synthetic lecture recordings: the bytes each mode saves, the time
+ffmpeg takes, and the upload time saved at a given bandwidth once preprocessing is paid for.
+
+The videos are generated with ffmpeg at the resolution and length given, encoded as a camera or
+screen recorder would (H.264 at 30 fps and up to about 8 Mb/s at 1080p, with 128 kb/s stereo audio):
+- camera: a moving test pattern with sensor noise, like a recording of a lecturer.
+- slides: a still picture that changes every 15 seconds, like a screen recording of a slide deck.
+
+Usage:
+    python -m backend.benchmarks.video_preprocessing_benchmark
+    python -m backend.benchmarks.video_preprocessing_benchmark --duration 300 --height 720 --upload-mbps 50 --output video.json
+"""
+import argparse
+import json
+import os
+import subprocess
+import tempfile
+import time
+from typing import Any, Dict, List
+
+from backend.src.utils.constants import KEYFRAME_VIDEO, TRANSCODED_VIDEO
+from backend.src.utils.notes.file_management.video_preprocessing import get_ffmpeg_executable, preprocess_video
+
+SLIDE_SECONDS = 15
+
+VIDEO_SOURCES = {
+    "camera": "testsrc2=size={width}x{height}:rate=30,noise=alls=12:allf=t",
+    # One frame of the pattern every SLIDE_SECONDS, repeated at 30 fps.
+    "slides": f"testsrc2=size={{width}}x{{height}}:rate=30,fps=1/{SLIDE_SECONDS},fps=30",
+}
+
+
+def make_video(ffmpeg: str, kind: str, height: int, duration: int, path: str) -> None:
+    width = height * 16 // 9 // 2 * 2
+    # Capped at a camera's bitrate, which the noise would otherwise far exceed.
+    max_kbps = height * 15 // 2
+    video_source = VIDEO_SOURCES[kind].format(width=width, height=height)
+    subprocess.run([ffmpeg, "-hide_banner", "-loglevel", "error", "-y",
+                    "-f", "lavfi", "-i", video_source,
+                    "-f", "lavfi", "-i", "sine=frequency=220:beep_factor=4:sample_rate=44100",
+                    "-t", str(duration), "-c:v", "libx264", "-preset", "veryfast", "-crf", "20",
+                    "-maxrate", f"{max_kbps}k", "-bufsize", f"{2 * max_kbps}k", "-pix_fmt", "yuv420p",
+                    "-c:a", "aac", "-b:a", "128k", "-ac", "2", "-shortest", path],
+                   check=True, capture_output=True)
+
+
+def benchmark_video(ffmpeg: str, kind: str, height: int, duration: int, modes: List[str], upload_mbps: float, directory: str) -> List[Dict[str, Any]]:
+    path = os.path.join(directory, f"{kind}-{height}p.mp4")
+    start = time.perf_counter()
+    make_video(ffmpeg, kind, height, duration, path)
+    print(f"Generated {kind} {height}p video of {duration}s in {time.perf_counter() - start:.1f}s", flush=True)
+
+    bytes_per_second = upload_mbps * 1e6 / 8
+    results = []
+    for mode in modes:
+        video = preprocess_video(path, "video/mp4", mode, min_bytes=0)
+        upload_seconds = video.original_bytes / bytes_per_second
+        processed_upload_seconds = video.processed_bytes / bytes_per_second
+        results.append({
+            "video": f"{kind}:{height}p",
+            "duration_seconds": duration,
+            "mode": mode,
+            "applied": video.is_copy,
+            "original_bytes": video.original_bytes,
+            "processed_bytes": video.processed_bytes,
+            "bytes_saved_percent": round(100 * video.bytes_saved / video.original_bytes, 1),
+            "preprocessing_seconds": round(video.seconds, 3),
+            "upload_seconds": round(upload_seconds, 3),
+            "processed_upload_seconds": round(processed_upload_seconds, 3),
+            "net_seconds_saved": round(upload_seconds - processed_upload_seconds - video.seconds, 3),
+        })
+        video.cleanup()
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--duration", type=int, default=60, help="Length of each video in seconds")
+    parser.add_argument("--height", type=int, nargs="+", default=[1080], help="Heights of the videos, e.g. 720 1080")
+    parser.add_argument("--kinds", nargs="+", choices=list(VIDEO_SOURCES), default=list(VIDEO_SOURCES), help="Kinds of video to generate")
+    parser.add_argument("--modes", nargs="+", choices=[TRANSCODED_VIDEO, KEYFRAME_VIDEO], default=[TRANSCODED_VIDEO, KEYFRAME_VIDEO], help="Preprocessing modes to compare")
+    parser.add_argument("--upload-mbps", type=float, default=20, help="Upload bandwidth in megabits per second used to estimate upload time")
+    parser.add_argument("--output", help="Write the results as JSON to this path")
+    args = parser.parse_args()
+
+    ffmpeg = get_ffmpeg_executable()
+    with tempfile.TemporaryDirectory() as directory:
+        results = [result for kind in args.kinds for height in args.height
+                   for result in benchmark_video(ffmpeg, kind, height, args.duration, args.modes, args.upload_mbps, directory)]
+
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
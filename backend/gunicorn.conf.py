@@ -0,0 +1,35 @@
+"""
+Gunicorn settings for running the API with one worker per CPU core:
+
+    gunicorn -c backend/gunicorn.conf.py backend.src.api.main:app
+"""
+import os
+import sys
+
+# The config is loaded before gunicorn puts the working directory on the path.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.src.utils.constants import SERVER_GRACEFUL_TIMEOUT_SECONDS, SERVER_KEEPALIVE_SECONDS
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+workers = int(os.getenv("WEB_CONCURRENCY", len(os.sched_getaffinity(0))))
+worker_class = "uvicorn.workers.UvicornWorker"
+
+# The app is imported once before forking, so workers share its code pages. Clients, threads and
+# cache connections are created on first use, so none of them are inherited by the workers.
+preload_app = True
+
+# On SIGTERM workers stop accepting connections, finish in-flight requests and run the app's
+# shutdown handlers, which flush buffered answers.
+graceful_timeout = SERVER_GRACEFUL_TIMEOUT_SECONDS
+# The worker heartbeat, not a request timeout; requests run in the worker's event loop.
+timeout = 120
+keepalive = SERVER_KEEPALIVE_SECONDS
+worker_tmp_dir = "/dev/shm" if os.path.isdir("/dev/shm") else None
+
+
+def on_starting(server):
+    # Workers share embeddings, extracted text and verified tokens through a cache file in /dev/shm
+    # unless another shared cache is configured.
+    if server.cfg.workers > 1:
+        os.environ.setdefault("SHARED_CACHE_BACKEND", "sqlite")
@@ -0,0 +1,18 @@
+import argparse
+import json
+
+from firebase_admin import firestore
+
+from backend.src.utils.app_init import configure_logging, initialize_firebase
+from backend.src.utils.firestore.retention import load_retention_policy, run_retention
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compacts old answered quizzes, archives stale notes and expires old archives.")
+    parser.add_argument("--apply", action="store_true", help="Make the changes. Without it, only reports what would change.")
+    parser.add_argument("--user", action="append", dest="user_ids", help="Only process this user. Can be repeated.")
+    args = parser.parse_args()
+
+    configure_logging()
+    initialize_firebase()
+    report = run_retention(firestore.client(), load_retention_policy(), dry_run=not args.apply, user_ids=args.user_ids)
+    print(json.dumps(report.to_dict(), indent=2))
@@ -1,9 +1,10 @@
 from fastapi import FastAPI
-from fastapi.responses import RedirectResponse
+from fastapi.responses import PlainTextResponse, RedirectResponse
 from fastapi.routing import Mount
 
 from backend.src.utils.app_init import configure_logging
-from backend.src.api.v1.app import app as v1_api
+from backend.src.utils.metrics import render_prometheus
+from backend.src.api.v1.app import app as v1_api, shutdown as shutdown_v1
 
 from starlette.middleware.cors import CORSMiddleware
 
@@ -14,6 +15,8 @@ app = FastAPI(
     routes=version_mounts,
     docs_url=None,
     redoc_url=None,
+    # Lifespan events of mounted apps do not run, so the v1 app's shutdown is registered here.
+    on_shutdown=[shutdown_v1],
 )
 
 app.add_middleware(
@@ -24,6 +27,10 @@ app.add_middleware(
 def redirect_to_latest_version():
     return RedirectResponse("/v1")
 
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    return PlainTextResponse(render_prometheus(), media_type="text/plain; version=0.0.4")
+
 @app.get("/docs", include_in_schema=False)
 def redirect_to_latest_swagger():
     return RedirectResponse("/v1/docs")
@@ -1,16 +1,25 @@
 import logging
+import math
+import time
 
 from tempfile import NamedTemporaryFile
 import os
 import json
+from typing import AsyncIterator, Callable, Dict, Iterator, List, Optional
 
-from fastapi import FastAPI, Depends, UploadFile, File, Form
+from fastapi import FastAPI, Depends, UploadFile, File, Form, Request
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from fastapi.exceptions import HTTPException
-
-from backend.src.utils.app_init import configure_genai, init_gemini_llm
-from backend.src.utils.firestore.notes_operations import add_to_notes
-from backend.src.utils.firestore.quizzes_operations import add_student_answer_to_quizzes, add_to_quizzes
+from fastapi.responses import ORJSONResponse, Response, StreamingResponse
+from starlette.routing import Match
+
+from backend.src.utils.constants import NOTES_BATCH_MAX_FILES
+from backend.src.utils.lazy import Lazy
+from backend.src.utils.exceptions import RateLimitExceeded
+from backend.src.utils.llm.factory import get_llm_provider
+from backend.src.utils.llm_scheduler import PRIORITY_NAMES, get_llm_scheduler
+from backend.src.utils.notes.batch_notes import generate_combined_summary, generate_notes_batch
 from backend.src.utils.notes.notes_generation import generate_notes
 from backend.src.utils.quiz.quiz_generation import check_and_format_question_answer_list, generate_quiz
 from backend.src.utils.quiz.quiz_generation import regenerate_quiz_based_on_evaluation
@@ -18,21 +27,122 @@ from backend.src.utils.quiz.quiz_correctness import check_student_answer
 from backend.src.utils.quiz.strength_and_weakness import assess_student_strength_weakness
 from backend.src.utils.query_bot import query_firestore
 from backend.src.api.v1.models.requests import FilePathRequest, UserLoginRequest, UserSignupRequest, DeleteMediaRequest, DeleteCollectionsRequest, CompareAnswerRequest, NotesCustomisationRequest, QuizCustomisationRequest, QueryBotRequest, QuizParameterRequest
-from backend.src.api.v1.models.responses import NotesGenerateResponse, UserSignupResponse, UserLoginResponse, WelcomeResponse, DeleteMediaResponse, DeleteCollectionsResponse, QuizGenerateResponse, EvaluateQuizResponse, StudentQuizEvaluationResponse, QueryBotResponse
-from backend.src.utils.app_init import initialize_firebase
-from backend.src.utils.firestore.document_operations import delete_all_docs_in_collection
+from backend.src.api.v1.models.responses import NotesBatchFileResponse, NotesBatchSummaryResponse, NotesGenerateResponse, UserSignupResponse, UserLoginResponse, WelcomeResponse, DeleteMediaResponse, DeleteCollectionsResponse, RevokeTokensResponse, QuizGenerateResponse, EvaluateQuizResponse, StudentQuizEvaluationResponse, QueryBotResponse
+from backend.src.utils.app_init import initialize_firebase_admin, initialize_pyrebase
+from backend.src.utils.compression import CompressionMiddleware
+from backend.src.utils.serialization import ModelJSONResponse
+from backend.src.utils.storage.answer_buffer import AnswerBuffer
+from backend.src.utils.storage.factory import init_storage_repository
+from backend.src.utils.firestore.instrumentation import record_request_usage, start_request_usage, stop_request_usage
+from backend.src.utils.token_cache import revoke_user_tokens, start_signing_key_refresh, stop_signing_key_refresh, verify_token_cached
+from backend.src.utils.metrics import get_histogram, reset_request_labels, set_request_label, start_request_labels
+
+
+app = FastAPI(default_response_class=ORJSONResponse)
+# Added before the other middleware so that it runs inside them and request latency includes compression.
+app.add_middleware(CompressionMiddleware)
+security = HTTPBearer()
 
-import google.generativeai as genai
 
-from firebase_admin import auth, firestore
+def init_firebase_auth() -> None:
+    initialize_firebase_admin()
+    start_signing_key_refresh()
 
 
-app = FastAPI()
-security = HTTPBearer()
-firebase = initialize_firebase()
-db = firestore.client()
+def init_answer_buffer() -> Optional[AnswerBuffer]:
+    if os.getenv("ANSWER_WRITE_BEHIND", "true").lower() != "true":
+        return None
+    answer_buffer = AnswerBuffer(get_storage())
+    answer_buffer.start()
+    return answer_buffer
+
+
+# Clients are created on first use, so a cold start only pays for what the first request needs.
+get_pyrebase = Lazy(initialize_pyrebase)
+get_firebase_auth = Lazy(init_firebase_auth)
+get_storage = Lazy(init_storage_repository)
+get_answer_buffer = Lazy(init_answer_buffer)
+get_model = get_llm_provider
+
+request_latency_histogram = get_histogram("http_request_duration_seconds", "Request latency by route, status code and uploaded file type", ("route", "status", "file_type"))
+
+
+def get_route_path(request: Request) -> str:
+    for route in app.router.routes:
+        match, _ = route.matches(request.scope)
+        if match == Match.FULL:
+            return route.path
+    return "unmatched"
+
+
+def finish_after_body(response: Response, finish: Callable[[], None]) -> Response:
+    """
+    Calls `finish` once the response body has been sent, so that work done while a response streams counts towards its request.
+
+    The body may be sent from another task, in a copy of the middleware's context, so `finish` must not reset context variables.
+    """
+    body_iterator = response.body_iterator
+
+    async def send_body() -> AsyncIterator[bytes]:
+        try:
+            async for chunk in body_iterator:
+                yield chunk
+        finally:
+            finish()
+
+    response.body_iterator = send_body()
+    return response
+
+
+@app.middleware("http")
+async def account_firestore_usage(request: Request, call_next):
+    token = start_request_usage()
+    try:
+        response = await call_next(request)
+    except BaseException:
+        record_request_usage(stop_request_usage(token), get_route_path(request))
+        raise
+    usage = stop_request_usage(token)
+    return finish_after_body(response, lambda: record_request_usage(usage, get_route_path(request)))
+
+
+@app.middleware("http")
+async def record_request_latency(request: Request, call_next):
+    token = start_request_labels()
+    route = get_route_path(request)
+    set_request_label("route", route)
+    start = time.perf_counter()
+
+    def finish(status: int, labels: Dict[str, str]) -> None:
+        request_latency_histogram.observe(time.perf_counter() - start, route=route, status=str(status), file_type=labels.get("file_type", ""))
+
+    try:
+        response = await call_next(request)
+    except BaseException:
+        finish(500, reset_request_labels(token))
+        raise
+    labels = reset_request_labels(token)
+    return finish_after_body(response, lambda: finish(response.status_code, labels))
+
+
+@app.exception_handler(RateLimitExceeded)
+async def rate_limit_exceeded(request: Request, e: RateLimitExceeded):
+    return ORJSONResponse(status_code=429, content={"detail": str(e)}, headers={"Retry-After": str(math.ceil(e.retry_after))})
+
+
+@app.on_event("startup")
+def startup():
+    # Created up front rather than on first use, so answers spilled by the previous shutdown are written straight away.
+    get_answer_buffer()
+
+
+@app.on_event("shutdown")
+def shutdown():
+    stop_signing_key_refresh()
+    answer_buffer = get_answer_buffer.peek()
+    if answer_buffer is not None:
+        answer_buffer.close()
 
-model = init_gemini_llm()
 
 @app.get("/")
 def healthcheck():
@@ -45,7 +155,7 @@ async def create_an_account(user_data: UserSignupRequest):
     password = user_data.password
 
     try:
-        user = firebase.auth().create_user_with_email_and_password(email, password)
+        user = get_pyrebase().auth().create_user_with_email_and_password(email, password)
         return UserSignupResponse(message=f"User account created successfully for user {user['localId']}")
     except Exception as e:
         raise HTTPException(
@@ -60,7 +170,7 @@ async def login(user_data: UserLoginRequest):
     password = user_data.password
 
     try:
-        user = firebase.auth().sign_in_with_email_and_password(email, password)
+        user = get_pyrebase().auth().sign_in_with_email_and_password(email, password)
         return UserLoginResponse(message="Login successful", idToken=user["idToken"])
     except Exception as e:
         raise HTTPException(
@@ -72,7 +182,11 @@ async def login(user_data: UserLoginRequest):
 async def verify_token(auth_creds: HTTPAuthorizationCredentials = Depends(security)):
     token = auth_creds.credentials
     try:
-        decoded_token = auth.verify_id_token(token)
+        if not get_firebase_auth.is_initialised:
+            # Initialising the Admin SDK fetches the signing keys, so it is kept off the event loop.
+            await run_in_threadpool(get_firebase_auth)
+        decoded_token = verify_token_cached(token)
+        set_request_label("user_id", decoded_token["uid"])
         return decoded_token
     except Exception as e:
         logging.info(f"Token verification failed: {e}") 
@@ -86,6 +200,30 @@ async def protected_route(user=Depends(verify_token)):
     return WelcomeResponse(message=f"Welcome {user['email']}")
 
 
+@app.post('/api/revoke-tokens', response_model=RevokeTokensResponse)
+def revoke_tokens(user=Depends(verify_token)):
+    try:
+        user_id = user['uid']
+        from firebase_admin import auth
+        auth.revoke_refresh_tokens(user_id)
+        revoke_user_tokens(user_id)
+    except Exception as e:
+        logging.error(f"Error occurred: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+    return RevokeTokensResponse(message="Signed out of all sessions.")
+
+
+@app.get("/api/llm-queue")
+def llm_queue(user=Depends(verify_token)):
+    scheduler = get_llm_scheduler()
+    model = get_model()
+    return {
+        "model": model.model_name,
+        "estimated_wait_seconds": {name: round(scheduler.estimated_wait(model.model_name, priority), 1) for priority, name in PRIORITY_NAMES.items()},
+    }
+
+
 @app.post("/api/get-notes-from-uploaded-file", response_model=NotesGenerateResponse)
 def get_notes_from_uploaded_file(
     file: UploadFile = File(...),
@@ -101,18 +239,92 @@ def get_notes_from_uploaded_file(
             temp_file_path = temp_file.name
             logging.info(f"Temp file created at: {temp_file_path}")
 
-        notes = generate_notes(model, temp_file_path, file.filename, notes_customisation_object)
+        notes = generate_notes(get_model(), temp_file_path, file.filename, notes_customisation_object)
 
         os.remove(temp_file_path)
         user_id = user['uid']
-        add_to_notes(db, user_id, notes)
+        get_storage().add_to_notes(user_id, notes)
+
+        return ModelJSONResponse(NotesGenerateResponse(summarised_notes=notes))
+
+    except RateLimitExceeded:
+        raise
+    except Exception as e:
+        logging.error(f"Error occurred: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
 
-        return NotesGenerateResponse(summarised_notes=notes)
 
+@app.post("/api/get-notes-from-uploaded-files", response_class=StreamingResponse, responses={200: {
+    "description": "Newline-delimited JSON: one NotesBatchFileResponse line per file in the order the files finish, "
+                   "followed by one NotesBatchSummaryResponse line if `combined_summary` is set.",
+    "content": {"application/x-ndjson": {"schema": {"oneOf": [NotesBatchFileResponse.model_json_schema(), NotesBatchSummaryResponse.model_json_schema()]}}},
+}})
+def get_notes_from_uploaded_files(
+    files: List[UploadFile] = File(...),
+    notes_customisation: str = Form(...),
+    combined_summary: bool = Form(False),
+    user=Depends(verify_token)
+):
+    """
+    Generates notes for several files concurrently, streaming one JSON line per file as it finishes,
+    followed by a combined summary line if `combined_summary` is set.
+    """
+    if len(files) > NOTES_BATCH_MAX_FILES:
+        raise HTTPException(status_code=400, detail=f"At most {NOTES_BATCH_MAX_FILES} files can be uploaded at once.")
+
+    temp_files = []
+    try:
+        notes_customisation_dict = json.loads(notes_customisation)
+        notes_customisation_object = NotesCustomisationRequest(**notes_customisation_dict)
+
+        for file in files:
+            with NamedTemporaryFile(delete=False) as temp_file:
+                temp_files.append((temp_file.name, file.filename))
+                temp_file.write(file.file.read())
+                logging.info(f"Temp file created at: {temp_file.name}")
     except Exception as e:
         logging.error(f"Error occurred: {str(e)}")
+        for temp_file_path, _ in temp_files:
+            os.remove(temp_file_path)
         raise HTTPException(status_code=500, detail=str(e))
 
+    model = get_model()
+    user_id = user['uid']
+    results = generate_notes_batch(model, temp_files, notes_customisation_object)
+
+    def stream_results() -> Iterator[bytes]:
+        finished = []
+        try:
+            for result in results:
+                os.remove(temp_files[result.index][0])
+                if result.error is None:
+                    try:
+                        get_storage().add_to_notes(user_id, result.notes)
+                    except Exception as e:
+                        logging.error(f"Error occurred: {str(e)}")
+                        result.error = e
+                finished.append(result)
+                if result.error is None:
+                    response = NotesBatchFileResponse(file_name=result.file_name, summarised_notes=result.notes)
+                else:
+                    status_code = 429 if isinstance(result.error, RateLimitExceeded) else 500
+                    response = NotesBatchFileResponse(file_name=result.file_name, error=str(result.error), status_code=status_code)
+                yield response.model_dump_json().encode("utf-8") + b"\n"
+
+            if combined_summary:
+                try:
+                    response = NotesBatchSummaryResponse(combined_summary=generate_combined_summary(model, finished, notes_customisation_object))
+                except Exception as e:
+                    logging.error(f"Error occurred: {str(e)}")
+                    response = NotesBatchSummaryResponse(error=str(e))
+                yield response.model_dump_json().encode("utf-8") + b"\n"
+        finally:
+            results.close()
+            for temp_file_path, _ in temp_files:
+                if os.path.exists(temp_file_path):
+                    os.remove(temp_file_path)
+
+    return StreamingResponse(stream_results(), media_type="application/x-ndjson")
 
 
 @app.post("/api/get-quiz-from-uploaded-notes", response_model=QuizGenerateResponse)
@@ -123,16 +335,18 @@ def get_quiz_from_uploaded_notes(
     try:
         user_id = user['uid']
         
-        quiz_qn_and_ans_list = generate_quiz(model, db, user_id, quiz_customisation)
+        quiz_qn_and_ans_list = generate_quiz(get_model(), get_storage(), user_id, quiz_customisation)
         formatted_quiz_qn_and_ans = check_and_format_question_answer_list(quiz_qn_and_ans_list)
 
-        add_to_quizzes(db, user_id, quiz_qn_and_ans_list)
+        get_storage().add_to_quizzes(user_id, formatted_quiz_qn_and_ans)
+    except RateLimitExceeded:
+        raise
     except Exception as e:
         logging.error(f"Error occurred: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
-    return QuizGenerateResponse(questions_and_answers=formatted_quiz_qn_and_ans)
+    return ModelJSONResponse(QuizGenerateResponse(questions_and_answers=formatted_quiz_qn_and_ans))
 
 
 @app.post("/api/evaluate-student-answer", response_model=EvaluateQuizResponse)
@@ -145,9 +359,15 @@ def evaluate_student_answer(
         question_and_answer = question_and_answers.question_and_answer
         student_answer = question_and_answers.student_answer
         
-        correctness = check_student_answer(model, question_and_answer, student_answer)
-
-        add_student_answer_to_quizzes(db, user_id, question_and_answer.question, student_answer, correctness)
+        correctness = check_student_answer(get_model(), question_and_answer, student_answer)
+
+        answer_buffer = get_answer_buffer()
+        if answer_buffer is not None:
+            answer_buffer.submit(user_id, question_and_answer, student_answer, correctness)
+        else:
+            get_storage().add_student_answer_to_quizzes(user_id, question_and_answer, student_answer, correctness)
+    except RateLimitExceeded:
+        raise
     except Exception as e:
         logging.error(f"Error occurred: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -165,7 +385,9 @@ def get_student_strength_and_weakness(
     try:
         user_id = user['uid']
         
-        result_dict = assess_student_strength_weakness(model, db, user_id, quiz_parameter.num_of_qns)
+        result_dict = assess_student_strength_weakness(get_model(), get_storage(), user_id, quiz_parameter.num_of_qns, get_answer_buffer())
+    except RateLimitExceeded:
+        raise
     except Exception as e:
         logging.error(f"Error occurred: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -183,16 +405,18 @@ def regenerate_quiz(
     try:
         user_id = user['uid']
         
-        quiz_qn_and_ans_dict = regenerate_quiz_based_on_evaluation(model, db, user_id, quiz_customisation, strength_and_weakness)
+        quiz_qn_and_ans_dict = regenerate_quiz_based_on_evaluation(get_model(), get_storage(), user_id, quiz_customisation, strength_and_weakness)
         formatted_quiz_qn_and_ans = check_and_format_question_answer_list(quiz_qn_and_ans_dict)
         
-        add_to_quizzes(db, user_id, quiz_qn_and_ans_dict)
+        get_storage().add_to_quizzes(user_id, formatted_quiz_qn_and_ans)
+    except RateLimitExceeded:
+        raise
     except Exception as e:
         logging.error(f"Error occurred: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
-    return QuizGenerateResponse(questions_and_answers=formatted_quiz_qn_and_ans)
+    return ModelJSONResponse(QuizGenerateResponse(questions_and_answers=formatted_quiz_qn_and_ans))
 
 
 @app.post("/api/query-bot", response_model=QueryBotResponse)
@@ -202,7 +426,9 @@ def query_bot(
 ):
     try:
         user_id = user['uid']
-        bot_answer = query_firestore(db, user_id, model, user_query.query, limit=10)
+        bot_answer = query_firestore(get_storage(), user_id, get_model(), user_query.query, limit=10)
+    except RateLimitExceeded:
+        raise
     except Exception as e:
         logging.error(f"Error occurred: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -216,8 +442,7 @@ def delete_media(
     file: DeleteMediaRequest
 ):
     try:
-        configure_genai()
-        genai.delete_file(file.file_name)
+        get_llm_provider().delete_file(file.file_name)
     except Exception as e:
         logging.error(f"Error occurred: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -234,11 +459,14 @@ def delete_collections(
         user_id = user['uid']
         coll_name = coll_info.coll_name
         batch_size = coll_info.batch_size
-        
-        delete_all_docs_in_collection(db, coll_name, batch_size, user_id)
+
+        answer_buffer = get_answer_buffer()
+        if answer_buffer is not None:
+            answer_buffer.flush(user_id)
+        deleted = get_storage().delete_all_docs_in_collection(coll_name, batch_size, user_id, coll_info.recursive)
     except Exception as e:
         logging.error(f"Error occurred: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
-    return DeleteCollectionsResponse(message=f"Deleted '{coll_name}' collection")
+    return DeleteCollectionsResponse(message=f"Deleted '{coll_name}' collection", deleted=deleted)
@@ -44,6 +44,8 @@ class DeleteMediaRequest(BaseModel):
 class DeleteCollectionsRequest(BaseModel):
     coll_name: str = Field(..., description="Name of the collection to be deleted")
     batch_size: int = Field(..., description="Size of the batch for deletion")
+    recursive: Optional[bool] = Field(False, description="Whether to also delete the subcollections of each document. "
+                                                         "For the users collection, only the caller's user document and its data are deleted")
 
 
 class NotesCustomisationRequest(BaseModel):
@@ -134,7 +136,7 @@ class CompareAnswerRequest(BaseModel):
         MultiSelectQuestion, 
         TrueFalseQuestion, 
         FreeResponseQuestion
-    ] = Field(..., description="Question and answer details, can be of different types")
+    ] = Field(..., description="Question and answer details, can be of different types. Include the 'id' returned with the quiz to record the answer directly")
     
     model_config = {
         "json_schema_extra": {
@@ -144,7 +146,8 @@ class CompareAnswerRequest(BaseModel):
                     "question_and_answer": {
                          "question": "Select the prime numbers.",
                         "answer": [0, 2],
-                        "choices": ["2", "4", "5", "9"]
+                        "choices": ["2", "4", "5", "9"],
+                        "id": "Xb2kWq9mP4rT7yLc1dEf"
                     }
                 },
                 {
@@ -15,6 +15,31 @@ class NotesGenerateResponse(BaseModel):
         }
     }
 
+class NotesBatchFileResponse(BaseModel):
+    file_name: str = Field(..., description="The name of the uploaded file")
+    summarised_notes: Optional[str] = Field(None, description="The summarised notes generated from the file, if generation succeeded")
+    error: Optional[str] = Field(None, description="Why notes could not be generated from the file")
+    status_code: int = Field(200, description="The status code the single-file endpoint would have responded with")
+
+    model_config = {
+        "json_schema_extra": {
+            "examples": [
+                {
+                    "file_name": "lecture1.pdf",
+                    "summarised_notes": "These are the summarised notes from lecture 1.",
+                    "error": None,
+                    "status_code": 200
+                }
+            ]
+        }
+    }
+
+
+class NotesBatchSummaryResponse(BaseModel):
+    combined_summary: Optional[str] = Field(None, description="A summary combining the notes of all files")
+    error: Optional[str] = Field(None, description="Why the combined summary could not be generated")
+
+
 class Correctness(int, Enum):
     CORRECT = 1
     INCORRECT = 0
@@ -38,6 +63,8 @@ class MultipleChoiceQuestion(BaseModel):
     answer: int = Field(..., description="The index of the correct answer")
     choices: List[str] = Field(..., description="A list of answer choices")
     explanation: Optional[str] = Field("", description="Explanation behind the answer")
+    topic: Optional[str] = Field(None, description="The concept the question tests")
+    id: Optional[str] = Field(None, description="The ID of the stored quiz question")
 
     model_config = {
         "json_schema_extra": {
@@ -57,6 +84,8 @@ class MultiSelectQuestion(BaseModel):
     answer: List[int] = Field(..., description="Indices of the correct answers")
     choices: List[str] = Field(..., description="A list of answer choices")
     explanation: Optional[str] = Field("", description="Explanation behind the answer")
+    topic: Optional[str] = Field(None, description="The concept the question tests")
+    id: Optional[str] = Field(None, description="The ID of the stored quiz question")
 
     model_config = {
         "json_schema_extra": {
@@ -81,6 +110,8 @@ class TrueFalseQuestion(BaseModel):
     answer: TrueFalseChoices = Field(..., description="The correct answer")
     choices: List[TrueFalseChoices] = Field(default=[TrueFalseChoices.TRUE, TrueFalseChoices.FALSE], description="The answer choices, true or false")
     explanation: Optional[str] = Field("", description="Explanation behind the answer")
+    topic: Optional[str] = Field(None, description="The concept the question tests")
+    id: Optional[str] = Field(None, description="The ID of the stored quiz question")
 
     model_config = {
         "json_schema_extra": {
@@ -99,6 +130,8 @@ class FreeResponseQuestion(BaseModel):
     question: str = Field(..., description="The quiz question")
     answer: str = Field(..., description="The correct answer")
     explanation: Optional[str] = Field("", description="Explanation behind the answer")
+    topic: Optional[str] = Field(None, description="The concept the question tests")
+    id: Optional[str] = Field(None, description="The ID of the stored quiz question")
 
     model_config = {
         "json_schema_extra": {
@@ -147,12 +180,17 @@ class UserLoginResponse(BaseModel):
     idToken: str = Field(..., description="The ID token for the logged-in user")
 
 
+class RevokeTokensResponse(BaseModel):
+    message: str = Field(..., description="Response message for token revocation")
+
+
 class DeleteMediaResponse(BaseModel):
     message: str = Field(..., description="Response message for media deletion")
 
 
 class DeleteCollectionsResponse(BaseModel):
     message: str = Field(..., description="Response message for collection deletion")
+    deleted: int = Field(0, description="Number of deleted documents")
 
 class QueryBotResponse(BaseModel):
     answer: str = Field(..., description="Query bot's answer for user query")
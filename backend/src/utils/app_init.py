@@ -2,15 +2,10 @@ import json
 import logging
 from dotenv import load_dotenv
 import os
+from typing import TYPE_CHECKING
 
-import google.generativeai as genai
-from google.generativeai import GenerativeModel
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
-
-import firebase_admin
-from firebase_admin import credentials
-import pyrebase
-from pyrebase.pyrebase import Firebase
+if TYPE_CHECKING:
+    from pyrebase.pyrebase import Firebase
 
 load_dotenv()
 
@@ -18,30 +13,13 @@ def configure_genai() -> None:
     """
     Configures the Google Generative AI API with the API key.
     """
+    import google.generativeai as genai
+
     GOOGLE_API_KEY=os.getenv("GOOGLE_API_KEY", "")
     genai.configure(api_key=GOOGLE_API_KEY)
     return GOOGLE_API_KEY
 
 
-def init_gemini_llm() -> GenerativeModel:
-    """
-    Initializes and returns a GenerativeModel instance from the Google Generative AI API.
-    """
-    configure_genai()
-    
-    model = genai.GenerativeModel('gemini-1.5-pro')
-    return model
-
-
-def init_embedding_model() -> GoogleGenerativeAIEmbeddings:
-    """
-    Initializes and returns a GoogleGenerativeAIEmbeddings instance.
-    """
-    GOOGLE_API_KEY = configure_genai()
-    embedding_model = GoogleGenerativeAIEmbeddings(model="models/text-embedding-004", google_api_key=GOOGLE_API_KEY)
-    return embedding_model
-
-
 def configure_logging(log_level: int = logging.INFO) -> None:
     """
     Configures the logging settings for the application.
@@ -60,10 +38,13 @@ def configure_logging(log_level: int = logging.INFO) -> None:
     logging.getLogger("uvicorn.error").propagate = True
 
 
-def initialize_firebase() -> Firebase:
+def initialize_firebase_admin() -> None:
     """
-    Initializes Firebase with the provided service account and SDK configurations.
+    Initializes the Firebase Admin SDK with the service account from the environment, if it is not initialized yet.
     """
+    import firebase_admin
+    from firebase_admin import credentials
+
     firebase_service_cred = {
         "type": os.getenv("FIREBASE_TYPE", ""),
         "project_id": os.getenv("FIREBASE_PROJECT_ID", ""),
@@ -81,6 +62,13 @@ def initialize_firebase() -> Firebase:
         cred = credentials.Certificate(firebase_service_cred)
         firebase_admin.initialize_app(cred)
 
+
+def initialize_pyrebase() -> "Firebase":
+    """
+    Initializes the Pyrebase client used for signing users up and in.
+    """
+    import pyrebase
+
     firebase_config = {
         "apiKey": os.getenv("FIREBASE_API_KEY", ""),
         "authDomain": os.getenv("AUTH_DOMAIN", ""),
@@ -95,3 +83,10 @@ def initialize_firebase() -> Firebase:
 
     return firebase
 
+
+def initialize_firebase() -> "Firebase":
+    """
+    Initializes Firebase with the provided service account and SDK configurations.
+    """
+    initialize_firebase_admin()
+    return initialize_pyrebase()
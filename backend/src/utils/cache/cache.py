@@ -0,0 +1,125 @@
+import json
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional, Tuple
+
+
+class SharedCache(ABC):
+    """
+    A key-value cache of bytes with expiry, grouped into namespaces.
+
+    Backends that keep entries outside the process let every server worker share them, so adding
+    workers does not multiply cache misses.
+    """
+
+    # Whether other processes see the entries.
+    is_shared: bool = False
+
+    @abstractmethod
+    def get(self, namespace: str, key: str) -> Optional[bytes]:
+        """
+        Returns the value stored under a key, or None if there is none or it has expired.
+
+        Args:
+            namespace (str): The namespace of the key, e.g. 'embeddings'.
+            key (str): The key.
+        """
+
+    @abstractmethod
+    def set(self, namespace: str, key: str, value: bytes, ttl: Optional[float] = None) -> None:
+        """
+        Stores a value under a key.
+
+        Args:
+            namespace (str): The namespace of the key.
+            key (str): The key.
+            value (bytes): The value.
+            ttl (Optional[float]): Seconds until the value expires. Defaults to never, though the cache may still evict it.
+        """
+
+    @abstractmethod
+    def delete(self, namespace: str, key: str) -> None:
+        """
+        Removes a key, if it is stored.
+
+        Args:
+            namespace (str): The namespace of the key.
+            key (str): The key.
+        """
+
+    @abstractmethod
+    def increment(self, namespace: str, key: str) -> int:
+        """
+        Atomically adds one to the counter stored under a key, which starts at zero, and returns the new value.
+
+        The counter never expires and is read back by `get` as its decimal digits.
+
+        Args:
+            namespace (str): The namespace of the key.
+            key (str): The key.
+
+        Returns:
+            int: The new value of the counter.
+        """
+
+    @abstractmethod
+    def take_tokens(self, namespace: str, key: str, rate: float, capacity: float, tokens: float, drain: Optional[bool] = False) -> Tuple[bool, float]:
+        """
+        Atomically refills a token bucket and takes tokens from it if enough are available.
+
+        Buckets start full and are refilled at `rate` tokens per second up to `capacity`. Backends
+        shared by several processes apply one bucket to all of them.
+
+        Args:
+            namespace (str): The namespace of the bucket.
+            key (str): The key of the bucket.
+            rate (float): The tokens added per second.
+            capacity (float): The most tokens the bucket holds.
+            tokens (float): The tokens to take, or 0 to only read the bucket.
+            drain (Optional[bool]): Whether to empty the bucket first, e.g. after the provider reported its quota as exhausted.
+
+        Returns:
+            Tuple[bool, float]: Whether the tokens were taken, and the tokens left in the bucket.
+        """
+
+    def get_many(self, namespace: str, keys: List[str]) -> Dict[str, bytes]:
+        """
+        Returns the stored values of the keys that have one.
+
+        Args:
+            namespace (str): The namespace of the keys.
+            keys (List[str]): The keys.
+
+        Returns:
+            Dict[str, bytes]: The values by key, without the keys that are not stored.
+        """
+        values = {}
+        for key in keys:
+            value = self.get(namespace, key)
+            if value is not None:
+                values[key] = value
+        return values
+
+    def set_many(self, namespace: str, values: Dict[str, bytes], ttl: Optional[float] = None) -> None:
+        """
+        Stores several values, all with the same expiry.
+
+        Args:
+            namespace (str): The namespace of the keys.
+            values (Dict[str, bytes]): The values by key.
+            ttl (Optional[float]): Seconds until the values expire.
+        """
+        for key, value in values.items():
+            self.set(namespace, key, value, ttl)
+
+    def get_json(self, namespace: str, key: str) -> Optional[Any]:
+        """
+        Returns the value stored by `set_json` under a key, or None.
+        """
+        value = self.get(namespace, key)
+        return json.loads(value) if value is not None else None
+
+    def set_json(self, namespace: str, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        """
+        Stores a JSON-serialisable value under a key.
+        """
+        self.set(namespace, key, json.dumps(value).encode("utf-8"), ttl)
@@ -0,0 +1,48 @@
+import logging
+import os
+import tempfile
+
+from backend.src.utils.cache.cache import SharedCache
+from backend.src.utils.constants import LOCAL_CACHE, REDIS_CACHE, SQLITE_CACHE
+from backend.src.utils.lazy import Lazy
+
+
+def default_cache_path() -> str:
+    """
+    Returns the path of the SQLite cache, in shared memory where the host has it.
+    """
+    directory = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+    return os.path.join(directory, "whoots-cache.sqlite")
+
+
+def init_shared_cache() -> SharedCache:
+    """
+    Initializes the cache selected by the SHARED_CACHE_BACKEND environment variable.
+
+    'local' (default) keeps entries in process memory, 'sqlite' in the SQLite file at SHARED_CACHE_PATH
+    that every worker on the host shares, and 'redis' in the Redis-compatible server at SHARED_CACHE_URL.
+
+    Returns:
+        SharedCache: The cache.
+
+    Raises:
+        ValueError: If the cache backend is unknown.
+    """
+    cache_backend = os.getenv("SHARED_CACHE_BACKEND", LOCAL_CACHE).lower()
+    logging.info(f"Using {cache_backend} shared cache")
+
+    if cache_backend == LOCAL_CACHE:
+        from backend.src.utils.cache.local_cache import LocalCache
+        return LocalCache()
+    elif cache_backend == SQLITE_CACHE:
+        from backend.src.utils.cache.sqlite_cache import SQLiteCache
+        return SQLiteCache(os.getenv("SHARED_CACHE_PATH", default_cache_path()))
+    elif cache_backend == REDIS_CACHE:
+        from backend.src.utils.cache.redis_cache import RedisCache
+        return RedisCache(os.getenv("SHARED_CACHE_URL", "redis://localhost:6379/0"))
+    else:
+        raise ValueError(f"Unknown shared cache backend: {cache_backend}")
+
+
+# Created on first use, so each server worker opens its own connection after it is forked.
+get_shared_cache = Lazy(init_shared_cache)
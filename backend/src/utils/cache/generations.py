@@ -0,0 +1,71 @@
+from typing import Optional, Tuple
+
+from backend.src.utils.cache.factory import get_shared_cache
+
+GENERATIONS_NAMESPACE = "cache_generations"
+
+# The generation of every user's entries, then of one user's entries.
+Generation = Tuple[int, int]
+
+# Without a shared cache, writes in other processes are not tracked, so entries never become outdated.
+_UNSHARED_GENERATION: Generation = (0, 0)
+
+
+def _all_users_key(cache_name: str) -> str:
+    return f"{cache_name}:*"
+
+
+def _user_key(cache_name: str, user_id: str) -> str:
+    return f"{cache_name}:{user_id}"
+
+
+def get_generation(cache_name: str, user_id: str) -> Generation:
+    """
+    Returns the current generation of a user's entries in a per-process cache.
+
+    Read it before loading the data to cache and stamp the entry with it; an entry whose stamp is not
+    the current generation missed a write made by another server worker sharing the cache.
+
+    Args:
+        cache_name (str): The name of the per-process cache, e.g. 'notes'.
+        user_id (str): The ID of the user.
+
+    Returns:
+        Generation: The generation.
+    """
+    cache = get_shared_cache()
+    if not cache.is_shared:
+        return _UNSHARED_GENERATION
+    keys = [_all_users_key(cache_name), _user_key(cache_name, user_id)]
+    values = cache.get_many(GENERATIONS_NAMESPACE, keys)
+    return int(values.get(keys[0], b"0")), int(values.get(keys[1], b"0"))
+
+
+def bump_generation(cache_name: str, user_id: Optional[str] = None, seen: Optional[Generation] = None) -> Optional[Generation]:
+    """
+    Marks a user's entries, or every user's entries when no user is given, as outdated in every server worker.
+
+    Call it after the write is stored. A caller that applied the write to its own entry passes the
+    entry's stamp, and may keep the entry, stamped with the returned generation, if no other write
+    happened since the entry was stamped.
+
+    Args:
+        cache_name (str): The name of the per-process cache.
+        user_id (Optional[str]): The ID of the user.
+        seen (Optional[Generation]): The stamp of the caller's entry, if it applied the write to one.
+
+    Returns:
+        Optional[Generation]: The generation to stamp the caller's entry with, or None if it must be dropped.
+    """
+    cache = get_shared_cache()
+    if not cache.is_shared:
+        return seen
+    if user_id is None:
+        cache.increment(GENERATIONS_NAMESPACE, _all_users_key(cache_name))
+        return None
+
+    user_generation = cache.increment(GENERATIONS_NAMESPACE, _user_key(cache_name, user_id))
+    all_users_generation = int(cache.get(GENERATIONS_NAMESPACE, _all_users_key(cache_name)) or b"0")
+    if seen is not None and seen == (all_users_generation, user_generation - 1):
+        return all_users_generation, user_generation
+    return None
@@ -0,0 +1,63 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from backend.src.utils.cache.cache import SharedCache
+from backend.src.utils.constants import LOCAL_CACHE_MAX_ENTRIES
+
+
+class LocalCache(SharedCache):
+    """
+    A cache in process memory, evicting the least recently used entry beyond max_entries.
+    """
+
+    def __init__(self, max_entries: Optional[int] = LOCAL_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.entries: "OrderedDict[Tuple[str, str], Tuple[bytes, float]]" = OrderedDict()
+        self.buckets: Dict[Tuple[str, str], Tuple[float, float]] = {}
+        self.lock = threading.Lock()
+
+    def get(self, namespace: str, key: str) -> Optional[bytes]:
+        with self.lock:
+            entry = self.entries.get((namespace, key))
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if time.time() >= expires_at:
+                del self.entries[(namespace, key)]
+                return None
+            self.entries.move_to_end((namespace, key))
+            return value
+
+    def set(self, namespace: str, key: str, value: bytes, ttl: Optional[float] = None) -> None:
+        with self.lock:
+            self.entries[(namespace, key)] = (value, time.time() + ttl if ttl is not None else float("inf"))
+            self.entries.move_to_end((namespace, key))
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def delete(self, namespace: str, key: str) -> None:
+        with self.lock:
+            self.entries.pop((namespace, key), None)
+
+    def increment(self, namespace: str, key: str) -> int:
+        with self.lock:
+            entry = self.entries.get((namespace, key))
+            value = int(entry[0]) + 1 if entry is not None else 1
+            self.entries[(namespace, key)] = (str(value).encode("utf-8"), float("inf"))
+            self.entries.move_to_end((namespace, key))
+            return value
+
+    def take_tokens(self, namespace: str, key: str, rate: float, capacity: float, tokens: float, drain: Optional[bool] = False) -> Tuple[bool, float]:
+        now = time.time()
+        with self.lock:
+            available, updated_at = self.buckets.get((namespace, key), (capacity, now))
+            available = min(capacity, available + (now - updated_at) * rate)
+            if drain:
+                available = min(available, 0)
+            taken = tokens > 0 and available >= tokens
+            if taken:
+                available -= tokens
+            self.buckets[(namespace, key)] = (available, now)
+            return taken, available
@@ -0,0 +1,99 @@
+import logging
+import math
+from typing import Dict, List, Optional, Tuple
+
+from backend.src.utils.cache.cache import SharedCache
+
+# Refills and takes from a token bucket in one step, using the server's clock so that every host agrees on it.
+_TAKE_TOKENS_SCRIPT = """
+local time = redis.call('TIME')
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+local rate, capacity, tokens, drain, ttl = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3]), ARGV[4] == '1', tonumber(ARGV[5])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated_at')
+local available = tonumber(state[1]) or capacity
+local updated_at = tonumber(state[2]) or now
+available = math.min(capacity, available + math.max(0, now - updated_at) * rate)
+if drain then available = math.min(available, 0) end
+local taken = 0
+if tokens > 0 and available >= tokens then
+    available = available - tokens
+    taken = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(available), 'updated_at', tostring(now))
+redis.call('PEXPIRE', KEYS[1], ttl)
+return {taken, tostring(available)}
+"""
+
+
+class RedisCache(SharedCache):
+    """
+    A cache in a Redis-compatible server (e.g. Redis, Valkey or Dragonfly), shared by every worker that connects to it.
+
+    Errors from the server are logged and treated as cache misses, so an unavailable cache slows
+    requests down instead of failing them.
+    """
+
+    is_shared = True
+
+    def __init__(self, url: str):
+        import redis
+
+        self.redis = redis
+        self.client = redis.Redis.from_url(url, socket_timeout=0.5, socket_connect_timeout=0.5)
+        self.take_tokens_script = self.client.register_script(_TAKE_TOKENS_SCRIPT)
+
+    def get(self, namespace: str, key: str) -> Optional[bytes]:
+        try:
+            return self.client.get(f"{namespace}:{key}")
+        except self.redis.RedisError as e:
+            logging.warning(f"Shared cache read failed: {e}")
+            return None
+
+    def get_many(self, namespace: str, keys: List[str]) -> Dict[str, bytes]:
+        if not keys:
+            return {}
+        try:
+            values = self.client.mget([f"{namespace}:{key}" for key in keys])
+        except self.redis.RedisError as e:
+            logging.warning(f"Shared cache read failed: {e}")
+            return {}
+        return {key: value for key, value in zip(keys, values) if value is not None}
+
+    def set(self, namespace: str, key: str, value: bytes, ttl: Optional[float] = None) -> None:
+        try:
+            self.client.set(f"{namespace}:{key}", value, px=max(1, int(ttl * 1000)) if ttl is not None else None)
+        except self.redis.RedisError as e:
+            logging.warning(f"Shared cache write failed: {e}")
+
+    def set_many(self, namespace: str, values: Dict[str, bytes], ttl: Optional[float] = None) -> None:
+        try:
+            pipeline = self.client.pipeline(transaction=False)
+            for key, value in values.items():
+                pipeline.set(f"{namespace}:{key}", value, px=max(1, int(ttl * 1000)) if ttl is not None else None)
+            pipeline.execute()
+        except self.redis.RedisError as e:
+            logging.warning(f"Shared cache write failed: {e}")
+
+    def increment(self, namespace: str, key: str) -> int:
+        try:
+            return self.client.incr(f"{namespace}:{key}")
+        except self.redis.RedisError as e:
+            logging.warning(f"Shared cache write failed: {e}")
+            return 0
+
+    def take_tokens(self, namespace: str, key: str, rate: float, capacity: float, tokens: float, drain: Optional[bool] = False) -> Tuple[bool, float]:
+        # A bucket left alone until it is full again is the same as a new one, so it can expire then.
+        ttl = math.ceil(capacity / rate * 1000) + 1000 if rate > 0 else 24 * 3600 * 1000
+        try:
+            taken, available = self.take_tokens_script(keys=[f"{namespace}:{key}"], args=[rate, capacity, tokens, int(bool(drain)), ttl])
+        except self.redis.RedisError as e:
+            # The provider's own quota errors still drain the bucket, so failing open does not overrun it for long.
+            logging.warning(f"Shared rate limit query failed: {e}")
+            return True, capacity
+        return bool(taken), float(available)
+
+    def delete(self, namespace: str, key: str) -> None:
+        try:
+            self.client.delete(f"{namespace}:{key}")
+        except self.redis.RedisError as e:
+            logging.warning(f"Shared cache write failed: {e}")
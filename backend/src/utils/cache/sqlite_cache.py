@@ -0,0 +1,153 @@
+import logging
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, TypeVar
+
+from backend.src.utils.cache.cache import SharedCache
+from backend.src.utils.constants import SQLITE_CACHE_MAX_ENTRIES, SQLITE_CACHE_PINNED_NAMESPACES, SQLITE_CACHE_PRUNE_INTERVAL
+
+T = TypeVar("T")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS cache (
+    namespace TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value BLOB NOT NULL,
+    expires_at REAL NOT NULL,
+    PRIMARY KEY (namespace, key)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS cache_expires_at ON cache (expires_at);
+CREATE TABLE IF NOT EXISTS token_buckets (
+    namespace TEXT NOT NULL,
+    key TEXT NOT NULL,
+    tokens REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (namespace, key)
+) WITHOUT ROWID;
+"""
+
+
+class SQLiteCache(SharedCache):
+    """
+    A cache in a SQLite database file shared by every worker on the host, e.g. in /dev/shm.
+
+    Expired entries are pruned every SQLITE_CACHE_PRUNE_INTERVAL writes, and beyond max_entries the
+    entries closest to expiry are evicted, except those in pinned_namespaces. Entries are not durable; losing the file only costs misses,
+    and database errors, e.g. a write lock held too long by another worker, are logged and treated as misses.
+    """
+
+    is_shared = True
+
+    def __init__(self,
+                 database_path: str,
+                 max_entries: Optional[int] = SQLITE_CACHE_MAX_ENTRIES,
+                 pinned_namespaces: Optional[Sequence[str]] = SQLITE_CACHE_PINNED_NAMESPACES):
+        self.max_entries = max_entries
+        self.pinned_namespaces = tuple(pinned_namespaces)
+        self.connection = sqlite3.connect(database_path, check_same_thread=False, isolation_level=None, timeout=1.0)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        # The cache may lose recent writes on a crash, but never becomes corrupt.
+        self.connection.execute("PRAGMA synchronous=OFF")
+        self.connection.executescript(_SCHEMA)
+        self.lock = threading.Lock()
+        self.writes = 0
+
+    def _execute(self, sql: str, parameters: Tuple[Any, ...]) -> List[Tuple[Any, ...]]:
+        try:
+            with self.lock:
+                return self.connection.execute(sql, parameters).fetchall()
+        except sqlite3.Error as e:
+            logging.warning(f"Shared cache query failed: {e}")
+            return []
+
+    def get(self, namespace: str, key: str) -> Optional[bytes]:
+        rows = self._execute("SELECT value FROM cache WHERE namespace = ? AND key = ? AND expires_at > ?", (namespace, key, time.time()))
+        return rows[0][0] if rows else None
+
+    def get_many(self, namespace: str, keys: List[str]) -> Dict[str, bytes]:
+        values = {}
+        # Batched to stay under SQLite's limit on query parameters.
+        for i in range(0, len(keys), 500):
+            batch = keys[i:i + 500]
+            placeholders = ", ".join("?" * len(batch))
+            values.update(self._execute(f"SELECT key, value FROM cache WHERE namespace = ? AND key IN ({placeholders}) AND expires_at > ?", (namespace, *batch, time.time())))
+        return values
+
+    def set(self, namespace: str, key: str, value: bytes, ttl: Optional[float] = None) -> None:
+        expires_at = time.time() + ttl if ttl is not None else float("inf")
+        self._execute("INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?)", (namespace, key, value, expires_at))
+        self.writes += 1
+        if self.writes % SQLITE_CACHE_PRUNE_INTERVAL == 0:
+            self._prune()
+
+    def set_many(self, namespace: str, values: Dict[str, bytes], ttl: Optional[float] = None) -> None:
+        expires_at = time.time() + ttl if ttl is not None else float("inf")
+        try:
+            with self.lock, self.connection:
+                self.connection.executemany("INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?)", [(namespace, key, value, expires_at) for key, value in values.items()])
+        except sqlite3.Error as e:
+            logging.warning(f"Shared cache query failed: {e}")
+        self.writes += len(values)
+        if self.writes % SQLITE_CACHE_PRUNE_INTERVAL < len(values):
+            self._prune()
+
+    def delete(self, namespace: str, key: str) -> None:
+        self._execute("DELETE FROM cache WHERE namespace = ? AND key = ?", (namespace, key))
+
+    def _read_modify_write(self, update: Callable[[], T]) -> T:
+        with self.lock:
+            # An immediate transaction takes the write lock first, so no other worker reads the row in between.
+            self.connection.execute("BEGIN IMMEDIATE")
+            try:
+                result = update()
+                self.connection.execute("COMMIT")
+                return result
+            except BaseException:
+                self.connection.execute("ROLLBACK")
+                raise
+
+    def increment(self, namespace: str, key: str) -> int:
+        def update() -> int:
+            row = self.connection.execute("SELECT value FROM cache WHERE namespace = ? AND key = ?", (namespace, key)).fetchone()
+            value = int(row[0]) + 1 if row is not None else 1
+            self.connection.execute("INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?)", (namespace, key, str(value).encode("utf-8"), float("inf")))
+            return value
+
+        try:
+            return self._read_modify_write(update)
+        except sqlite3.Error as e:
+            logging.warning(f"Shared cache query failed: {e}")
+            return 0
+
+    def take_tokens(self, namespace: str, key: str, rate: float, capacity: float, tokens: float, drain: Optional[bool] = False) -> Tuple[bool, float]:
+        now = time.time()
+
+        def update() -> Tuple[bool, float]:
+            row = self.connection.execute("SELECT tokens, updated_at FROM token_buckets WHERE namespace = ? AND key = ?", (namespace, key)).fetchone()
+            available, updated_at = row if row is not None else (capacity, now)
+            available = min(capacity, available + max(0.0, now - updated_at) * rate)
+            if drain:
+                available = min(available, 0)
+            taken = tokens > 0 and available >= tokens
+            if taken:
+                available -= tokens
+            self.connection.execute("INSERT OR REPLACE INTO token_buckets VALUES (?, ?, ?, ?)", (namespace, key, available, now))
+            return taken, available
+
+        try:
+            return self._read_modify_write(update)
+        except sqlite3.Error as e:
+            # The provider's own quota errors still drain the bucket, so failing open does not overrun it for long.
+            logging.warning(f"Shared rate limit query failed: {e}")
+            return True, capacity
+
+    def _prune(self) -> None:
+        self._execute("DELETE FROM cache WHERE expires_at <= ?", (time.time(),))
+        rows = self._execute("SELECT COUNT(*) FROM cache", ())
+        excess = rows[0][0] - self.max_entries if rows else 0
+        if excess > 0:
+            placeholders = ", ".join("?" * len(self.pinned_namespaces))
+            self._execute(f"DELETE FROM cache WHERE (namespace, key) IN "
+                          f"(SELECT namespace, key FROM cache WHERE namespace NOT IN ({placeholders}) ORDER BY expires_at LIMIT ?)",
+                          (*self.pinned_namespaces, excess))
@@ -0,0 +1,176 @@
+import logging
+import zlib
+from typing import Any, Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from backend.src.utils.constants import BROTLI_QUALITY, COMPRESSIBLE_CONTENT_TYPES, COMPRESSION_MINIMUM_SIZE, GZIP_COMPRESSION_LEVEL
+from backend.src.utils.metrics import get_counter
+
+GZIP = "gzip"
+BROTLI = "br"
+
+response_bytes_counter = get_counter("response_body_bytes_total", "Response body bytes before and after compression, by content encoding", ("encoding", "stage"))
+
+
+def _import_brotli() -> Optional[Any]:
+    try:
+        import brotli
+        return brotli
+    except ImportError:
+        logging.warning("Brotli is not installed; responses are only compressed with gzip.")
+        return None
+
+
+def choose_encoding(accept_encoding: str, brotli_available: bool) -> Optional[str]:
+    """
+    Picks the content encoding for a response from the request's Accept-Encoding header.
+
+    Args:
+        accept_encoding (str): The Accept-Encoding header, e.g. 'gzip, deflate, br' or 'br;q=0.5, gzip'.
+        brotli_available (bool): Whether responses can be compressed with Brotli.
+
+    Returns:
+        Optional[str]: 'br' or 'gzip', whichever the client prefers (Brotli on a tie), or None to send the response uncompressed.
+    """
+    weights = {}
+    for coding in accept_encoding.split(","):
+        name, _, params = coding.strip().partition(";")
+        weight = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                weight = float(params[2:])
+            except ValueError:
+                weight = 0.0
+        weights[name.strip().lower()] = weight
+
+    supported = [BROTLI, GZIP] if brotli_available else [GZIP]
+    candidates = [(weights.get(encoding, weights.get("*", 0.0)), -i, encoding) for i, encoding in enumerate(supported)]
+    weight, _, encoding = max(candidates)
+    return encoding if weight > 0 else None
+
+
+class _Compressor:
+    """
+    An incremental gzip or Brotli compressor.
+    """
+
+    def __init__(self, encoding: str, gzip_level: int, brotli_quality: int, brotli: Optional[Any]):
+        self.encoding = encoding
+        if encoding == BROTLI:
+            self.compressor = brotli.Compressor(quality=brotli_quality, mode=brotli.MODE_TEXT)
+        else:
+            # wbits of 16 + 15 writes a gzip header and trailer.
+            self.compressor = zlib.compressobj(gzip_level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data: bytes) -> bytes:
+        return self.compressor.process(data) if self.encoding == BROTLI else self.compressor.compress(data)
+
+    def flush(self) -> bytes:
+        return self.compressor.flush() if self.encoding == BROTLI else self.compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self.compressor.finish() if self.encoding == BROTLI else self.compressor.flush()
+
+
+class CompressionMiddleware:
+    """
+    Compresses responses with Brotli or gzip, as negotiated with the client's Accept-Encoding header.
+
+    Responses smaller than minimum_size, responses that already have a Content-Encoding and responses
+    that are not JSON or text are sent as they are. Streamed responses are compressed chunk by chunk,
+    and each chunk is flushed so the client sees it without waiting for the rest.
+    """
+
+    def __init__(self,
+                 app: ASGIApp,
+                 minimum_size: Optional[int] = COMPRESSION_MINIMUM_SIZE,
+                 gzip_level: Optional[int] = GZIP_COMPRESSION_LEVEL,
+                 brotli_quality: Optional[int] = BROTLI_QUALITY):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.brotli = _import_brotli()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""), self.brotli is not None)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        await _CompressingResponder(self, encoding, send).run(scope, receive)
+
+
+class _CompressingResponder:
+    def __init__(self, middleware: CompressionMiddleware, encoding: str, send: Send):
+        self.middleware = middleware
+        self.encoding = encoding
+        self.send = send
+        self.start_message: Optional[Message] = None
+        self.compressor: Optional[_Compressor] = None
+        # Set once the response turns out not to need compressing.
+        self.passthrough = False
+
+    async def run(self, scope: Scope, receive: Receive) -> None:
+        await self.middleware.app(scope, receive, self.send_compressed)
+
+    def _is_compressible(self, headers: MutableHeaders) -> bool:
+        content_type = headers.get("content-type", "")
+        return "content-encoding" not in headers and content_type.startswith(COMPRESSIBLE_CONTENT_TYPES)
+
+    def _set_encoding_headers(self, headers: MutableHeaders) -> None:
+        headers["Content-Encoding"] = self.encoding
+        headers.add_vary_header("Accept-Encoding")
+
+    async def send_compressed(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            # Held back until the first body chunk shows whether and how to compress.
+            self.start_message = message
+            return
+        if message["type"] != "http.response.body":
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.start_message is not None:
+            start_message, self.start_message = self.start_message, None
+            headers = MutableHeaders(scope=start_message)
+            if not self._is_compressible(headers) or (not more_body and len(body) < self.middleware.minimum_size):
+                self.passthrough = True
+                await self.send(start_message)
+                await self.send(message)
+                return
+
+            self.compressor = _Compressor(self.encoding, self.middleware.gzip_level, self.middleware.brotli_quality, self.middleware.brotli)
+            self._set_encoding_headers(headers)
+            if more_body:
+                del headers["Content-Length"]
+                compressed = self.compressor.compress(body) + self.compressor.flush()
+            else:
+                compressed = self.compressor.compress(body) + self.compressor.finish()
+                headers["Content-Length"] = str(len(compressed))
+            self._count(body, compressed)
+            await self.send(start_message)
+            await self.send({"type": "http.response.body", "body": compressed, "more_body": more_body})
+            return
+
+        if self.passthrough:
+            await self.send(message)
+            return
+
+        compressed = self.compressor.compress(body) + (self.compressor.flush() if more_body else self.compressor.finish())
+        self._count(body, compressed)
+        await self.send({"type": "http.response.body", "body": compressed, "more_body": more_body})
+
+    def _count(self, body: bytes, compressed: bytes) -> None:
+        response_bytes_counter.inc(len(body), encoding=self.encoding, stage="uncompressed")
+        response_bytes_counter.inc(len(compressed), encoding=self.encoding, stage="compressed")
@@ -14,10 +14,153 @@ VIDEO_MIME_TYPES = {
     ".mov": "video/quicktime",
 }
 
+# Video preprocessing
+ORIGINAL_VIDEO = "none"
+TRANSCODED_VIDEO = "transcode"
+KEYFRAME_VIDEO = "keyframes"
+# Gemini samples uploaded videos at 1 frame per second, so higher frame rates only add upload bytes.
+VIDEO_TRANSCODE_FPS = 1
+VIDEO_TRANSCODE_MAX_HEIGHT = 480
+VIDEO_TRANSCODE_CRF = 30
+# Slides are kept sharper than camera footage so their text stays readable.
+VIDEO_KEYFRAME_MAX_HEIGHT = 720
+VIDEO_KEYFRAME_SCENE_THRESHOLD = 0.1
+VIDEO_AUDIO_BITRATE = "48k"
+VIDEO_PREPROCESSING_TIMEOUT_SECONDS = 600
+# Smaller videos upload faster than ffmpeg can shrink them.
+VIDEO_PREPROCESSING_MIN_BYTES = 8 * 1024 * 1024
+
+# Storage backends
+FIRESTORE_STORAGE = 'firestore'
+MEMORY_STORAGE = 'memory'
+SQLITE_STORAGE = 'sqlite'
+
 # Collection names
 USER_COLLECTION = 'users'
 NOTE_COLLECTION = 'notes'
 QUIZ_COLLECTION = 'quiz_qn_and_ans'
+PERFORMANCE_COLLECTION = 'performance'
+QUIZ_SUMMARY_COLLECTION = 'quiz_summaries'
+QUIZ_SUMMARY_QUESTIONS_COLLECTION = 'questions'
+NOTES_ARCHIVE_COLLECTION = 'notes_archive'
+
+# Document names
+PERFORMANCE_SUMMARY_DOCUMENT = 'summary'
+
+# Question types
+MULTIPLE_CHOICE = 'multiple_choice'
+MULTI_SELECT = 'multi_select'
+TRUE_FALSE = 'true_false'
+FREE_RESPONSE = 'free_response'
+
+# Quiz question fields
+QUESTION_FIELDS = ('question', 'choices', 'answer', 'explanation', 'topic')
+UNKNOWN_TOPIC = 'general'
+
+# Firestore access
+READ_PAGE_SIZE = 300
+FIRESTORE_ASYNC_CONCURRENCY = 32
+FIRESTORE_MAX_BATCH_WRITES = 500
+FIRESTORE_BATCH_CONCURRENCY = 8
+FIRESTORE_REQUEST_READ_BUDGET = 500
+FIRESTORE_REQUEST_WRITE_BUDGET = 200
+
+# Bulk deletion
+BULK_DELETE_INITIAL_OPS_PER_SECOND = 500
+BULK_DELETE_MAX_OPS_PER_SECOND = 2000
+BULK_DELETE_MAX_ATTEMPTS = 5
+
+# Notes
+RECENT_NOTES_WINDOW_MINUTES = 15
+NOTES_BATCH_MAX_FILES = 20
+NOTES_BATCH_CONCURRENCY = 4
+
+# Notes cache
+NOTES_CACHE_MAX_BYTES = 64 * 1024 * 1024
+NOTES_CACHE_TTL_SECONDS = 300
+NOTES_CACHE_LISTENER_TIMEOUT_SECONDS = 10
+
+# Retention
+QUIZ_COMPACTION_AGE_DAYS = 30
+NOTES_ARCHIVE_AGE_DAYS = 90
+NOTES_ARCHIVE_TTL_DAYS = 365
+ARCHIVE_BLOB_MAX_BYTES = 900_000
+RETENTION_PAGE_SIZE = 200
+RETENTION_MAX_OPS_PER_SECOND = 100
+
+# Performance aggregate
+RECENT_ANSWERS_LIMIT = 50
+RECENT_ANSWERS_WINDOW_MINUTES = 120
+
+# Answer write-behind
+ANSWER_BUFFER_MAX_SIZE = 100
+ANSWER_BUFFER_FLUSH_SECONDS = 2
+ANSWER_BUFFER_SHUTDOWN_ATTEMPTS = 3
+
+# Question index
+MINHASH_NUM_PERM = 64
+MINHASH_BANDS = 16
+MINHASH_SHINGLE_SIZE = 4
+SIMHASH_NUM_PLANES = 64
+SIMHASH_BANDS = 8
+DUPLICATE_QUESTION_THRESHOLD = 0.7
+DUPLICATE_QUESTION_EMBEDDING_THRESHOLD = 0.92
+QUESTION_INDEX_MAX_USERS = 256
+QUIZ_REPAIR_ATTEMPTS = 2
+
+# LLM backends
+GEMINI_LLM = "gemini"
+STUB_LLM = "stub"
+RECORD_LLM = "record"
+REPLAY_LLM = "replay"
+EMBEDDING_DIMENSIONS = 768
+STUB_LLM_DEFAULT_LATENCY = "fixed:0"
+
+# Model rate limits
+GEMINI_MODEL = "models/gemini-1.5-pro"
+EMBEDDING_MODEL = "models/text-embedding-004"
+GEMINI_REQUESTS_PER_MINUTE = 2
+EMBEDDING_REQUESTS_PER_MINUTE = 1500
+LLM_MAX_QUEUE_WAIT_SECONDS = 120
+# Below the 40 threads of the server's threadpool, so that waiting calls cannot take all of them.
+LLM_MAX_QUEUED_CALLS = 24
+PRIORITY_INTERACTIVE = 0
+PRIORITY_STANDARD = 1
+PRIORITY_BACKGROUND = 2
+
+# Authentication
+TOKEN_CACHE_MAX_ENTRIES = 10_000
+TOKEN_CACHE_MAX_TTL_SECONDS = 300
+ID_TOKEN_LIFETIME_SECONDS = 3600
+SIGNING_KEYS_REFRESH_SECONDS = 3600
+
+# Metrics
+LATENCY_BUCKETS_SECONDS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+# Shared cache
+LOCAL_CACHE = "local"
+SQLITE_CACHE = "sqlite"
+REDIS_CACHE = "redis"
+LOCAL_CACHE_MAX_ENTRIES = 4096
+SQLITE_CACHE_MAX_ENTRIES = 100_000
+SQLITE_CACHE_PRUNE_INTERVAL = 1000
+REVOKED_TOKENS_NAMESPACE = "revoked_tokens"
+REVOKED_USERS_NAMESPACE = "revoked_users"
+# Entries in these namespaces are only removed once they expire, never to make room, so a revocation outlives the tokens it revokes.
+SQLITE_CACHE_PINNED_NAMESPACES = (REVOKED_TOKENS_NAMESPACE, REVOKED_USERS_NAMESPACE)
+EMBEDDING_CACHE_TTL_SECONDS = 7 * 24 * 3600
+EXTRACTION_CACHE_TTL_SECONDS = 24 * 3600
+
+# Production server
+# Notes generation waits up to 600 seconds for the model, so in-flight requests get a little longer to finish.
+SERVER_GRACEFUL_TIMEOUT_SECONDS = 630
+SERVER_KEEPALIVE_SECONDS = 5
+
+# Response compression
+COMPRESSION_MINIMUM_SIZE = 1024
+GZIP_COMPRESSION_LEVEL = 6
+BROTLI_QUALITY = 4
+COMPRESSIBLE_CONTENT_TYPES = ("application/json", "application/x-ndjson", "text/")
 
 
 # Prompts
@@ -25,12 +168,14 @@ QUIZ_FORMATTER = """Please return JSON list of questions and answers from this t
 
     list[MultipleChoice, MultiSelect, TrueFalse, FillInTheBlank, ShortAnswer, LongAnswer]
 
-    MultipleChoice = {"question": str, "choices": list[str], "answer": int, "explanation": str}
-    MultiSelect = {"question": str, "choices": list[str], "answer": list[int], "explanation": str}
-    TrueFalse = {"question": str, "choices": ["True", "False"], "answer": str, "explanation": str}
-    FillInTheBlank = {"question": str, "answer": str, "explanation": str}
-    ShortAnswer = {"question": str, "answer": str, "explanation": str}
-    LongAnswer = {"question": str, "answer": str, "explanation": str}
+    MultipleChoice = {"question": str, "choices": list[str], "answer": int, "explanation": str, "topic": str}
+    MultiSelect = {"question": str, "choices": list[str], "answer": list[int], "explanation": str, "topic": str}
+    TrueFalse = {"question": str, "choices": ["True", "False"], "answer": str, "explanation": str, "topic": str}
+    FillInTheBlank = {"question": str, "answer": str, "explanation": str, "topic": str}
+    ShortAnswer = {"question": str, "answer": str, "explanation": str, "topic": str}
+    LongAnswer = {"question": str, "answer": str, "explanation": str, "topic": str}
+
+    "topic" is a short name (at most three words) of the concept the question tests.
    
     All other fields are required.
 
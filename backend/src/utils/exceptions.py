@@ -1,3 +1,10 @@
 class JSONLoadError(Exception):
     """Custom exception for errors during JSON loading."""
-    pass
\ No newline at end of file
+    pass
+
+class RateLimitExceeded(Exception):
+    """Raised when a model call cannot be scheduled within the allowed wait or the model's quota is exhausted."""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
@@ -0,0 +1,421 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Any, AsyncIterator, Awaitable, Dict, Iterable, List, Optional, Sequence, TypeVar, Union
+
+from firebase_admin import firestore
+from google.cloud.firestore_v1.async_client import AsyncClient
+from google.cloud.firestore_v1.async_query import AsyncQuery
+from google.cloud.firestore_v1.base_query import FieldFilter
+from google.cloud.firestore_v1.base_vector_query import DistanceMeasure
+from google.cloud.firestore_v1.bulk_writer import BulkWriter
+from google.cloud.firestore_v1.vector import Vector
+
+from backend.src.api.v1.models.responses import FreeResponseQuestion, MultiSelectQuestion, MultipleChoiceQuestion, TrueFalseQuestion
+from backend.src.utils.constants import (
+    FIRESTORE_ASYNC_CONCURRENCY,
+    NOTE_COLLECTION,
+    PERFORMANCE_COLLECTION,
+    PERFORMANCE_SUMMARY_DOCUMENT,
+    QUIZ_COLLECTION,
+    READ_PAGE_SIZE,
+    RECENT_NOTES_WINDOW_MINUTES,
+    USER_COLLECTION,
+)
+from backend.src.utils.firestore.document_operations import open_bulk_delete_writer
+from backend.src.utils.firestore.notes_cache import CachedNotes, add_cached_notes, cache_notes, get_cached_notes, get_notes_generation, invalidate_cached_notes
+from backend.src.utils.firestore.notes_operations import get_notes_from_docs
+from backend.src.utils.firestore.performance_operations import get_performance_aggregate_ref
+from backend.src.utils.quiz.question_index import QuestionIndex, evict_question_index, get_cached_question_index, update_cached_question_index
+from backend.src.utils.rag import chunk_and_embed_notes
+
+T = TypeVar("T")
+
+
+def init_async_firestore_client() -> AsyncClient:
+    """
+    Returns an async Firestore client for the default Firebase app. Call initialize_firebase first.
+    """
+    from firebase_admin import firestore_async
+    return firestore_async.client()
+
+
+async def gather_with_concurrency(awaitables: Iterable[Awaitable[T]], limit: Optional[int] = FIRESTORE_ASYNC_CONCURRENCY) -> List[T]:
+    """
+    Awaits awaitables concurrently, with at most limit of them in flight at once.
+
+    Args:
+        awaitables (Iterable[Awaitable[T]]): The awaitables, e.g. Firestore reads or writes.
+        limit (Optional[int]): The maximum number of awaitables in flight. Defaults to FIRESTORE_ASYNC_CONCURRENCY.
+
+    Returns:
+        List[T]: The results, in order.
+    """
+    semaphore = asyncio.Semaphore(limit)
+
+    async def run(awaitable: Awaitable[T]) -> T:
+        async with semaphore:
+            return await awaitable
+
+    return await asyncio.gather(*(run(awaitable) for awaitable in awaitables))
+
+
+async def collate_document_data(query: AsyncQuery,
+                                fields: Optional[Sequence[str]] = None,
+                                page_size: Optional[int] = READ_PAGE_SIZE) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Yields the data of the documents matched by an async Firestore query, one page at a time.
+
+    Args:
+        query (AsyncQuery): The async Firestore query or collection reference.
+        fields (Optional[Sequence[str]]): The fields to read. Reads all fields if not provided.
+            Must include any field the query filters on with an inequality, since the cursor is built from it.
+        page_size (Optional[int]): The number of documents to read per page.
+
+    Yields:
+        Dict[str, Any]: The data of each document, with its 'id'.
+    """
+    if fields is not None:
+        query = query.select(list(fields))
+
+    last_doc = None
+    while True:
+        page_query = query.limit(page_size)
+        if last_doc is not None:
+            page_query = page_query.start_after(last_doc)
+
+        num_docs = 0
+        async for doc in page_query.stream():
+            num_docs += 1
+            last_doc = doc
+            doc_data = doc.to_dict()
+            doc_data['id'] = doc.id
+            yield doc_data
+
+        if num_docs < page_size:
+            return
+
+
+def get_all_docs(db: AsyncClient, user_id: str, coll_name: str, fields: Optional[Sequence[str]] = None) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Lazily retrieves all documents from a specified collection.
+
+    Args:
+        db (AsyncClient): The async Firestore client.
+        user_id (str): The ID of the user.
+        coll_name (str): The name of the collection.
+        fields (Optional[Sequence[str]]): The fields to read. Reads all fields if not provided.
+
+    Returns:
+        AsyncIterator[Dict[str, Any]]: The documents in the collection.
+    """
+    query = db.collection(USER_COLLECTION).document(user_id).collection(coll_name)
+    return collate_document_data(query, fields)
+
+
+def get_recent_documents(db: AsyncClient,
+                         user_id: str,
+                         coll_name: str,
+                         minutes: Optional[int] = 15,
+                         fields: Optional[Sequence[str]] = None) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Lazily retrieves recent documents from a specified collection within a given time frame.
+
+    Args:
+        db (AsyncClient): The async Firestore client.
+        user_id (str): The ID of the user.
+        coll_name (str): The name of the collection.
+        minutes (Optional[int]): The time frame in minutes. Defaults to 15.
+        fields (Optional[Sequence[str]]): The fields to read. Reads all fields if not provided.
+
+    Returns:
+        AsyncIterator[Dict[str, Any]]: The recent documents.
+    """
+    time_threshold = datetime.now(timezone.utc) - timedelta(minutes=minutes)
+    query = db.collection(USER_COLLECTION).document(user_id).collection(coll_name).where(filter=FieldFilter('timestamp', '>=', time_threshold))
+    if fields is not None and 'timestamp' not in fields:
+        fields = [*fields, 'timestamp']
+    return collate_document_data(query, fields)
+
+
+async def update_doc_with_timestamp(db: AsyncClient, user_id: str, coll_name: str) -> int:
+    """
+    Updates all documents in a user's collection with the current server timestamp, concurrently.
+
+    Unlike the sync version, document references are listed without reading the documents.
+
+    Args:
+        db (AsyncClient): The async Firestore client.
+        user_id (str): The ID of the user.
+        coll_name (str): The name of the collection.
+
+    Returns:
+        int: The number of updated documents.
+    """
+    coll_ref = db.collection(USER_COLLECTION).document(user_id).collection(coll_name)
+    doc_refs = [doc_ref async for doc_ref in coll_ref.list_documents()]
+    await gather_with_concurrency(doc_ref.update({"timestamp": firestore.SERVER_TIMESTAMP}) for doc_ref in doc_refs)
+    logging.info(f'Updated {len(doc_refs)} documents in {coll_name} with timestamp')
+
+    return len(doc_refs)
+
+
+async def add_to_notes(db: AsyncClient, user_id: str, notes: str) -> None:
+    """
+    Adds chunked and embedded notes to the Firestore database for a specified user, concurrently.
+
+    Chunking and embedding call blocking APIs, so they run in a worker thread. The cached notes are
+    updated once every chunk is written, and dropped if any write fails.
+
+    Args:
+        db (AsyncClient): The async Firestore client.
+        user_id (str): The ID of the user.
+        notes (str): The notes to be chunked and added.
+    """
+    note_chunks = await asyncio.to_thread(chunk_and_embed_notes, notes)
+    logging.info(f"Uploading {len(note_chunks)} chunks to firestore ...")
+    coll_ref = db.collection(USER_COLLECTION).document(user_id).collection(NOTE_COLLECTION)
+    try:
+        results = await gather_with_concurrency(
+            coll_ref.add({"summarised_notes": note, "embedding": note_embeddings, "timestamp": firestore.SERVER_TIMESTAMP})
+            for note, note_embeddings in note_chunks
+        )
+    except BaseException:
+        invalidate_cached_notes(user_id)
+        raise
+    logging.info(f"Added {len(results)} note documents")
+
+    add_cached_notes(user_id, [
+        {"id": note_ref.id, "summarised_notes": note, "timestamp": update_time or datetime.now(timezone.utc)}
+        for (note, _), (update_time, note_ref) in zip(note_chunks, results)
+    ])
+
+
+async def load_notes(db: AsyncClient, user_id: str, since: Optional[datetime] = None) -> CachedNotes:
+    """
+    Returns a user's note chunks stored since a given time, or all of them, from the per-process notes cache.
+
+    Shares the cache with the sync version. On a cache miss, the chunks are read once with a projected
+    read and cached; snapshot listeners need the sync client and are not started.
+
+    Args:
+        db (AsyncClient): The async Firestore client.
+        user_id (str): The ID of the user.
+        since (Optional[datetime]): The earliest time to read chunks from. Reads all chunks if not provided.
+
+    Returns:
+        CachedNotes: The cached notes. They may include chunks from before `since`.
+    """
+    cached_notes = get_cached_notes(user_id, since)
+    if cached_notes is None:
+        generation = get_notes_generation(user_id)
+        query = db.collection(USER_COLLECTION).document(user_id).collection(NOTE_COLLECTION)
+        if since is not None:
+            query = query.where(filter=FieldFilter("timestamp", ">=", since))
+        documents = [doc async for doc in collate_document_data(query, ["summarised_notes", "timestamp"])]
+        cached_notes = cache_notes(user_id, documents, generation, since)
+    return cached_notes
+
+
+async def retrieve_notes_doc_from_firestore(db: AsyncClient, user_id: str) -> str:
+    """
+    Retrieves and aggregates notes from recent documents or all documents if recent ones are empty.
+
+    Only the chunks of the last RECENT_NOTES_WINDOW_MINUTES are read, unless none are recent.
+
+    Args:
+        db (AsyncClient): The async Firestore client.
+        user_id (str): The ID of the user.
+
+    Returns:
+        str: Aggregated notes content.
+
+    Raises:
+        ValueError: If no documents are found in the collection.
+    """
+    since = datetime.now(timezone.utc) - timedelta(minutes=RECENT_NOTES_WINDOW_MINUTES)
+    cached_notes = await load_notes(db, user_id, since)
+    content = get_notes_from_docs(cached_notes.documents(RECENT_NOTES_WINDOW_MINUTES))
+
+    if not content:
+        logging.info("No content available from recent documents to generate a quiz. Using all documents in the collection to generate the quiz ...")
+        if not cached_notes.covers(None):
+            cached_notes = await load_notes(db, user_id)
+        content = get_notes_from_docs(cached_notes.documents())
+        if not content:
+            logging.error(f"No documents in {NOTE_COLLECTION} collection.")
+            raise ValueError("Upload a file to get started. There is no documents available in our database to generate a quiz.")
+
+    return content
+
+
+async def similarity_search_in_notes(db: AsyncClient, user_id: str, embeddings: Vector, limit: Optional[int] = 5) -> List[str]:
+    """
+    Performs a similarity search in the user's notes collection using the provided embeddings.
+
+    Args:
+        db (AsyncClient): The async Firestore client.
+        user_id (str): The ID of the user.
+        embeddings (Vector): The query embeddings.
+        limit (Optional[int]): The maximum number of similar texts to retrieve. Defaults to 5.
+
+    Returns:
+        List[str]: A list of similar texts.
+    """
+    embedding_ref = db.collection(USER_COLLECTION).document(user_id).collection(NOTE_COLLECTION)
+    retrieved_documents = await embedding_ref.find_nearest(
+        vector_field="embedding",
+        query_vector=Vector(embeddings),
+        distance_measure=DistanceMeasure.EUCLIDEAN,
+        limit=limit
+    ).get()
+
+    logging.info(f"Retrieved {len(retrieved_documents)} from the {NOTE_COLLECTION} collection")
+
+    return [doc.to_dict()['summarised_notes'] for doc in retrieved_documents]
+
+
+async def add_to_quizzes(db: AsyncClient,
+                         user_id: str,
+                         quiz_qn_and_ans_list: List[Union[MultipleChoiceQuestion, MultiSelectQuestion, TrueFalseQuestion, FreeResponseQuestion]]) -> List[str]:
+    """
+    Adds quiz questions and answers to the Firestore database concurrently and assigns each question its document ID.
+
+    Question embeddings are computed in a worker thread, and the cached question index is updated once
+    every question is written.
+
+    Args:
+        db (AsyncClient): The async Firestore client.
+        user_id (str): The ID of the user.
+        quiz_qn_and_ans_list (List[Union[MultipleChoiceQuestion, MultiSelectQuestion, TrueFalseQuestion, FreeResponseQuestion]]): The validated quiz questions and answers.
+            Questions that already carry an 'id' are stored already and are not written again.
+
+    Returns:
+        List[str]: The IDs of the quiz questions, in order.
+    """
+    quiz_collection_ref = db.collection(USER_COLLECTION).document(user_id).collection(QUIZ_COLLECTION)
+    question_index = get_cached_question_index(user_id)
+
+    writes = []
+    new_questions = []
+    for qna in quiz_qn_and_ans_list:
+        if qna.id:
+            continue
+        quiz_data = qna.model_dump(mode="json", exclude={"id"})
+        question_embedding = await asyncio.to_thread(question_index.embedding_for, qna.question) if question_index is not None else None
+        if question_embedding is not None:
+            quiz_data["question_embedding"] = question_embedding
+        quiz_data["timestamp"] = firestore.SERVER_TIMESTAMP
+
+        quiz_ref = quiz_collection_ref.document()
+        writes.append(quiz_ref.set(quiz_data))
+        new_questions.append((qna, quiz_ref.id, quiz_data, question_embedding))
+
+    await gather_with_concurrency(writes)
+    logging.info(f"Added {len(writes)} quiz documents")
+
+    def add_new_questions(index: QuestionIndex) -> None:
+        for _, quiz_id, quiz_data, question_embedding in new_questions:
+            index.add(quiz_id, quiz_data, embedding=question_embedding)
+
+    for qna, quiz_id, _, _ in new_questions:
+        qna.id = quiz_id
+    if new_questions:
+        update_cached_question_index(user_id, add_new_questions)
+
+    return [qna.id for qna in quiz_qn_and_ans_list]
+
+
+async def delete_all_docs_in_collection(db: AsyncClient, coll_name: str, batch_size: int, user_id: Optional[str] = None, recursive: Optional[bool] = False) -> int:
+    """
+    Deletes all documents in a specified collection with parallel bulk writes, like the sync version.
+
+    Document references, and the subcollections of each page when deleting recursively, are listed
+    concurrently. The deletes are sent through a BulkWriter with retries, which is flushed in a worker
+    thread because it blocks. Also deletes the performance aggregates summarising deleted quizzes and
+    drops the affected cached question indexes and notes.
+
+    Args:
+        db (AsyncClient): The async Firestore client.
+        coll_name (str): The name of the collection.
+        batch_size (int): The number of document references to list per page.
+        user_id (Optional[str]): The ID of the user (required for non-user collections). For the users collection,
+            only the user's document is deleted; every user is deleted if no user is given.
+        recursive (Optional[bool]): Whether to also delete the subcollections of each document. Defaults to False.
+
+    Returns:
+        int: The number of deleted documents.
+
+    Raises:
+        ValueError: If user_id is not provided for non-user collections.
+    """
+    user_ref = None
+    if coll_name == USER_COLLECTION and user_id:
+        user_ref = db.collection(USER_COLLECTION).document(user_id)
+    elif coll_name == USER_COLLECTION:
+        coll_ref = db.collection(coll_name)
+    elif user_id:
+        coll_ref = db.collection(USER_COLLECTION).document(user_id).collection(coll_name)
+    else:
+        raise ValueError(f"Provide user_id to delete collections under 'users' collection.")
+
+    if batch_size == 0:
+        return 0
+
+    bulk_writer, failed = open_bulk_delete_writer(db)
+    deleted = 0
+    if user_ref is not None:
+        collections = [collection async for collection in user_ref.collections()] if recursive else []
+    else:
+        collections = [coll_ref]
+    while collections:
+        collection = collections.pop()
+        page = []
+        async for doc_ref in collection.list_documents(page_size=batch_size):
+            page.append(doc_ref)
+            if len(page) >= batch_size:
+                deleted += await _delete_page(bulk_writer, page, collections if recursive else None)
+                page = []
+        if page:
+            deleted += await _delete_page(bulk_writer, page, collections if recursive else None)
+        logging.info(f"Deleted {deleted} documents so far, currently from {collection.id}")
+    if user_ref is not None:
+        deleted += await _delete_page(bulk_writer, [user_ref], None)
+
+    await asyncio.to_thread(bulk_writer.close)
+    deleted -= len(failed)
+    logging.info(f"Deleted {deleted} documents from {coll_name} with {len(failed)} failures")
+
+    if coll_name == QUIZ_COLLECTION or (coll_name == USER_COLLECTION and not recursive):
+        await _delete_performance_aggregates(db, user_id)
+    evict_question_index(user_id)
+    if coll_name in (USER_COLLECTION, NOTE_COLLECTION):
+        invalidate_cached_notes(user_id)
+
+    return deleted
+
+
+async def _delete_page(bulk_writer: BulkWriter, page: List[Any], subcollections: Optional[List[Any]]) -> int:
+    """
+    Queues deletes for a page of documents and waits for them, collecting each document's subcollections when deleting recursively.
+    """
+    if subcollections is not None:
+        async def list_collections(doc_ref: Any) -> List[Any]:
+            return [collection async for collection in doc_ref.collections()]
+
+        for collections in await gather_with_concurrency(list_collections(doc_ref) for doc_ref in page):
+            subcollections.extend(collections)
+    for doc_ref in page:
+        bulk_writer.delete(doc_ref)
+    await asyncio.to_thread(bulk_writer.flush)
+    return len(page)
+
+
+async def _delete_performance_aggregates(db: AsyncClient, user_id: Optional[str] = None) -> None:
+    if user_id is not None:
+        await get_performance_aggregate_ref(db, user_id).delete()
+        return
+
+    aggregate_refs = [snapshot.reference async for snapshot in db.collection_group(PERFORMANCE_COLLECTION).select([]).stream()
+                      if snapshot.id == PERFORMANCE_SUMMARY_DOCUMENT]
+    await gather_with_concurrency(aggregate_ref.delete() for aggregate_ref in aggregate_refs)
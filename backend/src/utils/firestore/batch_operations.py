@@ -0,0 +1,127 @@
+import contextvars
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from google.cloud.firestore_v1.client import Client
+from google.cloud.firestore_v1.document import DocumentReference
+
+from backend.src.utils.constants import FIRESTORE_BATCH_CONCURRENCY, FIRESTORE_MAX_BATCH_WRITES
+from backend.src.utils.metrics import get_counter
+
+batch_writes_counter = get_counter("firestore_batch_writes_total", "Documents written in Firestore write batches by outcome", ("outcome",))
+
+SET = "set"
+UPDATE = "update"
+DELETE = "delete"
+
+
+class BatchResult:
+    """
+    The outcome of committing one write batch.
+    """
+
+    def __init__(self, index: int, size: int, latency: float, write_results: Optional[List[Any]] = None, error: Optional[Exception] = None):
+        self.index = index
+        self.size = size
+        self.latency = latency
+        self.write_results = write_results or []
+        self.error = error
+
+
+class BatchWriteReport:
+    """
+    The outcome of committing a sequence of writes in batches.
+    """
+
+    def __init__(self, batches: List[BatchResult]):
+        self.batches = batches
+
+    @property
+    def written(self) -> int:
+        return sum(batch.size for batch in self.batches if batch.error is None)
+
+    @property
+    def failed(self) -> int:
+        return sum(batch.size for batch in self.batches if batch.error is not None)
+
+    @property
+    def errors(self) -> List[Exception]:
+        return [batch.error for batch in self.batches if batch.error is not None]
+
+    def update_times(self) -> List[Any]:
+        """
+        Returns the update time of each write, in the order the writes were given, or None for writes in failed batches.
+        """
+        update_times = []
+        for batch in self.batches:
+            if batch.error is None:
+                update_times.extend(write_result.update_time for write_result in batch.write_results)
+            else:
+                update_times.extend([None] * batch.size)
+        return update_times
+
+
+def commit_in_batches(db: Client,
+                      writes: Sequence[Tuple[str, DocumentReference, Optional[Dict[str, Any]]]],
+                      batch_size: Optional[int] = FIRESTORE_MAX_BATCH_WRITES,
+                      raise_on_failure: Optional[bool] = True) -> BatchWriteReport:
+    """
+    Commits writes in atomic batches of up to batch_size, with up to FIRESTORE_BATCH_CONCURRENCY batches committed in parallel.
+
+    Each batch succeeds or fails as a whole. Batches are independent, so when one fails the others
+    may still have been committed.
+
+    Args:
+        db (Client): The Firestore client.
+        writes (Sequence[Tuple[str, DocumentReference, Optional[Dict[str, Any]]]]): The writes as (operation, document reference, data),
+            where operation is SET, UPDATE or DELETE and data is None for deletes.
+        batch_size (Optional[int]): The maximum number of writes per batch. Firestore allows at most 500.
+        raise_on_failure (Optional[bool]): Whether to raise the first batch error after all batches are done. Defaults to True.
+
+    Returns:
+        BatchWriteReport: The per-batch latency, write results and errors.
+
+    Raises:
+        Exception: The first batch error, if raise_on_failure is set.
+    """
+    chunks = [writes[i:i + batch_size] for i in range(0, len(writes), batch_size)]
+    if not chunks:
+        return BatchWriteReport([])
+
+    def commit(index: int, chunk: Sequence[Tuple[str, DocumentReference, Optional[Dict[str, Any]]]]) -> BatchResult:
+        batch = db.batch()
+        for operation, doc_ref, data in chunk:
+            if operation == DELETE:
+                batch.delete(doc_ref)
+            else:
+                getattr(batch, operation)(doc_ref, data)
+
+        start = time.perf_counter()
+        try:
+            write_results = batch.commit()
+        except Exception as e:
+            latency = time.perf_counter() - start
+            logging.error(f"Write batch {index} of {len(chunk)} writes failed after {latency:.3f}s: {e}")
+            batch_writes_counter.inc(len(chunk), outcome="failed")
+            return BatchResult(index, len(chunk), latency, error=e)
+
+        latency = time.perf_counter() - start
+        logging.info(f"Committed write batch {index} of {len(chunk)} writes in {latency:.3f}s")
+        batch_writes_counter.inc(len(chunk), outcome="written")
+        return BatchResult(index, len(chunk), latency, write_results=write_results)
+
+    if len(chunks) == 1:
+        results = [commit(0, chunks[0])]
+    else:
+        # Each batch runs in a copy of the caller's context, so its operations are accounted to the caller's request.
+        contexts = [contextvars.copy_context() for _ in chunks]
+        with ThreadPoolExecutor(max_workers=min(FIRESTORE_BATCH_CONCURRENCY, len(chunks))) as executor:
+            results = list(executor.map(lambda context, index, chunk: context.run(commit, index, chunk), contexts, range(len(chunks)), chunks))
+
+    report = BatchWriteReport(results)
+    if raise_on_failure and report.errors:
+        raise report.errors[0]
+
+    return report
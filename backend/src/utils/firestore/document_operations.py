@@ -1,65 +1,96 @@
-from typing import Any, Dict, List, Optional
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
 import logging
 from datetime import datetime, timedelta
 
 from firebase_admin import firestore
+from google.cloud.firestore_v1.base_client import BaseClient
 from google.cloud.firestore_v1.client import Client
 from google.cloud.firestore_v1.base_query import FieldFilter
+from google.cloud.firestore_v1.bulk_writer import BulkWriteFailure, BulkWriter, BulkWriterOptions, SendMode
 from google.cloud.firestore_v1.collection import CollectionReference
+from google.cloud.firestore_v1.document import DocumentReference
+from google.cloud.firestore_v1.query import Query
 
-from backend.src.utils.constants import USER_COLLECTION
+from backend.src.utils.constants import BULK_DELETE_INITIAL_OPS_PER_SECOND, BULK_DELETE_MAX_ATTEMPTS, BULK_DELETE_MAX_OPS_PER_SECOND, READ_PAGE_SIZE, USER_COLLECTION
+from backend.src.utils.firestore.batch_operations import UPDATE, commit_in_batches
 
 
-def collate_document_data(query: CollectionReference) -> List[Dict[str, Any]]:
+def collate_document_data(query: Query,
+                          fields: Optional[Sequence[str]] = None,
+                          page_size: Optional[int] = READ_PAGE_SIZE) -> Iterator[Dict[str, Any]]:
     """
-    Collects and formats document data from a Firestore collection reference.
+    Yields the data of the documents matched by a Firestore query, one page at a time.
+
+    Each page is a separate query resumed with a cursor after the last document of the previous
+    page, so only one page of documents is held in memory and no single stream stays open for
+    the whole collection.
 
     Args:
-        query (CollectionReference): The Firestore collection reference object.
+        query (Query): The Firestore query or collection reference.
+        fields (Optional[Sequence[str]]): The fields to read. Reads all fields if not provided.
+            Must include any field the query filters on with an inequality, since the cursor is built from it.
+        page_size (Optional[int]): The number of documents to read per page.
 
-    Returns:
-        List[Dict[str, Any]]: A list of documents with their data.
+    Yields:
+        Dict[str, Any]: The data of each document, with its 'id'.
     """
-    docs = query.stream()
-    documents = []
-    for doc in docs:
-        doc_data = doc.to_dict()
-        doc_data['id'] = doc.id
-        documents.append(doc_data)
+    if fields is not None:
+        query = query.select(list(fields))
 
-    return documents
+    last_doc = None
+    while True:
+        page_query = query.limit(page_size)
+        if last_doc is not None:
+            page_query = page_query.start_after(last_doc)
 
+        num_docs = 0
+        for doc in page_query.stream():
+            num_docs += 1
+            last_doc = doc
+            doc_data = doc.to_dict()
+            doc_data['id'] = doc.id
+            yield doc_data
 
-def get_all_docs(db: Client, user_id: str, coll_name: str) -> List[Dict[str, Any]]:
+        if num_docs < page_size:
+            return
+
+
+def get_all_docs(db: Client, user_id: str, coll_name: str, fields: Optional[Sequence[str]] = None) -> Iterator[Dict[str, Any]]:
     """
-    Retrieves all documents from a specified collection.
+    Lazily retrieves all documents from a specified collection.
 
     Args:
         db (Client): The Firestore client.
         user_id (str): The ID of the user.
         coll_name (str): The name of the collection.
+        fields (Optional[Sequence[str]]): The fields to read. Reads all fields if not provided.
 
     Returns:
-        List[Dict[str, Any]]: A list of all documents in the collection.
+        Iterator[Dict[str, Any]]: The documents in the collection.
     """
     query = db.collection(USER_COLLECTION).document(user_id).collection(coll_name)
-    documents = collate_document_data(query)
+    documents = collate_document_data(query, fields)
 
     return documents
 
 
-def get_recent_documents(db: Client, user_id: str, coll_name: str, minutes: Optional[int]=15) -> List[Dict[str, Any]]:
+def get_recent_documents(db: Client,
+                         user_id: str,
+                         coll_name: str,
+                         minutes: Optional[int]=15,
+                         fields: Optional[Sequence[str]] = None) -> Iterator[Dict[str, Any]]:
     """
-    Retrieves recent documents from a specified collection within a given time frame.
+    Lazily retrieves recent documents from a specified collection within a given time frame.
 
     Args:
         db (Client): The Firestore client.
         user_id (str): The ID of the user.
         coll_name (str): The name of the collection.
         minutes (Optional[int]): The time frame in minutes. Defaults to 15.
+        fields (Optional[Sequence[str]]): The fields to read. Reads all fields if not provided.
 
     Returns:
-        List[Dict[str, Any]]: A list of recent documents.
+        Iterator[Dict[str, Any]]: The recent documents.
     """
     now = datetime.utcnow()
     time_threshold = now - timedelta(minutes=minutes)
@@ -67,58 +98,143 @@ def get_recent_documents(db: Client, user_id: str, coll_name: str, minutes: Opti
     logging.info(f"Time Threshold Time (UTC): {time_threshold}")
 
     query = db.collection(USER_COLLECTION).document(user_id).collection(coll_name).where(filter=FieldFilter('timestamp', '>=', time_threshold))
-    documents = collate_document_data(query)
+    if fields is not None and 'timestamp' not in fields:
+        fields = [*fields, 'timestamp']
+    documents = collate_document_data(query, fields)
 
     return documents
 
 
-def update_doc_with_timestamp(db: Client, user_id: str, coll_name: str) -> None:
+def update_doc_with_timestamp(db: Client, user_id: str, coll_name: str) -> int:
     """
     Updates all documents in the user's notes collection with the current server timestamp.
 
+    Document references are listed without reading the documents, and the updates are committed in parallel batches.
+
     Args:
         db (Client): The Firestore client.
         user_id (str): The ID of the user.
         coll_name (str): The name of the collection.
+
+    Returns:
+        int: The number of updated documents.
     """
     note_ref = db.collection(USER_COLLECTION).document(user_id).collection(coll_name)
-    docs = note_ref.get()
-    for doc in docs:
-        doc_ref = note_ref.document(doc.id)
-        doc_ref.update({"timestamp": firestore.SERVER_TIMESTAMP})
-        logging.info(f'Updated document id {doc.id} with timestamp')
+    writes = [(UPDATE, doc_ref, {"timestamp": firestore.SERVER_TIMESTAMP}) for doc_ref in note_ref.list_documents()]
+    report = commit_in_batches(db, writes)
+    logging.info(f'Updated {report.written} documents in {coll_name} with timestamp')
+
+    return report.written
 
 
-def delete_all_docs_in_collection(db: Client, coll_name: str, batch_size: int, user_id: Optional[str] = None) -> None:
+def delete_all_docs_in_collection(db: Client,
+                                  coll_name: str,
+                                  batch_size: int,
+                                  user_id: Optional[str] = None,
+                                  recursive: Optional[bool] = False,
+                                  progress_callback: Optional[Callable[[int], None]] = None) -> int:
     """
-    Recursively deletes documents in a specified collection up to the batch size limit.
+    Deletes all documents in a specified collection with parallel bulk writes.
+
+    Document references are listed a page of batch_size at a time without reading the documents, and
+    the deletes are sent through a BulkWriter, which batches them and sends the batches in parallel,
+    ramping up to at most BULK_DELETE_MAX_OPS_PER_SECOND.
 
     Args:
         db (Client): The Firestore client.
         coll_name (str): The name of the collection.
-        batch_size (int): The maximum number of documents to delete in a batch.
-        user_id (Optional[str]): The ID of the user (required for non-user collections).
+        batch_size (int): The number of document references to list per page.
+        user_id (Optional[str]): The ID of the user (required for non-user collections). For the users collection,
+            only the user's document is deleted; every user is deleted if no user is given.
+        recursive (Optional[bool]): Whether to also delete the subcollections of each document. Defaults to False.
+        progress_callback (Optional[Callable[[int], None]]): Called with the running number of deleted documents after each page.
+
+    Returns:
+        int: The number of deleted documents.
 
     Raises:
         ValueError: If user_id is not provided for non-user collections.
     """
-    if coll_name == USER_COLLECTION:
+    user_ref = None
+    if coll_name == USER_COLLECTION and user_id:
+        user_ref = db.collection(USER_COLLECTION).document(user_id)
+    elif coll_name == USER_COLLECTION:
         coll_ref = db.collection(coll_name)
-    elif user_id and coll_name != USER_COLLECTION:
+    elif user_id:
         coll_ref = db.collection(USER_COLLECTION).document(user_id).collection(coll_name)
     else:
         raise ValueError(f"Provide user_id to delete collections under 'users' collection.")
 
     if batch_size == 0:
-        return
+        return 0
+
+    bulk_writer, failed = open_bulk_delete_writer(db)
 
-    docs = coll_ref.list_documents(page_size=batch_size)
     deleted = 0
+    if user_ref is not None:
+        collections = list(user_ref.collections()) if recursive else []
+    else:
+        collections = [coll_ref]
+    while collections:
+        collection = collections.pop()
+        page = []
+        for doc_ref in collection.list_documents(page_size=batch_size):
+            page.append(doc_ref)
+            if len(page) >= batch_size:
+                deleted += _delete_page(bulk_writer, page, collections if recursive else None)
+                _report_progress(collection, deleted, progress_callback)
+                page = []
+        if page:
+            deleted += _delete_page(bulk_writer, page, collections if recursive else None)
+            _report_progress(collection, deleted, progress_callback)
+    if user_ref is not None:
+        deleted += _delete_page(bulk_writer, [user_ref], None)
+
+    bulk_writer.close()
+    deleted -= len(failed)
+    logging.info(f"Deleted {deleted} documents from {coll_name} with {len(failed)} failures")
+
+    return deleted
+
+
+def open_bulk_delete_writer(db: BaseClient) -> Tuple[BulkWriter, List[str]]:
+    """
+    Returns a BulkWriter for bulk deletes, which retries each failed delete up to BULK_DELETE_MAX_ATTEMPTS times.
+
+    Args:
+        db (BaseClient): The Firestore client. An async client's BulkWriter sends its writes with a sync copy of the client.
+
+    Returns:
+        Tuple[BulkWriter, List[str]]: The BulkWriter, and the list that the paths of documents that could not be deleted are added to.
+    """
+    failed = []
+
+    def on_write_error(error: BulkWriteFailure, bulk_writer: BulkWriter) -> bool:
+        if error.attempts < BULK_DELETE_MAX_ATTEMPTS:
+            return True
+        failed.append(error.operation.reference.path)
+        logging.error(f"Failed to delete {error.operation.reference.path}: {error.message}")
+        return False
 
-    for doc in docs:
-        logging.info(f"Deleting doc {doc.id} => {doc.get().to_dict()}")
-        doc.delete()
-        deleted = deleted + 1
+    options = BulkWriterOptions(initial_ops_per_second=BULK_DELETE_INITIAL_OPS_PER_SECOND, max_ops_per_second=BULK_DELETE_MAX_OPS_PER_SECOND, mode=SendMode.parallel)
+    bulk_writer = db.bulk_writer(options=options)
+    bulk_writer.on_write_error(on_write_error)
+    return bulk_writer, failed
 
-    if deleted >= batch_size:
-        return delete_all_docs_in_collection(db, coll_name, batch_size, user_id)
\ No newline at end of file
+
+def _delete_page(bulk_writer: BulkWriter, page: List[DocumentReference], subcollections: Optional[List[CollectionReference]]) -> int:
+    """
+    Queues deletes for a page of documents and waits for them, collecting each document's subcollections when deleting recursively.
+    """
+    for doc_ref in page:
+        if subcollections is not None:
+            subcollections.extend(doc_ref.collections())
+        bulk_writer.delete(doc_ref)
+    bulk_writer.flush()
+    return len(page)
+
+
+def _report_progress(collection: CollectionReference, deleted: int, progress_callback: Optional[Callable[[int], None]]) -> None:
+    logging.info(f"Deleted {deleted} documents so far, currently from {collection.id}")
+    if progress_callback:
+        progress_callback(deleted)
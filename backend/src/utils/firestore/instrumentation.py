@@ -0,0 +1,284 @@
+import contextvars
+import logging
+from importlib.metadata import PackageNotFoundError, version
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator, Optional
+
+from google.cloud.firestore_v1.client import Client
+
+from backend.src.utils.constants import FIRESTORE_REQUEST_READ_BUDGET, FIRESTORE_REQUEST_WRITE_BUDGET
+from backend.src.utils.metrics import get_counter
+
+BACKGROUND_ROUTE = "background"
+OPERATIONS = ("reads", "writes", "deletes", "vector_queries")
+# The client is instrumented through its private GAPIC API attribute, so only the google-cloud-firestore
+# releases it was checked against (pinned in requirements.txt) are instrumented.
+INSTRUMENTED_FIRESTORE_VERSIONS = ("2.17.",)
+
+operations_counter = get_counter("firestore_operations_total", "Firestore documents read, written and deleted and vector queries run, by route", ("route", "operation"))
+bytes_counter = get_counter("firestore_bytes_total", "Approximate Firestore request and response payload bytes by route", ("route", "direction"))
+latency_counter = get_counter("firestore_latency_seconds_total", "Time spent waiting on Firestore RPCs by route", ("route",))
+requests_counter = get_counter("firestore_requests_total", "Requests whose Firestore usage was accounted, by route", ("route",))
+over_budget_counter = get_counter("firestore_requests_over_budget_total", "Requests that exceeded the per-request Firestore budget, by route", ("route",))
+
+
+class FirestoreUsage:
+    """
+    The Firestore operations made on behalf of one request.
+    """
+
+    def __init__(self, background: Optional[bool] = False):
+        self.background = background
+        self.reads = 0
+        self.writes = 0
+        self.deletes = 0
+        self.vector_queries = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.latency = 0.0
+        self.lock = threading.Lock()
+
+    def add(self, latency: Optional[float] = 0.0, bytes_sent: Optional[int] = 0, bytes_received: Optional[int] = 0, **operations: int) -> None:
+        """
+        Adds operations to the usage.
+
+        Args:
+            latency (Optional[float]): Seconds spent waiting on Firestore.
+            bytes_sent (Optional[int]): Approximate request payload bytes.
+            bytes_received (Optional[int]): Approximate response payload bytes.
+            **operations (int): Counts of 'reads', 'writes', 'deletes' and 'vector_queries'.
+        """
+        with self.lock:
+            self.latency += latency
+            self.bytes_sent += bytes_sent
+            self.bytes_received += bytes_received
+            for operation, count in operations.items():
+                setattr(self, operation, getattr(self, operation) + count)
+
+        if self.background:
+            _record(BACKGROUND_ROUTE, latency=latency, bytes_sent=bytes_sent, bytes_received=bytes_received, **operations)
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                "reads": self.reads,
+                "writes": self.writes,
+                "deletes": self.deletes,
+                "vector_queries": self.vector_queries,
+                "bytes_sent": self.bytes_sent,
+                "bytes_received": self.bytes_received,
+                "latency": round(self.latency, 6),
+            }
+
+
+_current_usage: contextvars.ContextVar[Optional[FirestoreUsage]] = contextvars.ContextVar("firestore_usage", default=None)
+
+
+def start_request_usage() -> contextvars.Token:
+    """
+    Starts accounting Firestore operations to a new request in the current context.
+
+    Returns:
+        contextvars.Token: The token to pass to `stop_request_usage`.
+    """
+    return _current_usage.set(FirestoreUsage())
+
+
+def get_request_usage() -> Optional[FirestoreUsage]:
+    """
+    Returns the Firestore usage of the current request, if one is being accounted.
+    """
+    return _current_usage.get()
+
+
+def stop_request_usage(token: contextvars.Token) -> FirestoreUsage:
+    """
+    Stops accounting Firestore operations to the current request in the current context.
+
+    Call it in the context `start_request_usage` was called in. Operations made while the response
+    body streams, in another context, are still added to the returned usage.
+
+    Args:
+        token (contextvars.Token): The token from `start_request_usage`.
+
+    Returns:
+        FirestoreUsage: The request's usage, to pass to `record_request_usage` once the response is sent.
+    """
+    usage = _current_usage.get()
+    _current_usage.reset(token)
+    return usage
+
+
+def record_request_usage(usage: FirestoreUsage, route: str) -> None:
+    """
+    Adds a request's usage to the route's totals and logs a warning if it exceeded the budget.
+
+    Args:
+        usage (FirestoreUsage): The usage from `stop_request_usage`.
+        route (str): The route of the request.
+    """
+    usage_dict = usage.to_dict()
+
+    _record(route, latency=usage_dict["latency"], bytes_sent=usage_dict["bytes_sent"], bytes_received=usage_dict["bytes_received"],
+            **{operation: usage_dict[operation] for operation in OPERATIONS})
+    requests_counter.inc(route=route)
+
+    if usage_dict["reads"] > FIRESTORE_REQUEST_READ_BUDGET or usage_dict["writes"] + usage_dict["deletes"] > FIRESTORE_REQUEST_WRITE_BUDGET:
+        over_budget_counter.inc(route=route)
+        logging.warning(f"Request to {route} exceeded the Firestore budget "
+                        f"({FIRESTORE_REQUEST_READ_BUDGET} reads, {FIRESTORE_REQUEST_WRITE_BUDGET} writes): {usage_dict}")
+
+
+def _record(route: str, latency: float, bytes_sent: int, bytes_received: int, **operations: int) -> None:
+    for operation, count in operations.items():
+        if count:
+            operations_counter.inc(count, route=route, operation=operation)
+    bytes_counter.inc(bytes_sent, route=route, direction="sent")
+    bytes_counter.inc(bytes_received, route=route, direction="received")
+    latency_counter.inc(latency, route=route)
+
+
+def _usage() -> FirestoreUsage:
+    return _current_usage.get() or FirestoreUsage(background=True)
+
+
+def _message_size(message: Any) -> int:
+    try:
+        return type(message).pb(message).ByteSize()
+    except Exception:
+        return 0
+
+
+def _request_field(request: Any, field: str) -> Any:
+    if isinstance(request, dict):
+        return request.get(field)
+    return getattr(request, field, None)
+
+
+class _CountingIterator:
+    """
+    Wraps a streaming Firestore response, accounting each response as it is consumed.
+    """
+
+    def __init__(self, iterator: Any, usage: FirestoreUsage, count_response: Callable[[Any], Dict[str, int]]):
+        self.iterator = iterator
+        self.usage = usage
+        self.count_response = count_response
+
+    def __iter__(self) -> Iterator[Any]:
+        return self
+
+    def __next__(self) -> Any:
+        start = time.perf_counter()
+        try:
+            response = next(self.iterator)
+        except StopIteration:
+            self.usage.add(latency=time.perf_counter() - start)
+            raise
+        self.usage.add(latency=time.perf_counter() - start, bytes_received=_message_size(response), **self.count_response(response))
+        return response
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.iterator, name)
+
+
+class InstrumentedFirestoreAPI:
+    """
+    Wraps the GAPIC Firestore API of a client, accounting the operations of every RPC to the current request.
+    """
+
+    def __init__(self, api: Any):
+        self._api = api
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._api, name)
+
+    def run_query(self, request: Any = None, **kwargs: Any) -> _CountingIterator:
+        usage = _usage()
+        structured_query = _request_field(request, "structured_query")
+        is_vector_query = structured_query is not None and "find_nearest" in structured_query
+        start = time.perf_counter()
+        iterator = self._api.run_query(request=request, **kwargs)
+        # Firestore bills at least one read per query, even when it matches no documents, so the
+        # first read is accounted up front and the first document returned is not counted again.
+        usage.add(latency=time.perf_counter() - start, bytes_sent=_message_size(structured_query), reads=1, vector_queries=int(is_vector_query))
+        documents = 0
+
+        def count_response(response: Any) -> Dict[str, int]:
+            nonlocal documents
+            if "document" not in response:
+                return {}
+            documents += 1
+            return {"reads": 1} if documents > 1 else {}
+
+        return _CountingIterator(iterator, usage, count_response)
+
+    def batch_get_documents(self, request: Any = None, **kwargs: Any) -> _CountingIterator:
+        usage = _usage()
+        start = time.perf_counter()
+        iterator = self._api.batch_get_documents(request=request, **kwargs)
+        usage.add(latency=time.perf_counter() - start)
+        return _CountingIterator(iterator, usage, lambda response: {"reads": 1})
+
+    def run_aggregation_query(self, request: Any = None, **kwargs: Any) -> _CountingIterator:
+        usage = _usage()
+        start = time.perf_counter()
+        iterator = self._api.run_aggregation_query(request=request, **kwargs)
+        usage.add(latency=time.perf_counter() - start, reads=1)
+        return _CountingIterator(iterator, usage, lambda response: {})
+
+    def list_documents(self, request: Any = None, **kwargs: Any) -> _CountingIterator:
+        usage = _usage()
+        start = time.perf_counter()
+        pager = self._api.list_documents(request=request, **kwargs)
+        usage.add(latency=time.perf_counter() - start)
+        return _CountingIterator(iter(pager), usage, lambda document: {"reads": 1})
+
+    def commit(self, request: Any = None, **kwargs: Any) -> Any:
+        return self._write("commit", request, **kwargs)
+
+    def batch_write(self, request: Any = None, **kwargs: Any) -> Any:
+        return self._write("batch_write", request, **kwargs)
+
+    def _write(self, method: str, request: Any, **kwargs: Any) -> Any:
+        usage = _usage()
+        writes = _request_field(request, "writes") or []
+        deletes = sum(1 for write in writes if _request_field(write, "delete"))
+        start = time.perf_counter()
+        response = getattr(self._api, method)(request=request, **kwargs)
+        usage.add(latency=time.perf_counter() - start,
+                  bytes_sent=sum(_message_size(write) for write in writes),
+                  bytes_received=_message_size(response),
+                  writes=len(writes) - deletes,
+                  deletes=deletes)
+        return response
+
+
+def instrument_firestore_client(db: Client) -> Client:
+    """
+    Accounts every Firestore operation of a client to the current request.
+
+    The client's GAPIC API object is wrapped, so document references, queries, vector queries,
+    batches, transactions and bulk writers of the client are all covered. Operations made on other
+    threads than the request's (e.g. BulkWriter's sender threads) are accounted under 'background'.
+
+    Args:
+        db (Client): The Firestore client.
+
+    Returns:
+        Client: The same client, instrumented unless google-cloud-firestore is not one of INSTRUMENTED_FIRESTORE_VERSIONS.
+    """
+    try:
+        firestore_version = version("google-cloud-firestore")
+    except PackageNotFoundError:
+        firestore_version = "unknown"
+    if not firestore_version.startswith(INSTRUMENTED_FIRESTORE_VERSIONS) or not hasattr(db, "_firestore_api_internal"):
+        logging.warning(f"Firestore usage is not accounted with google-cloud-firestore {firestore_version}, "
+                        f"only with {', '.join(INSTRUMENTED_FIRESTORE_VERSIONS)}x")
+        return db
+
+    api = db._firestore_api
+    if not isinstance(api, InstrumentedFirestoreAPI):
+        db._firestore_api_internal = InstrumentedFirestoreAPI(api)
+    return db
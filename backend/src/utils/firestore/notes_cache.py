@@ -0,0 +1,309 @@
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from google.cloud.firestore_v1.base_query import FieldFilter
+from google.cloud.firestore_v1.client import Client
+from google.cloud.firestore_v1.watch import ChangeType
+
+from backend.src.utils.cache.generations import Generation, bump_generation, get_generation
+from backend.src.utils.constants import (
+    NOTE_COLLECTION,
+    NOTES_CACHE_LISTENER_TIMEOUT_SECONDS,
+    NOTES_CACHE_MAX_BYTES,
+    NOTES_CACHE_TTL_SECONDS,
+    USER_COLLECTION,
+)
+from backend.src.utils.metrics import get_counter
+
+notes_cache_counter = get_counter("notes_cache_requests_total", "Notes cache lookups by outcome", ("outcome",))
+
+NOTES_CACHE = "notes"
+
+
+class CachedNotes:
+    """
+    The note chunks of one user, keyed by document ID, stored since a given time or all of them.
+
+    Chunks read once are stamped with the generation read before reading them, so that chunks which
+    missed a write made by another server worker are read again. Watched chunks are kept current by
+    their listener instead, for as long as it runs.
+    """
+
+    def __init__(self, user_id: str, generation: Optional[Generation] = None, since: Optional[datetime] = None):
+        self.user_id = user_id
+        self.generation = generation
+        self.since = since
+        self.chunks: Dict[str, Tuple[str, Optional[datetime]]] = {}
+        self.size = 0
+        self.filled_at = time.monotonic()
+        self.ready = threading.Event()
+        self.watch = None
+
+    def put(self, doc_id: str, notes: str, timestamp: Optional[datetime]) -> None:
+        self.remove(doc_id)
+        self.chunks[doc_id] = (notes, timestamp)
+        self.size += len(notes)
+
+    def remove(self, doc_id: str) -> None:
+        previous = self.chunks.pop(doc_id, None)
+        if previous is not None:
+            self.size -= len(previous[0])
+
+    def is_fresh(self, generation: Generation) -> bool:
+        """
+        Returns whether the chunks can be served. Watched chunks stay fresh while their listener runs; the
+        others expire after NOTES_CACHE_TTL_SECONDS or when another server worker writes the user's notes.
+
+        Args:
+            generation (Generation): The current generation of the user's notes.
+        """
+        if self.watch is not None:
+            return self.watch.is_active
+        return self.generation == generation and time.monotonic() - self.filled_at < NOTES_CACHE_TTL_SECONDS
+
+    def covers(self, since: Optional[datetime]) -> bool:
+        """
+        Returns whether the chunks include every chunk stored since the given time, or every chunk if no time is given.
+        """
+        return self.since is None or (since is not None and self.since <= since)
+
+    def documents(self, minutes: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Returns the chunks as note documents in document ID order, like a Firestore query.
+
+        Args:
+            minutes (Optional[int]): Only return chunks stored within this many minutes. Returns all chunks if not provided.
+
+        Returns:
+            List[Dict[str, Any]]: The documents with their 'id', 'summarised_notes' and 'timestamp'.
+        """
+        time_threshold = datetime.now(timezone.utc) - timedelta(minutes=minutes) if minutes is not None else None
+        return [
+            {"id": doc_id, "summarised_notes": notes, "timestamp": timestamp}
+            for doc_id, (notes, timestamp) in sorted(self.chunks.items())
+            if time_threshold is None or (timestamp is not None and timestamp >= time_threshold)
+        ]
+
+
+_cached_notes: "OrderedDict[str, CachedNotes]" = OrderedDict()
+_cached_notes_size = 0
+_cached_notes_lock = threading.RLock()
+
+
+def notes_cache_uses_listeners() -> bool:
+    """
+    Returns whether cached notes are kept current with Firestore snapshot listeners.
+    """
+    return os.getenv("NOTES_CACHE_USE_LISTENERS", "false").lower() == "true"
+
+
+def get_notes_generation(user_id: str) -> Generation:
+    """
+    Returns the current generation of a user's notes. Read it before reading the notes to cache.
+
+    Args:
+        user_id (str): The ID of the user.
+
+    Returns:
+        Generation: The generation.
+    """
+    return get_generation(NOTES_CACHE, user_id)
+
+
+def get_cached_notes(user_id: str, since: Optional[datetime] = None) -> Optional[CachedNotes]:
+    """
+    Returns the notes cached for a user in this process, if any are cached, fresh and cover the given time.
+
+    Args:
+        user_id (str): The ID of the user.
+        since (Optional[datetime]): The earliest time the notes must cover. They must include every chunk if not provided.
+
+    Returns:
+        Optional[CachedNotes]: The cached notes, or None.
+    """
+    generation = get_notes_generation(user_id)
+    with _cached_notes_lock:
+        cached = _cached_notes.get(user_id)
+        if cached is not None and cached.ready.is_set():
+            if not cached.is_fresh(generation):
+                if cached.watch is not None:
+                    logging.warning(f"Notes listener of user {user_id} stopped. Dropping its cached notes.")
+                    _remove(user_id)
+                    notes_cache_counter.inc(outcome="listener_stopped")
+                    return None
+            elif cached.covers(since):
+                _cached_notes.move_to_end(user_id)
+                notes_cache_counter.inc(outcome="hit")
+                return cached
+
+    notes_cache_counter.inc(outcome="miss")
+    return None
+
+
+def cache_notes(user_id: str, documents: Iterable[Dict[str, Any]], generation: Generation, since: Optional[datetime] = None) -> CachedNotes:
+    """
+    Caches a user's note documents, evicting the least recently used users to stay within NOTES_CACHE_MAX_BYTES.
+
+    Args:
+        user_id (str): The ID of the user.
+        documents (Iterable[Dict[str, Any]]): The note documents with their 'id', 'summarised_notes' and 'timestamp'.
+        generation (Generation): The generation read before the documents were read.
+        since (Optional[datetime]): The time the documents were read since. All of the user's documents were read if not provided.
+
+    Returns:
+        CachedNotes: The cached notes. They are not kept if they alone exceed NOTES_CACHE_MAX_BYTES.
+    """
+    cached = CachedNotes(user_id, generation, since)
+    for doc in documents:
+        cached.put(doc["id"], doc["summarised_notes"], doc.get("timestamp"))
+    cached.ready.set()
+
+    with _cached_notes_lock:
+        _store(user_id, cached)
+
+    return cached
+
+
+def add_cached_notes(user_id: str, documents: Iterable[Dict[str, Any]]) -> None:
+    """
+    Adds newly written note documents to a user's cached notes, if the user is cached, and marks the
+    notes cached by other server workers as outdated.
+
+    Args:
+        user_id (str): The ID of the user.
+        documents (Iterable[Dict[str, Any]]): The note documents with their 'id', 'summarised_notes' and 'timestamp'.
+    """
+    with _cached_notes_lock:
+        cached = _cached_notes.get(user_id)
+    generation = bump_generation(NOTES_CACHE, user_id, cached.generation if cached is not None and cached.watch is None else None)
+    if cached is None:
+        return
+
+    with _cached_notes_lock:
+        if not _is_stored(cached):
+            return
+        if cached.watch is None:
+            if generation is None:
+                _remove(user_id)
+                return
+            cached.generation = generation
+        for doc in documents:
+            _put(cached, doc["id"], doc["summarised_notes"], doc.get("timestamp"))
+        _evict_to_fit()
+
+
+def invalidate_cached_notes(user_id: Optional[str] = None) -> None:
+    """
+    Drops a user's cached notes, or every user's cached notes when no user is given, in every server
+    worker, and stops their listeners.
+
+    Args:
+        user_id (Optional[str]): The ID of the user.
+    """
+    bump_generation(NOTES_CACHE, user_id)
+    with _cached_notes_lock:
+        user_ids = list(_cached_notes) if user_id is None else [user_id]
+        for cached_user_id in user_ids:
+            _remove(cached_user_id)
+
+
+def watch_notes(db: Client, user_id: str, since: Optional[datetime] = None) -> Optional[CachedNotes]:
+    """
+    Caches a user's notes from a snapshot listener on their notes collection, which keeps them current.
+
+    Waits up to NOTES_CACHE_LISTENER_TIMEOUT_SECONDS for the initial snapshot. The notes are dropped
+    once the listener stops, e.g. after an error.
+
+    Args:
+        db (Client): The Firestore client.
+        user_id (str): The ID of the user.
+        since (Optional[datetime]): Only watch the notes stored since this time. Watches all notes if not provided.
+
+    Returns:
+        Optional[CachedNotes]: The cached notes, or None if the initial snapshot did not arrive in time.
+    """
+    cached = CachedNotes(user_id, since=since)
+
+    def on_snapshot(docs: List[Any], changes: List[Any], read_time: datetime) -> None:
+        with _cached_notes_lock:
+            for change in changes:
+                if change.type == ChangeType.REMOVED:
+                    _discard(cached, change.document.id)
+                else:
+                    doc_data = change.document.to_dict() or {}
+                    _put(cached, change.document.id, doc_data.get("summarised_notes", ""), doc_data.get("timestamp"))
+            if not cached.ready.is_set():
+                cached.ready.set()
+                logging.info(f"Watching {len(cached.chunks)} note chunks for user {user_id}")
+            _evict_to_fit()
+
+    query = db.collection(USER_COLLECTION).document(user_id).collection(NOTE_COLLECTION)
+    if since is not None:
+        query = query.where(filter=FieldFilter("timestamp", ">=", since))
+    with _cached_notes_lock:
+        _store(user_id, cached)
+        cached.watch = query.on_snapshot(on_snapshot)
+
+    if not cached.ready.wait(NOTES_CACHE_LISTENER_TIMEOUT_SECONDS):
+        logging.warning(f"Timed out waiting for the notes snapshot of user {user_id}")
+        with _cached_notes_lock:
+            if _cached_notes.get(user_id) is cached:
+                _remove(user_id)
+        return None
+
+    return cached
+
+
+def _put(cached: CachedNotes, doc_id: str, notes: str, timestamp: Optional[datetime]) -> None:
+    global _cached_notes_size
+    previous_size = cached.size
+    cached.put(doc_id, notes, timestamp)
+    if _is_stored(cached):
+        _cached_notes_size += cached.size - previous_size
+
+
+def _discard(cached: CachedNotes, doc_id: str) -> None:
+    global _cached_notes_size
+    previous_size = cached.size
+    cached.remove(doc_id)
+    if _is_stored(cached):
+        _cached_notes_size += cached.size - previous_size
+
+
+def _is_stored(cached: CachedNotes) -> bool:
+    return _cached_notes.get(cached.user_id) is cached
+
+
+def _store(user_id: str, cached: CachedNotes) -> None:
+    global _cached_notes_size
+    _remove(user_id)
+    if cached.size > NOTES_CACHE_MAX_BYTES:
+        logging.info(f"Notes of user {user_id} exceed the notes cache size. Not caching them.")
+        return
+    _cached_notes[user_id] = cached
+    _cached_notes_size += cached.size
+    _evict_to_fit()
+
+
+def _remove(user_id: str) -> None:
+    global _cached_notes_size
+    cached = _cached_notes.pop(user_id, None)
+    if cached is None:
+        return
+    _cached_notes_size -= cached.size
+    if cached.watch is not None:
+        # Unsubscribing joins the listener thread, which may be the caller, so it is done on another thread.
+        threading.Thread(target=cached.watch.unsubscribe, daemon=True).start()
+        cached.watch = None
+
+
+def _evict_to_fit() -> None:
+    while _cached_notes_size > NOTES_CACHE_MAX_BYTES and _cached_notes:
+        evicted_user_id = next(iter(_cached_notes))
+        _remove(evicted_user_id)
+        logging.info(f"Evicted cached notes of user {evicted_user_id}")
@@ -1,13 +1,18 @@
-from typing import Any, Dict, List
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, Optional
 import logging
 
 from firebase_admin import firestore
+from google.cloud.firestore_v1.base_query import FieldFilter
 from google.cloud.firestore_v1.client import Client
 
-from backend.src.utils.rag import chunk_text
-from backend.src.utils.constants import NOTE_COLLECTION, USER_COLLECTION
-from backend.src.utils.firestore.document_operations import get_all_docs, get_recent_documents
-from backend.src.utils.rag import embed_text
+from backend.src.utils.rag import chunk_and_embed_notes
+from backend.src.utils.constants import NOTE_COLLECTION, RECENT_NOTES_WINDOW_MINUTES, USER_COLLECTION
+from backend.src.utils.firestore.batch_operations import SET, commit_in_batches
+from backend.src.utils.firestore.document_operations import collate_document_data
+from backend.src.utils.firestore.notes_cache import (CachedNotes, add_cached_notes, cache_notes, get_cached_notes, get_notes_generation,
+                                                     invalidate_cached_notes, notes_cache_uses_listeners, watch_notes)
+from backend.src.utils.metrics import span
 
 
 
@@ -15,45 +20,82 @@ def add_to_notes(db: Client, user_id: str, notes: str) -> None:
     """
     Adds chunked and embedded notes to the Firestore database for a specified user.
 
+    The cached notes are updated once every chunk is written, and dropped if any batch fails, since
+    the other batches may have been written.
+
     Args:
         db (Client): The Firestore client.
         user_id (str): The ID of the user.
         notes (str): The notes to be chunked and added.
     """
-    notes_split = chunk_text(notes)
-    logging.info(f"Chunked notes into {len(notes_split)} chunks. Uploading to firestore ...")
-    for note_doc in notes_split:
-        note = note_doc.page_content
-        if not note or not note.strip():
-            continue
-        note_embeddings = embed_text(note)
-        notes = {"summarised_notes": note, "embedding": note_embeddings, "timestamp": firestore.SERVER_TIMESTAMP}
-        update_time, note_ref = db.collection(USER_COLLECTION).document(user_id).collection(NOTE_COLLECTION).add(notes)
-        logging.info(f'Added document with id {note_ref.id} at {update_time}')
-
-
-def get_notes_from_docs(documents: List[Dict[str, Any]]) -> str:
+    note_chunks = chunk_and_embed_notes(notes)
+    logging.info(f"Uploading {len(note_chunks)} chunks to firestore ...")
+    note_collection_ref = db.collection(USER_COLLECTION).document(user_id).collection(NOTE_COLLECTION)
+    writes = [
+        (SET, note_collection_ref.document(), {"summarised_notes": note, "embedding": note_embeddings, "timestamp": firestore.SERVER_TIMESTAMP})
+        for note, note_embeddings in note_chunks
+    ]
+    with span("firestore_write"):
+        try:
+            report = commit_in_batches(db, writes)
+        except BaseException:
+            invalidate_cached_notes(user_id)
+            raise
+    logging.info(f'Added {report.written} note documents')
+
+    add_cached_notes(user_id, [
+        {"id": note_ref.id, "summarised_notes": notes["summarised_notes"], "timestamp": update_time or datetime.now(timezone.utc)}
+        for (_, note_ref, notes), update_time in zip(writes, report.update_times())
+    ])
+
+
+def get_notes_from_docs(documents: Iterable[Dict[str, Any]]) -> str:
     """
-    Aggregates 'summarised_notes' from a list of Firestore document dictionaries into a single string.
+    Aggregates 'summarised_notes' from Firestore document dictionaries into a single string.
 
     Args:
-        documents (List[Dict[str, Any]]): A list of document dictionaries, where each dictionary contains a 'summarised_notes' field.
+        documents (Iterable[Dict[str, Any]]): The document dictionaries, where each dictionary contains a 'summarised_notes' field.
+            Consumed lazily, so a generator keeps only one page of documents in memory.
 
     Returns:
         str: A concatenated string of all 'summarised_notes' from the documents.
     """
-    content = ""
+    return "".join(doc['summarised_notes'] for doc in documents)
+
 
-    for doc in documents:
-        content += doc['summarised_notes']
+def load_notes(db: Client, user_id: str, since: Optional[datetime] = None) -> CachedNotes:
+    """
+    Returns a user's note chunks stored since a given time, or all of them, from the per-process notes cache.
 
-    return content
+    On a cache miss, the chunks are read once, either with a snapshot listener that keeps them current
+    (when NOTES_CACHE_USE_LISTENERS is set) or with a projected read, and cached.
+
+    Args:
+        db (Client): The Firestore client.
+        user_id (str): The ID of the user.
+        since (Optional[datetime]): The earliest time to read chunks from. Reads all chunks if not provided.
+
+    Returns:
+        CachedNotes: The cached notes. They may include chunks from before `since`.
+    """
+    cached_notes = get_cached_notes(user_id, since)
+    if cached_notes is None and notes_cache_uses_listeners():
+        cached_notes = watch_notes(db, user_id, since)
+    if cached_notes is None:
+        generation = get_notes_generation(user_id)
+        query = db.collection(USER_COLLECTION).document(user_id).collection(NOTE_COLLECTION)
+        if since is not None:
+            query = query.where(filter=FieldFilter("timestamp", ">=", since))
+        cached_notes = cache_notes(user_id, collate_document_data(query, ["summarised_notes", "timestamp"]), generation, since)
+    return cached_notes
 
 
 def retrieve_notes_doc_from_firestore(db: Client, user_id: str) -> str:
     """
     Retrieves and aggregates notes from recent documents or all documents if recent ones are empty.
 
+    Only the chunks of the last RECENT_NOTES_WINDOW_MINUTES are read, unless none are recent.
+
     Args:
         db (Client): The Firestore client.
         user_id (str): The ID of the user.
@@ -64,13 +106,15 @@ def retrieve_notes_doc_from_firestore(db: Client, user_id: str) -> str:
     Raises:
         ValueError: If no documents are found in the collection.
     """
-    recent_documents = get_recent_documents(db, user_id, NOTE_COLLECTION)
-    content = get_notes_from_docs(recent_documents)
+    since = datetime.now(timezone.utc) - timedelta(minutes=RECENT_NOTES_WINDOW_MINUTES)
+    cached_notes = load_notes(db, user_id, since)
+    content = get_notes_from_docs(cached_notes.documents(RECENT_NOTES_WINDOW_MINUTES))
 
     if not content:
         logging.info("No content available from recent documents to generate a quiz. Using all documents in the collection to generate the quiz ...")
-        all_documents = get_all_docs(db, user_id, NOTE_COLLECTION)
-        content = get_notes_from_docs(all_documents)
+        if not cached_notes.covers(None):
+            cached_notes = load_notes(db, user_id)
+        content = get_notes_from_docs(cached_notes.documents())
         if not content:
             logging.error(f"No documents in {NOTE_COLLECTION} collection.")
             raise ValueError("Upload a file to get started. There is no documents available in our database to generate a quiz.")
@@ -0,0 +1,76 @@
+from typing import Any, Dict, Optional
+
+from google.cloud.firestore_v1.client import Client
+from google.cloud.firestore_v1.document import DocumentReference
+
+from backend.src.utils.constants import PERFORMANCE_COLLECTION, PERFORMANCE_SUMMARY_DOCUMENT, USER_COLLECTION
+
+
+def get_performance_aggregate_ref(db: Client, user_id: str) -> DocumentReference:
+    """
+    Returns the reference to a user's performance aggregate document.
+
+    Args:
+        db (Client): The Firestore client.
+        user_id (str): The ID of the user.
+
+    Returns:
+        DocumentReference: The aggregate document reference.
+    """
+    return db.collection(USER_COLLECTION).document(user_id).collection(PERFORMANCE_COLLECTION).document(PERFORMANCE_SUMMARY_DOCUMENT)
+
+
+def get_performance_aggregate(db: Client, user_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Retrieves a user's performance aggregate with a single document read.
+
+    Args:
+        db (Client): The Firestore client.
+        user_id (str): The ID of the user.
+
+    Returns:
+        Optional[Dict[str, Any]]: The aggregate, or None if the user has not answered any question yet.
+    """
+    snapshot = get_performance_aggregate_ref(db, user_id).get()
+    return snapshot.to_dict() if snapshot.exists else None
+
+
+def set_cached_evaluation(db: Client, user_id: str, digest: str, strength_weakness: Dict[str, str]) -> None:
+    """
+    Stores a strength and weakness evaluation on the user's performance aggregate.
+
+    The cached evaluation is dropped whenever a new answer is recorded.
+
+    Args:
+        db (Client): The Firestore client.
+        user_id (str): The ID of the user.
+        digest (str): The digest of the answers the evaluation is based on.
+        strength_weakness (Dict[str, str]): The evaluation with 'strength' and 'weakness'.
+    """
+    cached_evaluation = {"digest": digest, "strength": strength_weakness["strength"], "weakness": strength_weakness["weakness"]}
+    get_performance_aggregate_ref(db, user_id).update({"cached_evaluation": cached_evaluation})
+
+
+def delete_performance_aggregates(db: Client, user_id: Optional[str] = None) -> int:
+    """
+    Deletes a user's performance aggregate, with its cached evaluation, or every user's aggregate when no user is given.
+
+    Args:
+        db (Client): The Firestore client.
+        user_id (Optional[str]): The ID of the user.
+
+    Returns:
+        int: The number of deleted aggregates.
+    """
+    if user_id is not None:
+        get_performance_aggregate_ref(db, user_id).delete()
+        return 1
+
+    bulk_writer = db.bulk_writer()
+    deleted = 0
+    for snapshot in db.collection_group(PERFORMANCE_COLLECTION).select([]).stream():
+        if snapshot.id == PERFORMANCE_SUMMARY_DOCUMENT:
+            bulk_writer.delete(snapshot.reference)
+            deleted += 1
+    bulk_writer.close()
+    return deleted
@@ -1,79 +1,238 @@
 import logging
-from typing import Dict, List, Any, Union
+from typing import Dict, Iterator, List, Any, Tuple, Union
 
+from google.api_core.exceptions import NotFound
 from google.cloud.firestore_v1.base_query import FieldFilter
 from google.cloud.firestore_v1.client import Client
+from google.cloud.firestore_v1.document import DocumentReference
+from google.cloud.firestore_v1.transaction import Transaction
 from firebase_admin import firestore
 
-from backend.src.utils.constants import QUIZ_COLLECTION, USER_COLLECTION
+from backend.src.api.v1.models.responses import FreeResponseQuestion, MultiSelectQuestion, MultipleChoiceQuestion, TrueFalseQuestion
+from backend.src.utils.constants import QUESTION_FIELDS, QUIZ_COLLECTION, QUIZ_SUMMARY_COLLECTION, QUIZ_SUMMARY_QUESTIONS_COLLECTION, USER_COLLECTION
+from backend.src.utils.firestore.batch_operations import SET, commit_in_batches
+from backend.src.utils.firestore.document_operations import collate_document_data
+from backend.src.utils.firestore.performance_operations import get_performance_aggregate_ref
+from backend.src.utils.quiz.performance_aggregate import AnswerRecord, apply_answer_to_aggregate
+from backend.src.utils.quiz.question_index import (QuestionIndex, build_question_index, cache_question_index, get_cached_question_index,
+                                                   get_question_index_generation, question_index_uses_embeddings, update_cached_question_index)
+from backend.src.utils.rag import embed_text
 
 
-def add_to_quizzes(db: Client, user_id: str, quiz_qn_and_ans_list: List[Dict[str, Any]]) -> None:
+def add_to_quizzes(db: Client, user_id: str, quiz_qn_and_ans_list: List[Union[MultipleChoiceQuestion, MultiSelectQuestion, TrueFalseQuestion, FreeResponseQuestion]]) -> List[str]:
     """
-    Adds quiz questions and answers to the Firestore database.
+    Adds quiz questions and answers to the Firestore database and assigns each question its document ID.
+
+    All new questions are written in one batch (per FIRESTORE_MAX_BATCH_WRITES questions), so saving a quiz takes one round trip.
 
     Args:
         db (Client): The Firestore client.
         user_id (str): The ID of the user.
-        quiz_qn_and_ans_dict (List[Dict[str, Any]]): A dictionary containing quiz questions and answers under the key "question_answer_list".
+        quiz_qn_and_ans_list (List[Union[MultipleChoiceQuestion, MultiSelectQuestion, TrueFalseQuestion, FreeResponseQuestion]]): The validated quiz questions and answers.
+            Questions that already carry an 'id' are stored already and are not written again.
 
     Returns:
-        None
+        List[str]: The IDs of the quiz questions, in order.
     """
-    quizzes = quiz_qn_and_ans_list
+    quiz_collection_ref = db.collection(USER_COLLECTION).document(user_id).collection(QUIZ_COLLECTION)
+    question_index = get_cached_question_index(user_id)
     logging.info(f"Uploading to firestore ...")
-    for qna in quizzes:
-        qna["timestamp"] = firestore.SERVER_TIMESTAMP
-        update_time, quiz_ref = db.collection(USER_COLLECTION).document(user_id).collection(QUIZ_COLLECTION).add(qna)
-        logging.info(f'Added document with id {quiz_ref.id} at {update_time}')
+    writes = []
+    new_questions = []
+    for qna in quiz_qn_and_ans_list:
+        if qna.id:
+            logging.info(f"Question already stored with id {qna.id}. Skipping upload.")
+            continue
+        quiz_data = qna.model_dump(mode="json", exclude={"id"})
+        question_embedding = question_index.embedding_for(qna.question) if question_index is not None else None
+        if question_embedding is not None:
+            quiz_data["question_embedding"] = question_embedding
+        quiz_data["timestamp"] = firestore.SERVER_TIMESTAMP
+
+        quiz_ref = quiz_collection_ref.document()
+        writes.append((SET, quiz_ref, quiz_data))
+        new_questions.append((qna, quiz_ref.id, quiz_data, question_embedding))
+
+    commit_in_batches(db, writes)
+    logging.info(f'Added {len(writes)} quiz documents')
+
+    def add_new_questions(index: QuestionIndex) -> None:
+        for _, quiz_id, quiz_data, question_embedding in new_questions:
+            index.add(quiz_id, quiz_data, embedding=question_embedding)
+
+    for qna, quiz_id, _, _ in new_questions:
+        qna.id = quiz_id
+    if new_questions:
+        update_cached_question_index(user_id, add_new_questions)
 
+    return [qna.id for qna in quiz_qn_and_ans_list]
 
-def add_student_answer_to_quizzes(db: Client, user_id: str, question: str, student_answer: Union[int, List[int], str], correctness: int) -> None:
+
+def add_student_answer_to_quizzes(db: Client,
+                                  user_id: str,
+                                  question_and_answer: Union[MultipleChoiceQuestion, MultiSelectQuestion, TrueFalseQuestion, FreeResponseQuestion],
+                                  student_answer: Union[int, List[int], str],
+                                  correctness: int) -> None:
     """
-    Updates a quiz document with the student's answer and correctness.
+    Updates a quiz document with the student's answer and correctness, and folds the answer into the user's performance aggregate.
 
     Args:
         db (Client): The Firestore client.
         user_id (str): The ID of the user.
-        question (str): The question text to identify the document.
+        question_and_answer (Union[MultipleChoiceQuestion, MultiSelectQuestion, TrueFalseQuestion, FreeResponseQuestion]): The answered question.
         student_answer (Union[int, List[int], str]): The student's answer to the question.
         correctness (int): Whether the student's answer is correct or not. 1=Correct, 0=Incorrect
 
+    Returns:
+        None
+    """
+    add_student_answers_to_quizzes(db, user_id, [AnswerRecord(question_and_answer, student_answer, correctness)])
+
+
+def add_student_answers_to_quizzes(db: Client, user_id: str, answer_records: List[AnswerRecord]) -> None:
+    """
+    Updates quiz documents with the student's answers, and folds the answers into the user's performance aggregate.
+
+    All writes are made in one transaction, with a single read and write of the aggregate. Quiz
+    documents are written directly when the questions carry their IDs. If one of them does not
+    exist, and for clients that do not send question IDs, the documents are looked up by their
+    question text.
+
+    Args:
+        db (Client): The Firestore client.
+        user_id (str): The ID of the user.
+        answer_records (List[AnswerRecord]): The answers, oldest first.
+
     Returns:
         None
     """
     quiz_collection_ref = db.collection(USER_COLLECTION).document(user_id).collection(QUIZ_COLLECTION)
-    query = quiz_collection_ref.where(filter=FieldFilter('question', '==', question))
-    docs = query.stream()
-    for doc in docs:
-        doc_ref = quiz_collection_ref.document(doc.id)
-        doc_ref.update({"student_answer": student_answer})
-        doc_ref.update({"correctness": correctness})
-        doc_ref.update({"timestamp": firestore.SERVER_TIMESTAMP})
-        logging.info(f'Updated document id {doc.id} with student answer and correctness.')
 
+    def lookup_by_question(answer_record: AnswerRecord) -> List[DocumentReference]:
+        query = quiz_collection_ref.where(filter=FieldFilter('question', '==', answer_record.question_and_answer.question))
+        return [quiz_collection_ref.document(doc.id) for doc in query.stream()]
+
+    if all(answer_record.question_and_answer.id for answer_record in answer_records):
+        answered_refs = [[quiz_collection_ref.document(answer_record.question_and_answer.id)] for answer_record in answer_records]
+        try:
+            record_answers(db, user_id, list(zip(answered_refs, answer_records)))
+            return
+        except NotFound:
+            logging.warning(f"A quiz document of {len(answer_records)} answers was not found. Looking up missing questions by text instead.")
+
+    answered_refs = []
+    quiz_refs_with_ids = [quiz_collection_ref.document(answer_record.question_and_answer.id) for answer_record in answer_records if answer_record.question_and_answer.id]
+    existing_ids = {snapshot.id for snapshot in db.get_all(quiz_refs_with_ids, field_paths=['question']) if snapshot.exists} if quiz_refs_with_ids else set()
+    for answer_record in answer_records:
+        if answer_record.question_and_answer.id in existing_ids:
+            answered_refs.append([quiz_collection_ref.document(answer_record.question_and_answer.id)])
+        else:
+            answered_refs.append(lookup_by_question(answer_record))
+
+    record_answers(db, user_id, list(zip(answered_refs, answer_records)))
+
+
+def record_answers(db: Client, user_id: str, answers: List[Tuple[List[DocumentReference], AnswerRecord]]) -> None:
+    """
+    Writes answers to their quiz documents and updates the user's performance aggregate in one transaction.
+
+    Answers without quiz documents, e.g. to questions deleted since, are dropped, so that the aggregate
+    only counts attempts at stored questions.
+
+    Args:
+        db (Client): The Firestore client.
+        user_id (str): The ID of the user.
+        answers (List[Tuple[List[DocumentReference], AnswerRecord]]): Each answer with the quiz documents of its question, oldest first.
+
+    Raises:
+        NotFound: If a quiz document does not exist.
+    """
+    unmatched = sum(1 for quiz_refs, _ in answers if not quiz_refs)
+    if unmatched:
+        logging.warning(f"Dropping {unmatched} answers of user {user_id} whose questions are not stored.")
+    answers = [(quiz_refs, answer_record) for quiz_refs, answer_record in answers if quiz_refs]
+    if not answers:
+        return
+
+    aggregate_ref = get_performance_aggregate_ref(db, user_id)
+
+    @firestore.transactional
+    def update_in_transaction(transaction: Transaction) -> None:
+        snapshot = aggregate_ref.get(transaction=transaction)
+        aggregate = snapshot.to_dict() if snapshot.exists else None
+        # A question answered more than once gets a single write with its latest answer.
+        quiz_updates: Dict[str, Tuple[DocumentReference, Dict[str, Any]]] = {}
+        for quiz_refs, answer_record in answers:
+            answer = {"student_answer": answer_record.student_answer, "correctness": answer_record.correctness, "timestamp": firestore.SERVER_TIMESTAMP}
+            for quiz_ref in quiz_refs:
+                quiz_updates[quiz_ref.path] = (quiz_ref, answer)
+            aggregate = apply_answer_to_aggregate(aggregate, answer_record.to_answer_entry(quiz_refs[0].id))
+        for quiz_ref, answer in quiz_updates.values():
+            transaction.update(quiz_ref, answer)
+        transaction.set(aggregate_ref, aggregate)
 
-def get_quiz_results(quiz_docs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    update_in_transaction(db.transaction())
+    logging.info(f'Recorded {len(answers)} answers on their quiz documents and the performance aggregate.')
+
+    def mark_answered(index: QuestionIndex) -> None:
+        for quiz_refs, _ in answers:
+            for quiz_ref in quiz_refs:
+                index.mark_answered(quiz_ref.id)
+
+    update_cached_question_index(user_id, mark_answered)
+
+
+def load_question_index(db: Client, user_id: str) -> QuestionIndex:
     """
-    Formats quiz documents into a list of results with relevant fields.
+    Returns the user's question index, building it from the quiz collection on first use in this process.
+
+    Questions compacted into quiz summaries by the retention job are indexed as answered questions.
 
     Args:
-        quiz_docs (List[Dict[str, Any]]): A list of quiz document dictionaries.
+        db (Client): The Firestore client.
+        user_id (str): The ID of the user.
 
     Returns:
-        List[Dict[str, Any]]: A list of dictionaries containing the question, choices, answer, student answer, correctness, and timestamp.
+        QuestionIndex: The user's question index.
     """
-    quiz_results = [
-        {
-            "question": doc["question"],
-            "choices": doc.get("choices", None),
-            "answer": doc["answer"],
-            "student_answer": doc.get("student_answer", None),
-            "correctness": doc.get("correctness", None),
-            "timestamp": doc.get("timestamp", None)
-        }
-        for doc in quiz_docs
-        if doc.get("student_answer") is not None
-    ]
-
-    return quiz_results
\ No newline at end of file
+    question_index = get_cached_question_index(user_id)
+    if question_index is not None:
+        return question_index
+
+    generation = get_question_index_generation(user_id)
+    use_embeddings = question_index_uses_embeddings()
+    fields = [*QUESTION_FIELDS, "student_answer"] + (["question_embedding"] if use_embeddings else [])
+    query = db.collection(USER_COLLECTION).document(user_id).collection(QUIZ_COLLECTION)
+    quiz_docs = collate_document_data(query, fields)
+
+    question_index = build_question_index(quiz_docs, embed_fn=embed_text if use_embeddings else None)
+    for question_id, question in get_compacted_questions(db, user_id):
+        question_index.add(question_id, {"question": question}, answered=True)
+    cache_question_index(user_id, question_index, generation)
+
+    return question_index
+
+
+def get_compacted_questions(db: Client, user_id: str) -> Iterator[Tuple[str, str]]:
+    """
+    Yields the questions folded into the user's quiz summary documents by the retention job.
+
+    Questions are read from each summary's questions subcollection, and from the 'questions' array
+    that summaries written before the subcollection existed keep.
+
+    Args:
+        db (Client): The Firestore client.
+        user_id (str): The ID of the user.
+
+    Yields:
+        Tuple[str, str]: The (question ID, question text) pairs. The IDs are derived from the summary and question documents.
+    """
+    summaries_ref = db.collection(USER_COLLECTION).document(user_id).collection(QUIZ_SUMMARY_COLLECTION)
+    for summary in collate_document_data(summaries_ref, ["questions"]):
+        for i, question in enumerate(summary.get("questions", [])):
+            yield f"{QUIZ_SUMMARY_COLLECTION}/{summary['id']}/{i}", question
+        questions_ref = summaries_ref.document(summary["id"]).collection(QUIZ_SUMMARY_QUESTIONS_COLLECTION)
+        for shard in collate_document_data(questions_ref, ["questions"]):
+            for i, question in enumerate(shard.get("questions", [])):
+                yield f"{QUIZ_SUMMARY_COLLECTION}/{summary['id']}/{shard['id']}/{i}", question
+
@@ -0,0 +1,427 @@
+import json
+import logging
+import os
+import time
+import zlib
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from firebase_admin import firestore
+from google.cloud.firestore_v1.base_query import FieldFilter
+from google.cloud.firestore_v1.client import Client
+
+from backend.src.utils.constants import (
+    ARCHIVE_BLOB_MAX_BYTES,
+    FREE_RESPONSE,
+    MULTI_SELECT,
+    MULTIPLE_CHOICE,
+    NOTE_COLLECTION,
+    NOTES_ARCHIVE_AGE_DAYS,
+    NOTES_ARCHIVE_COLLECTION,
+    NOTES_ARCHIVE_TTL_DAYS,
+    QUIZ_COLLECTION,
+    QUIZ_COMPACTION_AGE_DAYS,
+    QUIZ_SUMMARY_COLLECTION,
+    QUIZ_SUMMARY_QUESTIONS_COLLECTION,
+    RETENTION_MAX_OPS_PER_SECOND,
+    RETENTION_PAGE_SIZE,
+    TRUE_FALSE,
+    UNKNOWN_TOPIC,
+    USER_COLLECTION,
+)
+from backend.src.utils.firestore.document_operations import collate_document_data
+from backend.src.utils.firestore.notes_cache import invalidate_cached_notes
+from backend.src.utils.quiz.question_index import evict_question_index
+
+ZSTD_CODEC = "zstd"
+ZLIB_CODEC = "zlib"
+
+
+class RetentionPolicy:
+    """
+    How old data must be before the retention job compacts, archives or expires it.
+    """
+
+    def __init__(self,
+                 quiz_compaction_days: Optional[int] = QUIZ_COMPACTION_AGE_DAYS,
+                 notes_archive_days: Optional[int] = NOTES_ARCHIVE_AGE_DAYS,
+                 notes_archive_ttl_days: Optional[int] = NOTES_ARCHIVE_TTL_DAYS,
+                 max_ops_per_second: Optional[float] = RETENTION_MAX_OPS_PER_SECOND):
+        self.quiz_compaction_days = quiz_compaction_days
+        self.notes_archive_days = notes_archive_days
+        self.notes_archive_ttl_days = notes_archive_ttl_days
+        self.max_ops_per_second = max_ops_per_second
+
+
+def load_retention_policy() -> RetentionPolicy:
+    """
+    Loads the retention policy, overriding the defaults with the RETENTION_* environment variables.
+
+    RETENTION_QUIZ_COMPACTION_DAYS, RETENTION_NOTES_ARCHIVE_DAYS and RETENTION_NOTES_ARCHIVE_TTL_DAYS
+    disable their step when set to 0.
+
+    Returns:
+        RetentionPolicy: The retention policy.
+    """
+    def days(name: str, default: int) -> Optional[int]:
+        value = int(os.getenv(name, default))
+        return value if value > 0 else None
+
+    return RetentionPolicy(
+        quiz_compaction_days=days("RETENTION_QUIZ_COMPACTION_DAYS", QUIZ_COMPACTION_AGE_DAYS),
+        notes_archive_days=days("RETENTION_NOTES_ARCHIVE_DAYS", NOTES_ARCHIVE_AGE_DAYS),
+        notes_archive_ttl_days=days("RETENTION_NOTES_ARCHIVE_TTL_DAYS", NOTES_ARCHIVE_TTL_DAYS),
+        max_ops_per_second=float(os.getenv("RETENTION_MAX_OPS_PER_SECOND", RETENTION_MAX_OPS_PER_SECOND)),
+    )
+
+
+class RetentionReport:
+    """
+    What a retention run compacted, archived and expired, or would have in a dry run.
+    """
+
+    def __init__(self, dry_run: bool):
+        self.dry_run = dry_run
+        self.users_scanned = 0
+        self.quizzes_compacted = 0
+        self.summary_months: Set[Tuple[str, str]] = set()
+        self.notes_archived = 0
+        self.archive_documents = 0
+        self.archive_bytes = 0
+        self.archives_expired = 0
+        self.reads_used = 0
+        self.writes_used = 0
+
+    @property
+    def summary_documents(self) -> int:
+        """
+        The monthly quiz summary documents written to, counted once per user and month.
+        """
+        return len(self.summary_months)
+
+    @property
+    def reads_saved_per_full_scan(self) -> int:
+        """
+        The documents no longer read by a full scan of the users' notes and quiz collections.
+        """
+        return self.quizzes_compacted - self.summary_documents + self.notes_archived
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "dry_run": self.dry_run,
+            "users_scanned": self.users_scanned,
+            "quizzes_compacted": self.quizzes_compacted,
+            "summary_documents": self.summary_documents,
+            "notes_archived": self.notes_archived,
+            "archive_documents": self.archive_documents,
+            "archive_bytes": self.archive_bytes,
+            "archives_expired": self.archives_expired,
+            "reads_used": self.reads_used,
+            "writes_used": self.writes_used,
+            "reads_saved_per_full_scan": self.reads_saved_per_full_scan,
+        }
+
+
+class Throttle:
+    """
+    Limits the rate of Firestore operations of the retention job.
+    """
+
+    def __init__(self, max_ops_per_second: Optional[float]):
+        self.max_ops_per_second = max_ops_per_second
+        self.next_time = time.monotonic()
+
+    def wait(self, ops: int) -> None:
+        """
+        Sleeps until ops more operations fit within the rate.
+        """
+        if not self.max_ops_per_second:
+            return
+        now = time.monotonic()
+        if self.next_time > now:
+            time.sleep(self.next_time - now)
+        self.next_time = max(now, self.next_time) + ops / self.max_ops_per_second
+
+
+def get_question_type_from_data(quiz_data: Dict[str, Any]) -> str:
+    """
+    Infers the question type of a stored quiz document from the shape of its answer.
+
+    Args:
+        quiz_data (Dict[str, Any]): The quiz document.
+
+    Returns:
+        str: The question type.
+    """
+    answer = quiz_data.get("answer")
+    if isinstance(answer, list):
+        return MULTI_SELECT
+    if isinstance(answer, int) and not isinstance(answer, bool):
+        return MULTIPLE_CHOICE
+    if answer in ("True", "False") and quiz_data.get("choices") == ["True", "False"]:
+        return TRUE_FALSE
+    return FREE_RESPONSE
+
+
+def compress_blob(data: bytes) -> Tuple[bytes, str]:
+    """
+    Compresses data with zstd if the zstandard package is installed, otherwise with zlib.
+
+    Returns:
+        Tuple[bytes, str]: The compressed data and the codec used.
+    """
+    try:
+        import zstandard
+    except ImportError:
+        return zlib.compress(data, 9), ZLIB_CODEC
+    return zstandard.ZstdCompressor(level=19).compress(data), ZSTD_CODEC
+
+
+def decompress_blob(blob: bytes, codec: str) -> bytes:
+    """
+    Decompresses a blob written by `compress_blob`.
+
+    Raises:
+        ValueError: If the codec is unknown.
+    """
+    if codec == ZLIB_CODEC:
+        return zlib.decompress(blob)
+    if codec == ZSTD_CODEC:
+        import zstandard
+        return zstandard.ZstdDecompressor().decompress(blob)
+    raise ValueError(f"Unknown archive codec: {codec}")
+
+
+def pack_note_documents(documents: List[Dict[str, Any]]) -> List[Tuple[bytes, str, List[Dict[str, Any]]]]:
+    """
+    Packs note documents into compressed JSON-lines blobs of at most ARCHIVE_BLOB_MAX_BYTES each.
+
+    Args:
+        documents (List[Dict[str, Any]]): The note documents with their 'id', 'summarised_notes' and 'timestamp'.
+
+    Returns:
+        List[Tuple[bytes, str, List[Dict[str, Any]]]]: The blobs, their codec and the documents packed into each.
+    """
+    lines = "\n".join(
+        json.dumps({"id": doc["id"], "summarised_notes": doc["summarised_notes"], "timestamp": doc["timestamp"].isoformat() if doc.get("timestamp") else None})
+        for doc in documents
+    )
+    blob, codec = compress_blob(lines.encode("utf-8"))
+    if len(blob) <= ARCHIVE_BLOB_MAX_BYTES or len(documents) == 1:
+        return [(blob, codec, documents)]
+
+    middle = len(documents) // 2
+    return pack_note_documents(documents[:middle]) + pack_note_documents(documents[middle:])
+
+
+def read_archived_notes(db: Client, user_id: str) -> Iterator[Dict[str, Any]]:
+    """
+    Yields the note chunks archived for a user.
+
+    Args:
+        db (Client): The Firestore client.
+        user_id (str): The ID of the user.
+
+    Yields:
+        Dict[str, Any]: The archived note documents with their 'id', 'summarised_notes' and ISO 'timestamp'.
+    """
+    archive_ref = db.collection(USER_COLLECTION).document(user_id).collection(NOTES_ARCHIVE_COLLECTION)
+    for archive in collate_document_data(archive_ref):
+        for line in decompress_blob(archive["blob"], archive["codec"]).decode("utf-8").splitlines():
+            yield json.loads(line)
+
+
+def compact_answered_quizzes(db: Client, user_id: str, cutoff: datetime, report: RetentionReport, throttle: Throttle) -> None:
+    """
+    Folds answered quiz documents last written before the cutoff into monthly summary documents and deletes them.
+
+    Each summary document in users/{uid}/quiz_summaries keeps the attempts and correct answers overall,
+    by question type and by topic. The question texts, which the question index still recognises, are
+    kept in the summary's 'questions' subcollection with one document per page, so the summary stays
+    small however many questions a month has. Each page is folded and deleted in one atomic batch.
+
+    Args:
+        db (Client): The Firestore client.
+        user_id (str): The ID of the user.
+        cutoff (datetime): Answered quizzes last written before this time are compacted.
+        report (RetentionReport): The report to add to. No writes are made if it is a dry run.
+        throttle (Throttle): The rate limit for reads and writes.
+    """
+    user_ref = db.collection(USER_COLLECTION).document(user_id)
+    query = user_ref.collection(QUIZ_COLLECTION).where(filter=FieldFilter("timestamp", "<", cutoff))
+    fields = ["question", "choices", "answer", "topic", "correctness", "timestamp"]
+
+    for page in _pages(collate_document_data(query, fields, RETENTION_PAGE_SIZE), RETENTION_PAGE_SIZE):
+        throttle.wait(len(page))
+        report.reads_used += len(page)
+        answered = [doc for doc in page if doc.get("correctness") is not None]
+        if not answered:
+            continue
+
+        summaries: Dict[str, Dict[str, Any]] = {}
+        for doc in answered:
+            summary = summaries.setdefault(doc["timestamp"].strftime("%Y-%m"), {"attempts": 0, "correct": 0, "by_question_type": {}, "by_topic": {}, "questions": []})
+            correctness = int(doc["correctness"])
+            summary["attempts"] += 1
+            summary["correct"] += correctness
+            for key, name in (("by_question_type", get_question_type_from_data(doc)), ("by_topic", doc.get("topic") or UNKNOWN_TOPIC)):
+                stats = summary[key].setdefault(name, {"attempts": 0, "correct": 0})
+                stats["attempts"] += 1
+                stats["correct"] += correctness
+            summary["questions"].append(doc["question"])
+
+        report.quizzes_compacted += len(answered)
+        report.summary_months.update((user_id, month) for month in summaries)
+        if report.dry_run:
+            continue
+
+        batch = db.batch()
+        for month, summary in summaries.items():
+            summary_ref = user_ref.collection(QUIZ_SUMMARY_COLLECTION).document(month)
+            batch.set(summary_ref, _as_increments(summary), merge=True)
+            batch.set(summary_ref.collection(QUIZ_SUMMARY_QUESTIONS_COLLECTION).document(), {"questions": summary["questions"]})
+        for doc in answered:
+            batch.delete(user_ref.collection(QUIZ_COLLECTION).document(doc["id"]))
+        throttle.wait(2 * len(summaries) + len(answered))
+        batch.commit()
+        report.writes_used += 2 * len(summaries) + len(answered)
+
+    if report.quizzes_compacted and not report.dry_run:
+        evict_question_index(user_id)
+
+
+def archive_stale_notes(db: Client, user_id: str, cutoff: datetime, ttl_days: Optional[int], report: RetentionReport, throttle: Throttle) -> None:
+    """
+    Moves note chunks stored before the cutoff into compressed archive documents and deletes them.
+
+    Archived chunks no longer take part in quiz generation or similarity search, and are readable
+    with `read_archived_notes`. Each archive document gets an 'expire_at' time when ttl_days is set,
+    for a Firestore TTL policy on notes_archive.expire_at or for `expire_archives`.
+
+    Args:
+        db (Client): The Firestore client.
+        user_id (str): The ID of the user.
+        cutoff (datetime): Note chunks stored before this time are archived.
+        ttl_days (Optional[int]): How long archives are kept, or None to keep them.
+        report (RetentionReport): The report to add to. No writes are made if it is a dry run.
+        throttle (Throttle): The rate limit for reads and writes.
+    """
+    user_ref = db.collection(USER_COLLECTION).document(user_id)
+    query = user_ref.collection(NOTE_COLLECTION).where(filter=FieldFilter("timestamp", "<", cutoff))
+
+    archived = 0
+    for page in _pages(collate_document_data(query, ["summarised_notes", "timestamp"], RETENTION_PAGE_SIZE), RETENTION_PAGE_SIZE):
+        throttle.wait(len(page))
+        report.reads_used += len(page)
+        for blob, codec, documents in pack_note_documents(page):
+            report.notes_archived += len(documents)
+            report.archive_documents += 1
+            report.archive_bytes += len(blob)
+            archived += len(documents)
+            if report.dry_run:
+                continue
+
+            now = datetime.now(timezone.utc)
+            archive = {"blob": blob, "codec": codec, "count": len(documents), "oldest": documents[0].get("timestamp"), "archived_at": now}
+            if ttl_days:
+                archive["expire_at"] = now + timedelta(days=ttl_days)
+
+            batch = db.batch()
+            batch.set(user_ref.collection(NOTES_ARCHIVE_COLLECTION).document(), archive)
+            for doc in documents:
+                batch.delete(user_ref.collection(NOTE_COLLECTION).document(doc["id"]))
+            throttle.wait(len(documents) + 1)
+            batch.commit()
+            report.writes_used += len(documents) + 1
+
+    if archived and not report.dry_run:
+        invalidate_cached_notes(user_id)
+
+
+def expire_archives(db: Client, user_id: str, report: RetentionReport, throttle: Throttle) -> None:
+    """
+    Deletes the user's note archives whose 'expire_at' time has passed.
+
+    Args:
+        db (Client): The Firestore client.
+        user_id (str): The ID of the user.
+        report (RetentionReport): The report to add to. No writes are made if it is a dry run.
+        throttle (Throttle): The rate limit for reads and writes.
+    """
+    archive_ref = db.collection(USER_COLLECTION).document(user_id).collection(NOTES_ARCHIVE_COLLECTION)
+    query = archive_ref.where(filter=FieldFilter("expire_at", "<", datetime.now(timezone.utc)))
+
+    for page in _pages(collate_document_data(query, ["expire_at"], RETENTION_PAGE_SIZE), RETENTION_PAGE_SIZE):
+        throttle.wait(len(page))
+        report.reads_used += len(page)
+        report.archives_expired += len(page)
+        if report.dry_run:
+            continue
+
+        batch = db.batch()
+        for doc in page:
+            batch.delete(archive_ref.document(doc["id"]))
+        throttle.wait(len(page))
+        batch.commit()
+        report.writes_used += len(page)
+
+
+def run_retention(db: Client,
+                  policy: Optional[RetentionPolicy] = None,
+                  dry_run: Optional[bool] = True,
+                  user_ids: Optional[Iterable[str]] = None) -> RetentionReport:
+    """
+    Applies the retention policy to every user's notes and quiz collections.
+
+    Args:
+        db (Client): The Firestore client.
+        policy (Optional[RetentionPolicy]): The retention policy. Defaults to `load_retention_policy()`.
+        dry_run (Optional[bool]): Whether to only report what would be compacted, archived and expired. Defaults to True.
+        user_ids (Optional[Iterable[str]]): The users to process. Defaults to all users.
+
+    Returns:
+        RetentionReport: What was, or would have been, compacted, archived and expired.
+    """
+    policy = policy or load_retention_policy()
+    report = RetentionReport(dry_run)
+    throttle = Throttle(policy.max_ops_per_second)
+    now = datetime.now(timezone.utc)
+
+    if user_ids is None:
+        user_ids = (doc_ref.id for doc_ref in db.collection(USER_COLLECTION).list_documents())
+
+    for user_id in user_ids:
+        report.users_scanned += 1
+        if policy.quiz_compaction_days:
+            compact_answered_quizzes(db, user_id, now - timedelta(days=policy.quiz_compaction_days), report, throttle)
+        if policy.notes_archive_days:
+            archive_stale_notes(db, user_id, now - timedelta(days=policy.notes_archive_days), policy.notes_archive_ttl_days, report, throttle)
+        if policy.notes_archive_ttl_days:
+            expire_archives(db, user_id, report, throttle)
+        logging.info(f"Retention {'dry run ' if dry_run else ''}processed user {user_id}: {report.to_dict()}")
+
+    return report
+
+
+def _pages(documents: Iterable[Dict[str, Any]], page_size: int) -> Iterator[List[Dict[str, Any]]]:
+    page = []
+    for doc in documents:
+        page.append(doc)
+        if len(page) >= page_size:
+            yield page
+            page = []
+    if page:
+        yield page
+
+
+def _as_increments(summary: Dict[str, Any]) -> Dict[str, Any]:
+    def increments(stats: Dict[str, Any]) -> Dict[str, Any]:
+        return {key: firestore.Increment(value) for key, value in stats.items()}
+
+    return {
+        "attempts": firestore.Increment(summary["attempts"]),
+        "correct": firestore.Increment(summary["correct"]),
+        "by_question_type": {name: increments(stats) for name, stats in summary["by_question_type"].items()},
+        "by_topic": {name: increments(stats) for name, stats in summary["by_topic"].items()},
+        "updated_at": firestore.SERVER_TIMESTAMP,
+    }
@@ -1,7 +1,10 @@
 import json
-from typing import Any
+import logging
+import re
+from typing import Any, List
 
 from backend.src.utils.exceptions import JSONLoadError
+from backend.src.utils.metrics import get_counter
 
 
 def load_json_response(llm_answer: str) -> Any:
@@ -25,4 +28,104 @@ def load_json_response(llm_answer: str) -> Any:
     except TypeError as e:
         raise JSONLoadError(f"Input should be a string, but got: {type(llm_answer)}")
     except Exception as e:
-        raise JSONLoadError(f"An unexpected error occurred: {e}")
\ No newline at end of file
+        raise JSONLoadError(f"An unexpected error occurred: {e}")
+
+_TRAILING_COMMA = re.compile(r",\s*([}\]])")
+_CODE_FENCE = re.compile(r"^\s*```(?:json)?\s*|\s*```\s*$")
+
+json_responses_counter = get_counter("llm_json_responses_total", "LLM JSON list responses by parse outcome", ("outcome",))
+json_items_counter = get_counter("llm_json_items_total", "Items in LLM JSON list responses by parse outcome", ("outcome",))
+
+
+def load_json_list_response(llm_answer: str) -> List[Any]:
+    """
+    Loads a JSON list from a string, recovering every complete item from truncated or slightly malformed output.
+
+    Only text that is not valid JSON is repaired, so string values of valid JSON are never rewritten.
+    Code fences and trailing commas are removed first. If the text is still not valid JSON, each
+    top-level object is decoded on its own, skipping over objects that cannot be decoded and an
+    incomplete last object.
+
+    Args:
+        llm_answer (str): The string containing the JSON list.
+
+    Returns:
+        List[Any]: The decoded items. A single object, or an object wrapping a single list, is returned as a list.
+
+    Raises:
+        JSONLoadError: If the input is not a string or no item could be recovered.
+    """
+    if not isinstance(llm_answer, str):
+        raise JSONLoadError(f"Input should be a string, but got: {type(llm_answer)}")
+
+    try:
+        items = json.loads(llm_answer)
+        json_responses_counter.inc(outcome="parsed")
+        return _as_list(items)
+    except json.JSONDecodeError:
+        pass
+
+    text = _TRAILING_COMMA.sub(r"\1", _CODE_FENCE.sub("", llm_answer))
+    try:
+        items = json.loads(text)
+        json_responses_counter.inc(outcome="repaired")
+        return _as_list(items)
+    except json.JSONDecodeError:
+        pass
+
+    decoder = json.JSONDecoder()
+    items = []
+    lost = 0
+    position = text.find("{", text.find("[") + 1)
+    while position != -1:
+        try:
+            item, end = decoder.raw_decode(text, position)
+            items.append(item)
+            position = text.find("{", end)
+        except json.JSONDecodeError:
+            lost += 1
+            position = text.find("{", position + 1)
+            while position != -1 and _is_nested(text, position):
+                position = text.find("{", position + 1)
+
+    if not items:
+        json_responses_counter.inc(outcome="failed")
+        raise JSONLoadError(f"Failed to decode JSON: no complete item in {llm_answer[:200]!r}")
+
+    json_responses_counter.inc(outcome="salvaged")
+    json_items_counter.inc(len(items), outcome="recovered")
+    json_items_counter.inc(lost, outcome="lost")
+    logging.warning(f"Recovered {len(items)} items from malformed JSON response, skipped {lost} malformed items.")
+
+    return items
+
+
+def _as_list(items: Any) -> List[Any]:
+    if isinstance(items, list):
+        return items
+    if isinstance(items, dict):
+        list_values = [value for value in items.values() if isinstance(value, list)]
+        return list_values[0] if len(list_values) == 1 else [items]
+    raise JSONLoadError(f"Expected a JSON list, but got: {type(items)}")
+
+
+def _is_nested(text: str, position: int) -> bool:
+    """
+    Returns whether the brace at position opens an object nested inside the previous object, rather than a top-level item.
+    """
+    line_start = text.rfind("\n", 0, position) + 1
+    previous = text[line_start:position].strip()
+    return previous.endswith(":") or previous.endswith("[")
+
+
+def estimate_token_count(text: str) -> int:
+    """
+    Estimates the number of model tokens in a text at roughly four characters per token.
+
+    Args:
+        text (str): The text.
+
+    Returns:
+        int: The estimated token count.
+    """
+    return (len(text) + 3) // 4
@@ -0,0 +1,39 @@
+import threading
+from typing import Callable, Generic, Optional, TypeVar
+
+T = TypeVar("T")
+
+_UNSET = object()
+
+
+class Lazy(Generic[T]):
+    """
+    A value created by a factory on first use.
+
+    The factory runs once, even when the value is first requested from several threads at once.
+    If it raises, the error is passed to the caller and the next call tries again.
+    """
+
+    def __init__(self, factory: Callable[[], T]):
+        self.factory = factory
+        self.value = _UNSET
+        self.lock = threading.Lock()
+
+    def __call__(self) -> T:
+        value = self.value
+        if value is _UNSET:
+            with self.lock:
+                if self.value is _UNSET:
+                    self.value = self.factory()
+                value = self.value
+        return value
+
+    @property
+    def is_initialised(self) -> bool:
+        return self.value is not _UNSET
+
+    def peek(self) -> Optional[T]:
+        """
+        Returns the value if it has been created, without creating it.
+        """
+        return self.value if self.value is not _UNSET else None
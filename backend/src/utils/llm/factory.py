@@ -0,0 +1,44 @@
+import logging
+import os
+
+from backend.src.utils.constants import EMBEDDING_MODEL, GEMINI_LLM, GEMINI_MODEL, RECORD_LLM, REPLAY_LLM, STUB_LLM
+from backend.src.utils.lazy import Lazy
+from backend.src.utils.llm.provider import LLMProvider
+
+
+def init_llm_provider() -> LLMProvider:
+    """
+    Initializes the model provider selected by the LLM_BACKEND environment variable.
+
+    'gemini' (default) calls Google Gemini, 'stub' answers deterministically in process, 'record' calls
+    Gemini and appends every call to the file at LLM_RECORDING_PATH, and 'replay' answers from that file.
+
+    Returns:
+        LLMProvider: The model provider.
+
+    Raises:
+        ValueError: If the LLM backend is unknown.
+    """
+    llm_backend = os.getenv("LLM_BACKEND", GEMINI_LLM).lower()
+    recording_path = os.getenv("LLM_RECORDING_PATH", "llm_recording.jsonl")
+    logging.info(f"Using {llm_backend} LLM backend")
+
+    if llm_backend == GEMINI_LLM:
+        from backend.src.utils.llm.gemini_provider import GeminiProvider
+        return GeminiProvider()
+    elif llm_backend == STUB_LLM:
+        from backend.src.utils.llm.stub_provider import StubProvider
+        return StubProvider()
+    elif llm_backend == RECORD_LLM:
+        from backend.src.utils.llm.gemini_provider import GeminiProvider
+        from backend.src.utils.llm.record_replay import RecordingProvider
+        return RecordingProvider(GeminiProvider(), recording_path)
+    elif llm_backend == REPLAY_LLM:
+        from backend.src.utils.llm.record_replay import ReplayProvider
+        replay_latency = os.getenv("LLM_REPLAY_LATENCY", "false").lower() == "true"
+        return ReplayProvider(recording_path, replay_latency, GEMINI_MODEL, EMBEDDING_MODEL)
+    else:
+        raise ValueError(f"Unknown LLM backend: {llm_backend}")
+
+
+get_llm_provider = Lazy(init_llm_provider)
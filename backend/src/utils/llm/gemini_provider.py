@@ -0,0 +1,52 @@
+from typing import Any, Dict, Iterator, List, Optional
+
+import google.generativeai as genai
+
+from backend.src.utils.app_init import configure_genai
+from backend.src.utils.constants import EMBEDDING_MODEL, GEMINI_MODEL
+from backend.src.utils.llm.provider import LLMProvider, LLMResponse, UploadedFile
+
+
+def _to_uploaded_file(file: Any) -> UploadedFile:
+    return UploadedFile(file.name, file.uri, file.mime_type, file.state.name, raw=file)
+
+
+def _to_gemini_contents(contents: Any) -> Any:
+    if isinstance(contents, UploadedFile):
+        return contents.raw
+    if isinstance(contents, list):
+        return [part.raw if isinstance(part, UploadedFile) else part for part in contents]
+    return contents
+
+
+class GeminiProvider(LLMProvider):
+    """
+    Google Gemini through the google-generativeai SDK.
+    """
+
+    def __init__(self, model_name: Optional[str] = GEMINI_MODEL, embedding_model_name: Optional[str] = EMBEDDING_MODEL):
+        configure_genai()
+        self.model = genai.GenerativeModel(model_name)
+        self.model_name = self.model.model_name
+        self.embedding_model_name = embedding_model_name
+
+    def generate_content(self, contents: Any, generation_config: Optional[Dict[str, Any]] = None, request_options: Optional[Dict[str, Any]] = None) -> LLMResponse:
+        response = self.model.generate_content(_to_gemini_contents(contents), generation_config=generation_config, request_options=request_options)
+        return LLMResponse(response.text)
+
+    def stream_content(self, contents: Any, generation_config: Optional[Dict[str, Any]] = None) -> Iterator[str]:
+        for chunk in self.model.generate_content(_to_gemini_contents(contents), generation_config=generation_config, stream=True):
+            yield chunk.text
+
+    def embed(self, texts: List[str], task_type: Optional[str] = "retrieval_query") -> List[List[float]]:
+        embeddings = genai.embed_content(model=self.embedding_model_name, content=texts, task_type=task_type)
+        return embeddings["embedding"]
+
+    def upload_file(self, path: str, mime_type: str) -> UploadedFile:
+        return _to_uploaded_file(genai.upload_file(path=path, mime_type=mime_type))
+
+    def get_file(self, name: str) -> UploadedFile:
+        return _to_uploaded_file(genai.get_file(name))
+
+    def delete_file(self, name: str) -> None:
+        genai.delete_file(name)
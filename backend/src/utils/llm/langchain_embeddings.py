@@ -0,0 +1,23 @@
+from typing import List
+
+from langchain_core.embeddings import Embeddings
+
+from backend.src.utils.constants import PRIORITY_BACKGROUND
+from backend.src.utils.llm.provider import LLMProvider
+from backend.src.utils.llm_scheduler import embed
+
+
+class ProviderEmbeddings(Embeddings):
+    """
+    Exposes a provider's embedding model to LangChain, e.g. to the semantic chunker, through the scheduler.
+    """
+
+    def __init__(self, provider: LLMProvider, priority: int = PRIORITY_BACKGROUND):
+        self.provider = provider
+        self.priority = priority
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return embed(self.provider, texts, "retrieval_document", self.priority)
+
+    def embed_query(self, text: str) -> List[float]:
+        return embed(self.provider, [text], "retrieval_query", self.priority)[0]
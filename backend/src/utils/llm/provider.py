@@ -0,0 +1,107 @@
+from abc import ABC, abstractmethod
+from types import SimpleNamespace
+from typing import Any, Dict, Iterator, List, Optional
+
+
+class LLMResponse:
+    """
+    The text a model generated.
+    """
+
+    def __init__(self, text: str):
+        self.text = text
+
+
+class UploadedFile:
+    """
+    A file uploaded for use in prompts, with the fields of the Gemini File API that the app uses.
+    """
+
+    def __init__(self, name: str, uri: str, mime_type: str, state: Optional[str] = "ACTIVE", raw: Optional[Any] = None):
+        self.name = name
+        self.uri = uri
+        self.mime_type = mime_type
+        self.state = SimpleNamespace(name=state)
+        self.raw = raw
+
+
+class LLMProvider(ABC):
+    """
+    Interface to a generative model and its embedding model, including files used in prompts.
+    """
+
+    model_name: str
+    embedding_model_name: str
+    # Whether calls count against a provider quota and are scheduled by the rate limiter.
+    rate_limited: bool = True
+
+    @abstractmethod
+    def generate_content(self, contents: Any, generation_config: Optional[Dict[str, Any]] = None, request_options: Optional[Dict[str, Any]] = None) -> LLMResponse:
+        """
+        Generates a response to a prompt.
+
+        Args:
+            contents (Any): The prompt, or a list of prompt parts and uploaded files.
+            generation_config (Optional[Dict[str, Any]]): Generation settings, e.g. {'response_mime_type': 'application/json'}.
+            request_options (Optional[Dict[str, Any]]): Request settings, e.g. {'timeout': 600}.
+
+        Returns:
+            LLMResponse: The generated response.
+        """
+
+    @abstractmethod
+    def stream_content(self, contents: Any, generation_config: Optional[Dict[str, Any]] = None) -> Iterator[str]:
+        """
+        Generates a response to a prompt, yielding the text as it is generated.
+
+        Args:
+            contents (Any): The prompt, or a list of prompt parts and uploaded files.
+            generation_config (Optional[Dict[str, Any]]): Generation settings.
+
+        Returns:
+            Iterator[str]: The chunks of the response text.
+        """
+
+    @abstractmethod
+    def embed(self, texts: List[str], task_type: Optional[str] = "retrieval_query") -> List[List[float]]:
+        """
+        Embeds texts with the embedding model.
+
+        Args:
+            texts (List[str]): The texts to embed.
+            task_type (Optional[str]): The embedding task, e.g. 'retrieval_query' or 'retrieval_document'.
+
+        Returns:
+            List[List[float]]: The embedding of each text, in order.
+        """
+
+    @abstractmethod
+    def upload_file(self, path: str, mime_type: str) -> UploadedFile:
+        """
+        Uploads a file for use in prompts.
+
+        Args:
+            path (str): The path to the file.
+            mime_type (str): The MIME type of the file.
+
+        Returns:
+            UploadedFile: The uploaded file, which may still be processing.
+        """
+
+    @abstractmethod
+    def get_file(self, name: str) -> UploadedFile:
+        """
+        Returns the current state of an uploaded file.
+
+        Args:
+            name (str): The name of the uploaded file.
+        """
+
+    @abstractmethod
+    def delete_file(self, name: str) -> None:
+        """
+        Deletes an uploaded file.
+
+        Args:
+            name (str): The name of the uploaded file.
+        """
@@ -0,0 +1,156 @@
+import hashlib
+import json
+import logging
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional
+
+from backend.src.utils.llm.provider import LLMProvider, LLMResponse, UploadedFile
+from backend.src.utils.single_flight import make_call_key
+
+
+def _file_digest(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class _CallKeys:
+    """
+    Keys calls by what they send, so a recording made with one run's uploaded files replays in another.
+
+    Uploaded files get a new name on every upload, so they are keyed by a digest of their content instead.
+    """
+
+    def __init__(self):
+        self.file_digests: Dict[str, str] = {}
+
+    def add_file(self, name: str, digest: str) -> None:
+        self.file_digests[name] = digest
+
+    def _part(self, part: Any) -> Any:
+        if isinstance(part, UploadedFile):
+            return f"file:{self.file_digests.get(part.name, part.name)}"
+        return part
+
+    def key(self, method: str, model_name: str, contents: Any, generation_config: Optional[Dict[str, Any]] = None) -> str:
+        parts = [self._part(part) for part in contents] if isinstance(contents, list) else self._part(contents)
+        return make_call_key(method, model_name, generation_config, parts)
+
+
+class RecordingProvider(LLMProvider):
+    """
+    Passes calls to another provider and appends each call's key, latency and response to a JSONL file.
+    """
+
+    def __init__(self, inner: LLMProvider, path: str):
+        self.inner = inner
+        self.path = path
+        self.model_name = inner.model_name
+        self.embedding_model_name = inner.embedding_model_name
+        self.rate_limited = inner.rate_limited
+        self.keys = _CallKeys()
+        self.lock = threading.Lock()
+
+    def _record(self, key: str, method: str, latency: float, response: Any) -> None:
+        line = json.dumps({"key": key, "method": method, "latency": round(latency, 4), "response": response})
+        with self.lock, open(self.path, "a") as f:
+            f.write(line + "\n")
+
+    def generate_content(self, contents: Any, generation_config: Optional[Dict[str, Any]] = None, request_options: Optional[Dict[str, Any]] = None) -> LLMResponse:
+        start = time.perf_counter()
+        response = self.inner.generate_content(contents, generation_config, request_options)
+        self._record(self.keys.key("generate", self.model_name, contents, generation_config), "generate", time.perf_counter() - start, response.text)
+        return response
+
+    def stream_content(self, contents: Any, generation_config: Optional[Dict[str, Any]] = None) -> Iterator[str]:
+        start = time.perf_counter()
+        chunks = []
+        for chunk in self.inner.stream_content(contents, generation_config):
+            chunks.append(chunk)
+            yield chunk
+        self._record(self.keys.key("stream", self.model_name, contents, generation_config), "stream", time.perf_counter() - start, chunks)
+
+    def embed(self, texts: List[str], task_type: Optional[str] = "retrieval_query") -> List[List[float]]:
+        start = time.perf_counter()
+        embeddings = self.inner.embed(texts, task_type)
+        self._record(self.keys.key("embed", self.embedding_model_name, texts, {"task_type": task_type}), "embed", time.perf_counter() - start, embeddings)
+        return embeddings
+
+    def upload_file(self, path: str, mime_type: str) -> UploadedFile:
+        start = time.perf_counter()
+        uploaded_file = self.inner.upload_file(path, mime_type)
+        digest = _file_digest(path)
+        self.keys.add_file(uploaded_file.name, digest)
+        self._record(make_call_key("upload", digest, mime_type), "upload", time.perf_counter() - start, None)
+        return uploaded_file
+
+    def get_file(self, name: str) -> UploadedFile:
+        return self.inner.get_file(name)
+
+    def delete_file(self, name: str) -> None:
+        self.inner.delete_file(name)
+
+
+class ReplayProvider(LLMProvider):
+    """
+    Answers calls from a recording made by RecordingProvider, without calling a model.
+
+    A call that was not recorded raises LookupError. With replay_latency, each call sleeps for the
+    latency it had when it was recorded.
+    """
+
+    model_name = "replay"
+    embedding_model_name = "replay-embedding"
+    rate_limited = False
+
+    def __init__(self, path: str, replay_latency: Optional[bool] = False, model_name: Optional[str] = None, embedding_model_name: Optional[str] = None):
+        self.path = path
+        self.replay_latency = replay_latency
+        # Calls are keyed by the names of the models they were recorded with.
+        self.model_name = model_name or self.model_name
+        self.embedding_model_name = embedding_model_name or self.embedding_model_name
+        self.keys = _CallKeys()
+        self.files: Dict[str, UploadedFile] = {}
+        self.records: Dict[str, Dict[str, Any]] = {}
+        with open(path) as f:
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    self.records[record["key"]] = record
+        logging.info(f"Loaded {len(self.records)} recorded model calls from {path}.")
+
+    def _replay(self, key: str, method: str) -> Any:
+        record = self.records.get(key)
+        if record is None:
+            raise LookupError(f"No recorded '{method}' call matches this request in {self.path}.")
+        if self.replay_latency and record["latency"]:
+            time.sleep(record["latency"])
+        return record["response"]
+
+    def generate_content(self, contents: Any, generation_config: Optional[Dict[str, Any]] = None, request_options: Optional[Dict[str, Any]] = None) -> LLMResponse:
+        return LLMResponse(self._replay(self.keys.key("generate", self.model_name, contents, generation_config), "generate"))
+
+    def stream_content(self, contents: Any, generation_config: Optional[Dict[str, Any]] = None) -> Iterator[str]:
+        yield from self._replay(self.keys.key("stream", self.model_name, contents, generation_config), "stream")
+
+    def embed(self, texts: List[str], task_type: Optional[str] = "retrieval_query") -> List[List[float]]:
+        return self._replay(self.keys.key("embed", self.embedding_model_name, texts, {"task_type": task_type}), "embed")
+
+    def upload_file(self, path: str, mime_type: str) -> UploadedFile:
+        digest = _file_digest(path)
+        key = make_call_key("upload", digest, mime_type)
+        if key in self.records:
+            self._replay(key, "upload")
+        uploaded_file = UploadedFile(f"files/replay-{digest[:16]}", f"replay://files/replay-{digest[:16]}", mime_type)
+        self.keys.add_file(uploaded_file.name, digest)
+        self.files[uploaded_file.name] = uploaded_file
+        return uploaded_file
+
+    def get_file(self, name: str) -> UploadedFile:
+        return self.files[name]
+
+    def delete_file(self, name: str) -> None:
+        self.files.pop(name, None)
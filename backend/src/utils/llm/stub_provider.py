@@ -0,0 +1,151 @@
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional
+
+import numpy as np
+
+from backend.src.utils.constants import EMBEDDING_DIMENSIONS, STUB_LLM_DEFAULT_LATENCY
+from backend.src.utils.llm.provider import LLMProvider, LLMResponse, UploadedFile
+
+STUB_TOPICS = ["Definitions", "Key Concepts", "Examples", "Applications", "History", "Comparisons"]
+
+
+class LatencyDistribution:
+    """
+    A distribution of call latencies in seconds, parsed from a spec:
+
+    - 'fixed:<seconds>'
+    - 'uniform:<min>:<max>'
+    - 'normal:<mean>:<std>'
+    - 'lognormal:<mu>:<sigma>', where mu and sigma are of the log of the latency
+    - 'exponential:<mean>'
+
+    Negative samples are clipped to zero.
+    """
+
+    def __init__(self, spec: str, rng: random.Random):
+        self.spec = spec
+        self.rng = rng
+        self.kind, _, params = spec.partition(":")
+        self.params = [float(param) for param in params.split(":") if param]
+
+        samplers = {
+            "fixed": lambda: self.params[0],
+            "uniform": lambda: self.rng.uniform(self.params[0], self.params[1]),
+            "normal": lambda: self.rng.gauss(self.params[0], self.params[1]),
+            "lognormal": lambda: self.rng.lognormvariate(self.params[0], self.params[1]),
+            "exponential": lambda: self.rng.expovariate(1 / self.params[0]) if self.params[0] > 0 else 0.0,
+        }
+        if self.kind not in samplers:
+            raise ValueError(f"Unknown latency distribution: {spec}")
+        self.sampler = samplers[self.kind]
+
+    def sample(self) -> float:
+        return max(0.0, self.sampler())
+
+
+class StubProvider(LLMProvider):
+    """
+    A deterministic local model for load tests and profiling without spending quota.
+
+    Responses depend only on the prompt: quiz prompts get the requested number of multiple choice
+    questions, grading and evaluation prompts get JSON in the schema they ask for, and other prompts
+    get notes-like text. Embeddings are unit vectors seeded by the text. Each call sleeps for a latency
+    drawn from its configured distribution, seeded by STUB_LLM_SEED.
+    """
+
+    model_name = "stub"
+    embedding_model_name = "stub-embedding"
+
+    def __init__(self,
+                 generate_latency: Optional[str] = None,
+                 embed_latency: Optional[str] = None,
+                 upload_latency: Optional[str] = None,
+                 seed: Optional[int] = None,
+                 rate_limited: Optional[bool] = None):
+        rng = random.Random(seed if seed is not None else int(os.getenv("STUB_LLM_SEED", "0")))
+        self.rng_lock = threading.Lock()
+        self.generate_latency = LatencyDistribution(generate_latency or os.getenv("STUB_LLM_GENERATE_LATENCY", STUB_LLM_DEFAULT_LATENCY), rng)
+        self.embed_latency = LatencyDistribution(embed_latency or os.getenv("STUB_LLM_EMBED_LATENCY", STUB_LLM_DEFAULT_LATENCY), rng)
+        self.upload_latency = LatencyDistribution(upload_latency or os.getenv("STUB_LLM_UPLOAD_LATENCY", STUB_LLM_DEFAULT_LATENCY), rng)
+        self.rate_limited = rate_limited if rate_limited is not None else os.getenv("STUB_LLM_RATE_LIMITED", "false").lower() == "true"
+        self.files: Dict[str, UploadedFile] = {}
+
+    def _sleep(self, distribution: LatencyDistribution) -> None:
+        with self.rng_lock:
+            latency = distribution.sample()
+        if latency:
+            time.sleep(latency)
+
+    def generate_content(self, contents: Any, generation_config: Optional[Dict[str, Any]] = None, request_options: Optional[Dict[str, Any]] = None) -> LLMResponse:
+        self._sleep(self.generate_latency)
+        return LLMResponse(self._respond(contents, generation_config))
+
+    def stream_content(self, contents: Any, generation_config: Optional[Dict[str, Any]] = None) -> Iterator[str]:
+        self._sleep(self.generate_latency)
+        words = self._respond(contents, generation_config).split(" ")
+        for i in range(0, len(words), 20):
+            yield " ".join(words[i:i + 20]) + (" " if i + 20 < len(words) else "")
+
+    def embed(self, texts: List[str], task_type: Optional[str] = "retrieval_query") -> List[List[float]]:
+        self._sleep(self.embed_latency)
+        embeddings = []
+        for text in texts:
+            vector = np.random.default_rng(_seed(text)).standard_normal(EMBEDDING_DIMENSIONS)
+            embeddings.append((vector / np.linalg.norm(vector)).tolist())
+        return embeddings
+
+    def upload_file(self, path: str, mime_type: str) -> UploadedFile:
+        self._sleep(self.upload_latency)
+        with open(path, "rb") as f:
+            digest = hashlib.sha256(f.read()).hexdigest()[:16]
+        uploaded_file = UploadedFile(f"files/stub-{digest}", f"stub://files/stub-{digest}", mime_type)
+        self.files[uploaded_file.name] = uploaded_file
+        return uploaded_file
+
+    def get_file(self, name: str) -> UploadedFile:
+        return self.files[name]
+
+    def delete_file(self, name: str) -> None:
+        self.files.pop(name, None)
+
+    def _respond(self, contents: Any, generation_config: Optional[Dict[str, Any]]) -> str:
+        parts = contents if isinstance(contents, list) else [contents]
+        prompt = "\n".join(part if isinstance(part, str) else f"[{part.name}]" for part in parts)
+        seed = _seed(prompt)
+        wants_json = (generation_config or {}).get("response_mime_type") == "application/json"
+
+        quiz_match = re.search(r"generate (\d+) quiz questions", prompt)
+        if quiz_match:
+            return json.dumps([_stub_question(seed, i) for i in range(int(quiz_match.group(1)))])
+        if '"strength"' in prompt and '"weakness"' in prompt:
+            return json.dumps({"strength": f"You understand {STUB_TOPICS[seed % len(STUB_TOPICS)].lower()} well.",
+                               "weakness": f"Review {STUB_TOPICS[(seed // 7) % len(STUB_TOPICS)].lower()}."})
+        if '"correctness"' in prompt:
+            return json.dumps({"correctness": seed % 2})
+        if wants_json:
+            return json.dumps({"text": f"Stub response {seed:x}"})
+
+        sections = [f"## {STUB_TOPICS[(seed + i) % len(STUB_TOPICS)]}\n- Point {seed % 97 + i}: summary of the content.\n- Detail {i}."
+                    for i in range(3 + seed % 3)]
+        return f"# Notes {seed:x}\n\n" + "\n\n".join(sections)
+
+
+def _seed(text: str) -> int:
+    return int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "big")
+
+
+def _stub_question(seed: int, index: int) -> Dict[str, Any]:
+    question_seed = _seed(f"{seed}:{index}")
+    return {
+        "question": f"Stub question {question_seed:x}?",
+        "choices": [f"Option {choice}" for choice in "ABCD"],
+        "answer": question_seed % 4,
+        "explanation": "Generated by the stub model.",
+        "topic": STUB_TOPICS[question_seed % len(STUB_TOPICS)],
+    }
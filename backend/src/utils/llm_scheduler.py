@@ -0,0 +1,368 @@
+import hashlib
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from typing import Any, Deque, Dict, Iterator, List, Optional, Tuple, Union
+
+import numpy as np
+from google.api_core.exceptions import ResourceExhausted
+
+from backend.src.utils.cache.cache import SharedCache
+from backend.src.utils.cache.factory import get_shared_cache
+from backend.src.utils.constants import (EMBEDDING_CACHE_TTL_SECONDS, EMBEDDING_MODEL, EMBEDDING_REQUESTS_PER_MINUTE, GEMINI_REQUESTS_PER_MINUTE, LLM_MAX_QUEUE_WAIT_SECONDS, LLM_MAX_QUEUED_CALLS,
+                                         PRIORITY_BACKGROUND, PRIORITY_INTERACTIVE, PRIORITY_STANDARD)
+from backend.src.utils.exceptions import RateLimitExceeded
+from backend.src.utils.llm.provider import LLMProvider, LLMResponse
+from backend.src.utils.metrics import get_counter, get_histogram, get_request_label
+from backend.src.utils.single_flight import SingleFlight, make_call_key
+
+EMBEDDINGS_NAMESPACE = "embeddings"
+RATE_LIMITS_NAMESPACE = "llm_rate_limits"
+
+PRIORITY_NAMES = {PRIORITY_INTERACTIVE: "interactive", PRIORITY_STANDARD: "standard", PRIORITY_BACKGROUND: "background"}
+
+queue_time_histogram = get_histogram("llm_queue_seconds", "Time model calls waited for a rate-limit slot, by model and priority", ("model", "priority"))
+embedding_cache_counter = get_counter("embedding_cache_requests_total", "Embedding cache lookups by outcome", ("outcome",))
+llm_requests_counter = get_counter("llm_requests_total", "Model calls by model, priority and scheduling outcome", ("model", "priority", "outcome"))
+
+
+class TokenBucket:
+    """
+    A token bucket refilled at a fixed rate per minute, up to one minute's worth of tokens.
+    """
+
+    def __init__(self, requests_per_minute: float):
+        self.rate = requests_per_minute / 60
+        self.capacity = max(requests_per_minute, 1)
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def try_take(self) -> bool:
+        """
+        Takes a token if one is available.
+        """
+        self._refill()
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    def seconds_until(self, tokens: float) -> float:
+        """
+        Returns the seconds until the given number of tokens will have been available.
+        """
+        self._refill()
+        return max(0.0, (tokens - self.tokens) / self.rate) if self.rate > 0 else float("inf")
+
+    def drain(self) -> None:
+        """
+        Empties the bucket, e.g. after the provider reported the quota as exhausted.
+        """
+        self._refill()
+        self.tokens = min(self.tokens, 0)
+
+
+class SharedTokenBucket:
+    """
+    A token bucket kept in a shared cache, so that every server worker using the cache takes from the same bucket.
+    """
+
+    def __init__(self, cache: SharedCache, key: str, requests_per_minute: float):
+        self.cache = cache
+        self.key = key
+        self.rate = requests_per_minute / 60
+        self.capacity = max(requests_per_minute, 1)
+
+    def try_take(self) -> bool:
+        """
+        Takes a token if one is available.
+        """
+        taken, _ = self.cache.take_tokens(RATE_LIMITS_NAMESPACE, self.key, self.rate, self.capacity, 1)
+        return taken
+
+    def seconds_until(self, tokens: float) -> float:
+        """
+        Returns the seconds until the given number of tokens will have been available.
+        """
+        _, available = self.cache.take_tokens(RATE_LIMITS_NAMESPACE, self.key, self.rate, self.capacity, 0)
+        return max(0.0, (tokens - available) / self.rate) if self.rate > 0 else float("inf")
+
+    def drain(self) -> None:
+        """
+        Empties the bucket, e.g. after the provider reported the quota as exhausted.
+        """
+        self.cache.take_tokens(RATE_LIMITS_NAMESPACE, self.key, self.rate, self.capacity, 0, drain=True)
+
+
+class _Waiter:
+    def __init__(self, user_id: str, priority: int):
+        self.user_id = user_id
+        self.priority = priority
+        self.enqueued_at = time.monotonic()
+
+
+class _ModelQueue:
+    """
+    The rate limit and waiting calls of one model and API key.
+
+    Waiting calls are served by priority, and round-robin across users within a priority, so one
+    user's batch of background calls does not hold up other users.
+    """
+
+    def __init__(self, bucket: Union[TokenBucket, SharedTokenBucket]):
+        self.bucket = bucket
+        self.queues: List["OrderedDict[str, Deque[_Waiter]]"] = [OrderedDict() for _ in PRIORITY_NAMES]
+
+    def push(self, waiter: _Waiter) -> None:
+        self.queues[waiter.priority].setdefault(waiter.user_id, deque()).append(waiter)
+
+    def head(self) -> Optional[_Waiter]:
+        for queue in self.queues:
+            if queue:
+                return next(iter(queue.values()))[0]
+        return None
+
+    def remove(self, waiter: _Waiter) -> None:
+        queue = self.queues[waiter.priority]
+        user_waiters = queue.get(waiter.user_id)
+        if user_waiters is None or waiter not in user_waiters:
+            return
+        was_next = user_waiters[0] is waiter
+        user_waiters.remove(waiter)
+        if not user_waiters:
+            del queue[waiter.user_id]
+        elif was_next:
+            # The user has had their turn, so the next user at this priority goes first.
+            queue.move_to_end(waiter.user_id)
+
+    def waiting_ahead(self, priority: int) -> int:
+        return sum(len(user_waiters) for queue in self.queues[:priority + 1] for user_waiters in queue.values())
+
+
+class LLMScheduler:
+    """
+    Schedules model calls within per-model, per-API-key rate limits.
+
+    With a shared cache backend the rate limits are kept in the cache, so they hold across all
+    server workers using it. Priorities and fair queuing then apply within each worker, and the
+    estimated wait only counts the calls waiting in this worker.
+
+    Each waiting call blocks its thread, so at most `max_queued` calls wait at once across all models,
+    and further calls are rejected straight away.
+    """
+
+    def __init__(self, max_wait: Optional[float] = LLM_MAX_QUEUE_WAIT_SECONDS, max_queued: Optional[int] = LLM_MAX_QUEUED_CALLS):
+        self.max_wait = max_wait
+        self.max_queued = max_queued
+        self.queued = 0
+        self.model_queues: Dict[Tuple[str, str], _ModelQueue] = {}
+        self.condition = threading.Condition()
+
+    def _model_queue(self, model_name: str) -> _ModelQueue:
+        key = (model_name, _api_key_id())
+        if key not in self.model_queues:
+            requests_per_minute = get_requests_per_minute(model_name)
+            cache = get_shared_cache()
+            if cache.is_shared:
+                bucket = SharedTokenBucket(cache, f"{model_name}:{key[1]}", requests_per_minute)
+            else:
+                bucket = TokenBucket(requests_per_minute)
+            self.model_queues[key] = _ModelQueue(bucket)
+        return self.model_queues[key]
+
+    def estimated_wait(self, model_name: str, priority: Optional[int] = PRIORITY_STANDARD) -> float:
+        """
+        Returns the estimated seconds a new call would wait for a slot.
+
+        The estimate counts the calls already waiting at the same or a higher priority, so calls of a
+        higher priority arriving later can still make the actual wait longer.
+
+        Args:
+            model_name (str): The name of the model.
+            priority (Optional[int]): The priority class of the call.
+
+        Returns:
+            float: The estimated wait in seconds.
+        """
+        with self.condition:
+            model_queue = self._model_queue(model_name)
+            return model_queue.bucket.seconds_until(model_queue.waiting_ahead(priority) + 1)
+
+    @contextmanager
+    def slot(self, model_name: str, priority: Optional[int] = PRIORITY_STANDARD, user_id: Optional[str] = None) -> Iterator[None]:
+        """
+        Waits for a rate-limit slot for one call to a model, then runs the body.
+
+        Args:
+            model_name (str): The name of the model.
+            priority (Optional[int]): PRIORITY_INTERACTIVE, PRIORITY_STANDARD or PRIORITY_BACKGROUND.
+            user_id (Optional[str]): The user the call is made for, for fair queuing. Defaults to the current request's user.
+
+        Raises:
+            RateLimitExceeded: If the estimated or actual wait exceeds the scheduler's max wait, too many calls are
+                waiting already, or the provider reports the quota as exhausted.
+        """
+        priority_name = PRIORITY_NAMES[priority]
+        waiter = _Waiter(user_id or get_request_label("user_id", "anonymous"), priority)
+
+        with self.condition:
+            model_queue = self._model_queue(model_name)
+            estimated_wait = model_queue.bucket.seconds_until(model_queue.waiting_ahead(priority) + 1)
+            if estimated_wait > self.max_wait:
+                llm_requests_counter.inc(model=model_name, priority=priority_name, outcome="rejected")
+                raise RateLimitExceeded(f"The model is busy. Please try again in about {estimated_wait:.0f} seconds.", estimated_wait)
+
+            # A call that finds no other call waiting for the model and a token free does not wait.
+            if model_queue.head() is not None or not model_queue.bucket.try_take():
+                if self.queued >= self.max_queued:
+                    llm_requests_counter.inc(model=model_name, priority=priority_name, outcome="rejected")
+                    retry_after = max(estimated_wait, 1.0)
+                    raise RateLimitExceeded(f"Too many requests are waiting for the model. Please try again in about {retry_after:.0f} seconds.", retry_after)
+                self._wait_for_token(model_name, model_queue, waiter)
+
+        queue_time_histogram.observe(time.monotonic() - waiter.enqueued_at, model=model_name, priority=priority_name)
+        try:
+            yield
+        except ResourceExhausted as e:
+            with self.condition:
+                model_queue.bucket.drain()
+                retry_after = model_queue.bucket.seconds_until(model_queue.waiting_ahead(priority) + 1)
+            llm_requests_counter.inc(model=model_name, priority=priority_name, outcome="quota_exhausted")
+            logging.warning(f"Quota of {model_name} exhausted: {e}")
+            raise RateLimitExceeded(f"The model's quota is exhausted. Please try again in about {retry_after:.0f} seconds.", retry_after) from e
+        except Exception:
+            llm_requests_counter.inc(model=model_name, priority=priority_name, outcome="failed")
+            raise
+        llm_requests_counter.inc(model=model_name, priority=priority_name, outcome="completed")
+
+    def _wait_for_token(self, model_name: str, model_queue: _ModelQueue, waiter: _Waiter) -> None:
+        # Called with the condition held.
+        priority_name = PRIORITY_NAMES[waiter.priority]
+        model_queue.push(waiter)
+        self.queued += 1
+        try:
+            while not (model_queue.head() is waiter and model_queue.bucket.try_take()):
+                waited = time.monotonic() - waiter.enqueued_at
+                if waited > self.max_wait:
+                    llm_requests_counter.inc(model=model_name, priority=priority_name, outcome="timed_out")
+                    retry_after = model_queue.bucket.seconds_until(model_queue.waiting_ahead(waiter.priority))
+                    raise RateLimitExceeded(f"The model is busy. Please try again in about {retry_after:.0f} seconds.", retry_after)
+                # Only the head can take the next token, so others wait to be notified when it moves.
+                timeout = model_queue.bucket.seconds_until(1) if model_queue.head() is waiter else self.max_wait - waited
+                self.condition.wait(timeout=max(timeout, 0.01))
+        finally:
+            model_queue.remove(waiter)
+            self.queued -= 1
+            self.condition.notify_all()
+
+
+def get_requests_per_minute(model_name: str) -> float:
+    """
+    Returns the requests per minute allowed for a model, from EMBEDDING_REQUESTS_PER_MINUTE or GEMINI_REQUESTS_PER_MINUTE.
+    """
+    if model_name == EMBEDDING_MODEL:
+        return float(os.getenv("EMBEDDING_REQUESTS_PER_MINUTE", EMBEDDING_REQUESTS_PER_MINUTE))
+    return float(os.getenv("GEMINI_REQUESTS_PER_MINUTE", GEMINI_REQUESTS_PER_MINUTE))
+
+
+def _api_key_id() -> str:
+    return hashlib.sha256(os.getenv("GOOGLE_API_KEY", "").encode("utf-8")).hexdigest()[:12]
+
+
+_scheduler: Optional[LLMScheduler] = None
+_generate_flights = SingleFlight("generate")
+_embed_flights = SingleFlight("embed")
+_scheduler_lock = threading.Lock()
+
+
+def get_llm_scheduler() -> LLMScheduler:
+    """
+    Returns the process-wide model call scheduler, waiting at most LLM_MAX_QUEUE_WAIT_SECONDS for a slot
+    with at most LLM_MAX_QUEUED_CALLS calls waiting.
+    """
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = LLMScheduler(float(os.getenv("LLM_MAX_QUEUE_WAIT_SECONDS", LLM_MAX_QUEUE_WAIT_SECONDS)),
+                                      int(os.getenv("LLM_MAX_QUEUED_CALLS", LLM_MAX_QUEUED_CALLS)))
+        return _scheduler
+
+
+def generate_content(model: LLMProvider, contents: Any, priority: Optional[int] = PRIORITY_STANDARD, **kwargs: Any) -> LLMResponse:
+    """
+    Calls `model.generate_content` once a rate-limit slot for the model is free.
+
+    Concurrent calls with the same model, generation config, prompt and priority share one upstream
+    call, so a call never waits behind one of a lower priority. Calls to providers that are not rate
+    limited, such as the local stub, skip the scheduler.
+
+    Args:
+        model (LLMProvider): The model provider.
+        contents (Any): The prompt and any files.
+        priority (Optional[int]): The priority class of the call.
+        **kwargs (Any): Passed on to `generate_content`.
+
+    Returns:
+        LLMResponse: The model's response.
+
+    Raises:
+        RateLimitExceeded: If no slot is free within the scheduler's max wait.
+    """
+    def call() -> LLMResponse:
+        if not model.rate_limited:
+            return model.generate_content(contents, **kwargs)
+        with get_llm_scheduler().slot(model.model_name, priority):
+            return model.generate_content(contents, **kwargs)
+
+    # The request options only set the timeout, so they do not change the response.
+    key = make_call_key(model.model_name, priority, kwargs.get("generation_config"), contents)
+    return _generate_flights.do(key, call)
+
+
+def embed(model: LLMProvider, texts: List[str], task_type: Optional[str] = "retrieval_query", priority: Optional[int] = PRIORITY_STANDARD) -> List[List[float]]:
+    """
+    Calls `model.embed` once a rate-limit slot for the embedding model is free.
+
+    Embeddings are kept in the shared cache for EMBEDDING_CACHE_TTL_SECONDS, so only texts that no
+    worker has embedded with the same model and task type are sent. Concurrent calls with the same
+    texts, task type and priority share one upstream call.
+
+    Args:
+        model (LLMProvider): The model provider.
+        texts (List[str]): The texts to embed.
+        task_type (Optional[str]): The embedding task, e.g. 'retrieval_query' or 'retrieval_document'.
+        priority (Optional[int]): The priority class of the call.
+
+    Returns:
+        List[List[float]]: The embedding of each text, in order.
+
+    Raises:
+        RateLimitExceeded: If no slot is free within the scheduler's max wait.
+    """
+    cache = get_shared_cache()
+    keys = [make_call_key(model.embedding_model_name, task_type, text) for text in texts]
+    embeddings = {key: np.frombuffer(value, dtype=np.float64).tolist() for key, value in cache.get_many(EMBEDDINGS_NAMESPACE, keys).items()}
+    missing_texts = {key: text for key, text in zip(keys, texts) if key not in embeddings}
+    embedding_cache_counter.inc(len(keys) - len(missing_texts), outcome="hit")
+    embedding_cache_counter.inc(len(missing_texts), outcome="miss")
+
+    if missing_texts:
+        def call() -> List[List[float]]:
+            if not model.rate_limited:
+                return model.embed(list(missing_texts.values()), task_type)
+            with get_llm_scheduler().slot(model.embedding_model_name, priority):
+                return model.embed(list(missing_texts.values()), task_type)
+
+        new_embeddings = dict(zip(missing_texts, _embed_flights.do(make_call_key(model.embedding_model_name, task_type, priority, list(missing_texts.values())), call)))
+        cache.set_many(EMBEDDINGS_NAMESPACE, {key: np.asarray(embedding, dtype=np.float64).tobytes() for key, embedding in new_embeddings.items()}, EMBEDDING_CACHE_TTL_SECONDS)
+        embeddings.update(new_embeddings)
+
+    return [embeddings[key] for key in keys]
@@ -0,0 +1,251 @@
+import contextvars
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+
+from backend.src.utils.constants import LATENCY_BUCKETS_SECONDS
+
+
+class Counter:
+    """
+    A monotonically increasing metric, optionally split by labels.
+    """
+
+    def __init__(self, name: str, description: str, label_names: Optional[Tuple[str, ...]] = ()):
+        self.name = name
+        self.description = description
+        self.label_names = tuple(label_names)
+        self.values: Dict[Tuple[str, ...], float] = {}
+        self.lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(label_name, "")) for label_name in self.label_names)
+
+    def inc(self, amount: Optional[float] = 1, **labels: str) -> None:
+        """
+        Increments the counter.
+
+        Args:
+            amount (Optional[float]): The amount to add. Defaults to 1.
+            **labels (str): The label values.
+        """
+        key = self._key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def value(self, **labels: str) -> float:
+        """
+        Returns the current value of the counter for the given labels.
+        """
+        with self.lock:
+            return self.values.get(self._key(labels), 0)
+
+
+class Histogram:
+    """
+    A distribution of observed values in cumulative buckets, optionally split by labels.
+    """
+
+    def __init__(self, name: str, description: str, label_names: Optional[Tuple[str, ...]] = (), buckets: Optional[Tuple[float, ...]] = LATENCY_BUCKETS_SECONDS):
+        self.name = name
+        self.description = description
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(sorted(buckets))
+        self.values: Dict[Tuple[str, ...], List[float]] = {}
+        self.lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(label_name, "")) for label_name in self.label_names)
+
+    def observe(self, value: float, **labels: str) -> None:
+        """
+        Records an observation.
+
+        Args:
+            value (float): The observed value.
+            **labels (str): The label values.
+        """
+        key = self._key(labels)
+        with self.lock:
+            # One count per bucket plus the +Inf bucket, then the sum.
+            counts = self.values.setdefault(key, [0] * (len(self.buckets) + 2))
+            counts[bisect_left(self.buckets, value)] += 1
+            counts[-1] += value
+
+    def snapshot(self, **labels: str) -> Dict[str, Union[float, List[float]]]:
+        """
+        Returns the cumulative bucket counts, count and sum observed for the given labels.
+        """
+        with self.lock:
+            counts = list(self.values.get(self._key(labels), [0] * (len(self.buckets) + 2)))
+        cumulative = []
+        total = 0
+        for count in counts[:-1]:
+            total += count
+            cumulative.append(total)
+        return {"buckets": cumulative, "count": total, "sum": counts[-1]}
+
+
+_metrics: Dict[str, Union[Counter, Histogram]] = {}
+_metrics_lock = threading.Lock()
+
+
+def get_counter(name: str, description: str, label_names: Optional[Tuple[str, ...]] = ()) -> Counter:
+    """
+    Returns the counter registered under a name, registering it on first use.
+
+    Args:
+        name (str): The metric name.
+        description (str): What the metric counts.
+        label_names (Optional[Tuple[str, ...]]): The names of the labels the counter is split by.
+
+    Returns:
+        Counter: The registered counter.
+    """
+    with _metrics_lock:
+        if name not in _metrics:
+            _metrics[name] = Counter(name, description, label_names)
+        return _metrics[name]
+
+
+def get_histogram(name: str, description: str, label_names: Optional[Tuple[str, ...]] = (), buckets: Optional[Tuple[float, ...]] = LATENCY_BUCKETS_SECONDS) -> Histogram:
+    """
+    Returns the histogram registered under a name, registering it on first use.
+
+    Args:
+        name (str): The metric name.
+        description (str): What the metric measures.
+        label_names (Optional[Tuple[str, ...]]): The names of the labels the histogram is split by.
+        buckets (Optional[Tuple[float, ...]]): The upper bounds of the buckets. Defaults to LATENCY_BUCKETS_SECONDS.
+
+    Returns:
+        Histogram: The registered histogram.
+    """
+    with _metrics_lock:
+        if name not in _metrics:
+            _metrics[name] = Histogram(name, description, label_names, buckets)
+        return _metrics[name]
+
+
+def get_all_metrics() -> Dict[str, Union[Counter, Histogram]]:
+    """
+    Returns all registered metrics by name.
+    """
+    with _metrics_lock:
+        return dict(_metrics)
+
+
+def _format_labels(label_names: Tuple[str, ...], key: Tuple[str, ...], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(zip(label_names, key)) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    escaped = (value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+def render_prometheus() -> str:
+    """
+    Renders all registered metrics in the Prometheus text exposition format.
+
+    Returns:
+        str: The metrics, one family per metric name.
+    """
+    lines = []
+    for name, metric in sorted(get_all_metrics().items()):
+        with metric.lock:
+            values = {key: list(value) if isinstance(value, list) else value for key, value in metric.values.items()}
+
+        lines.append(f"# HELP {name} {metric.description}")
+        if isinstance(metric, Counter):
+            lines.append(f"# TYPE {name} counter")
+            for key, value in sorted(values.items()):
+                lines.append(f"{name}{_format_labels(metric.label_names, key)} {_format_value(value)}")
+            continue
+
+        lines.append(f"# TYPE {name} histogram")
+        for key, counts in sorted(values.items()):
+            cumulative = 0
+            for upper_bound, count in zip(metric.buckets + (float("inf"),), counts[:-1]):
+                cumulative += count
+                lines.append(f"{name}_bucket{_format_labels(metric.label_names, key, ('le', _format_value(upper_bound)))} {cumulative}")
+            lines.append(f"{name}_sum{_format_labels(metric.label_names, key)} {_format_value(counts[-1])}")
+            lines.append(f"{name}_count{_format_labels(metric.label_names, key)} {cumulative}")
+
+    return "\n".join(lines) + "\n"
+
+
+_request_labels: contextvars.ContextVar[Optional[Dict[str, str]]] = contextvars.ContextVar("request_labels", default=None)
+
+stage_latency_histogram = get_histogram("stage_duration_seconds", "Time spent in each stage of a request, by route, stage and file type", ("route", "stage", "file_type"))
+
+
+def start_request_labels() -> contextvars.Token:
+    """
+    Starts collecting the metric labels of a new request in the current context.
+
+    The labels are kept in one dict shared with contexts copied from this one, so labels set
+    inside a sync endpoint's worker thread are seen by the middleware that started the request.
+
+    Returns:
+        contextvars.Token: The token to reset the context with.
+    """
+    return _request_labels.set({})
+
+
+def reset_request_labels(token: contextvars.Token) -> Dict[str, str]:
+    """
+    Stops collecting the metric labels of the current request in the current context.
+
+    Call it in the context `start_request_labels` was called in. Labels set while the response body
+    streams, in another context, are still added to the returned dict.
+
+    Returns:
+        Dict[str, str]: The labels of the request.
+    """
+    labels = _request_labels.get()
+    _request_labels.reset(token)
+    return labels
+
+
+def set_request_label(name: str, value: str) -> None:
+    """
+    Sets a metric label, e.g. 'route' or 'file_type', on the current request. Does nothing outside a request.
+    """
+    labels = _request_labels.get()
+    if labels is not None:
+        labels[name] = value
+
+
+def get_request_label(name: str, default: Optional[str] = "") -> str:
+    """
+    Returns a metric label of the current request.
+    """
+    labels = _request_labels.get()
+    return labels.get(name, default) if labels is not None else default
+
+
+@contextmanager
+def span(stage: str) -> Iterator[None]:
+    """
+    Times a stage of the current request and records it in the 'stage_duration_seconds' histogram,
+    labelled with the request's route and file type.
+
+    Args:
+        stage (str): The name of the stage, e.g. 'extraction' or 'generation'.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stage_latency_histogram.observe(time.perf_counter() - start,
+                                        route=get_request_label("route", "background"),
+                                        stage=stage,
+                                        file_type=get_request_label("file_type"))
@@ -0,0 +1,124 @@
+import contextvars
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Iterator, List, Optional, Tuple
+
+from backend.src.api.v1.models.requests import NotesCustomisationRequest
+from backend.src.utils.constants import NOTES_BATCH_CONCURRENCY, PRIORITY_BACKGROUND
+from backend.src.utils.llm.provider import LLMProvider
+from backend.src.utils.llm_scheduler import generate_content
+from backend.src.utils.metrics import get_counter, get_request_label, set_request_label, span, start_request_labels
+from backend.src.utils.notes.notes_generation import generate_notes, get_notes_customisation_params
+
+batch_files_counter = get_counter("notes_batch_files_total", "Files of batch notes requests by outcome", ("outcome",))
+
+
+class BatchNotesResult:
+    """
+    The outcome of generating notes for one file of a batch.
+    """
+
+    def __init__(self, index: int, file_name: str, notes: Optional[str] = None, error: Optional[Exception] = None):
+        self.index = index
+        self.file_name = file_name
+        self.notes = notes
+        self.error = error
+
+
+def get_batch_concurrency() -> int:
+    """
+    Returns how many files of a batch are processed at once, from NOTES_BATCH_CONCURRENCY.
+    """
+    return max(1, int(os.getenv("NOTES_BATCH_CONCURRENCY", NOTES_BATCH_CONCURRENCY)))
+
+
+def generate_notes_batch(model: LLMProvider, files: List[Tuple[str, str]], notes_customisation: NotesCustomisationRequest,
+                         concurrency: Optional[int] = None) -> Iterator[BatchNotesResult]:
+    """
+    Generates notes for several files concurrently, yielding each file's result as soon as it is ready.
+
+    Files are extracted and their notes generated on up to `concurrency` threads, so a batch takes about
+    as long as its slowest file while the model's rate limit allows. A file that fails does not stop
+    the others; its result carries the error instead.
+
+    The contexts to run the files in are copied when this function is called, not when the iterator
+    is first advanced, so call it inside the request the files belong to.
+
+    Args:
+        model (LLMProvider): The model provider to use for generating notes.
+        files (List[Tuple[str, str]]): The path and name, with extension, of each file.
+        notes_customisation (NotesCustomisationRequest): The customisation options, shared by all files.
+        concurrency (Optional[int]): The most files processed at once. Defaults to `get_batch_concurrency()`.
+
+    Returns:
+        Iterator[BatchNotesResult]: The result of each file, in the order they finish.
+    """
+    route = get_request_label("route", "background")
+    # Each file runs in its own copy of the caller's context, with its own metric labels so that
+    # its stages are labelled with its file type.
+    contexts = [contextvars.copy_context() for _ in files]
+
+    def run(index: int, file_path: str, file_name: str) -> BatchNotesResult:
+        start_request_labels()
+        set_request_label("route", route)
+        try:
+            notes = generate_notes(model, file_path, file_name, notes_customisation)
+        except Exception as e:
+            logging.error(f"Failed to generate notes for {file_name}: {e}")
+            batch_files_counter.inc(outcome="failed")
+            return BatchNotesResult(index, file_name, error=e)
+        batch_files_counter.inc(outcome="generated")
+        return BatchNotesResult(index, file_name, notes=notes)
+
+    return _run_batch(run, contexts, files, min(concurrency or get_batch_concurrency(), max(1, len(files))))
+
+
+def _run_batch(run: Callable[[int, str, str], BatchNotesResult], contexts: List[contextvars.Context], files: List[Tuple[str, str]], max_workers: int) -> Iterator[BatchNotesResult]:
+    executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="notes-batch")
+    try:
+        futures = [executor.submit(context.run, run, index, file_path, file_name) for index, (context, (file_path, file_name)) in enumerate(zip(contexts, files))]
+        for future in as_completed(futures):
+            yield future.result()
+    finally:
+        # Files not started yet are dropped if the caller stops early, e.g. when the client disconnects.
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def generate_combined_summary(model: LLMProvider, results: List[BatchNotesResult], notes_customisation: NotesCustomisationRequest) -> str:
+    """
+    Generates one summary across the notes of several files.
+
+    Args:
+        model (LLMProvider): The model provider to use for generating the summary.
+        results (List[BatchNotesResult]): The results of the batch. Files without notes are left out.
+        notes_customisation (NotesCustomisationRequest): The customisation options.
+
+    Returns:
+        str: The combined summary.
+
+    Raises:
+        ValueError: If no file has notes.
+    """
+    notes_by_file = [(result.file_name, result.notes) for result in sorted(results, key=lambda result: result.index) if result.notes is not None]
+    if not notes_by_file:
+        raise ValueError("No notes were generated to summarise.")
+
+    customisation = get_notes_customisation_params(notes_customisation)
+    notes_text = "\n\n".join(f"Notes from {file_name}:\n{notes}" for file_name, notes in notes_by_file)
+    prompt = f"""
+    You are a skilled note-taker tasked with combining the notes of {len(notes_by_file)} files into one summary.
+    Please generate a well-structured summary with headings and bullet points that brings together the key points of all files,
+    merging overlapping topics and noting which file each topic comes from, based on the following preferences:
+    - Focus: {customisation['focus'] if customisation['focus'] else 'General'}
+    - Tone: {customisation['tone'] if customisation['tone'] else 'neutral'}
+    - Emphasis: {customisation['emphasis'] if customisation['emphasis'] else 'balanced'}
+    - Length: {customisation['length'] if customisation['length'] else 'standard'}
+    - Language: {customisation['language']}
+
+    {notes_text}
+    """
+
+    with span("summary"):
+        response = generate_content(model, prompt, PRIORITY_BACKGROUND)
+    return response.text
@@ -1,18 +1,18 @@
 import logging
 
-import google.generativeai as genai
-from google.generativeai.types import File
+from backend.src.utils.llm.factory import get_llm_provider
+from backend.src.utils.llm.provider import UploadedFile
 
 
-def cleanup_file(file: File) -> None:
+def cleanup_file(file: UploadedFile) -> None:
     """
-    Deletes a file from the Google Generative AI storage.
+    Deletes a file from the model provider's file storage.
 
     Args:
-        file (File): The file object to be deleted.
+        file (UploadedFile): The file object to be deleted.
 
     Returns:
         None
     """
-    genai.delete_file(file.name)
+    get_llm_provider().delete_file(file.name)
     logging.info(f'Deleted file {file.uri}')
\ No newline at end of file
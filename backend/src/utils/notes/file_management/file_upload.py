@@ -2,12 +2,11 @@ import logging
 import time
 from typing import Any, Dict
 
-from moviepy.editor import VideoFileClip
-
-import google.generativeai as genai
-from google.generativeai.types import File
-
 from backend.src.utils.constants import IMAGE, VIDEO, IMAGE_MIME_TYPES, VIDEO_MIME_TYPES
+from backend.src.utils.llm.factory import get_llm_provider
+from backend.src.utils.llm.provider import UploadedFile
+from backend.src.utils.metrics import span
+from backend.src.utils.notes.file_management.video_preprocessing import preprocess_video
 
 
 def get_video_metadata(video_path: str) -> Dict[str, Any]:
@@ -23,6 +22,8 @@ def get_video_metadata(video_path: str) -> Dict[str, Any]:
     Raises:
         Exception: If an error occurs while processing the video file.
     """
+    from moviepy.editor import VideoFileClip
+
     try:
         clip = VideoFileClip(video_path)
         video_metadata = {
@@ -37,16 +38,18 @@ def get_video_metadata(video_path: str) -> Dict[str, Any]:
         return {}
 
 
-def upload_video_file(video_path: str, ext: str) -> File:
+def upload_video_file(video_path: str, ext: str) -> UploadedFile:
     """
-    Uploads a video file to Google Generative AI storage and waits for processing to complete.
+    Uploads a video file to the model provider's file storage and waits for processing to complete.
+
+    The video is first shrunk with ffmpeg as set by VIDEO_PREPROCESSING, see `preprocess_video`.
 
     Args:
         video_path (str): The path to the video file.
         ext (str): Extension of the file.
 
     Returns:
-        File: The uploaded video file object.
+        UploadedFile: The uploaded video file object.
 
     Raises:
         ValueError: If the video file is too long or if the upload fails.
@@ -64,20 +67,24 @@ def upload_video_file(video_path: str, ext: str) -> File:
         logging.info(f"Duration of the video is {video_metadata['duration']}")
         raise ValueError("Video file is too long. Make sure it does not exceed 2 hours.")
 
-    video_file_name = video_path
+    with span("preprocessing"):
+        video = preprocess_video(video_path, mime_type)
+
     logging.info(f"Uploading file...")
     try:
-        video_file = genai.upload_file(path=video_file_name, mime_type=mime_type)
+        video_file = get_llm_provider().upload_file(video.path, video.mime_type)
         logging.info(f"Completed upload: {video_file}")
     except Exception as e:
         logging.error(f"Video upload failed: {e}")
         raise
+    finally:
+        video.cleanup()
     logging.info(f"Completed upload: {video_file}")
 
     while video_file.state.name == "PROCESSING":
         print('.', end='')
         time.sleep(10)
-        video_file = genai.get_file(video_file.name)
+        video_file = get_llm_provider().get_file(video_file.name)
 
     if video_file.state.name == "FAILED":
         raise ValueError(video_file.state.name)
@@ -85,16 +92,16 @@ def upload_video_file(video_path: str, ext: str) -> File:
     return video_file
 
 
-def upload_image_file(image_path: str, ext: str) -> File:
+def upload_image_file(image_path: str, ext: str) -> UploadedFile:
     """
-    Uploads an image file to Google Generative AI storage.
+    Uploads an image file to the model provider's file storage.
 
     Args:
         image_path (str): The path to the image file.
         ext (str): Extension of the file.
 
     Returns:
-        File: The uploaded image file object.
+        UploadedFile: The uploaded image file object.
 
     Raises:
         Exception: If the upload fails.
@@ -104,7 +111,7 @@ def upload_image_file(image_path: str, ext: str) -> File:
         if not mime_type:
             raise ValueError(f"Unsupported video file type: {ext}")
 
-        image_file = genai.upload_file(path=image_path, mime_type=mime_type)
+        image_file = get_llm_provider().upload_file(image_path, mime_type)
         logging.info(f"Completed upload: {image_file}")
     except Exception as e:
         raise Exception(f"Error occurred: {e}")
@@ -112,9 +119,9 @@ def upload_image_file(image_path: str, ext: str) -> File:
     return image_file
 
 
-def upload_file(file_path: str, file_type: str, ext: str) -> File:
+def upload_file(file_path: str, file_type: str, ext: str) -> UploadedFile:
     """
-    Uploads a file to Google Generative AI storage based on its type.
+    Uploads a file to the model provider's file storage based on its type.
 
     Args:
         file_path (str): The path to the file.
@@ -122,7 +129,7 @@ def upload_file(file_path: str, file_type: str, ext: str) -> File:
         ext (str): Extension of the file.
 
     Returns:
-        File: The uploaded file object.
+        UploadedFile: The uploaded file object.
 
     Raises:
         ValueError: If the file type is unsupported.
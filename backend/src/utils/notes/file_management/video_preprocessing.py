@@ -0,0 +1,156 @@
+import logging
+import os
+import shutil
+import subprocess
+import time
+from tempfile import NamedTemporaryFile
+from typing import List, Optional
+
+from backend.src.utils.constants import (KEYFRAME_VIDEO, ORIGINAL_VIDEO, TRANSCODED_VIDEO, VIDEO_AUDIO_BITRATE, VIDEO_KEYFRAME_MAX_HEIGHT,
+                                         VIDEO_KEYFRAME_SCENE_THRESHOLD, VIDEO_PREPROCESSING_MIN_BYTES, VIDEO_PREPROCESSING_TIMEOUT_SECONDS,
+                                         VIDEO_TRANSCODE_CRF, VIDEO_TRANSCODE_FPS, VIDEO_TRANSCODE_MAX_HEIGHT)
+from backend.src.utils.metrics import get_counter, get_histogram
+
+video_bytes_counter = get_counter("video_preprocessing_bytes_total", "Bytes of uploaded videos before and after preprocessing, by mode", ("mode", "stage"))
+video_preprocessing_histogram = get_histogram("video_preprocessing_seconds", "Time spent preprocessing uploaded videos, by mode", ("mode",))
+
+
+class PreprocessedVideo:
+    """
+    A video ready to upload, either the original file or a smaller copy made by ffmpeg.
+    """
+
+    def __init__(self, path: str, mime_type: str, mode: str, original_bytes: int, processed_bytes: int, seconds: float):
+        self.path = path
+        self.mime_type = mime_type
+        self.mode = mode
+        self.original_bytes = original_bytes
+        self.processed_bytes = processed_bytes
+        self.seconds = seconds
+
+    @property
+    def bytes_saved(self) -> int:
+        return self.original_bytes - self.processed_bytes
+
+    @property
+    def is_copy(self) -> bool:
+        return self.mode != ORIGINAL_VIDEO
+
+    def cleanup(self) -> None:
+        """
+        Removes the preprocessed copy, if one was made.
+        """
+        if self.is_copy and os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def get_ffmpeg_executable() -> str:
+    """
+    Returns the path of the ffmpeg executable, from PATH or else the binary bundled with imageio-ffmpeg.
+
+    Raises:
+        FileNotFoundError: If ffmpeg is not available.
+    """
+    ffmpeg = shutil.which("ffmpeg")
+    if ffmpeg:
+        return ffmpeg
+    try:
+        import imageio_ffmpeg
+        return imageio_ffmpeg.get_ffmpeg_exe()
+    except Exception as e:
+        raise FileNotFoundError(f"ffmpeg is not available: {e}")
+
+
+def get_video_preprocessing_mode() -> str:
+    """
+    Returns the preprocessing mode from the VIDEO_PREPROCESSING environment variable, defaulting to 'transcode'.
+    """
+    return os.getenv("VIDEO_PREPROCESSING", TRANSCODED_VIDEO).lower()
+
+
+def build_ffmpeg_command(ffmpeg: str, input_path: str, output_path: str, mode: str) -> List[str]:
+    """
+    Returns the ffmpeg arguments that shrink a video for the given mode.
+
+    'transcode' scales the video down to VIDEO_TRANSCODE_MAX_HEIGHT at VIDEO_TRANSCODE_FPS frames per second.
+    'keyframes' keeps only the frames where the picture changes by more than VIDEO_KEYFRAME_SCENE_THRESHOLD,
+    each shown until the next one, which suits recordings of slides. Both keep the audio track as mono AAC.
+
+    Args:
+        ffmpeg (str): The path of the ffmpeg executable.
+        input_path (str): The path of the original video.
+        output_path (str): The path of the MP4 file to write.
+        mode (str): 'transcode' or 'keyframes'.
+
+    Returns:
+        List[str]: The command.
+
+    Raises:
+        ValueError: If the mode is unknown.
+    """
+    if mode == TRANSCODED_VIDEO:
+        video_filter = f"fps={VIDEO_TRANSCODE_FPS},scale=-2:'min({VIDEO_TRANSCODE_MAX_HEIGHT},ih)'"
+        video_options = ["-vf", video_filter, "-crf", str(VIDEO_TRANSCODE_CRF)]
+    elif mode == KEYFRAME_VIDEO:
+        video_filter = f"select='eq(n,0)+gt(scene,{VIDEO_KEYFRAME_SCENE_THRESHOLD})',scale=-2:'min({VIDEO_KEYFRAME_MAX_HEIGHT},ih)'"
+        # A variable frame rate keeps each selected frame on screen until the next one.
+        video_options = ["-vf", video_filter, "-vsync", "vfr", "-crf", str(VIDEO_TRANSCODE_CRF - 4), "-tune", "stillimage"]
+    else:
+        raise ValueError(f"Unknown video preprocessing mode: {mode}")
+
+    return [ffmpeg, "-hide_banner", "-loglevel", "error", "-y", "-i", input_path,
+            *video_options, "-c:v", "libx264", "-preset", "veryfast", "-pix_fmt", "yuv420p",
+            "-c:a", "aac", "-b:a", VIDEO_AUDIO_BITRATE, "-ac", "1",
+            "-movflags", "+faststart", output_path]
+
+
+def preprocess_video(video_path: str, mime_type: str, mode: Optional[str] = None, min_bytes: Optional[int] = VIDEO_PREPROCESSING_MIN_BYTES) -> PreprocessedVideo:
+    """
+    Shrinks a video with ffmpeg before it is uploaded to the model provider.
+
+    The original is kept if the mode is 'none', the video is smaller than `min_bytes`, ffmpeg is
+    unavailable or fails, or the copy is not smaller.
+
+    Args:
+        video_path (str): The path of the original video.
+        mime_type (str): The MIME type of the original video.
+        mode (Optional[str]): 'none', 'transcode' or 'keyframes'. Defaults to `get_video_preprocessing_mode()`.
+        min_bytes (Optional[int]): The size below which the original is uploaded as is.
+
+    Returns:
+        PreprocessedVideo: The video to upload. Call `cleanup` once it is uploaded.
+    """
+    mode = mode or get_video_preprocessing_mode()
+    original_bytes = os.path.getsize(video_path)
+    original = PreprocessedVideo(video_path, mime_type, ORIGINAL_VIDEO, original_bytes, original_bytes, 0.0)
+    if mode == ORIGINAL_VIDEO or original_bytes < min_bytes:
+        return original
+
+    start = time.perf_counter()
+    with NamedTemporaryFile(suffix=".mp4", delete=False) as output_file:
+        output_path = output_file.name
+    try:
+        command = build_ffmpeg_command(get_ffmpeg_executable(), video_path, output_path, mode)
+        subprocess.run(command, check=True, capture_output=True, timeout=VIDEO_PREPROCESSING_TIMEOUT_SECONDS)
+    except subprocess.CalledProcessError as e:
+        logging.warning(f"Video preprocessing failed, uploading the original: {e.stderr.decode('utf-8', 'replace').strip()}")
+        os.remove(output_path)
+        return original
+    except Exception as e:
+        logging.warning(f"Video preprocessing failed, uploading the original: {e}")
+        os.remove(output_path)
+        return original
+
+    seconds = time.perf_counter() - start
+    processed_bytes = os.path.getsize(output_path)
+    video_preprocessing_histogram.observe(seconds, mode=mode)
+    if processed_bytes >= original_bytes:
+        logging.info(f"Preprocessed video is not smaller ({processed_bytes} >= {original_bytes} bytes), uploading the original")
+        os.remove(output_path)
+        return original
+
+    video_bytes_counter.inc(original_bytes, mode=mode, stage="original")
+    video_bytes_counter.inc(processed_bytes, mode=mode, stage="processed")
+    logging.info(f"Preprocessed video with {mode} in {seconds:.2f}s: {original_bytes} -> {processed_bytes} bytes "
+                 f"({100 * (original_bytes - processed_bytes) / original_bytes:.0f}% smaller)")
+    return PreprocessedVideo(output_path, "video/mp4", mode, original_bytes, processed_bytes, seconds)
@@ -2,24 +2,24 @@ from typing import Any, Dict, Union
 import logging
 import os
 
-from google.generativeai.types import File
-from google.generativeai import GenerativeModel
-
 from backend.src.api.v1.models.requests import NotesCustomisationRequest
-from backend.src.utils.constants import IMAGE, PDF_DOCUMENT, PPT_SLIDE, VIDEO, WORD_DOCUMENT
+from backend.src.utils.constants import IMAGE, PDF_DOCUMENT, PPT_SLIDE, PRIORITY_BACKGROUND, VIDEO, WORD_DOCUMENT
+from backend.src.utils.llm.provider import LLMProvider, UploadedFile
+from backend.src.utils.llm_scheduler import generate_content
+from backend.src.utils.metrics import set_request_label, span
 from backend.src.utils.notes.file_management.file_check import check_file_type
 from backend.src.utils.notes.file_management.file_cleanup import cleanup_file
 from backend.src.utils.notes.file_management.file_upload import upload_file
 from backend.src.utils.notes.text_extraction import extract_text
 
 
-def generate_notes_from_content(content: Union[str, File], model: GenerativeModel, customisation: Dict[str, str], content_type: str) -> str:
+def generate_notes_from_content(content: Union[str, UploadedFile], model: LLMProvider, customisation: Dict[str, str], content_type: str) -> str:
     """
     Generates notes from provided content (media or document) using a generative model.
 
     Args:
-        content (Union[str, File]): A media file or document to generate notes from.
-        model (GenerativeModel): The generative model to use for generating notes.
+        content (Union[str, UploadedFile]): A media file or document to generate notes from.
+        model (LLMProvider): The model provider to use for generating notes.
         customisation (Dict[str, str]): The customisation settings.
         content_type (str): The type of content ('media' or 'document').
 
@@ -40,9 +40,9 @@ def generate_notes_from_content(content: Union[str, File], model: GenerativeMode
     """
 
     if content_type == 'media':
-        response = model.generate_content([content, prompt], request_options={"timeout": 600})
+        response = generate_content(model, [content, prompt], PRIORITY_BACKGROUND, request_options={"timeout": 600})
     else:
-        response = model.generate_content(prompt)
+        response = generate_content(model, prompt, PRIORITY_BACKGROUND)
 
     return response.text
 
@@ -66,12 +66,12 @@ def get_notes_customisation_params(notes_customisation: NotesCustomisationReques
     }
 
 
-def generate_notes(model: GenerativeModel, file_path: str, file_name: str, notes_customisation: NotesCustomisationRequest) -> str:
+def generate_notes(model: LLMProvider, file_path: str, file_name: str, notes_customisation: NotesCustomisationRequest) -> str:
     """
     Generates notes from a file based on its type. Handles media and document files.
 
     Args:
-        model (GenerativeModel): The generative model to use for generating notes.
+        model (LLMProvider): The model provider to use for generating notes.
         file_path (str): The path to the file from which to generate notes.
         file_name (str): Name of the file with extension
         notes_customisation (NotesCustomisationRequest): The customisation options.
@@ -87,16 +87,22 @@ def generate_notes(model: GenerativeModel, file_path: str, file_name: str, notes
         raise FileNotFoundError(f"File not found at {file_path}")
 
     file_type, ext = check_file_type(file_name)
+    set_request_label("file_type", file_type)
 
     actual_customisation = get_notes_customisation_params(notes_customisation)
 
     if file_type in [VIDEO, IMAGE]:
-        file = upload_file(file_path, file_type, ext)
-        notes = generate_notes_from_content(file, model, actual_customisation, content_type="media")
-        cleanup_file(file)
+        with span("upload"):
+            file = upload_file(file_path, file_type, ext)
+        with span("generation"):
+            notes = generate_notes_from_content(file, model, actual_customisation, content_type="media")
+        with span("cleanup"):
+            cleanup_file(file)
     elif file_type in [PDF_DOCUMENT, WORD_DOCUMENT, PPT_SLIDE]:
-        extracted_text = extract_text(file_path, file_type)
-        notes = generate_notes_from_content(extracted_text, model, actual_customisation, content_type="document")
+        with span("extraction"):
+            extracted_text = extract_text(file_path, file_type)
+        with span("generation"):
+            notes = generate_notes_from_content(extracted_text, model, actual_customisation, content_type="document")
 
     logging.info(f"Generated notes for file {file_path}.")
 
@@ -1,8 +1,12 @@
-import docx
-import fitz
-from pptx import Presentation
+import hashlib
 
-from backend.src.utils.constants import PDF_DOCUMENT, PPT_SLIDE, WORD_DOCUMENT
+from backend.src.utils.cache.factory import get_shared_cache
+from backend.src.utils.constants import EXTRACTION_CACHE_TTL_SECONDS, PDF_DOCUMENT, PPT_SLIDE, WORD_DOCUMENT
+from backend.src.utils.metrics import get_counter
+
+EXTRACTED_TEXT_NAMESPACE = "extracted_text"
+
+extraction_cache_counter = get_counter("extraction_cache_requests_total", "Extracted text cache lookups by outcome", ("outcome",))
 
 
 def extract_text_from_pdf(pdf_path: str) -> str:
@@ -15,6 +19,8 @@ def extract_text_from_pdf(pdf_path: str) -> str:
     Returns:
         str: The extracted text from the PDF file.
     """
+    import fitz
+
     doc = fitz.open(pdf_path)
     text = ""
     for page in doc:
@@ -32,6 +38,8 @@ def extract_text_from_word(docx_path: str) -> str:
     Returns:
         str: The extracted text from the Word document.
     """
+    import docx
+
     doc = docx.Document(docx_path)
     text = ""
     for para in doc.paragraphs:
@@ -49,6 +57,8 @@ def extract_text_from_pptx(pptx_path: str) -> str:
     Returns:
         str: The extracted text from the PowerPoint presentation.
     """
+    from pptx import Presentation
+
     prs = Presentation(pptx_path)
     text = ""
     for slide in prs.slides:
@@ -62,6 +72,9 @@ def extract_text(file_path: str, file_type: str) -> str:
     """
     Extracts text from a file based on its type.
 
+    The text is kept in the shared cache for EXTRACTION_CACHE_TTL_SECONDS by a hash of the file's
+    content, so a file uploaded again, e.g. to generate a quiz after notes, is only parsed once.
+
     Args:
         file_path (str): The path to the file.
         file_type (str): The type of the file (e.g., 'PDF', 'WORD', 'PPT').
@@ -73,10 +86,23 @@ def extract_text(file_path: str, file_type: str) -> str:
         ValueError: If the file type is unsupported.
     """
     if file_type == PDF_DOCUMENT:
-        return extract_text_from_pdf(file_path)
+        extractor = extract_text_from_pdf
     elif file_type == WORD_DOCUMENT:
-        return extract_text_from_word(file_path)
+        extractor = extract_text_from_word
     elif file_type == PPT_SLIDE:
-        return extract_text_from_pptx(file_path)
+        extractor = extract_text_from_pptx
     else:
-        raise ValueError(f"Unsupported document type: {file_type}")
\ No newline at end of file
+        raise ValueError(f"Unsupported document type: {file_type}")
+
+    with open(file_path, "rb") as f:
+        key = f"{file_type}:{hashlib.sha256(f.read()).hexdigest()}"
+    cache = get_shared_cache()
+    cached_text = cache.get(EXTRACTED_TEXT_NAMESPACE, key)
+    if cached_text is not None:
+        extraction_cache_counter.inc(outcome="hit")
+        return cached_text.decode("utf-8")
+
+    extraction_cache_counter.inc(outcome="miss")
+    text = extractor(file_path)
+    cache.set(EXTRACTED_TEXT_NAMESPACE, key, text.encode("utf-8"), EXTRACTION_CACHE_TTL_SECONDS)
+    return text
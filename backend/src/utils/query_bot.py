@@ -1,38 +1,41 @@
 from typing import Optional
 
-from google.generativeai import GenerativeModel
-from google.cloud.firestore_v1.client import Client
-
+from backend.src.utils.constants import PRIORITY_INTERACTIVE
+from backend.src.utils.llm.provider import LLMProvider
+from backend.src.utils.llm_scheduler import generate_content
+from backend.src.utils.metrics import span
 from backend.src.utils.rag import get_most_similar_text
-from backend.src.utils.rag import embed_text
+from backend.src.utils.storage.repository import StorageRepository
 
 
-def query_firestore(db: Client, user_id: str, model: GenerativeModel, user_query: str, limit: Optional[int] = 5) -> str:
+def query_firestore(storage: StorageRepository, user_id: str, model: LLMProvider, user_query: str, limit: Optional[int] = 5) -> str:
     """
     Queries Firestore for similar text to a user's query and generates an answer.
 
     Args:
-        db (Client): The Firestore client.
+        storage (StorageRepository): The storage repository.
         user_id (str): The ID of the user.
-        model (GenerativeModel): The generative model to use for answering the query.
+        model (LLMProvider): The model provider to use for answering the query.
         user_query (str): The user's query.
         limit (Optional[int]): The maximum number of similar texts to retrieve. Defaults to 5.
 
     Returns:
         str: The generated answer to the user's query.
     """
-    similar_text_list = get_most_similar_text(db, user_id, user_query, limit)
+    with span("similarity_search"):
+        similar_text_list = get_most_similar_text(storage, user_id, user_query, limit)
     similar_text = "\n\n ".join(similar_text_list) if len(similar_text_list) > 0 else ""
-    answer = answer_user_question(model, user_query, similar_text)
+    with span("generation"):
+        answer = answer_user_question(model, user_query, similar_text)
 
     return answer
 
-def answer_user_question(model: GenerativeModel, user_query: str, similar_text: str) -> str:
+def answer_user_question(model: LLMProvider, user_query: str, similar_text: str) -> str:
     """
     Generates an answer to the user's query based on provided similar text.
 
     Args:
-        model (GenerativeModel): The generative model to use for generating the answer.
+        model (LLMProvider): The model provider to use for generating the answer.
         user_query (str): The user's query.
         similar_text (str): The text similar to the user's query.
 
@@ -50,6 +53,6 @@ def answer_user_question(model: GenerativeModel, user_query: str, similar_text:
     {similar_text}
     """
 
-    response = model.generate_content(prompt)
+    response = generate_content(model, prompt, PRIORITY_INTERACTIVE)
     return response.text
 
@@ -0,0 +1,192 @@
+import hashlib
+import json
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Union
+
+from backend.src.api.v1.models.responses import FreeResponseQuestion, MultiSelectQuestion, MultipleChoiceQuestion, TrueFalseQuestion
+from backend.src.utils.constants import FREE_RESPONSE, MULTI_SELECT, MULTIPLE_CHOICE, RECENT_ANSWERS_LIMIT, TRUE_FALSE, UNKNOWN_TOPIC
+
+
+class AnswerRecord:
+    """
+    A student's answer to a quiz question, as submitted.
+    """
+
+    def __init__(self,
+                 question_and_answer: Union[MultipleChoiceQuestion, MultiSelectQuestion, TrueFalseQuestion, FreeResponseQuestion],
+                 student_answer: Union[int, List[int], str],
+                 correctness: int,
+                 answered_at: Optional[datetime] = None):
+        self.question_and_answer = question_and_answer
+        self.student_answer = student_answer
+        self.correctness = correctness
+        self.answered_at = answered_at or datetime.now(timezone.utc)
+
+    def to_answer_entry(self, question_id: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Returns the record as a performance aggregate answer entry, for the given quiz document ID or the question's own ID.
+        """
+        return create_answer_entry(question_id or self.question_and_answer.id, self.question_and_answer, self.student_answer, self.correctness, self.answered_at)
+
+
+def get_question_type(question_and_answer: Union[MultipleChoiceQuestion, MultiSelectQuestion, TrueFalseQuestion, FreeResponseQuestion]) -> str:
+    """
+    Returns the question type of a question model.
+
+    Args:
+        question_and_answer (Union[MultipleChoiceQuestion, MultiSelectQuestion, TrueFalseQuestion, FreeResponseQuestion]): The question.
+
+    Returns:
+        str: The question type.
+
+    Raises:
+        ValueError: If the question type is unsupported.
+    """
+    if isinstance(question_and_answer, MultipleChoiceQuestion):
+        return MULTIPLE_CHOICE
+    elif isinstance(question_and_answer, MultiSelectQuestion):
+        return MULTI_SELECT
+    elif isinstance(question_and_answer, TrueFalseQuestion):
+        return TRUE_FALSE
+    elif isinstance(question_and_answer, FreeResponseQuestion):
+        return FREE_RESPONSE
+    else:
+        raise ValueError("Unsupported question type")
+
+
+def create_answer_entry(question_id: Optional[str],
+                        question_and_answer: Union[MultipleChoiceQuestion, MultiSelectQuestion, TrueFalseQuestion, FreeResponseQuestion],
+                        student_answer: Union[int, List[int], str],
+                        correctness: int,
+                        answered_at: Optional[datetime] = None) -> Dict[str, Any]:
+    """
+    Creates the compact record of an answer kept in the performance aggregate.
+
+    Args:
+        question_id (Optional[str]): The ID of the quiz document.
+        question_and_answer (Union[MultipleChoiceQuestion, MultiSelectQuestion, TrueFalseQuestion, FreeResponseQuestion]): The answered question.
+        student_answer (Union[int, List[int], str]): The student's answer.
+        correctness (int): 1 if the answer is correct, 0 otherwise.
+        answered_at (Optional[datetime]): When the answer was given. Defaults to now.
+
+    Returns:
+        Dict[str, Any]: The answer entry.
+    """
+    question_data = question_and_answer.model_dump(mode="json")
+    return {
+        "id": question_id,
+        "question": question_data["question"],
+        "choices": question_data.get("choices"),
+        "answer": question_data["answer"],
+        "question_type": get_question_type(question_and_answer),
+        "topic": question_data.get("topic") or UNKNOWN_TOPIC,
+        "student_answer": student_answer,
+        "correctness": int(correctness),
+        "timestamp": answered_at or datetime.now(timezone.utc),
+    }
+
+
+def _increment(breakdown: Dict[str, Dict[str, int]], key: str, correctness: int) -> None:
+    stats = breakdown.setdefault(key, {"attempts": 0, "correct": 0})
+    stats["attempts"] += 1
+    stats["correct"] += correctness
+
+
+def apply_answer_to_aggregate(aggregate: Optional[Dict[str, Any]], answer_entry: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Folds an answer into a user's running performance aggregate.
+
+    Args:
+        aggregate (Optional[Dict[str, Any]]): The current aggregate, or None if the user has no aggregate yet.
+        answer_entry (Dict[str, Any]): The answer entry from `create_answer_entry`.
+
+    Returns:
+        Dict[str, Any]: The updated aggregate.
+    """
+    aggregate = aggregate or {}
+    aggregate.pop("cached_evaluation", None)
+    aggregate["attempts"] = aggregate.get("attempts", 0) + 1
+    aggregate["correct"] = aggregate.get("correct", 0) + answer_entry["correctness"]
+
+    by_question_type = aggregate.setdefault("by_question_type", {})
+    _increment(by_question_type, answer_entry["question_type"], answer_entry["correctness"])
+    by_topic = aggregate.setdefault("by_topic", {})
+    _increment(by_topic, answer_entry["topic"], answer_entry["correctness"])
+
+    recent_answers = [entry for entry in aggregate.get("recent_answers", []) if not answer_entry["id"] or entry.get("id") != answer_entry["id"]]
+    recent_answers.append(answer_entry)
+    aggregate["recent_answers"] = recent_answers[-RECENT_ANSWERS_LIMIT:]
+
+    return aggregate
+
+
+def get_recent_results(aggregate: Optional[Dict[str, Any]], num_of_qns: int, minutes: int) -> List[Dict[str, Any]]:
+    """
+    Returns the latest answers within a time window from a performance aggregate, newest first.
+
+    Args:
+        aggregate (Optional[Dict[str, Any]]): The user's aggregate.
+        num_of_qns (int): The maximum number of answers to return.
+        minutes (int): The time window in minutes.
+
+    Returns:
+        List[Dict[str, Any]]: The recent answer entries.
+    """
+    if not aggregate:
+        return []
+
+    time_threshold = datetime.now(timezone.utc) - timedelta(minutes=minutes)
+    recent_answers = [entry for entry in aggregate.get("recent_answers", []) if entry["timestamp"] >= time_threshold]
+
+    return list(reversed(recent_answers))[:num_of_qns]
+
+
+def get_evaluation_digest(quiz_results: List[Dict[str, Any]], num_of_qns: int) -> str:
+    """
+    Computes a digest identifying the exact set of answers an evaluation is based on.
+
+    Args:
+        quiz_results (List[Dict[str, Any]]): The answer entries being evaluated.
+        num_of_qns (int): The number of questions requested for the evaluation.
+
+    Returns:
+        str: The hex digest of the (question ID, student answer, correctness) set and num_of_qns.
+    """
+    answered = sorted(json.dumps([entry.get("id"), entry.get("student_answer"), entry.get("correctness")]) for entry in quiz_results)
+    return hashlib.sha256(json.dumps([num_of_qns, answered]).encode("utf-8")).hexdigest()
+
+
+def get_cached_evaluation(aggregate: Dict[str, Any], digest: str) -> Optional[Dict[str, str]]:
+    """
+    Returns the cached strength and weakness evaluation if it was made for the same set of answers.
+
+    Args:
+        aggregate (Dict[str, Any]): The user's aggregate.
+        digest (str): The digest from `get_evaluation_digest`.
+
+    Returns:
+        Optional[Dict[str, str]]: The cached 'strength' and 'weakness', or None on a cache miss.
+    """
+    cached_evaluation = aggregate.get("cached_evaluation")
+    if not cached_evaluation or cached_evaluation.get("digest") != digest:
+        return None
+    return {"strength": cached_evaluation["strength"], "weakness": cached_evaluation["weakness"]}
+
+
+def format_performance_breakdown(aggregate: Dict[str, Any]) -> str:
+    """
+    Formats the per-question-type and per-topic breakdown of an aggregate for the evaluation prompt.
+
+    Args:
+        aggregate (Dict[str, Any]): The user's aggregate.
+
+    Returns:
+        str: The formatted breakdown.
+    """
+    formatted_str = f"Overall: {aggregate.get('correct', 0)}/{aggregate.get('attempts', 0)} correct\n"
+    for title, key in (("By question type", "by_question_type"), ("By topic", "by_topic")):
+        formatted_str += f"{title}:\n"
+        for name, stats in sorted(aggregate.get(key, {}).items()):
+            formatted_str += f"  - {name}: {stats['correct']}/{stats['attempts']} correct\n"
+
+    return formatted_str
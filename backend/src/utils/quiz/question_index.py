@@ -0,0 +1,441 @@
+import hashlib
+import logging
+import os
+import random
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+from backend.src.utils.cache.generations import Generation, bump_generation, get_generation
+from backend.src.utils.constants import (
+    DUPLICATE_QUESTION_EMBEDDING_THRESHOLD,
+    DUPLICATE_QUESTION_THRESHOLD,
+    MINHASH_BANDS,
+    MINHASH_NUM_PERM,
+    MINHASH_SHINGLE_SIZE,
+    QUESTION_FIELDS,
+    QUESTION_INDEX_MAX_USERS,
+    SIMHASH_BANDS,
+    SIMHASH_NUM_PLANES,
+)
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+
+def normalise_question_text(question: str) -> str:
+    """
+    Normalises question text so that trivially different phrasings compare equal.
+
+    Args:
+        question (str): The raw question text.
+
+    Returns:
+        str: The case-folded question with punctuation removed and whitespace collapsed.
+    """
+    text = unicodedata.normalize("NFKC", question).casefold()
+    text = "".join(" " if unicodedata.category(char)[0] in ("P", "S") else char for char in text)
+    return " ".join(text.split())
+
+
+def get_shingles(text: str, size: Optional[int] = MINHASH_SHINGLE_SIZE) -> Set[str]:
+    """
+    Splits normalised text into overlapping character shingles.
+
+    Character shingles are used instead of words so that languages without whitespace are handled.
+
+    Args:
+        text (str): The normalised text.
+        size (Optional[int]): The shingle length. Defaults to MINHASH_SHINGLE_SIZE.
+
+    Returns:
+        Set[str]: The set of shingles.
+    """
+    if len(text) <= size:
+        return {text} if text else set()
+    return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+
+class MinHasher:
+    """
+    Computes MinHash signatures using universal hashing over 64-bit shingle hashes.
+    """
+
+    def __init__(self, num_perm: int = MINHASH_NUM_PERM, seed: int = 1):
+        rng = random.Random(seed)
+        self.num_perm = num_perm
+        self.permutations = [(rng.randint(1, _MERSENNE_PRIME - 1), rng.randint(0, _MERSENNE_PRIME - 1)) for _ in range(num_perm)]
+
+    def signature(self, shingles: Set[str]) -> Tuple[int, ...]:
+        """
+        Computes the MinHash signature of a set of shingles.
+
+        Args:
+            shingles (Set[str]): The shingles to hash.
+
+        Returns:
+            Tuple[int, ...]: The signature with one value per permutation.
+        """
+        hashes = [int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "little") for shingle in shingles]
+        return tuple(min(((a * h + b) % _MERSENNE_PRIME) & _MAX_HASH for h in hashes) for a, b in self.permutations)
+
+
+class QuestionIndex:
+    """
+    Per-user index of stored quiz questions for near-duplicate detection.
+
+    Questions are bucketed with MinHash LSH over their normalised text, so a lookup only compares
+    against the few questions sharing a band bucket. When an embedding function is provided,
+    questions are additionally bucketed with random-hyperplane LSH over their embeddings to catch
+    paraphrases that share little text.
+    """
+
+    def __init__(self, embed_fn: Optional[Callable[[str], Sequence[float]]] = None, hasher: Optional[MinHasher] = None):
+        self.hasher = hasher or _DEFAULT_HASHER
+        self.rows_per_band = self.hasher.num_perm // MINHASH_BANDS
+        self.embed_fn = embed_fn
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        self.text_to_id: Dict[str, str] = {}
+        self.buckets: Dict[Tuple[int, Tuple[int, ...]], Set[str]] = {}
+        self.embedding_buckets: Dict[Tuple[int, int], Set[str]] = {}
+        self.embedding_cache: Dict[str, List[float]] = {}
+        self.lock = threading.RLock()
+
+    @property
+    def uses_embeddings(self) -> bool:
+        return self.embed_fn is not None
+
+    def __len__(self) -> int:
+        # An empty index is falsy, so a cached index must be told apart from a missing one with `is not None`.
+        return len(self.entries)
+
+    def _band_keys(self, signature: Tuple[int, ...]) -> List[Tuple[int, Tuple[int, ...]]]:
+        r = self.rows_per_band
+        return [(band, signature[band * r:(band + 1) * r]) for band in range(MINHASH_BANDS)]
+
+    def _embedding_band_keys(self, embedding: Sequence[float]) -> List[Tuple[int, int]]:
+        bits = (_get_hyperplanes(len(embedding)) @ np.asarray(embedding, dtype=np.float32)) >= 0
+        rows = SIMHASH_NUM_PLANES // SIMHASH_BANDS
+        return [(band, int("".join("1" if bit else "0" for bit in bits[band * rows:(band + 1) * rows]), 2)) for band in range(SIMHASH_BANDS)]
+
+    def embedding_for(self, question: str) -> Optional[List[float]]:
+        """
+        Returns the embedding for a question, computing and memoising it when the embedding path is enabled.
+
+        Args:
+            question (str): The question text.
+
+        Returns:
+            Optional[List[float]]: The embedding, or None if the embedding path is disabled.
+        """
+        if not self.uses_embeddings:
+            return None
+        text = normalise_question_text(question)
+        if text not in self.embedding_cache:
+            self.embedding_cache[text] = list(self.embed_fn(question))
+        return self.embedding_cache[text]
+
+    def add(self, question_id: str, question_and_answer: Dict[str, Any], answered: Optional[bool] = False, embedding: Optional[Sequence[float]] = None) -> None:
+        """
+        Adds a stored question to the index.
+
+        Args:
+            question_id (str): The ID of the quiz document.
+            question_and_answer (Dict[str, Any]): The stored question fields.
+            answered (Optional[bool]): Whether the student has answered the question. Defaults to False.
+            embedding (Optional[Sequence[float]]): A precomputed embedding of the question, if any.
+        """
+        question = question_and_answer.get("question")
+        if not isinstance(question, str):
+            return
+        text = normalise_question_text(question)
+        if not text:
+            return
+
+        with self.lock:
+            if question_id in self.entries:
+                self.remove(question_id)
+            signature = self.hasher.signature(get_shingles(text))
+            entry = {
+                "id": question_id,
+                "text": text,
+                "signature": signature,
+                "answered": answered,
+                "question_and_answer": {key: question_and_answer[key] for key in QUESTION_FIELDS if key in question_and_answer},
+                "embedding": None,
+            }
+            for key in self._band_keys(signature):
+                self.buckets.setdefault(key, set()).add(question_id)
+
+            if embedding is None and text in self.embedding_cache:
+                embedding = self.embedding_cache[text]
+            if embedding is not None and self.uses_embeddings:
+                entry["embedding"] = np.asarray(embedding, dtype=np.float32)
+                for key in self._embedding_band_keys(embedding):
+                    self.embedding_buckets.setdefault(key, set()).add(question_id)
+
+            self.entries[question_id] = entry
+            self.text_to_id[text] = question_id
+
+    def remove(self, question_id: str) -> None:
+        """
+        Removes a question from the index.
+
+        Args:
+            question_id (str): The ID of the quiz document.
+        """
+        with self.lock:
+            entry = self.entries.pop(question_id, None)
+            if entry is None:
+                return
+            for key in self._band_keys(entry["signature"]):
+                self.buckets.get(key, set()).discard(question_id)
+            if entry["embedding"] is not None:
+                for key in self._embedding_band_keys(entry["embedding"]):
+                    self.embedding_buckets.get(key, set()).discard(question_id)
+            if self.text_to_id.get(entry["text"]) == question_id:
+                del self.text_to_id[entry["text"]]
+
+    def mark_answered(self, question_id: str) -> None:
+        """
+        Marks an indexed question as answered so it is no longer reused.
+
+        Args:
+            question_id (str): The ID of the quiz document.
+        """
+        with self.lock:
+            if question_id in self.entries:
+                self.entries[question_id]["answered"] = True
+
+    def find_duplicate(self, question: str) -> Optional[Dict[str, Any]]:
+        """
+        Finds a stored question that is a near-duplicate of the given question.
+
+        Args:
+            question (str): The question text to look up.
+
+        Returns:
+            Optional[Dict[str, Any]]: The matching index entry, or None if there is no near-duplicate.
+        """
+        text = normalise_question_text(question)
+        if not text:
+            return None
+
+        with self.lock:
+            if text in self.text_to_id:
+                return self.entries[self.text_to_id[text]]
+
+            signature = self.hasher.signature(get_shingles(text))
+            candidates = set()
+            for key in self._band_keys(signature):
+                candidates |= self.buckets.get(key, set())
+
+            best_entry, best_similarity = None, DUPLICATE_QUESTION_THRESHOLD
+            for candidate_id in candidates:
+                entry = self.entries[candidate_id]
+                similarity = sum(1 for x, y in zip(signature, entry["signature"]) if x == y) / len(signature)
+                if similarity >= best_similarity:
+                    best_entry, best_similarity = entry, similarity
+
+            if best_entry is not None or not self.uses_embeddings:
+                return best_entry
+
+            embedding = np.asarray(self.embedding_for(question), dtype=np.float32)
+            candidates = set()
+            for key in self._embedding_band_keys(embedding):
+                candidates |= self.embedding_buckets.get(key, set())
+
+            best_similarity = DUPLICATE_QUESTION_EMBEDDING_THRESHOLD
+            for candidate_id in candidates:
+                stored = self.entries[candidate_id]["embedding"]
+                similarity = float(stored @ embedding / ((np.linalg.norm(stored) * np.linalg.norm(embedding)) or 1.0))
+                if similarity >= best_similarity:
+                    best_entry, best_similarity = self.entries[candidate_id], similarity
+
+            return best_entry
+
+
+_DEFAULT_HASHER = MinHasher()
+_hyperplanes: Dict[int, np.ndarray] = {}
+
+
+def _get_hyperplanes(dimension: int) -> np.ndarray:
+    if dimension not in _hyperplanes:
+        _hyperplanes[dimension] = np.random.default_rng(1).standard_normal((SIMHASH_NUM_PLANES, dimension)).astype(np.float32)
+    return _hyperplanes[dimension]
+
+
+QUESTION_INDEX_CACHE = "question_index"
+
+# Each index is stamped with the generation it was built at, so that indexes which missed a
+# write made by another server worker are rebuilt.
+_question_indexes: "OrderedDict[str, Tuple[QuestionIndex, Generation]]" = OrderedDict()
+_question_indexes_lock = threading.Lock()
+
+
+def get_question_index_generation(user_id: str) -> Generation:
+    """
+    Returns the current generation of a user's question index. Read it before reading the questions to index.
+
+    Args:
+        user_id (str): The ID of the user.
+
+    Returns:
+        Generation: The generation.
+    """
+    return get_generation(QUESTION_INDEX_CACHE, user_id)
+
+
+def get_cached_question_index(user_id: str) -> Optional[QuestionIndex]:
+    """
+    Returns the question index already built for a user in this process, if any and if it is current.
+
+    Args:
+        user_id (str): The ID of the user.
+
+    Returns:
+        Optional[QuestionIndex]: The cached index, or None.
+    """
+    generation = get_question_index_generation(user_id)
+    with _question_indexes_lock:
+        entry = _question_indexes.get(user_id)
+        if entry is None:
+            return None
+        if entry[1] != generation:
+            del _question_indexes[user_id]
+            return None
+        _question_indexes.move_to_end(user_id)
+        return entry[0]
+
+
+def cache_question_index(user_id: str, index: QuestionIndex, generation: Generation) -> None:
+    """
+    Caches a user's question index, evicting the least recently used index when full.
+
+    Args:
+        user_id (str): The ID of the user.
+        index (QuestionIndex): The index to cache.
+        generation (Generation): The generation read before the indexed questions were read.
+    """
+    with _question_indexes_lock:
+        _question_indexes[user_id] = (index, generation)
+        _question_indexes.move_to_end(user_id)
+        while len(_question_indexes) > QUESTION_INDEX_MAX_USERS:
+            _question_indexes.popitem(last=False)
+
+
+def update_cached_question_index(user_id: str, update: Callable[[QuestionIndex], None]) -> None:
+    """
+    Applies a stored write to a user's cached question index, if one is cached, and marks the indexes
+    cached by other server workers as outdated.
+
+    The index is dropped instead if it missed a write made by another server worker.
+
+    Args:
+        user_id (str): The ID of the user.
+        update (Callable[[QuestionIndex], None]): Applies the write to the index.
+    """
+    with _question_indexes_lock:
+        entry = _question_indexes.get(user_id)
+    generation = bump_generation(QUESTION_INDEX_CACHE, user_id, entry[1] if entry is not None else None)
+    if entry is None:
+        return
+
+    if generation is not None:
+        update(entry[0])
+    with _question_indexes_lock:
+        if _question_indexes.get(user_id) is not entry:
+            return
+        if generation is None:
+            del _question_indexes[user_id]
+        else:
+            _question_indexes[user_id] = (entry[0], generation)
+
+
+def evict_question_index(user_id: Optional[str] = None) -> None:
+    """
+    Drops a user's cached question index, or every cached index when no user is given, in every server worker.
+
+    Args:
+        user_id (Optional[str]): The ID of the user.
+    """
+    bump_generation(QUESTION_INDEX_CACHE, user_id)
+    with _question_indexes_lock:
+        if user_id is None:
+            _question_indexes.clear()
+        else:
+            _question_indexes.pop(user_id, None)
+
+
+def question_index_uses_embeddings() -> bool:
+    """
+    Returns whether the optional embedding path of the question index is enabled.
+    """
+    return os.getenv("QUESTION_INDEX_USE_EMBEDDINGS", "false").lower() == "true"
+
+
+def build_question_index(quiz_docs: Iterable[Dict[str, Any]], embed_fn: Optional[Callable[[str], Sequence[float]]] = None) -> QuestionIndex:
+    """
+    Builds a question index from stored quiz documents.
+
+    Args:
+        quiz_docs (Iterable[Dict[str, Any]]): Quiz documents including their 'id'.
+        embed_fn (Optional[Callable[[str], Sequence[float]]]): Embedding function for the optional embedding path.
+
+    Returns:
+        QuestionIndex: The populated index.
+    """
+    index = QuestionIndex(embed_fn=embed_fn)
+    for doc in quiz_docs:
+        index.add(doc["id"], doc, answered=doc.get("student_answer") is not None, embedding=doc.get("question_embedding"))
+    logging.info(f"Built question index with {len(index)} questions.")
+    return index
+
+
+def select_new_questions(index: QuestionIndex, quiz_qn_and_ans_list: List[Dict[str, Any]], number_of_questions: int) -> Tuple[List[Dict[str, Any]], int]:
+    """
+    Removes near-duplicates of previously seen questions from a generated quiz.
+
+    Near-duplicates of stored questions the student has not answered yet are replaced by the stored
+    question (carrying its 'id', so it is not written again). Near-duplicates of answered questions,
+    and repeats within the generated quiz itself, are dropped.
+
+    Args:
+        index (QuestionIndex): The user's question index.
+        quiz_qn_and_ans_list (List[Dict[str, Any]]): The generated questions and answers.
+        number_of_questions (int): The number of questions wanted.
+
+    Returns:
+        Tuple[List[Dict[str, Any]], int]: The selected questions and the number still missing.
+    """
+    selected = []
+    seen_ids = set()
+    batch_index = QuestionIndex(hasher=index.hasher)
+
+    for qn_and_ans in quiz_qn_and_ans_list:
+        if len(selected) >= number_of_questions:
+            break
+        question = qn_and_ans.get("question") if isinstance(qn_and_ans, dict) else None
+        if not isinstance(question, str):
+            selected.append(qn_and_ans)
+            continue
+
+        if batch_index.find_duplicate(question) is not None:
+            logging.info(f"Dropped repeated question in generated quiz: {question}")
+            continue
+        batch_index.add(str(len(batch_index)), qn_and_ans)
+
+        duplicate = index.find_duplicate(question)
+        if duplicate is None:
+            selected.append(qn_and_ans)
+        elif not duplicate["answered"] and duplicate["id"] not in seen_ids:
+            seen_ids.add(duplicate["id"])
+            selected.append({**duplicate["question_and_answer"], "id": duplicate["id"]})
+            logging.info(f"Reused stored question {duplicate['id']} for: {question}")
+        else:
+            logging.info(f"Dropped previously answered question: {question}")
+
+    return selected, max(number_of_questions - len(selected), 0)
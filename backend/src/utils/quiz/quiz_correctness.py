@@ -1,13 +1,15 @@
 from typing import Union
 import textwrap
 
-from google.generativeai import GenerativeModel
-
 from backend.src.api.v1.models.responses import FreeResponseQuestion, MultiSelectQuestion, MultipleChoiceQuestion, TrueFalseQuestion
+from backend.src.utils.constants import PRIORITY_INTERACTIVE
 from backend.src.utils.json_utils import load_json_response
+from backend.src.utils.llm.provider import LLMProvider
+from backend.src.utils.llm_scheduler import generate_content
+from backend.src.utils.metrics import span
 
 
-def check_free_response_answer(model: GenerativeModel, 
+def check_free_response_answer(model: LLMProvider, 
                                question_and_answer: Union[MultipleChoiceQuestion, MultiSelectQuestion, TrueFalseQuestion, FreeResponseQuestion], 
                                student_answer: Union[int, list[int], str]) -> str:
     
@@ -15,7 +17,7 @@ def check_free_response_answer(model: GenerativeModel,
     Checks the correctness of a free response answer using a generative model.
 
     Args:
-        model (GenerativeModel): The generative model to use for checking the answer.
+        model (LLMProvider): The model provider to use for checking the answer.
         question_and_answer (Union[MultipleChoiceQuestion, MultiSelectQuestion, TrueFalseQuestion, FreeResponseQuestion]): The question and correct answer.
         student_answer (Union[int, list[int], str]): The student's answer to the question.
 
@@ -44,12 +46,12 @@ def check_free_response_answer(model: GenerativeModel,
     - **Student's Answer:** {student_answer}
     - **Correct Answer:** {question_and_answer.answer}
     """
-    response = model.generate_content(textwrap.dedent(prompt) + context, generation_config={'response_mime_type':'application/json'})
+    response = generate_content(model, textwrap.dedent(prompt) + context, PRIORITY_INTERACTIVE, generation_config={'response_mime_type':'application/json'})
 
     return response.text
 
 
-def check_student_answer(model: GenerativeModel,
+def check_student_answer(model: LLMProvider,
                          question_and_answer: Union[MultipleChoiceQuestion, MultiSelectQuestion, TrueFalseQuestion, FreeResponseQuestion],
                          student_answer: Union[int, list[int], str]) -> int:
 
@@ -57,7 +59,7 @@ def check_student_answer(model: GenerativeModel,
     Checks the correctness of a student's answer based on the question type.
 
     Args:
-        model (GenerativeModel): The generative model to use for checking free response answers.
+        model (LLMProvider): The model provider to use for checking free response answers.
         question_and_answer (Union[MultipleChoiceQuestion, MultiSelectQuestion, TrueFalseQuestion, FreeResponseQuestion]): The question and correct answer.
         student_answer (Union[int, List[int], str]): The student's answer.
 
@@ -72,7 +74,8 @@ def check_student_answer(model: GenerativeModel,
     elif isinstance(question_and_answer, MultiSelectQuestion):
         return 1 if sorted(student_answer) == sorted(question_and_answer.answer) else 0
     elif isinstance(question_and_answer, FreeResponseQuestion):
-        correctness = check_free_response_answer(model, question_and_answer, student_answer)
+        with span("grading"):
+            correctness = check_free_response_answer(model, question_and_answer, student_answer)
         correctness_dict = load_json_response(correctness)
         return correctness_dict["correctness"]
     else:
@@ -1,57 +1,109 @@
+import json
 import logging
 import textwrap
-from typing import Dict, List, Any, Union
-
-from google.generativeai import GenerativeModel
-from google.cloud.firestore_v1.client import Client
+from typing import Callable, Dict, List, Any, Optional, Union
 
 from backend.src.api.v1.models.requests import QuizCustomisationRequest
 from backend.src.api.v1.models.responses import FreeResponseQuestion, MultiSelectQuestion, MultipleChoiceQuestion, TrueFalseChoices, TrueFalseQuestion, StudentQuizEvaluationResponse
-from backend.src.utils.constants import NOTE_COLLECTION, QUIZ_FORMATTER
-from backend.src.utils.firestore.notes_operations import retrieve_notes_doc_from_firestore
-from backend.src.utils.json_utils import load_json_response
+from backend.src.utils.constants import NOTE_COLLECTION, PRIORITY_STANDARD, QUIZ_FORMATTER, QUIZ_REPAIR_ATTEMPTS
+from backend.src.utils.exceptions import JSONLoadError
+from backend.src.utils.json_utils import estimate_token_count, load_json_list_response
+from backend.src.utils.llm.provider import LLMProvider
+from backend.src.utils.llm_scheduler import generate_content
+from backend.src.utils.metrics import get_counter, span
+from backend.src.utils.quiz.question_index import QuestionIndex, select_new_questions
+from backend.src.utils.storage.repository import StorageRepository
+
+quiz_items_counter = get_counter("quiz_generated_items_total", "Generated quiz items by validation outcome", ("outcome",))
+quiz_repair_counter = get_counter("quiz_repair_requests_total", "Model requests made to regenerate missing or invalid quiz items")
+tokens_saved_counter = get_counter("quiz_repair_tokens_saved_total", "Estimated output tokens not regenerated because valid quiz items were kept")
+
+
+def format_question_answer(qn_and_ans: Dict[str, Any]) -> Union[MultipleChoiceQuestion, MultiSelectQuestion, TrueFalseQuestion, FreeResponseQuestion]:
+    """
+    Validates and formats a single question and answer dictionary.
+
+    Args:
+        qn_and_ans (Dict[str, Any]): The question and answer.
+
+    Returns:
+        Union[MultipleChoiceQuestion, MultiSelectQuestion, TrueFalseQuestion, FreeResponseQuestion]: The validated question object.
+
+    Raises:
+        ValueError: If the item is missing required keys or has an invalid question or answer type.
+    """
+    if not isinstance(qn_and_ans, dict) or 'question' not in qn_and_ans or 'answer' not in qn_and_ans:
+        raise ValueError(f"Missing 'question' or 'answer' key in: {qn_and_ans}")
+
+    question = qn_and_ans['question']
+    answer = qn_and_ans['answer']
+
+    if 'choices' in qn_and_ans:
+        if isinstance(answer, list):
+            return MultiSelectQuestion(**qn_and_ans)
+        elif isinstance(answer, int):
+            return MultipleChoiceQuestion(**qn_and_ans)
+        elif answer in [TrueFalseChoices.TRUE.value, TrueFalseChoices.FALSE.value]:
+            return TrueFalseQuestion(**qn_and_ans)
+        elif isinstance(answer, str) and not qn_and_ans["choices"]:
+            return FreeResponseQuestion(question=question, answer=answer, topic=qn_and_ans.get('topic'), id=qn_and_ans.get('id'))
+        else:
+            raise ValueError(f"Invalid answer type for question with choices: {qn_and_ans}")
+    else:
+        if isinstance(answer, str) and isinstance(question, str) and set(qn_and_ans.keys()).issubset({'id', 'question', 'answer', 'explanation', 'topic'}):
+            return FreeResponseQuestion(**qn_and_ans)
+        else:
+            raise ValueError(f"Invalid question and answer type for the question: {qn_and_ans}")
 
 
 def check_and_format_question_answer_list(quiz_qn_and_ans_list: List[Dict[str, Any]]) -> List[Union[MultipleChoiceQuestion, MultiSelectQuestion, TrueFalseQuestion, FreeResponseQuestion]]:
     """
-    Validates and formats a list of question and answer dictionaries.
+    Validates and formats a list of question and answer dictionaries, dropping invalid items.
 
     Args:
-        quiz_qn_and_ans_dict (List[Dict[str, Any]]): The dictionary containing the list of questions and answers.
+        quiz_qn_and_ans_list (List[Dict[str, Any]]): The list of questions and answers.
 
     Returns:
         List[Union[MultipleChoiceQuestion, MultiSelectQuestion, TrueFalseQuestion, FreeResponseQuestion]]: A list of validated and formatted question objects.
 
     Raises:
-        ValueError: If the input dictionary is missing required keys.
+        ValueError: If no item in the list is valid.
     """
 
     valid_questions_and_answers = []
 
     for qn_and_ans in quiz_qn_and_ans_list:
-        if 'question' not in qn_and_ans or 'answer' not in qn_and_ans:
-            raise ValueError(f"Missing 'question' or 'answer' key in: {qn_and_ans}")
-
-        question = qn_and_ans['question']
-        answer = qn_and_ans['answer']
-
-        if 'choices' in qn_and_ans:
-            if isinstance(answer, list):
-                valid_questions_and_answers.append(MultiSelectQuestion(**qn_and_ans))
-            elif isinstance(answer, int):
-                valid_questions_and_answers.append(MultipleChoiceQuestion(**qn_and_ans))
-            elif answer in [TrueFalseChoices.TRUE.value, TrueFalseChoices.FALSE.value]:
-                valid_questions_and_answers.append(TrueFalseQuestion(**qn_and_ans))
-            elif isinstance(answer, str) and not qn_and_ans["choices"]:
-                valid_questions_and_answers.append(FreeResponseQuestion(question=question, answer=answer))
-            else:
-                raise ValueError(f"Invalid answer type for question with choices: {qn_and_ans}")
-        else:
-            if isinstance(answer, str) and isinstance(question, str) and set(qn_and_ans.keys()).issubset({'question', 'answer', 'explanation'}):
-                valid_questions_and_answers.append(FreeResponseQuestion(**qn_and_ans))
-            else:
-                raise ValueError(f"Invalid question and answer type for the question: {qn_and_ans}")
+        try:
+            valid_questions_and_answers.append(format_question_answer(qn_and_ans))
+        except (ValueError, TypeError) as e:
+            logging.warning(f"Dropped invalid question: {e}")
 
+    if quiz_qn_and_ans_list and not valid_questions_and_answers:
+        raise ValueError(f"No valid question in the generated quiz: {quiz_qn_and_ans_list}")
+
+    return valid_questions_and_answers
+
+
+def get_valid_question_answers(quiz_qn_and_ans_list: List[Any]) -> List[Dict[str, Any]]:
+    """
+    Returns the items of a generated quiz that pass validation.
+
+    Args:
+        quiz_qn_and_ans_list (List[Any]): The generated questions and answers.
+
+    Returns:
+        List[Dict[str, Any]]: The valid questions and answers.
+    """
+    valid_questions_and_answers = []
+    for qn_and_ans in quiz_qn_and_ans_list:
+        try:
+            format_question_answer(qn_and_ans)
+            valid_questions_and_answers.append(qn_and_ans)
+        except (ValueError, TypeError) as e:
+            quiz_items_counter.inc(outcome="invalid")
+            logging.warning(f"Invalid generated question will be regenerated: {e}")
+
+    quiz_items_counter.inc(len(valid_questions_and_answers), outcome="valid")
     return valid_questions_and_answers
 
 
@@ -76,25 +128,27 @@ def get_quiz_customisation_params(quiz_customisation: QuizCustomisationRequest)
 
 
 def get_quiz_from_content(content: str, 
-                          model: GenerativeModel, 
+                          model: LLMProvider, 
                           number_of_questions: int, 
                           question_types: str, 
                           difficulty_level: str, 
                           include_explanation: str, 
                           emphasis: str, 
-                          language: str) -> str:
+                          language: str,
+                          excluded_questions: Optional[List[str]] = None) -> str:
     """
     Generates quiz questions based on the provided content and customization options.
 
     Args:
         content (str): The text content to generate quiz questions from.
-        model (GenerativeModel): The generative model to use for generating quiz questions.
+        model (LLMProvider): The model provider to use for generating quiz questions.
         number_of_questions (int): The number of questions to generate.
         question_types (str): The types of questions to generate.
         difficulty_level (str): The difficulty level of the questions.
         include_explanation (str): Whether to include explanations for the answers.
         emphasis (str): The emphasis for the quiz questions.
         language (str): The preferred language for the quiz.
+        excluded_questions (Optional[List[str]]): Questions the quiz must not repeat.
 
     Returns:
         str: The generated quiz in JSON format.
@@ -110,18 +164,91 @@ def get_quiz_from_content(content: str,
 
     """
 
-    response = model.generate_content(textwrap.dedent(prompt) + QUIZ_FORMATTER + content, generation_config={'response_mime_type':'application/json'})
+    response = generate_content(model, textwrap.dedent(prompt) + format_excluded_questions(excluded_questions) + QUIZ_FORMATTER + content, PRIORITY_STANDARD, generation_config={'response_mime_type':'application/json'})
 
     return response.text
 
 
-def generate_quiz(model: GenerativeModel, db: Client, user_id: str, quiz_customisation: QuizCustomisationRequest) -> List[Dict[str, Any]]:
+def format_excluded_questions(excluded_questions: Optional[List[str]]) -> str:
+    """
+    Formats questions the model must not repeat as an instruction for the quiz prompt.
+
+    Args:
+        excluded_questions (Optional[List[str]]): Questions to exclude.
+
+    Returns:
+        str: The instruction, or an empty string if there is nothing to exclude.
+    """
+    if not excluded_questions:
+        return ""
+
+    formatted_str = "Do not repeat or rephrase any of these questions:\n"
+    for question in excluded_questions:
+        formatted_str += f"- {question}\n"
+
+    return formatted_str + "\n"
+
+
+def generate_new_questions(generate: Callable[[int, List[str]], str], question_index: QuestionIndex, number_of_questions: int) -> List[Dict[str, Any]]:
+    """
+    Generates valid quiz questions, replacing invalid items and near-duplicates of earlier questions.
+
+    Every complete item is salvaged from the model output and validated on its own. Near-duplicates
+    are detected with the user's question index. Only the missing number of questions is requested
+    from the model again, within a retry budget.
+
+    Args:
+        generate (Callable[[int, List[str]], str]): Calls the model for a number of questions, excluding the given questions.
+        question_index (QuestionIndex): The user's question index.
+        number_of_questions (int): The number of questions wanted.
+
+    Returns:
+        List[Dict[str, Any]]: The questions and answers. Reused stored questions carry their 'id'.
+
+    Raises:
+        JSONLoadError: If no question could be recovered from any model output within the retry budget.
+    """
+    quiz_qn_and_ans_list = []
+    missing = number_of_questions
+    last_error = None
+
+    for attempt in range(QUIZ_REPAIR_ATTEMPTS + 1):
+        if attempt == 1:
+            tokens_saved_counter.inc(estimate_token_count(json.dumps(quiz_qn_and_ans_list)))
+        if attempt > 0:
+            logging.info(f"Requesting {missing} more questions to replace invalid or duplicate questions ...")
+            quiz_repair_counter.inc()
+        excluded_questions = [qn_and_ans["question"] for qn_and_ans in quiz_qn_and_ans_list]
+        quiz_qn_and_ans = generate(missing, excluded_questions)
+        logging.info(f"Generated quizzes. Checking for format ...")
+
+        try:
+            valid_qn_and_ans_list = get_valid_question_answers(load_json_list_response(quiz_qn_and_ans))
+        except JSONLoadError as e:
+            logging.warning(f"Could not recover any question from the model output. Retrying ...")
+            last_error = e
+            valid_qn_and_ans_list = []
+        quiz_qn_and_ans_list, missing = select_new_questions(question_index, quiz_qn_and_ans_list + valid_qn_and_ans_list, number_of_questions)
+
+        if missing == 0:
+            break
+
+    if not quiz_qn_and_ans_list and last_error is not None:
+        raise last_error
+
+    if missing > 0:
+        logging.warning(f"Generated {len(quiz_qn_and_ans_list)} of {number_of_questions} questions within the retry budget.")
+
+    return quiz_qn_and_ans_list
+
+
+def generate_quiz(model: LLMProvider, storage: StorageRepository, user_id: str, quiz_customisation: QuizCustomisationRequest) -> List[Dict[str, Any]]:
     """
     Generates a quiz based on the user's notes and customization options.
 
     Args:
-        model (GenerativeModel): The generative model to use for generating quiz questions.
-        db (Client): The Firestore client.
+        model (LLMProvider): The model provider to use for generating quiz questions.
+        storage (StorageRepository): The storage repository.
         user_id (str): The ID of the user.
         quiz_customisation (QuizCustomisationRequest): Customization options for generating the quiz.
 
@@ -129,18 +256,20 @@ def generate_quiz(model: GenerativeModel, db: Client, user_id: str, quiz_customi
         List[Dict[str, Any]]: The generated quiz in dictionary format.
     """
 
-    content = retrieve_notes_doc_from_firestore(db, user_id)
+    with span("retrieve_notes"):
+        content = storage.retrieve_notes(user_id)
     logging.info(f"Retrieved documents from {NOTE_COLLECTION}")
 
     quiz_customisation_params = get_quiz_customisation_params(quiz_customisation)
+    with span("load_question_index"):
+        question_index = storage.load_question_index(user_id)
 
-    quiz_qn_and_ans = get_quiz_from_content(content, model, **quiz_customisation_params)
+    def generate(number_of_questions: int, excluded_questions: List[str]) -> str:
+        params = {**quiz_customisation_params, "number_of_questions": number_of_questions}
+        with span("generation"):
+            return get_quiz_from_content(content, model, **params, excluded_questions=excluded_questions)
 
-    logging.info(f"Generated quizzes. Checking for format ...")
-
-    quiz_qn_and_ans_dict = load_json_response(quiz_qn_and_ans)
-
-    return quiz_qn_and_ans_dict[:min(quiz_customisation_params["number_of_questions"], len(quiz_qn_and_ans_dict))]
+    return generate_new_questions(generate, question_index, quiz_customisation_params["number_of_questions"])
 
 
 def format_strengths_weaknesses_for_quiz_regeneration(content: str, strengths_weaknesses: StudentQuizEvaluationResponse) -> str:
@@ -169,20 +298,21 @@ def format_strengths_weaknesses_for_quiz_regeneration(content: str, strengths_we
 
 
 def get_quiz_from_content_and_student_evaluation(content: str, 
-                                                 model: GenerativeModel, 
+                                                 model: LLMProvider, 
                                                  number_of_questions: int, 
                                                  question_types: str, 
                                                  difficulty_level: str, 
                                                  include_explanation: str, 
                                                  emphasis: str, 
                                                  language: str, 
-                                                 strength_weakness: StudentQuizEvaluationResponse) -> str:
+                                                 strength_weakness: StudentQuizEvaluationResponse,
+                                                 excluded_questions: Optional[List[str]] = None) -> str:
     """
     Generates quiz questions based on the content and student's evaluation.
 
     Args:
         content (str): The text content to generate quiz questions from.
-        model (GenerativeModel): The generative model to use for generating quiz questions.
+        model (LLMProvider): The model provider to use for generating quiz questions.
         number_of_questions (int): The number of questions to generate.
         question_types (str): The types of questions to generate.
         difficulty_level (str): The difficulty level of the questions.
@@ -190,6 +320,7 @@ def get_quiz_from_content_and_student_evaluation(content: str,
         emphasis (str): The emphasis for the quiz questions.
         language (str): The preferred language for the quiz.
         strength_weakness (StudentQuizEvaluationResponse): The student's strengths and weaknesses.
+        excluded_questions (Optional[List[str]]): Questions the quiz must not repeat.
 
     Returns:
         str: The generated quiz in JSON format.
@@ -207,13 +338,13 @@ def get_quiz_from_content_and_student_evaluation(content: str,
 
     context = format_strengths_weaknesses_for_quiz_regeneration(content, strength_weakness)
 
-    response = model.generate_content(textwrap.dedent(prompt) + QUIZ_FORMATTER + context, generation_config={'response_mime_type':'application/json'})
+    response = generate_content(model, textwrap.dedent(prompt) + format_excluded_questions(excluded_questions) + QUIZ_FORMATTER + context, PRIORITY_STANDARD, generation_config={'response_mime_type':'application/json'})
 
     return response.text
 
 
-def regenerate_quiz_based_on_evaluation(model: GenerativeModel, 
-                                        db: Client, 
+def regenerate_quiz_based_on_evaluation(model: LLMProvider, 
+                                        storage: StorageRepository, 
                                         user_id: str, 
                                         quiz_customisation: QuizCustomisationRequest, 
                                         strength_weakness: StudentQuizEvaluationResponse) -> Dict[str, List[Dict[str, Any]]]:
@@ -222,8 +353,8 @@ def regenerate_quiz_based_on_evaluation(model: GenerativeModel,
     Regenerates a quiz based on the student's evaluation and customization options.
 
     Args:
-        model (GenerativeModel): The generative model to use for generating quiz questions.
-        db (Client): The Firestore client.
+        model (LLMProvider): The model provider to use for generating quiz questions.
+        storage (StorageRepository): The storage repository.
         user_id (str): The ID of the user.
         quiz_customisation (QuizCustomisationRequest): Customization options for generating the quiz.
         strength_weakness (StudentQuizEvaluationResponse): The student's strengths and weaknesses.
@@ -232,14 +363,14 @@ def regenerate_quiz_based_on_evaluation(model: GenerativeModel,
         Dict[str, List[Dict[str, Any]]]: The regenerated list of questions and answers in dictionary format.
     """
 
-    content = retrieve_notes_doc_from_firestore(db, user_id)
+    content = storage.retrieve_notes(user_id)
     logging.info(f"Retrieved documents from {NOTE_COLLECTION}")
 
     quiz_customisation_params = get_quiz_customisation_params(quiz_customisation)
+    question_index = storage.load_question_index(user_id)
 
-    quiz_qn_and_ans = get_quiz_from_content_and_student_evaluation(content, model, **quiz_customisation_params, strength_weakness=strength_weakness)
-    logging.info(f"Generated quizzes. Checking for format ...")
-
-    quiz_qn_and_ans_dict = load_json_response(quiz_qn_and_ans)
+    def generate(number_of_questions: int, excluded_questions: List[str]) -> str:
+        params = {**quiz_customisation_params, "number_of_questions": number_of_questions}
+        return get_quiz_from_content_and_student_evaluation(content, model, **params, strength_weakness=strength_weakness, excluded_questions=excluded_questions)
 
-    return quiz_qn_and_ans_dict[:min(quiz_customisation_params["number_of_questions"], len(quiz_qn_and_ans_dict))]
\ No newline at end of file
+    return generate_new_questions(generate, question_index, quiz_customisation_params["number_of_questions"])
\ No newline at end of file
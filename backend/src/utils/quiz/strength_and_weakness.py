@@ -1,14 +1,14 @@
 import logging
-from typing import Any, Dict, List, Union
+from typing import Any, Dict, List, Optional, Union
 import textwrap
 
-from google.generativeai import GenerativeModel
-from google.cloud.firestore_v1.client import Client
-
-from backend.src.utils.constants import QUIZ_COLLECTION
-from backend.src.utils.firestore.document_operations import get_recent_documents
-from backend.src.utils.firestore.quizzes_operations import get_quiz_results
+from backend.src.utils.constants import PRIORITY_INTERACTIVE, RECENT_ANSWERS_WINDOW_MINUTES
 from backend.src.utils.json_utils import load_json_response
+from backend.src.utils.llm.provider import LLMProvider
+from backend.src.utils.llm_scheduler import generate_content
+from backend.src.utils.quiz.performance_aggregate import format_performance_breakdown, get_cached_evaluation, get_evaluation_digest, get_recent_results
+from backend.src.utils.storage.answer_buffer import AnswerBuffer
+from backend.src.utils.storage.repository import StorageRepository
 
 
 def format_quiz_results(quiz_qn_and_ans_list: List[Dict[str, Any]]) -> str:
@@ -37,13 +37,14 @@ def format_quiz_results(quiz_qn_and_ans_list: List[Dict[str, Any]]) -> str:
     return formatted_str
 
 
-def evaluate_strength_and_weakeness(model: GenerativeModel, quiz_results: List[Dict[str, Any]]) -> str:
+def evaluate_strength_and_weakeness(model: LLMProvider, quiz_results: List[Dict[str, Any]], performance_breakdown: Optional[str] = "") -> str:
     """
     Evaluates the student's strengths and weaknesses based on quiz results.
 
     Args:
-        model (GenerativeModel): The generative model to use for evaluation.
+        model (LLMProvider): The model provider to use for evaluation.
         quiz_results (List[Dict[str, Any]]): A list of dictionaries containing quiz results.
+        performance_breakdown (Optional[str]): The student's overall performance by question type and topic.
 
     Returns:
         str: The evaluation result in JSON format.
@@ -65,8 +66,10 @@ def evaluate_strength_and_weakeness(model: GenerativeModel, quiz_results: List[D
     """
 
     quiz_results_str = format_quiz_results(quiz_results)
+    if performance_breakdown:
+        quiz_results_str += "\nOverall performance:\n" + performance_breakdown
 
-    response = model.generate_content(textwrap.dedent(prompt) + quiz_results_str, generation_config={'response_mime_type':'application/json'})
+    response = generate_content(model, textwrap.dedent(prompt) + quiz_results_str, PRIORITY_INTERACTIVE, generation_config={'response_mime_type':'application/json'})
 
     return response.text
 
@@ -88,15 +91,24 @@ def calculate_student_score(latest_quiz_results: List[Dict[str, Any]]) -> int:
     return quiz_score
 
 
-def assess_student_strength_weakness(model: GenerativeModel, db: Client, user_id: str, num_of_quiz_qn: int) -> Dict[str, Union[str, int]]:
+def assess_student_strength_weakness(model: LLMProvider,
+                                     storage: StorageRepository,
+                                     user_id: str,
+                                     num_of_quiz_qn: int,
+                                     answer_buffer: Optional[AnswerBuffer] = None) -> Dict[str, Union[str, int]]:
     """
     Assesses the student's strengths and weaknesses based on recent quiz results.
 
+    The results are read from the user's performance aggregate, so the assessment costs a single document read.
+    The evaluation is reused without calling the model while no new answer has been recorded.
+    Answers still held by the answer buffer are included, so they count before they are written.
+
     Args:
-        model (GenerativeModel): The generative model to use for evaluation.
-        db (Client): The Firestore client.
+        model (LLMProvider): The model provider to use for evaluation.
+        storage (StorageRepository): The storage repository.
         user_id (str): The ID of the user.
         num_of_quiz_qn (int): The number of quiz questions to consider.
+        answer_buffer (Optional[AnswerBuffer]): The buffer of answers that are not written yet.
 
     Returns:
         Dict[str, Union[str, int]]: The student's strengths and weaknesses along with their score.
@@ -104,29 +116,38 @@ def assess_student_strength_weakness(model: GenerativeModel, db: Client, user_id
     Raises:
         ValueError: If there are no recently answered quizzes or if the user did not answer any questions.
     """
-    quiz_docs = get_recent_documents(db, user_id, QUIZ_COLLECTION, minutes=120)
+    aggregate = storage.get_performance_aggregate(user_id)
+    has_pending_answers = answer_buffer is not None and bool(answer_buffer.pending_records(user_id))
+    if has_pending_answers:
+        aggregate = answer_buffer.apply_pending(user_id, aggregate)
 
-    if len(quiz_docs) == 0:
+    if not aggregate:
         raise ValueError(f"There is no recently answered quizzes. Answer a quiz before getting your score.")
 
-    quiz_results = get_quiz_results(quiz_docs)
+    latest_quiz_results = get_recent_results(aggregate, num_of_quiz_qn, RECENT_ANSWERS_WINDOW_MINUTES)
 
-    if len(quiz_results) == 0:
+    if len(latest_quiz_results) == 0:
         raise ValueError(f"You did not answer any questions. Answer the quiz before getting your score and evaluation.")
-
-    sorted_quiz_results = sorted(quiz_results, key=lambda x: x['timestamp'], reverse=True)
-    latest_quiz_results = sorted_quiz_results[:num_of_quiz_qn] if len(sorted_quiz_results) > num_of_quiz_qn else sorted_quiz_results
     logging.info(f"Retrieved quiz results.")
 
     quiz_score = calculate_student_score(latest_quiz_results)
     logging.info(f"Calculated quiz score: {quiz_score}.")
 
-    strength_weakness = evaluate_strength_and_weakeness(model, latest_quiz_results)
-    logging.info(f"Generated strengths and weaknesses.")
+    digest = get_evaluation_digest(latest_quiz_results, num_of_quiz_qn)
+    strength_weakness_dict = get_cached_evaluation(aggregate, digest)
+
+    if strength_weakness_dict:
+        logging.info(f"Using cached strengths and weaknesses.")
+    else:
+        strength_weakness = evaluate_strength_and_weakeness(model, latest_quiz_results, format_performance_breakdown(aggregate))
+        logging.info(f"Generated strengths and weaknesses.")
 
-    strength_weakness_dict = load_json_response(strength_weakness)
+        strength_weakness_dict = load_json_response(strength_weakness)
+        # The stored aggregate does not have the buffered answers yet, so the evaluation is cached once they are written.
+        if not has_pending_answers:
+            storage.set_cached_evaluation(user_id, digest, strength_weakness_dict)
 
     result_dict = strength_weakness_dict
     result_dict["score"] = quiz_score
 
-    return result_dict
\ No newline at end of file
+    return result_dict
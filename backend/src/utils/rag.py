@@ -1,36 +1,33 @@
-from typing import List, Optional
+from typing import TYPE_CHECKING, List, Optional, Tuple
 import logging
 
-from firebase_admin import firestore
-
 from google.cloud.firestore_v1.base_vector_query import DistanceMeasure
-import google.generativeai as genai
 from google.cloud.firestore_v1.vector import Vector
 from google.cloud.firestore_v1.client import Client
 
-from langchain.schema import Document
-from langchain_experimental.text_splitter import SemanticChunker
+from backend.src.utils.constants import NOTE_COLLECTION, PRIORITY_BACKGROUND, PRIORITY_INTERACTIVE, USER_COLLECTION
+from backend.src.utils.llm.factory import get_llm_provider
+from backend.src.utils.llm_scheduler import embed
+from backend.src.utils.metrics import span
+from backend.src.utils.storage.repository import StorageRepository
 
-from backend.src.utils.app_init import configure_genai, init_embedding_model
-from backend.src.utils.constants import NOTE_COLLECTION, USER_COLLECTION
+if TYPE_CHECKING:
+    from langchain.schema import Document
 
 
-def embed_text(text: str) -> Vector:
+def embed_text(text: str, priority: Optional[int] = PRIORITY_INTERACTIVE) -> Vector:
     """
-    Generates embeddings for the given text using Google Generative AI.
+    Generates embeddings for the given text with the configured embedding model.
 
     Args:
         text (str): The text to be embedded.
+        priority (Optional[int]): The scheduling priority of the call. Defaults to PRIORITY_INTERACTIVE.
 
     Returns:
         Vector: The generated embeddings.
     """
-    configure_genai()
-    embeddings = genai.embed_content(
-        model="models/text-embedding-004",
-        content=text,
-        task_type="retrieval_query")
-    vector_embeddings = Vector(embeddings['embedding'])
+    embeddings = embed(get_llm_provider(), [text], "retrieval_query", priority)
+    vector_embeddings = Vector(embeddings[0])
     return vector_embeddings
 
 
@@ -67,12 +64,12 @@ def similarity_search_in_notes(db: Client, user_id: str, embeddings: Vector, lim
     return retrieved_text_lst
 
 
-def get_most_similar_text(db: Client, user_id: str, query: str, limit: Optional[int] = 5) -> List[str]:
+def get_most_similar_text(storage: StorageRepository, user_id: str, query: str, limit: Optional[int] = 5) -> List[str]:
     """
     Finds the most similar text in the user's notes based on a query.
 
     Args:
-        db (Client): The Firestore client.
+        storage (StorageRepository): The storage repository.
         user_id (str): The ID of the user.
         query (str): The query text.
         limit (Optional[int]): The maximum number of similar texts to retrieve. Defaults to 5.
@@ -81,11 +78,11 @@ def get_most_similar_text(db: Client, user_id: str, query: str, limit: Optional[
         List[str]: A list of the most similar texts.
     """
     query_embeddings = embed_text(query)
-    retrieved_text_lst = similarity_search_in_notes(db, user_id, query_embeddings, limit)
+    retrieved_text_lst = storage.similarity_search_in_notes(user_id, query_embeddings, limit)
     return retrieved_text_lst
 
 
-def chunk_text(notes: str) -> List[Document]:
+def chunk_text(notes: str) -> List["Document"]:
     """
     Splits notes into smaller chunks using semantic text chunking.
 
@@ -95,9 +92,38 @@ def chunk_text(notes: str) -> List[Document]:
     Returns:
         List[Document]: A list of documents of chunked notes.
     """
-    embedding_model = init_embedding_model()
+    from langchain_experimental.text_splitter import SemanticChunker
+    from backend.src.utils.llm.langchain_embeddings import ProviderEmbeddings
+
+    # The chunker embeds the sentences in one batched call.
+    embedding_model = ProviderEmbeddings(get_llm_provider(), PRIORITY_BACKGROUND)
 
     text_splitter = SemanticChunker(embedding_model, breakpoint_threshold_type="percentile")
     notes_split = text_splitter.create_documents([notes])
 
-    return notes_split
\ No newline at end of file
+    return notes_split
+
+
+def chunk_and_embed_notes(notes: str) -> List[Tuple[str, Vector]]:
+    """
+    Splits notes into chunks and embeds each non-empty chunk.
+
+    Args:
+        notes (str): The notes to be chunked.
+
+    Returns:
+        List[Tuple[str, Vector]]: The note chunks with their embeddings.
+    """
+    with span("chunking"):
+        notes_split = chunk_text(notes)
+    logging.info(f"Chunked notes into {len(notes_split)} chunks.")
+
+    note_chunks = []
+    with span("embedding"):
+        for note_doc in notes_split:
+            note = note_doc.page_content
+            if not note or not note.strip():
+                continue
+            note_chunks.append((note, embed_text(note, PRIORITY_BACKGROUND)))
+
+    return note_chunks
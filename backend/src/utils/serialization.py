@@ -0,0 +1,17 @@
+from typing import Any
+
+from fastapi.responses import JSONResponse
+from pydantic_core import to_json
+
+
+class ModelJSONResponse(JSONResponse):
+    """
+    A JSON response rendered straight from pydantic models by pydantic-core.
+
+    Endpoints that return this response skip FastAPI's response handling, which validates the model
+    again and converts it to Python objects before encoding them, so only return models that are
+    already of the route's response model.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return to_json(content)
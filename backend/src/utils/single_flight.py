@@ -0,0 +1,89 @@
+import hashlib
+import json
+import threading
+from typing import Any, Callable, Dict, Optional
+
+from backend.src.utils.metrics import get_counter
+
+single_flight_counter = get_counter("llm_single_flight_total", "Model calls made upstream ('leader') or collapsed into an identical in-flight call ('collapsed')", ("kind", "outcome"))
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """
+    Collapses concurrent calls with the same key into one call whose result, or error, all callers share.
+
+    Only calls that overlap in time are collapsed; nothing is cached once the call returns.
+    """
+
+    def __init__(self, kind: str):
+        self.kind = kind
+        self.calls: Dict[str, _Call] = {}
+        self.lock = threading.Lock()
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Any:
+        """
+        Runs fn, unless a call with the same key is in flight, in which case its result is returned.
+
+        Args:
+            key (str): The key identifying identical calls.
+            fn (Callable[[], Any]): The call to make.
+
+        Returns:
+            Any: The result of fn, or of the in-flight call.
+
+        Raises:
+            BaseException: The error raised by fn or by the in-flight call.
+        """
+        with self.lock:
+            call = self.calls.get(key)
+            is_leader = call is None
+            if is_leader:
+                call = self.calls[key] = _Call()
+
+        if not is_leader:
+            single_flight_counter.inc(kind=self.kind, outcome="collapsed")
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        single_flight_counter.inc(kind=self.kind, outcome="leader")
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self.lock:
+                del self.calls[key]
+            call.done.set()
+
+
+def _key_part(part: Any) -> Any:
+    if isinstance(part, (str, int, float, bool)) or part is None:
+        return part
+    if isinstance(part, (list, tuple)):
+        return [_key_part(item) for item in part]
+    if isinstance(part, dict):
+        return {str(name): _key_part(value) for name, value in part.items()}
+    # Uploaded files are identified by their name, e.g. 'files/abc123'.
+    name = getattr(part, "name", None)
+    if isinstance(name, str):
+        return f"{type(part).__name__}:{name}"
+    return repr(part)
+
+
+def make_call_key(*parts: Any) -> str:
+    """
+    Returns a SHA-256 key of a model call's parts, e.g. the model name, generation config and prompt.
+    """
+    payload = json.dumps([_key_part(part) for part in parts], sort_keys=True, default=repr)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
@@ -0,0 +1,208 @@
+import copy
+import json
+import logging
+import os
+import threading
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Union
+
+from backend.src.api.v1.models.requests import CompareAnswerRequest
+from backend.src.api.v1.models.responses import FreeResponseQuestion, MultiSelectQuestion, MultipleChoiceQuestion, TrueFalseQuestion
+from backend.src.utils.constants import ANSWER_BUFFER_FLUSH_SECONDS, ANSWER_BUFFER_MAX_SIZE, ANSWER_BUFFER_SHUTDOWN_ATTEMPTS
+from backend.src.utils.metrics import get_counter
+from backend.src.utils.quiz.performance_aggregate import AnswerRecord, apply_answer_to_aggregate
+from backend.src.utils.quiz.question_index import get_cached_question_index
+from backend.src.utils.storage.repository import StorageRepository
+
+answer_records_counter = get_counter("answer_buffer_records_total", "Answer records by write-behind outcome", ("outcome",))
+answer_flushes_counter = get_counter("answer_buffer_flushes_total", "Per-user answer buffer flushes by outcome", ("outcome",))
+
+
+class AnswerBuffer:
+    """
+    Write-behind buffer for students' answers.
+
+    Answers are acknowledged as soon as they are buffered, and written per user in one transaction
+    when ANSWER_BUFFER_MAX_SIZE answers are pending or every ANSWER_BUFFER_FLUSH_SECONDS. Answers that
+    cannot be written on shutdown are spilled to a JSON-lines file and replayed on the next start.
+    Reads of a user's performance see buffered answers through `apply_pending`.
+    """
+
+    def __init__(self,
+                 storage: StorageRepository,
+                 max_size: Optional[int] = ANSWER_BUFFER_MAX_SIZE,
+                 flush_interval: Optional[float] = ANSWER_BUFFER_FLUSH_SECONDS,
+                 spill_path: Optional[str] = None):
+        self.storage = storage
+        self.max_size = max_size
+        self.flush_interval = flush_interval
+        self.spill_path = spill_path or os.getenv("ANSWER_BUFFER_SPILL_PATH", "pending_answers.jsonl")
+        self.pending: Dict[str, List[AnswerRecord]] = {}
+        self.in_flight: Dict[str, List[AnswerRecord]] = {}
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.stopped = threading.Event()
+        self.thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        """
+        Replays answers spilled by a previous shutdown and starts the background flush thread.
+        """
+        self._replay_spilled()
+        self.thread = threading.Thread(target=self._run, name="answer-buffer", daemon=True)
+        self.thread.start()
+
+    def submit(self,
+               user_id: str,
+               question_and_answer: Union[MultipleChoiceQuestion, MultiSelectQuestion, TrueFalseQuestion, FreeResponseQuestion],
+               student_answer: Union[int, List[int], str],
+               correctness: int) -> None:
+        """
+        Buffers a student's answer for writing.
+
+        Args:
+            user_id (str): The ID of the user.
+            question_and_answer (Union[MultipleChoiceQuestion, MultiSelectQuestion, TrueFalseQuestion, FreeResponseQuestion]): The answered question.
+            student_answer (Union[int, List[int], str]): The student's answer to the question.
+            correctness (int): Whether the student's answer is correct or not. 1=Correct, 0=Incorrect
+        """
+        with self.lock:
+            self.pending.setdefault(user_id, []).append(AnswerRecord(question_and_answer, student_answer, correctness))
+            pending_count = sum(len(records) for records in self.pending.values())
+        answer_records_counter.inc(outcome="buffered")
+
+        question_index = get_cached_question_index(user_id)
+        if question_index is not None and question_and_answer.id:
+            question_index.mark_answered(question_and_answer.id)
+
+        if pending_count >= self.max_size:
+            self.wakeup.set()
+
+    def pending_records(self, user_id: str) -> List[AnswerRecord]:
+        """
+        Returns the user's answers that are not written yet, oldest first.
+        """
+        with self.lock:
+            return list(self.in_flight.get(user_id, [])) + list(self.pending.get(user_id, []))
+
+    def apply_pending(self, user_id: str, aggregate: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """
+        Returns the user's performance aggregate with the answers that are not written yet folded in.
+
+        Args:
+            user_id (str): The ID of the user.
+            aggregate (Optional[Dict[str, Any]]): The stored aggregate. It is not modified.
+
+        Returns:
+            Optional[Dict[str, Any]]: The aggregate as it will be once the buffered answers are written.
+        """
+        pending_records = self.pending_records(user_id)
+        if not pending_records:
+            return aggregate
+
+        aggregate = copy.deepcopy(aggregate)
+        for answer_record in pending_records:
+            aggregate = apply_answer_to_aggregate(aggregate, answer_record.to_answer_entry())
+        return aggregate
+
+    def flush(self, user_id: Optional[str] = None) -> bool:
+        """
+        Writes the buffered answers of a user, or of every user, with one transaction per user.
+
+        Answers that fail to write are kept in the buffer, ahead of newer answers.
+
+        Args:
+            user_id (Optional[str]): The ID of the user.
+
+        Returns:
+            bool: Whether all the flushed answers were written.
+        """
+        with self.flush_lock:
+            with self.lock:
+                user_ids = [user_id] if user_id is not None else list(self.pending)
+                batches = {uid: self.pending.pop(uid) for uid in user_ids if self.pending.get(uid)}
+                self.in_flight.update(batches)
+
+            failed = {}
+            for uid, answer_records in batches.items():
+                try:
+                    self.storage.add_student_answers_to_quizzes(uid, answer_records)
+                    answer_flushes_counter.inc(outcome="written")
+                    answer_records_counter.inc(len(answer_records), outcome="written")
+                except Exception as e:
+                    logging.error(f"Failed to write {len(answer_records)} buffered answers of user {uid}: {e}")
+                    answer_flushes_counter.inc(outcome="failed")
+                    failed[uid] = answer_records
+
+            with self.lock:
+                for uid in batches:
+                    self.in_flight.pop(uid, None)
+                for uid, answer_records in failed.items():
+                    self.pending[uid] = answer_records + self.pending.get(uid, [])
+
+        return not failed
+
+    def close(self) -> None:
+        """
+        Stops the flush thread and writes every buffered answer, spilling those that still fail to the spill file.
+        """
+        self.stopped.set()
+        self.wakeup.set()
+        if self.thread is not None:
+            self.thread.join()
+
+        for _ in range(ANSWER_BUFFER_SHUTDOWN_ATTEMPTS):
+            if self.flush():
+                return
+        self._spill()
+
+    def _run(self) -> None:
+        while not self.stopped.is_set():
+            self.wakeup.wait(self.flush_interval)
+            self.wakeup.clear()
+            if not self.stopped.is_set():
+                self.flush()
+
+    def _spill(self) -> None:
+        with self.lock:
+            pending = self.pending
+            self.pending = {}
+
+        spilled = 0
+        with open(self.spill_path, "a") as f:
+            for user_id, answer_records in pending.items():
+                for answer_record in answer_records:
+                    f.write(json.dumps({
+                        "user_id": user_id,
+                        "question_and_answer": answer_record.question_and_answer.model_dump(mode="json"),
+                        "student_answer": answer_record.student_answer,
+                        "correctness": answer_record.correctness,
+                        "answered_at": answer_record.answered_at.isoformat(),
+                    }) + "\n")
+                    spilled += 1
+        answer_records_counter.inc(spilled, outcome="spilled")
+        logging.error(f"Spilled {spilled} unwritten answers to {self.spill_path}")
+
+    def _replay_spilled(self) -> None:
+        # Claimed with an atomic rename, so that only one of several server workers replays the answers.
+        claimed_path = f"{self.spill_path}.{os.getpid()}"
+        try:
+            os.replace(self.spill_path, claimed_path)
+        except FileNotFoundError:
+            return
+
+        with open(claimed_path) as f:
+            lines = [line for line in f if line.strip()]
+        with self.lock:
+            for line in lines:
+                record = json.loads(line)
+                request = CompareAnswerRequest(question_and_answer=record["question_and_answer"], student_answer=record["student_answer"])
+                answer_record = AnswerRecord(request.question_and_answer, request.student_answer, record["correctness"], datetime.fromisoformat(record["answered_at"]))
+                self.pending.setdefault(record["user_id"], []).append(answer_record)
+        # The answers are buffered now: those the flush below fails to write are retried by the flush
+        # thread and spilled again on shutdown, so keeping the file would write them twice.
+        os.remove(claimed_path)
+        logging.info(f"Replaying {len(lines)} spilled answers from {self.spill_path}")
+
+        self.flush()
@@ -0,0 +1,38 @@
+import logging
+import os
+
+from backend.src.utils.constants import FIRESTORE_STORAGE, MEMORY_STORAGE, SQLITE_STORAGE
+from backend.src.utils.storage.repository import StorageRepository
+
+
+def init_storage_repository() -> StorageRepository:
+    """
+    Initializes the storage repository selected by the STORAGE_BACKEND environment variable.
+
+    'firestore' (default) uses Cloud Firestore, 'memory' keeps data in process memory and 'sqlite'
+    stores data in the file at SQLITE_DATABASE_PATH.
+
+    Returns:
+        StorageRepository: The storage repository.
+
+    Raises:
+        ValueError: If the storage backend is unknown.
+    """
+    storage_backend = os.getenv("STORAGE_BACKEND", FIRESTORE_STORAGE).lower()
+    logging.info(f"Using {storage_backend} storage backend")
+
+    if storage_backend == FIRESTORE_STORAGE:
+        from firebase_admin import firestore
+        from backend.src.utils.app_init import initialize_firebase_admin
+        from backend.src.utils.firestore.instrumentation import instrument_firestore_client
+        from backend.src.utils.storage.firestore_repository import FirestoreRepository
+        initialize_firebase_admin()
+        return FirestoreRepository(instrument_firestore_client(firestore.client()))
+    elif storage_backend == MEMORY_STORAGE:
+        from backend.src.utils.storage.memory_repository import MemoryRepository
+        return MemoryRepository()
+    elif storage_backend == SQLITE_STORAGE:
+        from backend.src.utils.storage.sqlite_repository import SQLiteRepository
+        return SQLiteRepository(os.getenv("SQLITE_DATABASE_PATH", "whoots.db"))
+    else:
+        raise ValueError(f"Unknown storage backend: {storage_backend}")
@@ -0,0 +1,55 @@
+from typing import Any, Dict, List, Optional, Sequence, Union
+
+from google.cloud.firestore_v1.client import Client
+
+from backend.src.api.v1.models.responses import FreeResponseQuestion, MultiSelectQuestion, MultipleChoiceQuestion, TrueFalseQuestion
+from backend.src.utils.constants import NOTE_COLLECTION, QUIZ_COLLECTION, USER_COLLECTION
+from backend.src.utils.firestore import document_operations, notes_operations, performance_operations, quizzes_operations
+from backend.src.utils.firestore.notes_cache import invalidate_cached_notes
+from backend.src.utils.quiz.performance_aggregate import AnswerRecord
+from backend.src.utils.quiz.question_index import QuestionIndex, evict_question_index
+from backend.src.utils.rag import similarity_search_in_notes
+from backend.src.utils.storage.repository import StorageRepository
+
+
+class FirestoreRepository(StorageRepository):
+    """
+    Storage repository backed by Cloud Firestore.
+    """
+
+    def __init__(self, db: Client):
+        self.db = db
+
+    def add_to_notes(self, user_id: str, notes: str) -> None:
+        notes_operations.add_to_notes(self.db, user_id, notes)
+
+    def retrieve_notes(self, user_id: str) -> str:
+        return notes_operations.retrieve_notes_doc_from_firestore(self.db, user_id)
+
+    def similarity_search_in_notes(self, user_id: str, embeddings: Sequence[float], limit: Optional[int] = 5) -> List[str]:
+        return similarity_search_in_notes(self.db, user_id, embeddings, limit)
+
+    def add_to_quizzes(self, user_id: str, quiz_qn_and_ans_list: List[Union[MultipleChoiceQuestion, MultiSelectQuestion, TrueFalseQuestion, FreeResponseQuestion]]) -> List[str]:
+        return quizzes_operations.add_to_quizzes(self.db, user_id, quiz_qn_and_ans_list)
+
+    def add_student_answers_to_quizzes(self, user_id: str, answer_records: List[AnswerRecord]) -> None:
+        quizzes_operations.add_student_answers_to_quizzes(self.db, user_id, answer_records)
+
+    def load_question_index(self, user_id: str) -> QuestionIndex:
+        return quizzes_operations.load_question_index(self.db, user_id)
+
+    def get_performance_aggregate(self, user_id: str) -> Optional[Dict[str, Any]]:
+        return performance_operations.get_performance_aggregate(self.db, user_id)
+
+    def set_cached_evaluation(self, user_id: str, digest: str, strength_weakness: Dict[str, str]) -> None:
+        performance_operations.set_cached_evaluation(self.db, user_id, digest, strength_weakness)
+
+    def delete_all_docs_in_collection(self, coll_name: str, batch_size: int, user_id: Optional[str] = None, recursive: Optional[bool] = False) -> int:
+        deleted = document_operations.delete_all_docs_in_collection(self.db, coll_name, batch_size, user_id, recursive)
+        if coll_name == QUIZ_COLLECTION or (coll_name == USER_COLLECTION and not recursive):
+            # The aggregates summarise the deleted answers. A recursive delete of the users removes them already.
+            performance_operations.delete_performance_aggregates(self.db, user_id)
+        evict_question_index(user_id)
+        if coll_name in (USER_COLLECTION, NOTE_COLLECTION):
+            invalidate_cached_notes(user_id)
+        return deleted
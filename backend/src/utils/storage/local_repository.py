@@ -0,0 +1,231 @@
+import logging
+import uuid
+from abc import abstractmethod
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from backend.src.api.v1.models.responses import FreeResponseQuestion, MultiSelectQuestion, MultipleChoiceQuestion, TrueFalseQuestion
+from backend.src.utils.constants import NOTE_COLLECTION, PERFORMANCE_COLLECTION, QUIZ_COLLECTION, RECENT_NOTES_WINDOW_MINUTES, USER_COLLECTION
+from backend.src.utils.firestore.notes_operations import get_notes_from_docs
+from backend.src.utils.quiz.performance_aggregate import AnswerRecord, apply_answer_to_aggregate
+from backend.src.utils.quiz.question_index import (QuestionIndex, build_question_index, cache_question_index, evict_question_index, get_cached_question_index,
+                                                   get_question_index_generation, question_index_uses_embeddings, update_cached_question_index)
+from backend.src.utils.rag import chunk_and_embed_notes, embed_text
+from backend.src.utils.storage.repository import StorageRepository
+
+
+def new_document_id() -> str:
+    """
+    Returns a random 20-character document ID, like Firestore auto-IDs.
+    """
+    return uuid.uuid4().hex[:20]
+
+
+def find_nearest(texts: List[str], embeddings: np.ndarray, query: Sequence[float], limit: int) -> List[str]:
+    """
+    Returns the texts whose embeddings are nearest to the query by Euclidean distance.
+
+    Args:
+        texts (List[str]): The texts, aligned with the rows of embeddings.
+        embeddings (np.ndarray): The embeddings as an (n, d) array.
+        query (Sequence[float]): The query embedding.
+        limit (int): The maximum number of texts to return.
+
+    Returns:
+        List[str]: The nearest texts, nearest first.
+    """
+    if not texts or limit <= 0:
+        return []
+
+    distances = np.linalg.norm(embeddings - np.asarray(query, dtype=np.float32), axis=1)
+    limit = min(limit, len(texts))
+    nearest = np.argpartition(distances, limit - 1)[:limit]
+    return [texts[i] for i in nearest[np.argsort(distances[nearest])]]
+
+
+class LocalRepository(StorageRepository):
+    """
+    Shared logic for storage repositories that run in the application process.
+
+    Subclasses provide the primitive reads and writes. Multi-write operations run inside `transaction`.
+    """
+
+    @abstractmethod
+    def transaction(self) -> Iterator[None]:
+        """
+        Context manager making the enclosed reads and writes atomic.
+        """
+
+    @abstractmethod
+    def insert_notes(self, user_id: str, note_chunks: List[Tuple[str, np.ndarray]], timestamp: datetime) -> None:
+        """
+        Stores note chunks with their embeddings.
+        """
+
+    @abstractmethod
+    def get_notes(self, user_id: str, since: Optional[datetime] = None) -> List[Dict[str, Any]]:
+        """
+        Returns the user's note documents, optionally only those stored since a time.
+        """
+
+    @abstractmethod
+    def get_note_embeddings(self, user_id: str) -> Tuple[List[str], np.ndarray]:
+        """
+        Returns the user's note texts and their embeddings as an (n, d) array.
+        """
+
+    @abstractmethod
+    def insert_quiz(self, user_id: str, quiz_id: str, quiz_data: Dict[str, Any]) -> None:
+        """
+        Stores a quiz question document.
+        """
+
+    @abstractmethod
+    def update_quiz(self, user_id: str, quiz_id: str, fields: Dict[str, Any]) -> bool:
+        """
+        Merges fields into a quiz question document. Returns False if the document does not exist.
+        """
+
+    @abstractmethod
+    def find_quiz_ids(self, user_id: str, question: str) -> List[str]:
+        """
+        Returns the IDs of the user's quiz documents with exactly this question text.
+        """
+
+    @abstractmethod
+    def get_quizzes(self, user_id: str) -> List[Dict[str, Any]]:
+        """
+        Returns all the user's quiz documents, including their 'id'.
+        """
+
+    @abstractmethod
+    def get_aggregate(self, user_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Returns the user's performance aggregate, if any.
+        """
+
+    @abstractmethod
+    def put_aggregate(self, user_id: str, aggregate: Dict[str, Any]) -> None:
+        """
+        Replaces the user's performance aggregate.
+        """
+
+    @abstractmethod
+    def delete_collection(self, coll_name: str, user_id: Optional[str] = None) -> int:
+        """
+        Deletes a user's collection, or the user's data when coll_name is the users collection, or every user's data if no
+        user is given for it. Returns the number of deleted documents.
+        """
+
+    def add_to_notes(self, user_id: str, notes: str) -> None:
+        note_chunks = [(note, np.asarray(list(embedding), dtype=np.float32)) for note, embedding in chunk_and_embed_notes(notes)]
+        self.insert_notes(user_id, note_chunks, datetime.now(timezone.utc))
+        logging.info(f"Added {len(note_chunks)} note chunks for user {user_id}")
+
+    def retrieve_notes(self, user_id: str) -> str:
+        since = datetime.now(timezone.utc) - timedelta(minutes=RECENT_NOTES_WINDOW_MINUTES)
+        content = get_notes_from_docs(self.get_notes(user_id, since))
+
+        if not content:
+            logging.info("No content available from recent documents to generate a quiz. Using all documents in the collection to generate the quiz ...")
+            content = get_notes_from_docs(self.get_notes(user_id))
+            if not content:
+                logging.error(f"No documents in {NOTE_COLLECTION} collection.")
+                raise ValueError("Upload a file to get started. There is no documents available in our database to generate a quiz.")
+
+        return content
+
+    def similarity_search_in_notes(self, user_id: str, embeddings: Sequence[float], limit: Optional[int] = 5) -> List[str]:
+        texts, note_embeddings = self.get_note_embeddings(user_id)
+        retrieved_text_lst = find_nearest(texts, note_embeddings, list(embeddings), limit)
+        logging.info(f"Retrieved {len(retrieved_text_lst)} from the {NOTE_COLLECTION} collection")
+        return retrieved_text_lst
+
+    def add_to_quizzes(self, user_id: str, quiz_qn_and_ans_list: List[Union[MultipleChoiceQuestion, MultiSelectQuestion, TrueFalseQuestion, FreeResponseQuestion]]) -> List[str]:
+        question_index = get_cached_question_index(user_id)
+        new_questions = []
+        with self.transaction():
+            for qna in quiz_qn_and_ans_list:
+                if qna.id:
+                    continue
+                quiz_data = qna.model_dump(mode="json", exclude={"id"})
+                question_embedding = question_index.embedding_for(qna.question) if question_index is not None else None
+                if question_embedding is not None:
+                    quiz_data["question_embedding"] = question_embedding
+                quiz_data["timestamp"] = datetime.now(timezone.utc)
+
+                qna.id = new_document_id()
+                self.insert_quiz(user_id, qna.id, quiz_data)
+                new_questions.append((qna.id, quiz_data, question_embedding))
+
+        def add_new_questions(index: QuestionIndex) -> None:
+            for quiz_id, quiz_data, question_embedding in new_questions:
+                index.add(quiz_id, quiz_data, embedding=question_embedding)
+
+        if new_questions:
+            update_cached_question_index(user_id, add_new_questions)
+
+        return [qna.id for qna in quiz_qn_and_ans_list]
+
+    def add_student_answers_to_quizzes(self, user_id: str, answer_records: List[AnswerRecord]) -> None:
+        answered_quiz_ids = []
+        with self.transaction():
+            aggregate = self.get_aggregate(user_id)
+            for answer_record in answer_records:
+                question_and_answer = answer_record.question_and_answer
+                answer = {"student_answer": answer_record.student_answer, "correctness": answer_record.correctness, "timestamp": answer_record.answered_at}
+                if question_and_answer.id and self.update_quiz(user_id, question_and_answer.id, answer):
+                    quiz_ids = [question_and_answer.id]
+                else:
+                    quiz_ids = self.find_quiz_ids(user_id, question_and_answer.question)
+                    for quiz_id in quiz_ids:
+                        self.update_quiz(user_id, quiz_id, answer)
+                if not quiz_ids:
+                    logging.warning(f"Dropping an answer of user {user_id} whose question is not stored.")
+                    continue
+
+                aggregate = apply_answer_to_aggregate(aggregate, answer_record.to_answer_entry(quiz_ids[0]))
+                answered_quiz_ids.extend(quiz_ids)
+            self.put_aggregate(user_id, aggregate)
+
+        def mark_answered(index: QuestionIndex) -> None:
+            for quiz_id in answered_quiz_ids:
+                index.mark_answered(quiz_id)
+
+        update_cached_question_index(user_id, mark_answered)
+
+    def load_question_index(self, user_id: str) -> QuestionIndex:
+        question_index = get_cached_question_index(user_id)
+        if question_index is None:
+            generation = get_question_index_generation(user_id)
+            use_embeddings = question_index_uses_embeddings()
+            question_index = build_question_index(self.get_quizzes(user_id), embed_fn=embed_text if use_embeddings else None)
+            cache_question_index(user_id, question_index, generation)
+        return question_index
+
+    def get_performance_aggregate(self, user_id: str) -> Optional[Dict[str, Any]]:
+        return self.get_aggregate(user_id)
+
+    def set_cached_evaluation(self, user_id: str, digest: str, strength_weakness: Dict[str, str]) -> None:
+        with self.transaction():
+            aggregate = self.get_aggregate(user_id)
+            if aggregate is None:
+                return
+            aggregate["cached_evaluation"] = {"digest": digest, "strength": strength_weakness["strength"], "weakness": strength_weakness["weakness"]}
+            self.put_aggregate(user_id, aggregate)
+
+    def delete_all_docs_in_collection(self, coll_name: str, batch_size: int, user_id: Optional[str] = None, recursive: Optional[bool] = False) -> int:
+        if coll_name != USER_COLLECTION and not user_id:
+            raise ValueError(f"Provide user_id to delete collections under 'users' collection.")
+
+        with self.transaction():
+            deleted = self.delete_collection(coll_name, user_id)
+            if coll_name == QUIZ_COLLECTION:
+                # The performance aggregate and its cached evaluation summarise the deleted answers.
+                self.delete_collection(PERFORMANCE_COLLECTION, user_id)
+        evict_question_index(user_id)
+        logging.info(f"Deleted {deleted} documents from {coll_name}")
+        return deleted
+
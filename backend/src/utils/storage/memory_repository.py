@@ -0,0 +1,94 @@
+import copy
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from backend.src.utils.constants import NOTE_COLLECTION, PERFORMANCE_COLLECTION, QUIZ_COLLECTION, USER_COLLECTION
+from backend.src.utils.storage.local_repository import LocalRepository, new_document_id
+
+
+class MemoryRepository(LocalRepository):
+    """
+    Storage repository kept in process memory. Data is lost when the process exits.
+    """
+
+    def __init__(self):
+        self.notes: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self.quizzes: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self.aggregates: Dict[str, Dict[str, Any]] = {}
+        self.lock = threading.RLock()
+
+    @contextmanager
+    def transaction(self) -> Iterator[None]:
+        with self.lock:
+            yield
+
+    def insert_notes(self, user_id: str, note_chunks: List[Tuple[str, np.ndarray]], timestamp: datetime) -> None:
+        with self.lock:
+            user_notes = self.notes.setdefault(user_id, {})
+            for note, embedding in note_chunks:
+                user_notes[new_document_id()] = {"summarised_notes": note, "embedding": embedding, "timestamp": timestamp}
+
+    def get_notes(self, user_id: str, since: Optional[datetime] = None) -> List[Dict[str, Any]]:
+        with self.lock:
+            return [
+                {"id": note_id, "summarised_notes": note["summarised_notes"], "timestamp": note["timestamp"]}
+                for note_id, note in self.notes.get(user_id, {}).items()
+                if since is None or note["timestamp"] >= since
+            ]
+
+    def get_note_embeddings(self, user_id: str) -> Tuple[List[str], np.ndarray]:
+        with self.lock:
+            user_notes = list(self.notes.get(user_id, {}).values())
+        if not user_notes:
+            return [], np.empty((0, 0), dtype=np.float32)
+        return [note["summarised_notes"] for note in user_notes], np.stack([note["embedding"] for note in user_notes])
+
+    def insert_quiz(self, user_id: str, quiz_id: str, quiz_data: Dict[str, Any]) -> None:
+        with self.lock:
+            self.quizzes.setdefault(user_id, {})[quiz_id] = copy.deepcopy(quiz_data)
+
+    def update_quiz(self, user_id: str, quiz_id: str, fields: Dict[str, Any]) -> bool:
+        with self.lock:
+            quiz = self.quizzes.get(user_id, {}).get(quiz_id)
+            if quiz is None:
+                return False
+            quiz.update(copy.deepcopy(fields))
+            return True
+
+    def find_quiz_ids(self, user_id: str, question: str) -> List[str]:
+        with self.lock:
+            return [quiz_id for quiz_id, quiz in self.quizzes.get(user_id, {}).items() if quiz.get("question") == question]
+
+    def get_quizzes(self, user_id: str) -> List[Dict[str, Any]]:
+        with self.lock:
+            return [{**copy.deepcopy(quiz), "id": quiz_id} for quiz_id, quiz in self.quizzes.get(user_id, {}).items()]
+
+    def get_aggregate(self, user_id: str) -> Optional[Dict[str, Any]]:
+        with self.lock:
+            return copy.deepcopy(self.aggregates.get(user_id))
+
+    def put_aggregate(self, user_id: str, aggregate: Dict[str, Any]) -> None:
+        with self.lock:
+            self.aggregates[user_id] = copy.deepcopy(aggregate)
+
+    def delete_collection(self, coll_name: str, user_id: Optional[str] = None) -> int:
+        with self.lock:
+            if coll_name == USER_COLLECTION and user_id:
+                return len(self.notes.pop(user_id, {})) + len(self.quizzes.pop(user_id, {})) + (1 if self.aggregates.pop(user_id, None) is not None else 0)
+            if coll_name == USER_COLLECTION:
+                deleted = len(set(self.notes) | set(self.quizzes) | set(self.aggregates))
+                self.notes.clear()
+                self.quizzes.clear()
+                self.aggregates.clear()
+                return deleted
+
+            collections = {NOTE_COLLECTION: self.notes, QUIZ_COLLECTION: self.quizzes}
+            if coll_name in collections:
+                return len(collections[coll_name].pop(user_id, {}))
+            if coll_name == PERFORMANCE_COLLECTION:
+                return 1 if self.aggregates.pop(user_id, None) is not None else 0
+            return 0
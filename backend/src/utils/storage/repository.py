@@ -0,0 +1,149 @@
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional, Sequence, Union
+
+from backend.src.api.v1.models.responses import FreeResponseQuestion, MultiSelectQuestion, MultipleChoiceQuestion, TrueFalseQuestion
+from backend.src.utils.quiz.performance_aggregate import AnswerRecord
+from backend.src.utils.quiz.question_index import QuestionIndex
+
+
+class StorageRepository(ABC):
+    """
+    Persistence interface for a user's notes, quizzes and performance, including vector search over notes.
+    """
+
+    @abstractmethod
+    def add_to_notes(self, user_id: str, notes: str) -> None:
+        """
+        Adds chunked and embedded notes for a user.
+
+        Args:
+            user_id (str): The ID of the user.
+            notes (str): The notes to be chunked and added.
+        """
+
+    @abstractmethod
+    def retrieve_notes(self, user_id: str) -> str:
+        """
+        Retrieves and aggregates the user's recent notes, or all notes if there are no recent ones.
+
+        Args:
+            user_id (str): The ID of the user.
+
+        Returns:
+            str: Aggregated notes content.
+
+        Raises:
+            ValueError: If the user has no notes.
+        """
+
+    @abstractmethod
+    def similarity_search_in_notes(self, user_id: str, embeddings: Sequence[float], limit: Optional[int] = 5) -> List[str]:
+        """
+        Finds the notes nearest to the embeddings by Euclidean distance.
+
+        Args:
+            user_id (str): The ID of the user.
+            embeddings (Sequence[float]): The query embeddings.
+            limit (Optional[int]): The maximum number of similar texts to retrieve. Defaults to 5.
+
+        Returns:
+            List[str]: A list of similar texts.
+        """
+
+    @abstractmethod
+    def add_to_quizzes(self, user_id: str, quiz_qn_and_ans_list: List[Union[MultipleChoiceQuestion, MultiSelectQuestion, TrueFalseQuestion, FreeResponseQuestion]]) -> List[str]:
+        """
+        Stores quiz questions and assigns each new question its ID. Questions that already carry an 'id' are not stored again.
+
+        Args:
+            user_id (str): The ID of the user.
+            quiz_qn_and_ans_list (List[Union[MultipleChoiceQuestion, MultiSelectQuestion, TrueFalseQuestion, FreeResponseQuestion]]): The validated quiz questions.
+
+        Returns:
+            List[str]: The IDs of the quiz questions, in order.
+        """
+
+    def add_student_answer_to_quizzes(self,
+                                      user_id: str,
+                                      question_and_answer: Union[MultipleChoiceQuestion, MultiSelectQuestion, TrueFalseQuestion, FreeResponseQuestion],
+                                      student_answer: Union[int, List[int], str],
+                                      correctness: int) -> None:
+        """
+        Records a student's answer on its quiz question and in the user's performance aggregate.
+
+        Args:
+            user_id (str): The ID of the user.
+            question_and_answer (Union[MultipleChoiceQuestion, MultiSelectQuestion, TrueFalseQuestion, FreeResponseQuestion]): The answered question.
+            student_answer (Union[int, List[int], str]): The student's answer to the question.
+            correctness (int): Whether the student's answer is correct or not. 1=Correct, 0=Incorrect
+        """
+        self.add_student_answers_to_quizzes(user_id, [AnswerRecord(question_and_answer, student_answer, correctness)])
+
+    @abstractmethod
+    def add_student_answers_to_quizzes(self, user_id: str, answer_records: List[AnswerRecord]) -> None:
+        """
+        Records several answers of a user on their quiz questions and in the performance aggregate, in one transaction.
+
+        Args:
+            user_id (str): The ID of the user.
+            answer_records (List[AnswerRecord]): The answers, oldest first.
+        """
+
+    @abstractmethod
+    def load_question_index(self, user_id: str) -> QuestionIndex:
+        """
+        Returns the user's question index, building it from the stored quizzes on first use.
+
+        Args:
+            user_id (str): The ID of the user.
+
+        Returns:
+            QuestionIndex: The user's question index.
+        """
+
+    @abstractmethod
+    def get_performance_aggregate(self, user_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Retrieves the user's performance aggregate.
+
+        Args:
+            user_id (str): The ID of the user.
+
+        Returns:
+            Optional[Dict[str, Any]]: The aggregate, or None if the user has not answered any question yet.
+        """
+
+    @abstractmethod
+    def set_cached_evaluation(self, user_id: str, digest: str, strength_weakness: Dict[str, str]) -> None:
+        """
+        Stores a strength and weakness evaluation on the user's performance aggregate.
+
+        Args:
+            user_id (str): The ID of the user.
+            digest (str): The digest of the answers the evaluation is based on.
+            strength_weakness (Dict[str, str]): The evaluation with 'strength' and 'weakness'.
+        """
+
+    @abstractmethod
+    def delete_all_docs_in_collection(self, coll_name: str, batch_size: int, user_id: Optional[str] = None, recursive: Optional[bool] = False) -> int:
+        """
+        Deletes all documents in a collection.
+
+        Deleting the quiz collection or users also resets the performance aggregate, with its cached
+        evaluation, of the users whose quizzes are deleted.
+
+        Deleting the users collection with a user ID deletes only that user's document, and its data
+        when recursive. Without a user ID every user is deleted, so API routes always pass the caller's ID.
+
+        Args:
+            coll_name (str): The name of the collection.
+            batch_size (int): The maximum number of documents to delete in a batch.
+            user_id (Optional[str]): The ID of the user (required for non-user collections).
+            recursive (Optional[bool]): Whether to also delete the subcollections of each document. Defaults to False.
+
+        Returns:
+            int: The number of deleted documents.
+
+        Raises:
+            ValueError: If user_id is not provided for non-user collections.
+        """
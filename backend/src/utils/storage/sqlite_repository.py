@@ -0,0 +1,148 @@
+import json
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from backend.src.utils.constants import NOTE_COLLECTION, PERFORMANCE_COLLECTION, QUIZ_COLLECTION, USER_COLLECTION
+from backend.src.utils.storage.local_repository import LocalRepository, new_document_id
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS notes (
+    id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    summarised_notes TEXT NOT NULL,
+    embedding BLOB NOT NULL,
+    timestamp REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS notes_user_timestamp ON notes (user_id, timestamp);
+
+CREATE TABLE IF NOT EXISTS quizzes (
+    id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    question TEXT NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS quizzes_user_question ON quizzes (user_id, question);
+
+CREATE TABLE IF NOT EXISTS performance (
+    user_id TEXT PRIMARY KEY,
+    data TEXT NOT NULL
+);
+"""
+
+
+def _encode(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return {"$datetime": value.isoformat()}
+    raise TypeError(f"Object of type {type(value)} is not JSON serializable")
+
+
+def _decode(value: Dict[str, Any]) -> Any:
+    if len(value) == 1 and "$datetime" in value:
+        return datetime.fromisoformat(value["$datetime"])
+    return value
+
+
+def dumps(value: Any) -> str:
+    """
+    Serialises a document to JSON, keeping datetimes.
+    """
+    return json.dumps(value, default=_encode)
+
+
+def loads(value: str) -> Any:
+    """
+    Deserialises a document written by `dumps`.
+    """
+    return json.loads(value, object_hook=_decode)
+
+
+class SQLiteRepository(LocalRepository):
+    """
+    Storage repository backed by a single SQLite database file, with vector search over notes in NumPy.
+    """
+
+    def __init__(self, database_path: str):
+        self.connection = sqlite3.connect(database_path, check_same_thread=False, isolation_level=None)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.executescript(_SCHEMA)
+        self.lock = threading.RLock()
+        self.depth = 0
+
+    @contextmanager
+    def transaction(self) -> Iterator[None]:
+        with self.lock:
+            self.depth += 1
+            if self.depth == 1:
+                self.connection.execute("BEGIN IMMEDIATE")
+            try:
+                yield
+                if self.depth == 1:
+                    self.connection.execute("COMMIT")
+            except BaseException:
+                if self.depth == 1:
+                    self.connection.execute("ROLLBACK")
+                raise
+            finally:
+                self.depth -= 1
+
+    def execute(self, sql: str, parameters: Optional[Tuple[Any, ...]] = ()) -> List[Tuple[Any, ...]]:
+        with self.lock:
+            return self.connection.execute(sql, parameters).fetchall()
+
+    def insert_notes(self, user_id: str, note_chunks: List[Tuple[str, np.ndarray]], timestamp: datetime) -> None:
+        rows = [(new_document_id(), user_id, note, np.asarray(embedding, dtype=np.float32).tobytes(), timestamp.timestamp()) for note, embedding in note_chunks]
+        with self.transaction():
+            self.connection.executemany("INSERT INTO notes VALUES (?, ?, ?, ?, ?)", rows)
+
+    def get_notes(self, user_id: str, since: Optional[datetime] = None) -> List[Dict[str, Any]]:
+        rows = self.execute(
+            "SELECT id, summarised_notes, timestamp FROM notes WHERE user_id = ? AND timestamp >= ? ORDER BY timestamp",
+            (user_id, since.timestamp() if since else 0),
+        )
+        return [{"id": note_id, "summarised_notes": note, "timestamp": datetime.fromtimestamp(timestamp, timezone.utc)} for note_id, note, timestamp in rows]
+
+    def get_note_embeddings(self, user_id: str) -> Tuple[List[str], np.ndarray]:
+        rows = self.execute("SELECT summarised_notes, embedding FROM notes WHERE user_id = ?", (user_id,))
+        if not rows:
+            return [], np.empty((0, 0), dtype=np.float32)
+        return [note for note, _ in rows], np.stack([np.frombuffer(embedding, dtype=np.float32) for _, embedding in rows])
+
+    def insert_quiz(self, user_id: str, quiz_id: str, quiz_data: Dict[str, Any]) -> None:
+        self.execute("INSERT INTO quizzes VALUES (?, ?, ?, ?)", (quiz_id, user_id, quiz_data["question"], dumps(quiz_data)))
+
+    def update_quiz(self, user_id: str, quiz_id: str, fields: Dict[str, Any]) -> bool:
+        with self.transaction():
+            rows = self.execute("SELECT data FROM quizzes WHERE user_id = ? AND id = ?", (user_id, quiz_id))
+            if not rows:
+                return False
+            self.execute("UPDATE quizzes SET data = ? WHERE id = ?", (dumps({**loads(rows[0][0]), **fields}), quiz_id))
+            return True
+
+    def find_quiz_ids(self, user_id: str, question: str) -> List[str]:
+        return [quiz_id for quiz_id, in self.execute("SELECT id FROM quizzes WHERE user_id = ? AND question = ?", (user_id, question))]
+
+    def get_quizzes(self, user_id: str) -> List[Dict[str, Any]]:
+        return [{**loads(data), "id": quiz_id} for quiz_id, data in self.execute("SELECT id, data FROM quizzes WHERE user_id = ?", (user_id,))]
+
+    def get_aggregate(self, user_id: str) -> Optional[Dict[str, Any]]:
+        rows = self.execute("SELECT data FROM performance WHERE user_id = ?", (user_id,))
+        return loads(rows[0][0]) if rows else None
+
+    def put_aggregate(self, user_id: str, aggregate: Dict[str, Any]) -> None:
+        self.execute("INSERT OR REPLACE INTO performance VALUES (?, ?)", (user_id, dumps(aggregate)))
+
+    def delete_collection(self, coll_name: str, user_id: Optional[str] = None) -> int:
+        tables = {NOTE_COLLECTION: "notes", QUIZ_COLLECTION: "quizzes", PERFORMANCE_COLLECTION: "performance"}
+        with self.transaction():
+            if coll_name == USER_COLLECTION and user_id:
+                return sum(self.connection.execute(f"DELETE FROM {table} WHERE user_id = ?", (user_id,)).rowcount for table in tables.values())
+            if coll_name == USER_COLLECTION:
+                return sum(self.connection.execute(f"DELETE FROM {table}").rowcount for table in tables.values())
+            if coll_name in tables:
+                return self.connection.execute(f"DELETE FROM {tables[coll_name]} WHERE user_id = ?", (user_id,)).rowcount
+            return 0
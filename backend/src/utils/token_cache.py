@@ -0,0 +1,288 @@
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+from importlib.metadata import PackageNotFoundError, version
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from backend.src.utils.cache.factory import get_shared_cache
+from backend.src.utils.constants import (
+    ID_TOKEN_LIFETIME_SECONDS,
+    REVOKED_TOKENS_NAMESPACE,
+    REVOKED_USERS_NAMESPACE,
+    SIGNING_KEYS_REFRESH_SECONDS,
+    TOKEN_CACHE_MAX_ENTRIES,
+    TOKEN_CACHE_MAX_TTL_SECONDS,
+)
+from backend.src.utils.metrics import get_counter
+
+token_cache_counter = get_counter("token_cache_requests_total", "Verified ID token cache lookups by outcome", ("outcome",))
+
+# Verified claims by SHA-256 of the token, with the time the entry stops being valid.
+_verified_tokens: "OrderedDict[str, Tuple[Dict[str, Any], float]]" = OrderedDict()
+_revoked_tokens: Dict[str, float] = {}
+_revoked_users: Dict[str, float] = {}
+_lock = threading.Lock()
+_key_refresh_timer: Optional[threading.Timer] = None
+
+VERIFIED_TOKENS_NAMESPACE = "verified_tokens"
+
+# Prefetching goes through the Admin SDK's private token verifier, so it is only done with the
+# firebase-admin releases it was checked against (pinned in requirements.txt).
+SIGNING_KEY_PREFETCH_FIREBASE_ADMIN_VERSIONS = ("6.5.",)
+
+
+class TokenRevokedError(Exception):
+    """
+    Raised when a token, or all tokens of its user, were revoked in this process or, with a shared cache, in another worker.
+    """
+
+
+def _token_key(token: str) -> str:
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+def _is_revoked(key: str, claims: Dict[str, Any]) -> bool:
+    revoked_at = _revoked_users.get(claims.get("uid", ""))
+    return key in _revoked_tokens or (revoked_at is not None and claims.get("iat", 0) <= revoked_at)
+
+
+def _is_revoked_shared(key: str, claims: Dict[str, Any]) -> bool:
+    cache = get_shared_cache()
+    if not cache.is_shared:
+        return False
+    revoked_at = cache.get_json(REVOKED_USERS_NAMESPACE, claims.get("uid", ""))
+    return cache.get(REVOKED_TOKENS_NAMESPACE, key) is not None or (revoked_at is not None and claims.get("iat", 0) <= revoked_at)
+
+
+def _get_shared_claims(key: str, now: float) -> Optional[Tuple[Dict[str, Any], float]]:
+    cache = get_shared_cache()
+    if not cache.is_shared:
+        return None
+    entry = cache.get_json(VERIFIED_TOKENS_NAMESPACE, key)
+    if entry is None or now >= entry["valid_until"]:
+        return None
+    return entry["claims"], entry["valid_until"]
+
+
+def _cache_claims(key: str, claims: Dict[str, Any], valid_until: float) -> None:
+    with _lock:
+        _verified_tokens[key] = (claims, valid_until)
+        _verified_tokens.move_to_end(key)
+        while len(_verified_tokens) > TOKEN_CACHE_MAX_ENTRIES:
+            _verified_tokens.popitem(last=False)
+
+
+def verify_token_cached(token: str, verify: Optional[Callable[[str], Dict[str, Any]]] = None) -> Dict[str, Any]:
+    """
+    Returns the decoded claims of an ID token, verifying its signature only the first time it is seen.
+
+    Verified claims are cached by a hash of the token until the token's 'exp', and for at most
+    TOKEN_CACHE_MAX_TTL_SECONDS so that revocations made by other processes are picked up. The cache
+    holds at most TOKEN_CACHE_MAX_ENTRIES tokens, evicting the least recently used. With a shared
+    cache backend, tokens verified and revocations made by one server worker also apply to the others,
+    and revocations are checked on every lookup, including those served from this process.
+
+    Args:
+        token (str): The ID token.
+        verify (Optional[Callable[[str], Dict[str, Any]]]): The verifier to call on a cache miss. Defaults to `firebase_admin.auth.verify_id_token`.
+
+    Returns:
+        Dict[str, Any]: The decoded claims of the token.
+
+    Raises:
+        TokenRevokedError: If the token or its user's tokens were revoked with `revoke_token` or `revoke_user_tokens`.
+        Exception: Any error raised by the verifier for an invalid or expired token.
+    """
+    key = _token_key(token)
+    now = time.time()
+
+    with _lock:
+        entry = _verified_tokens.get(key)
+        if entry is not None:
+            claims, valid_until = entry
+            if _is_revoked(key, claims):
+                _verified_tokens.pop(key)
+                token_cache_counter.inc(outcome="revoked")
+                raise TokenRevokedError("The ID token has been revoked.")
+            if now < valid_until:
+                _verified_tokens.move_to_end(key)
+            else:
+                _verified_tokens.pop(key)
+
+    # Shared lookups are made outside the lock, as they may wait on another process.
+    if entry is not None and now < entry[1]:
+        claims = entry[0]
+        if _is_revoked_shared(key, claims):
+            with _lock:
+                _verified_tokens.pop(key, None)
+            token_cache_counter.inc(outcome="revoked")
+            raise TokenRevokedError("The ID token has been revoked.")
+        token_cache_counter.inc(outcome="hit")
+        return claims
+
+    shared_entry = _get_shared_claims(key, now)
+    if shared_entry is not None:
+        claims, valid_until = shared_entry
+        with _lock:
+            revoked = _is_revoked(key, claims)
+        if revoked or _is_revoked_shared(key, claims):
+            token_cache_counter.inc(outcome="revoked")
+            raise TokenRevokedError("The ID token has been revoked.")
+        _cache_claims(key, claims, valid_until)
+        token_cache_counter.inc(outcome="shared_hit")
+        return claims
+    token_cache_counter.inc(outcome="expired" if entry is not None else "miss")
+
+    if verify is None:
+        from firebase_admin import auth
+        verify = auth.verify_id_token
+    claims = verify(token)
+
+    with _lock:
+        revoked = _is_revoked(key, claims)
+    if revoked or _is_revoked_shared(key, claims):
+        token_cache_counter.inc(outcome="revoked")
+        raise TokenRevokedError("The ID token has been revoked.")
+
+    valid_until = min(claims.get("exp", now), now + TOKEN_CACHE_MAX_TTL_SECONDS)
+    _cache_claims(key, claims, valid_until)
+    cache = get_shared_cache()
+    if cache.is_shared and valid_until > now:
+        cache.set_json(VERIFIED_TOKENS_NAMESPACE, key, {"claims": claims, "valid_until": valid_until}, valid_until - now)
+
+    return claims
+
+
+def revoke_token(token: str) -> None:
+    """
+    Revokes a single ID token in this process and, with a shared cache backend, in every worker sharing it, e.g. on logout.
+
+    Args:
+        token (str): The ID token.
+    """
+    key = _token_key(token)
+    now = time.time()
+    with _lock:
+        entry = _verified_tokens.pop(key, None)
+        # Kept until the token would have expired anyway, so the revocation list stays small.
+        revoked_until = entry[1] if entry is not None else now + TOKEN_CACHE_MAX_TTL_SECONDS
+        _revoked_tokens[key] = revoked_until
+        _prune_revoked_tokens()
+
+    cache = get_shared_cache()
+    if cache.is_shared:
+        cache.delete(VERIFIED_TOKENS_NAMESPACE, key)
+        # Another worker may have cached the token for up to TOKEN_CACHE_MAX_TTL_SECONDS.
+        cache.set(REVOKED_TOKENS_NAMESPACE, key, b"1", max(revoked_until - now, TOKEN_CACHE_MAX_TTL_SECONDS))
+
+
+def revoke_user_tokens(uid: str) -> None:
+    """
+    Revokes every ID token issued to a user up to now in this process and, with a shared cache
+    backend, in every worker sharing it.
+
+    Args:
+        uid (str): The ID of the user.
+    """
+    now = time.time()
+    cache = get_shared_cache()
+    if cache.is_shared:
+        cache.set_json(REVOKED_USERS_NAMESPACE, uid, now, ID_TOKEN_LIFETIME_SECONDS)
+
+    with _lock:
+        # Tokens issued before an older revocation have expired by now, so the revocation can be dropped.
+        for revoked_uid in [revoked_uid for revoked_uid, revoked_at in _revoked_users.items() if revoked_at < now - ID_TOKEN_LIFETIME_SECONDS]:
+            _revoked_users.pop(revoked_uid)
+        _revoked_users[uid] = now
+        for key in [key for key, (claims, _) in _verified_tokens.items() if claims.get("uid") == uid]:
+            _verified_tokens.pop(key)
+
+
+def clear_token_cache() -> None:
+    """
+    Removes all tokens and revocations cached in this process. Entries in a shared cache are kept.
+    """
+    with _lock:
+        _verified_tokens.clear()
+        _revoked_tokens.clear()
+        _revoked_users.clear()
+
+
+def _prune_revoked_tokens() -> None:
+    now = time.time()
+    for key in [key for key, expires_at in _revoked_tokens.items() if expires_at <= now]:
+        _revoked_tokens.pop(key)
+
+
+def signing_key_prefetch_supported() -> bool:
+    """
+    Returns whether the installed firebase-admin is one of SIGNING_KEY_PREFETCH_FIREBASE_ADMIN_VERSIONS.
+    """
+    try:
+        return version("firebase-admin").startswith(SIGNING_KEY_PREFETCH_FIREBASE_ADMIN_VERSIONS)
+    except PackageNotFoundError:
+        return False
+
+
+def prefetch_signing_keys() -> float:
+    """
+    Fetches the public keys ID tokens are signed with into the Firebase Admin SDK's HTTP cache,
+    so the first verification after startup or key rotation does not wait on the fetch.
+
+    Returns:
+        float: The seconds the keys may be cached for, from the response's Cache-Control max-age.
+
+    Raises:
+        RuntimeError: If the installed firebase-admin is not supported.
+    """
+    if not signing_key_prefetch_supported():
+        raise RuntimeError(f"Prefetching signing keys needs firebase-admin {', '.join(SIGNING_KEY_PREFETCH_FIREBASE_ADMIN_VERSIONS)}x")
+
+    from firebase_admin import auth
+    from firebase_admin._token_gen import ID_TOKEN_CERT_URI
+
+    # The SDK fetches the keys through a cache-control aware session kept on its token verifier,
+    # so fetching through the same session serves later verifications from the cache.
+    request = auth._get_client(None)._token_verifier.request
+    response = request(ID_TOKEN_CERT_URI)
+
+    cache_control = response.headers.get("Cache-Control", "")
+    for directive in cache_control.split(","):
+        name, _, value = directive.strip().partition("=")
+        if name == "max-age" and value.isdigit():
+            return float(value)
+    return SIGNING_KEYS_REFRESH_SECONDS
+
+
+def start_signing_key_refresh() -> None:
+    """
+    Prefetches the signing keys and keeps refetching them on a daemon timer as their cache expires.
+    Failures are logged and retried after SIGNING_KEYS_REFRESH_SECONDS. Nothing is prefetched with
+    unsupported firebase-admin releases, and the SDK then fetches the keys on first verification.
+    """
+    global _key_refresh_timer
+
+    if not signing_key_prefetch_supported():
+        logging.warning(f"Not prefetching ID token signing keys: needs firebase-admin {', '.join(SIGNING_KEY_PREFETCH_FIREBASE_ADMIN_VERSIONS)}x")
+        return
+
+    try:
+        refresh_in = prefetch_signing_keys()
+        logging.info(f"Prefetched ID token signing keys, refreshing in {refresh_in:.0f}s")
+    except Exception as e:
+        refresh_in = SIGNING_KEYS_REFRESH_SECONDS
+        logging.warning(f"Failed to prefetch ID token signing keys: {e}")
+
+    _key_refresh_timer = threading.Timer(refresh_in + 1, start_signing_key_refresh)
+    _key_refresh_timer.daemon = True
+    _key_refresh_timer.start()
+
+
+def stop_signing_key_refresh() -> None:
+    """
+    Stops refetching the signing keys.
+    """
+    if _key_refresh_timer is not None:
+        _key_refresh_timer.cancel()